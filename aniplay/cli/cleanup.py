@@ -14,14 +14,29 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+"""
+Remove Jellyfin/Kodi junk (see CLEANUP_PATTERNS) from the library.
+
+    python -m aniplay.cli.cleanup [LIBRARY]              # dry run: list what would go
+    python -m aniplay.cli.cleanup [LIBRARY] --apply      # move it to CLEANUP_TRASH_DIR
+    python -m aniplay.cli.cleanup [LIBRARY] --apply --delete   # delete for good
+    python -m aniplay.cli.cleanup [LIBRARY] --empty-dirs # also remove empty folders
+    python -m aniplay.cli.cleanup --trash                # list trash batches
+    python -m aniplay.cli.cleanup --restore MANIFEST     # put a batch back
+"""
+
+import argparse
 import asyncio
-import os
+import time
 from pathlib import Path
-from ..config import DEFAULT_LIBRARY_PATH
+from ..config import DEFAULT_LIBRARY_PATH, CLEANUP_EMPTY_DIRS, CLEANUP_WORKERS
 from ..utils.cleanup_manager import CleanupManager
+from ..utils.format_utils import format_size
 
-async def run_cleanup(library_path: str = DEFAULT_LIBRARY_PATH, dry_run: bool = True):
-    manager = CleanupManager(dry_run=dry_run)
+async def run_cleanup(library_path: str = DEFAULT_LIBRARY_PATH, dry_run: bool = True, delete: bool = False,
+                      workers: int = CLEANUP_WORKERS, empty_dirs: bool = CLEANUP_EMPTY_DIRS):
+    kwargs = {"trash_dir": None} if delete else {}
+    manager = CleanupManager(dry_run=dry_run, empty_dirs=empty_dirs, workers=workers, **kwargs)
     root = Path(library_path)
     
     if not root.exists():
@@ -33,42 +48,71 @@ async def run_cleanup(library_path: str = DEFAULT_LIBRARY_PATH, dry_run: bool =
         print("[DRY RUN] No files will be actually deleted.")
     print("-" * 60)
 
-    junk_files = manager.scan_for_junk(library_path)
+    start = time.perf_counter()
+    junk = await asyncio.to_thread(manager.scan, library_path)
+    scanned_in = time.perf_counter() - start
     
-    if not junk_files:
-        print("No junk files found. Your library is clean!")
+    if not junk:
+        print(f"No junk files found. Your library is clean! ({scanned_in:.2f}s)")
         return
 
-    print(f"Found {len(junk_files)} potential junk files:")
-    for f in junk_files[:20]: # Show first 20
-        print(f"  - {f.name} (in {f.parent.name})")
+    print(f"Found {len(junk)} potential junk items in {scanned_in:.2f}s:")
+    for item in junk[:20]: # Show first 20
+        p = Path(item.path)
+        kind = {"dir": " [folder]", "empty_dir": " [empty folder]"}.get(item.kind, "")
+        print(f"  - {p.name}{kind} (in {p.parent.name})")
     
-    if len(junk_files) > 20:
-        print(f"  ... and {len(junk_files) - 20} more.")
+    if len(junk) > 20:
+        print(f"  ... and {len(junk) - 20} more.")
 
-    total_size_mb = sum(f.stat().st_size for f in junk_files) / (1024 * 1024)
-    print(f"\nTotal potential space to save: {total_size_mb:.2f} MB")
+    print(f"\nTotal potential space to save: {format_size(sum(item.size for item in junk))}")
 
     if dry_run:
         print("\nTo actually delete these files, run with --apply")
     else:
-        print("\nDeleting files...")
-        results = manager.cleanup(junk_files)
-        print(f"Successfully deleted {len(results['deleted'])} files.")
+        print("\nDeleting files..." if delete else f"\nMoving files to {manager.trash_dir}...")
+        results = await asyncio.to_thread(manager.cleanup, junk, library_path)
+        print(f"Successfully removed {len(results['deleted'])} items ({format_size(results['total_size'])}).")
+        if results["manifest"]:
+            print(f"Undo with: python -m aniplay.cli.cleanup --restore \"{results['manifest']}\"")
         if results["failed"]:
             print(f"Failed to delete {len(results['failed'])} files. Check logs.")
 
+
+def show_trash():
+    batches = CleanupManager().list_trash()
+    if not batches:
+        print("The trash is empty.")
+    for batch in batches:
+        print(f"{batch['created_at']}  {batch['items']:>6} items  {format_size(batch['size']):>10}  {batch['library_path']}")
+        print(f"    {batch['manifest']}")
+
+
+def restore(manifest: str):
+    results = CleanupManager(dry_run=False).restore(manifest)
+    print(f"Restored {len(results['restored'])} items.")
+    for failure in results["failed"]:
+        print(f"  Failed: {failure['path']}: {failure['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("library", nargs="?", default=DEFAULT_LIBRARY_PATH)
+    parser.add_argument("--apply", action="store_true", help="actually remove the files")
+    parser.add_argument("--delete", action="store_true", help="delete instead of moving to the trash")
+    parser.add_argument("--empty-dirs", action="store_true", default=CLEANUP_EMPTY_DIRS,
+                        help="also remove folders that are empty or hold only junk")
+    parser.add_argument("--workers", type=int, default=CLEANUP_WORKERS)
+    parser.add_argument("--trash", action="store_true", help="list trash batches")
+    parser.add_argument("--restore", metavar="MANIFEST", help="restore a trash batch")
+    args = parser.parse_args()
+
+    if args.trash:
+        show_trash()
+    elif args.restore:
+        restore(args.restore)
+    else:
+        asyncio.run(run_cleanup(args.library, not args.apply, args.delete, args.workers, args.empty_dirs))
+
 if __name__ == "__main__":
-    import sys
-    path = DEFAULT_LIBRARY_PATH
-    dry_run = True
-    
-    args = sys.argv[1:]
-    if "--apply" in args:
-        dry_run = False
-        args.remove("--apply")
-    
-    if args:
-        path = args[0]
-    
-    asyncio.run(run_cleanup(path, dry_run))
+    main()
@@ -0,0 +1,145 @@
+# AniPlay - Personal media server and player for anime libraries.
+# Copyright (C) 2026  Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Work through the download queue without the GUI, e.g. on a server.
+
+    python -m aniplay.cli.download [--watch] [--poll SECONDS] [--status-port PORT]
+    python -m aniplay.cli.download --status [--json]
+
+Downloads queued in the database (by the app, or left over from an earlier
+run) start under the same limits as in the app and continue from their last
+checkpoint. Without --watch it exits once the queue is done; with it, it keeps
+polling the database for new ones. --status-port serves the live queue as
+JSON on 127.0.0.1. Ctrl+C or SIGTERM stops it, keeping partial downloads for
+the next run.
+
+Run it instead of the app, not next to it: both would pick up the same rows.
+"""
+
+import argparse
+import asyncio
+import json
+import signal
+
+from ..core.download_service import DownloadService
+from ..database.db import DatabaseManager
+
+WAITING = ("Downloading", "Queued", "Paused")
+
+
+def format_status(status: dict) -> str:
+    """One line summary of DownloadService.status()."""
+    line = (f"{len(status['active'])} downloading, {len(status['processing'])} checking, "
+            f"{len(status['queued'])} queued, {status['finished']} finished, {status['failed']} failed")
+    for task in status["active"]:
+        line += f"\n  {task['progress'] or 0:5.1f}%  {task['speed'] or '':>12}  ETA {task['eta'] or '-':<8} {task['filename']}"
+    return line
+
+
+async def serve_status(service: DownloadService, port: int, host: str = "127.0.0.1") -> asyncio.AbstractServer:
+    """Answer every HTTP request on host:port with service.status() as JSON."""
+    async def handle(reader, writer):
+        try:
+            # The request itself does not matter; read its head so the client sees a normal reply
+            await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        body = json.dumps(service.status()).encode()
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                     b"Content-Length: " + str(len(body)).encode() + b"\r\nConnection: close\r\n\r\n" + body)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+async def print_queue(db: DatabaseManager, as_json: bool):
+    tasks = await db.get_all_download_tasks()
+    # Waiting downloads first, in the order they will start
+    tasks.sort(key=lambda t: (t.status not in WAITING, -t.priority if t.status in WAITING else 0))
+    if as_json:
+        print(json.dumps([{"filename": t.filename, "status": t.status, "progress": t.progress, "priority": t.priority,
+                           "last_updated": t.last_updated.isoformat(timespec="seconds")} for t in tasks], indent=2))
+        return
+    if not tasks:
+        print("The download queue is empty.")
+    for t in tasks:
+        print(f"{t.status:<12} {t.progress:5.1f}%  {t.filename}")
+
+
+async def run(args):
+    db = DatabaseManager()
+    await db.initialize()
+
+    if args.status:
+        await print_queue(db, args.json)
+        return
+
+    service = DownloadService(db)
+    service.task_finished.connect(
+        lambda filename, success, message, metadata: print(f"{'Finished' if success else 'Failed'}: {filename}"
+                                                           + ("" if success else f" ({message})")))
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, AttributeError, ValueError):
+            pass  # Windows: Ctrl+C still ends asyncio.run, and the finally below cleans up
+
+    server = await serve_status(service, args.status_port) if args.status_port else None
+    if server:
+        print(f"Serving the queue status on http://127.0.0.1:{args.status_port}/")
+    try:
+        await service.loaded
+        last = None
+        while not stop.is_set():
+            line = format_status(service.status())
+            if line != last:
+                print(line)
+                last = line
+            if service.idle and not args.watch:
+                break
+            try:
+                await asyncio.wait_for(stop.wait(), args.poll)
+            except asyncio.TimeoutError:
+                pass
+            if args.watch:
+                await service.reload()
+    finally:
+        if server:
+            server.close()
+            await server.wait_closed()
+        await service.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--watch", action="store_true", help="keep running and pick up newly queued downloads")
+    parser.add_argument("--poll", type=float, default=5.0, metavar="SECONDS",
+                        help="how often to print progress and check the database (default 5)")
+    parser.add_argument("--status-port", type=int, metavar="PORT", help="serve the live status as JSON on this port")
+    parser.add_argument("--status", action="store_true", help="print the queue stored in the database and exit")
+    parser.add_argument("--json", action="store_true", help="with --status, print it as JSON")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# AniPlay - Personal media server and player for anime libraries.
+# Copyright (C) 2026  Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Find identical video files in the library roots and the downloads folder.
+
+    python -m aniplay.cli.duplicates [FOLDER ...] [--min-size MB] [--no-verify] [--json FILE]
+    python -m aniplay.cli.duplicates --hardlink [--apply]   # replace copies with hardlinks to the kept one
+    python -m aniplay.cli.duplicates --delete [--apply]     # delete the copies
+
+Without folders, all enabled library roots and DOWNLOADS_PATH are searched.
+The copy with watch progress is kept (then library episodes over downloads).
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from dataclasses import asdict
+
+from ..config import DOWNLOADS_PATH, SCAN_WORKERS
+from ..core.library_manager import LibraryManager
+from ..database.db import DatabaseManager
+from ..utils.duplicate_finder import DuplicateFinder
+from ..utils.format_utils import format_size
+
+
+async def run(args):
+    db = DatabaseManager()
+    await db.initialize()
+    folders = args.folders
+    if not folders:
+        folders = [r.path for r in await LibraryManager(db).get_library_roots(enabled_only=True)] + [str(DOWNLOADS_PATH)]
+
+    finder = DuplicateFinder(db, workers=args.workers)
+    start = time.perf_counter()
+    groups = await finder.find(folders, min_size=int(args.min_size * 1024 * 1024), verify=not args.no_verify)
+    elapsed = time.perf_counter() - start
+
+    if args.json:
+        data = {"folders": folders, "elapsed": round(elapsed, 3),
+                "reclaimable": sum(g.reclaimable for g in groups),
+                "groups": [{**asdict(g), "reclaimable": g.reclaimable} for g in groups]}
+        if args.json == "-":
+            json.dump(data, sys.stdout, indent=2)
+        else:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+
+    if args.json != "-":
+        print(f"Searched {', '.join(folders)} in {elapsed:.1f}s")
+        for group in groups:
+            print(f"\n{format_size(group.size)} x {len(group.paths)} ({format_size(group.reclaimable)} reclaimable)")
+            for path in group.paths:
+                print(f"  {'keep' if path == group.keep else '    '}  {path}")
+        print(f"\n{len(groups)} duplicate groups, {format_size(sum(g.reclaimable for g in groups))} reclaimable")
+
+    # Keep stdout valid JSON with --json -
+    out = sys.stderr if args.json == "-" else sys.stdout
+    mode = "hardlink" if args.hardlink else "delete" if args.delete else None
+    if mode and groups:
+        if not args.apply:
+            print(f"\n[DRY RUN] Run with --apply to {mode} the duplicates.", file=out)
+            return
+        done = failed = reclaimed = 0
+        for group in groups:
+            results = await finder.resolve(group, mode, dry_run=False)
+            done += len(results["done"])
+            failed += len(results["failed"])
+            reclaimed += results["reclaimed"]
+            for failure in results["failed"]:
+                print(f"  Failed: {failure['path']}: {failure['error']}", file=out)
+        print(f"\n{'Hardlinked' if mode == 'hardlink' else 'Deleted'} {done} files, {format_size(reclaimed)} reclaimed"
+              + (f", {failed} failed" if failed else ""), file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folders", nargs="*")
+    parser.add_argument("--min-size", type=float, default=1, help="ignore files smaller than this many MB")
+    parser.add_argument("--no-verify", action="store_true", help="trust the partial hash, skip full hashes of large files")
+    parser.add_argument("--workers", type=int, default=SCAN_WORKERS)
+    parser.add_argument("--json", metavar="FILE", help="write the groups as JSON (\"-\" for stdout)")
+    action = parser.add_mutually_exclusive_group()
+    action.add_argument("--hardlink", action="store_true", help="replace duplicates with hardlinks (same drive only)")
+    action.add_argument("--delete", action="store_true", help="delete duplicates")
+    parser.add_argument("--apply", action="store_true", help="actually change files")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -14,54 +14,165 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-import os
+"""
+Check series folders for organization issues (loose episodes, odd folder names, mixed seasons).
+
+    python -m aniplay.cli.org_check [LIBRARY] [--workers N] [--from-db] [--json FILE] [--csv FILE] [--quiet]
+
+Series are analyzed in parallel. --from-db uses the file list stored by the
+last library scan instead of walking the disk. --json and --csv write a
+machine-readable report ("-" for stdout) including per-series timings.
+"""
+
+import argparse
 import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
-from ..config import DEFAULT_LIBRARY_PATH
+from typing import Dict, List, Optional
+
+from ..config import DEFAULT_LIBRARY_PATH, SCAN_WORKERS
+from ..database.db import DatabaseManager
 from ..utils.org_analyzer import OrgAnalyzer
 
-async def run_check(library_path: str = DEFAULT_LIBRARY_PATH):
-    analyzer = OrgAnalyzer()
+
+async def _files_from_db(db: DatabaseManager, root: Path) -> Dict[str, List[str]]:
+    """Series folder -> relative video paths, as recorded by the last scan of root."""
+    root_abs = os.path.abspath(root)
+    series = {s.id: s.path for s in await db.get_all_series()
+              if os.path.dirname(os.path.abspath(s.path)) == root_abs}
+    files = {path: [] for path in series.values()}
+    for episode in await db.get_all_episodes():
+        path = series.get(episode.series_id)
+        if path is not None:
+            files[path].append(os.path.relpath(episode.path, path))
+    return files
+
+
+def _analyze(analyzer: OrgAnalyzer, folder: str, files: Optional[List[str]]) -> dict:
+    start = time.perf_counter()
+    result = analyzer.analyze_series(folder, files)
+    return {
+        "series": os.path.basename(folder),
+        "path": folder,
+        **result,
+        "elapsed": round(time.perf_counter() - start, 6),
+    }
+
+
+async def run_check(library_path: str = DEFAULT_LIBRARY_PATH, workers: int = SCAN_WORKERS,
+                    from_db: bool = False, db: Optional[DatabaseManager] = None) -> Optional[dict]:
+    """
+    Analyze every series under library_path. Returns the report, or None if the path does not exist.
+    With from_db the file lists come from db (the default database if not given).
+    """
     root = Path(library_path)
-    
     if not root.exists():
-        print(f"Error: Library path '{library_path}' does not exist.")
-        return
+        return None
 
-    print(f"\nScanning library for organization issues: {library_path}")
-    print("-" * 60)
+    started = time.perf_counter()
+    if from_db:
+        if db is None:
+            db = DatabaseManager()
+            await db.initialize()
+        series_files = await _files_from_db(db, root)
+    else:
+        series_files = {str(f): None for f in root.iterdir() if f.is_dir()}
 
-    series_folders = [f for f in root.iterdir() if f.is_dir()]
-    
-    issue_count = 0
-    clean_count = 0
-    
-    for folder in series_folders:
-        # print(f"Checking {folder.name}...")
-        results = analyzer.analyze_series(str(folder))
-        
-        if results["status"] == "issues":
-            issue_count += 1
-            print(f"\n[!] {folder.name}")
-            for issue in results["issues"]:
-                print(f"  - {issue['message']}")
-                if "files" in issue:
-                    print(f"    Possible culprits: {', '.join(issue['files'])}")
-        elif results["status"] == "ok":
-            clean_count += 1
-        # Skip empty folders or non-anime folders without noise
+    analyzer = OrgAnalyzer()
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="org-check") as pool:
+        results = await asyncio.gather(*(
+            loop.run_in_executor(pool, _analyze, analyzer, folder, files)
+            for folder, files in series_files.items()
+        ))
+    results.sort(key=lambda r: r["series"].lower())
+
+    return {
+        "library_path": library_path,
+        "source": "database" if from_db else "disk",
+        "checked_at": datetime.now().isoformat(timespec="seconds"),
+        "workers": workers,
+        "elapsed": round(time.perf_counter() - started, 6),
+        "summary": {
+            "series": len(results),
+            "ok": sum(r["status"] == "ok" for r in results),
+            "issues": sum(r["status"] == "issues" for r in results),
+            "empty": sum(r["status"] == "empty" for r in results),
+        },
+        "series": results,
+    }
+
+
+def write_csv(report: dict, out):
+    """One row per issue; clean and empty series get a single row without an issue."""
+    writer = csv.writer(out)
+    writer.writerow(["series", "path", "status", "total_videos", "elapsed", "issue", "message"])
+    for r in report["series"]:
+        base = [r["series"], r["path"], r["status"], r.get("total_videos", 0), r["elapsed"]]
+        if not r["issues"]:
+            writer.writerow(base + ["", ""])
+        for issue in r["issues"]:
+            writer.writerow(base + [issue["type"], issue["message"]])
+
+
+def print_report(report: dict):
+    print(f"\nScanning library for organization issues: {report['library_path']}")
+    print("-" * 60)
+    for r in report["series"]:
+        if r["status"] != "issues":
+            # Skip empty folders or non-anime folders without noise
+            continue
+        print(f"\n[!] {r['series']}")
+        for issue in r["issues"]:
+            print(f"  - {issue['message']}")
+            if "files" in issue:
+                print(f"    Possible culprits: {', '.join(issue['files'])}")
 
+    summary = report["summary"]
     print("\n" + "=" * 60)
-    print(f"Summary:")
-    print(f"  Total Series Checked: {len(series_folders)}")
-    print(f"  Clean Series:         {clean_count}")
-    print(f"  Series with Issues:   {issue_count}")
+    print("Summary:")
+    print(f"  Total Series Checked: {summary['series']}")
+    print(f"  Clean Series:         {summary['ok']}")
+    print(f"  Series with Issues:   {summary['issues']}")
+    print(f"  Checked in {report['elapsed']:.2f}s from {report['source']} with {report['workers']} workers")
     print("=" * 60 + "\n")
 
+
+def _write(target: str, writer):
+    if target == "-":
+        writer(sys.stdout)
+    else:
+        with open(target, "w", encoding="utf-8", newline="") as f:
+            writer(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("library", nargs="?", default=DEFAULT_LIBRARY_PATH)
+    parser.add_argument("--workers", type=int, default=SCAN_WORKERS)
+    parser.add_argument("--from-db", action="store_true", help="use the files recorded by the last scan")
+    parser.add_argument("--json", metavar="FILE", help="write the report as JSON")
+    parser.add_argument("--csv", metavar="FILE", help="write the issues as CSV")
+    parser.add_argument("--quiet", action="store_true", help="no human readable output")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_check(args.library, args.workers, args.from_db))
+    if report is None:
+        print(f"Error: Library path '{args.library}' does not exist.", file=sys.stderr)
+        sys.exit(1)
+    if args.json:
+        _write(args.json, lambda f: json.dump(report, f, indent=2))
+    if args.csv:
+        _write(args.csv, lambda f: write_csv(report, f))
+    if not args.quiet and "-" not in (args.json, args.csv):
+        print_report(report)
+
+
 if __name__ == "__main__":
-    import sys
-    path = DEFAULT_LIBRARY_PATH
-    if len(sys.argv) > 1:
-        path = sys.argv[1]
-    
-    asyncio.run(run_check(path))
+    main()
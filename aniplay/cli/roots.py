@@ -0,0 +1,134 @@
+# AniPlay - Personal media server and player for anime libraries.
+# Copyright (C) 2026  Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Manage library roots and their scan settings.
+
+    python -m aniplay.cli.roots list
+    python -m aniplay.cli.roots add /mnt/nas/anime --interval 360 --scan-workers 2 --probe-workers 1 --io-class idle
+    python -m aniplay.cli.roots set 2 --nice 10 --offline-timeout 30
+    python -m aniplay.cli.roots remove 2
+    python -m aniplay.cli.roots scan [ID] [--full]
+"""
+
+import argparse
+import asyncio
+import os
+
+from ..core.library_manager import LibraryManager
+from ..core.scan_scheduler import IO_CLASSES, ScanScheduler
+from ..database.db import DatabaseManager
+from ..database.models import LibraryRoot
+
+
+def _print_roots(roots):
+    if not roots:
+        print("No library roots configured.")
+        return
+    print(f"{'ID':>3}  {'Interval':>8}  {'Walk/Probe':>10}  {'Nice':>4}  {'I/O':<11}  {'Last scan':<19}  {'Status':<9}  Path")
+    for r in roots:
+        interval = f"{r.scan_interval}m" if r.scan_interval else "manual"
+        workers = f"{r.scan_workers or '-'}/{r.probe_workers or '-'}"
+        last = r.last_scan_at.strftime("%Y-%m-%d %H:%M:%S") if r.last_scan_at else "never"
+        path = r.path if r.enabled else f"{r.path} (disabled)"
+        print(f"{r.id:>3}  {interval:>8}  {workers:>10}  {r.nice:>4}  {r.io_class:<11}  {last:<19}  {r.last_status or '-':<9}  {path}")
+
+
+def _apply(root: LibraryRoot, args):
+    for field in ("name", "scan_workers", "probe_workers", "nice", "io_class", "offline_timeout"):
+        value = getattr(args, field, None)
+        if value is not None:
+            setattr(root, field, value)
+    if args.interval is not None:
+        root.scan_interval = args.interval
+    if args.enable:
+        root.enabled = True
+    if args.disable:
+        root.enabled = False
+
+
+async def run(args):
+    db = DatabaseManager()
+    await db.initialize()
+    library = LibraryManager(db)
+    roots = await library.get_library_roots()
+
+    if args.command == "list":
+        _print_roots(roots)
+    elif args.command == "add":
+        root = LibraryRoot(path=os.path.abspath(args.path))
+        _apply(root, args)
+        root.id = await db.add_library_root(root)
+        print(f"Added library root {root.id}: {root.path}")
+    elif args.command in ("set", "remove", "scan") and args.id is not None:
+        root = next((r for r in roots if r.id == args.id), None)
+        if root is None:
+            print(f"Error: no library root with ID {args.id}")
+            return
+        if args.command == "set":
+            _apply(root, args)
+            await db.update_library_root(root)
+            _print_roots([root])
+        elif args.command == "remove":
+            await db.remove_library_root(root.id)
+            print(f"Removed library root {root.id}: {root.path}")
+        else:
+            await _scan(library, [root], args.full)
+    elif args.command == "scan":
+        await _scan(library, [r for r in roots if r.enabled], args.full)
+
+
+async def _scan(library, roots, full_scan):
+    scheduler = ScanScheduler(library)
+    for root in roots:
+        print(f"Scanning {root.path}...")
+        status = await scheduler.scan(root, full_scan, progress_callback=lambda e: print(f"  {str(e).strip()}"))
+        print(f"  -> {status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list")
+
+    def settings(p):
+        p.add_argument("--name")
+        p.add_argument("--interval", type=int, help="minutes between background scans, 0 = manual only")
+        p.add_argument("--scan-workers", type=int)
+        p.add_argument("--probe-workers", type=int)
+        p.add_argument("--nice", type=int, help="CPU niceness added to scan threads")
+        p.add_argument("--io-class", choices=list(IO_CLASSES))
+        p.add_argument("--offline-timeout", type=float, help="seconds before the root counts as offline")
+        p.add_argument("--enable", action="store_true")
+        p.add_argument("--disable", action="store_true")
+
+    add = sub.add_parser("add")
+    add.add_argument("path")
+    settings(add)
+    set_ = sub.add_parser("set")
+    set_.add_argument("id", type=int)
+    settings(set_)
+    remove = sub.add_parser("remove")
+    remove.add_argument("id", type=int)
+    scan = sub.add_parser("scan")
+    scan.add_argument("id", type=int, nargs="?")
+    scan.add_argument("--full", action="store_true")
+
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# AniPlay - Personal media server and player for anime libraries.
+# Copyright (C) 2026  Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Show the performance reports stored for recent library scans.
+
+    python -m aniplay.cli.scan_report [--library PATH] [--limit N]
+    python -m aniplay.cli.scan_report --json ID
+    python -m aniplay.cli.scan_report --compare [--library PATH]
+"""
+
+import argparse
+import asyncio
+import json
+
+from ..core.scan_profiler import format_report
+from ..database.db import DatabaseManager
+
+
+def _delta(new: float, old: float) -> str:
+    if not old:
+        return ""
+    return f"{(new - old) / old * 100:+.0f}%"
+
+
+def _compare(new: dict, old: dict):
+    print(f"Run {old['id']} ({old['started_at']}) -> run {new['id']} ({new['started_at']}) for {new['library_path']}")
+    rows = [("duration", old["duration"], new["duration"])]
+    for section in ("phases", "worker_time", "counters"):
+        for key in sorted(set(old.get(section, {})) | set(new.get(section, {}))):
+            rows.append((f"{section}.{key}", old.get(section, {}).get(key, 0), new.get(section, {}).get(key, 0)))
+    for name, a, b in rows:
+        print(f"  {name:<28} {a:>12g} {b:>12g}  {_delta(b, a)}")
+
+
+async def run(args):
+    db = DatabaseManager()
+    await db.initialize()
+
+    if args.json is not None:
+        report = await db.get_scan_run(args.json)
+        if report is None:
+            print(f"Error: no scan run with ID {args.json}")
+            return
+        print(json.dumps(report, indent=2))
+        return
+
+    if args.compare:
+        latest = await db.get_scan_runs(args.library, limit=1)
+        if not latest:
+            print("No scan runs recorded.")
+            return
+        runs = await db.get_scan_runs(latest[0]["library_path"], limit=2)
+        if len(runs) < 2:
+            print(f"Only one scan run recorded for {latest[0]['library_path']}.")
+            return
+        _compare(runs[0], runs[1])
+        return
+
+    runs = await db.get_scan_runs(args.library, limit=args.limit)
+    if not runs:
+        print("No scan runs recorded.")
+    for report in runs:
+        print(f"#{report['id']} {report['started_at']}")
+        print(format_report(report))
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--library", help="only runs of this library root")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--json", type=int, metavar="ID", help="print the full report of one run")
+    parser.add_argument("--compare", action="store_true", help="compare the last two runs of a library")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -46,6 +46,55 @@ VIDEO_EXTENSIONS = {
     ".mkv", ".mp4", ".avi", ".webm", ".flv", ".m4v", ".ts", ".mov", ".wmv", ".mpg", ".mpeg"
 }
 
+# Scan Settings
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", "4"))  # series folders walked/stat'ed concurrently
+PROBE_WORKERS = int(os.getenv("PROBE_WORKERS", "2"))  # concurrent metadata probes (ffprobe processes)
+# Days a vanished episode stays hidden (progress kept) before it is deleted; 0 deletes on the next scan.
+# The grace period also lets `migrate_paths` relink files that the scan could not match
+PRUNE_GRACE_DAYS = float(os.getenv("PRUNE_GRACE_DAYS", "14"))
+# Minutes between background scans of the default library root; 0 = manual only.
+# Further roots and their settings live in the library_roots table (python -m aniplay.cli.roots)
+SCAN_INTERVAL = int(os.getenv("SCAN_INTERVAL", "0"))
+
+# Library Watcher (inotify on Linux, optional `watchdog` package elsewhere)
+LIBRARY_WATCHER = os.getenv("LIBRARY_WATCHER", "false").lower() in ("1", "true", "yes")
+WATCHER_DEBOUNCE = float(os.getenv("WATCHER_DEBOUNCE", "2.0"))  # seconds of quiet before a rescan
+
+# Episode Previews (needs ffmpeg): a frame per episode and a trickplay sprite for the seek bar
+PREVIEWS = os.getenv("PREVIEWS", "true").lower() in ("1", "true", "yes")
+PREVIEW_INTERVAL = float(os.getenv("PREVIEW_INTERVAL", "10"))  # seconds between sprite frames
+PREVIEW_WORKERS = int(os.getenv("PREVIEW_WORKERS", "1"))  # concurrent ffmpeg processes
+PREVIEW_NICE = int(os.getenv("PREVIEW_NICE", "10"))  # CPU niceness of the ffmpeg processes
+
+# Downloads
+DOWNLOAD_RETRIES = int(os.getenv("DOWNLOAD_RETRIES", "4"))  # attempts per segment/chunk after the first
+HLS_SEGMENT_WORKERS = int(os.getenv("HLS_SEGMENT_WORKERS", "6"))  # HLS segments fetched concurrently per download
+HTTP_CONNECTIONS = int(os.getenv("HTTP_CONNECTIONS", "4"))  # parallel ranged requests per direct file download
+HTTP_CHUNK_SIZE_MB = int(os.getenv("HTTP_CHUNK_SIZE_MB", "8"))  # size of each ranged request
+DOWNLOAD_CHECKPOINT_INTERVAL = float(os.getenv("DOWNLOAD_CHECKPOINT_INTERVAL", "5"))  # seconds between saved resume points
+DOWNLOAD_PROGRESS_INTERVAL = float(os.getenv("DOWNLOAD_PROGRESS_INTERVAL", "0.25"))  # seconds between progress updates in the UI
+DOWNLOAD_PROGRESS_SAVE_INTERVAL = float(os.getenv("DOWNLOAD_PROGRESS_SAVE_INTERVAL", "5"))  # seconds between progress writes to the DB
+DOWNLOAD_POSTPROCESS_WORKERS = int(os.getenv("DOWNLOAD_POSTPROCESS_WORKERS", "1"))  # finished downloads checked concurrently
+DOWNLOAD_FASTSTART = os.getenv("DOWNLOAD_FASTSTART", "false").lower() in ("1", "true", "yes")  # move the MP4 index to the front (needs ffmpeg)
+DOWNLOAD_MAX_CONCURRENT = int(os.getenv("DOWNLOAD_MAX_CONCURRENT", "2"))
+DOWNLOAD_HOST_LIMIT = int(os.getenv("DOWNLOAD_HOST_LIMIT", "2"))  # running downloads per server, 0 = no limit
+# Running downloads per provider (allanime, nyaa, torrent), e.g. "torrent=1"
+DOWNLOAD_PROVIDER_LIMITS = {k.strip(): int(v) for k, v in (p.split("=", 1) for p in os.getenv("DOWNLOAD_PROVIDER_LIMITS", "").split(",") if "=" in p)}
+DOWNLOAD_BANDWIDTH_LIMIT = int(os.getenv("DOWNLOAD_BANDWIDTH_LIMIT", "0"))  # KiB/s over all downloads, 0 = unlimited
+DOWNLOAD_BANDWIDTH_SCHEDULE = os.getenv("DOWNLOAD_BANDWIDTH_SCHEDULE", "")  # e.g. "08:00-23:00=2048" (KiB/s), overrides the limit inside each window
+ARIA2_RPC_URL = os.getenv("ARIA2_RPC_URL", "")  # use a running aria2c (e.g. http://127.0.0.1:6800/jsonrpc) instead of starting one
+ARIA2_RPC_SECRET = os.getenv("ARIA2_RPC_SECRET", "")
+
+# Junk Cleanup (python -m aniplay.cli.cleanup): comma-separated name patterns, case-insensitive
+CLEANUP_PATTERNS = [p.strip() for p in os.getenv("CLEANUP_PATTERNS", "*-thumb.jpg,*-thumb.jpeg,*.nfo").split(",") if p.strip()]
+CLEANUP_DIR_PATTERNS = [p.strip() for p in os.getenv("CLEANUP_DIR_PATTERNS", ".actors").split(",") if p.strip()]  # removed with their contents
+# Also remove folders left empty (or holding only junk); off by default, since empty
+# folders are often placeholders ("Season 2", a fresh download folder)
+CLEANUP_EMPTY_DIRS = os.getenv("CLEANUP_EMPTY_DIRS", "false").lower() in ("1", "true", "yes")
+CLEANUP_WORKERS = int(os.getenv("CLEANUP_WORKERS", "8"))  # concurrent deletes/moves
+# Cleaned files are moved here with a manifest so they can be restored; on the library's drive moves are instant
+CLEANUP_TRASH_DIR = Path(os.getenv("CLEANUP_TRASH_DIR", "") or BASE_DIR / "cache" / "trash")
+
 # Playback Settings
 AUTO_SAVE_INTERVAL = 5  # seconds
 COMPLETE_THRESHOLD = 0.9  # 90% watched marks as completed
@@ -55,8 +104,10 @@ PREFERRED_SUBTITLE = os.getenv("PREFERRED_SUBTITLE", "pol")
 # UI Settings
 PREFERRED_PLAYER = "embedded_vlc"  # "mpv", "vlc", or "embedded_vlc"
 THUMBNAIL_CACHE_DIR = BASE_DIR / "cache" / "thumbnails"
+PREVIEW_CACHE_DIR = BASE_DIR / "cache" / "previews"
 DOWNLOADS_PATH = BASE_DIR / "downloads"
 os.makedirs(THUMBNAIL_CACHE_DIR, exist_ok=True)
+os.makedirs(PREVIEW_CACHE_DIR, exist_ok=True)
 os.makedirs(DOWNLOADS_PATH, exist_ok=True)
 
 # Discord Rich Presence Settings
@@ -0,0 +1,409 @@
+# AniPlay - Personal media server and player for anime libraries.
+# Copyright (C) 2026  Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Torrent downloads through one aria2c process for the whole app, driven
+over its JSON-RPC interface instead of one console process per magnet.
+
+Aria2Daemon starts aria2c with --enable-rpc on a free local port (or
+attaches to ARIA2_RPC_URL) and polls the status of every download it
+watches with a single system.multicall per tick. A magnet first runs a
+metadata download whose `followedBy` gid is the real one; the watcher
+moves over to it. The DHT and tracker state are shared by all torrents,
+and the bandwidth cap is applied as aria2's global download limit.
+
+For a single episode out of a batch torrent the real download is added
+paused; once the file list is known it is narrowed to that episode's
+files (aria2's select-file, matched with the release-name parser) before
+anything but the metadata has been fetched.
+"""
+
+import asyncio
+import base64
+import itertools
+import os
+import secrets
+import shutil
+import socket
+import subprocess
+import weakref
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from ..config import ARIA2_RPC_SECRET, ARIA2_RPC_URL, VIDEO_EXTENSIONS
+from ..utils.logger import get_logger
+from ..utils.release_parser import parse_release
+from .download_backends import DownloadError, ProgressCallback, ProgressReporter
+from .download_scheduler import bandwidth
+
+logger = get_logger(__name__)
+
+STATUS_KEYS = ["gid", "status", "totalLength", "completedLength", "downloadSpeed", "connections", "numSeeders",
+               "followedBy", "errorCode", "errorMessage", "infoHash", "dir", "files", "bittorrent"]
+
+DAEMON_OPTIONS = [
+    "--seed-time=0", "--continue=true", "--allow-overwrite=true", "--bt-save-metadata=true",
+    "--auto-save-interval=10", "--max-concurrent-downloads=16", "--enable-dht=true",
+    "--bt-tracker-connect-timeout=5", "--bt-tracker-timeout=5", "--console-log-level=warn",
+]
+
+
+class Aria2Error(DownloadError):
+    pass
+
+
+@dataclass
+class Aria2Status:
+    gid: str
+    status: str  # active, waiting, paused, error, complete, removed
+    total: int = 0
+    completed: int = 0
+    speed: int = 0
+    connections: int = 0
+    seeders: int = 0
+    followed_by: List[str] = field(default_factory=list)
+    error: str = ""
+    info_hash: str = ""
+    dir: str = ""
+    files: List[str] = field(default_factory=list)  # selected files
+    name: str = ""
+
+    @classmethod
+    def from_rpc(cls, data: dict) -> "Aria2Status":
+        info = (data.get("bittorrent") or {}).get("info") or {}
+        return cls(
+            gid=data["gid"], status=data.get("status", ""),
+            total=int(data.get("totalLength", 0)), completed=int(data.get("completedLength", 0)),
+            speed=int(data.get("downloadSpeed", 0)), connections=int(data.get("connections", 0)),
+            seeders=int(data.get("numSeeders", 0) or 0), followed_by=list(data.get("followedBy") or []),
+            error=data.get("errorMessage", "") or (f"aria2 error {data['errorCode']}" if data.get("errorCode", "0") != "0" else ""),
+            info_hash=data.get("infoHash", ""), dir=data.get("dir", ""),
+            files=[f["path"] for f in data.get("files", []) if f.get("selected", "true") == "true" and f.get("path")],
+            name=info.get("name", ""),
+        )
+
+    @property
+    def is_metadata(self) -> bool:
+        """The magnet's metadata fetch (no real files yet)."""
+        return not self.name and any(f.startswith("[METADATA]") for f in self.files)
+
+
+def select_episode_files(files: List[dict], episode: int) -> List[int]:
+    """
+    1-based indices (as aria2 numbers them) of the files of `episode` in a torrent's
+    file list: its videos plus files sharing their name, like external subtitles.
+    Empty if the torrent holds a single video or none of them is that episode.
+    """
+    videos, others = [], []
+    for f in files:
+        path = f.get("path", "")
+        base, ext = os.path.splitext(os.path.basename(path))
+        (videos if ext.lower() in VIDEO_EXTENSIONS else others).append((int(f["index"]), base, path))
+    if len(videos) < 2:
+        return []
+
+    def matches(name):
+        info = parse_release(name)
+        if info.episode is None or info.episode_decimal is not None:  # "05.5" is a special, not episode 5
+            return False
+        return info.episode == episode or (info.episode_end is not None and info.episode <= episode <= info.episode_end)
+
+    picked = [(index, base) for index, base, path in videos if matches(os.path.basename(path))]
+    stems = {base for _, base in picked}
+    extras = [index for index, base, _ in others if any(base == stem or base.startswith(stem + ".") for stem in stems)]
+    return sorted([index for index, _ in picked] + extras)
+
+
+class Aria2Client:
+    """Minimal aria2 JSON-RPC client over HTTP."""
+
+    def __init__(self, url: str, secret: str = "", http: Optional[httpx.AsyncClient] = None):
+        self.url = url
+        self._token = [f"token:{secret}"] if secret else []
+        self._http = http
+        self._ids = itertools.count(1)
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(timeout=10.0)
+        return self._http
+
+    async def _post(self, method: str, params: list):
+        payload = {"jsonrpc": "2.0", "id": str(next(self._ids)), "method": method, "params": params}
+        try:
+            response = await self.http.post(self.url, json=payload)
+            body = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            raise Aria2Error(f"aria2 RPC {method} failed: {e}") from e
+        if body.get("error"):
+            raise Aria2Error(f"aria2 RPC {method}: {body['error'].get('message')}")
+        return body.get("result")
+
+    async def call(self, method: str, *params):
+        return await self._post(method, self._token + list(params))
+
+    async def multicall(self, calls: List[tuple]) -> list:
+        """Several calls in one request. Failed ones come back as Aria2Error instances."""
+        results = await self._post("system.multicall", [[
+            {"methodName": method, "params": self._token + list(params)} for method, *params in calls
+        ]])
+        return [Aria2Error(r.get("message", "")) if isinstance(r, dict) else r[0] for r in results]
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Aria2Daemon:
+    """
+    One aria2c for all torrents. watch() registers a callback that gets an
+    Aria2Status per poll until the download completes, fails or is removed.
+    """
+
+    def __init__(self, rpc: Optional[Aria2Client] = None, poll_interval: float = 1.0):
+        self.rpc = rpc
+        self.process = None
+        self._poll_interval = poll_interval
+        self._watchers: Dict[str, Callable[[Aria2Status], None]] = {}
+        self._poller: Optional[asyncio.Task] = None
+        self._limit: Optional[int] = None
+
+    async def start(self, timeout: float = 10.0):
+        if self.rpc is not None:
+            return
+        if ARIA2_RPC_URL:
+            self.rpc = Aria2Client(ARIA2_RPC_URL, ARIA2_RPC_SECRET)
+            await self.rpc.call("aria2.getVersion")
+            return
+        if not shutil.which("aria2c"):
+            raise Aria2Error("aria2c not found")
+        port, secret = _free_port(), secrets.token_hex(16)
+        cmd = ["aria2c", "--enable-rpc", "--rpc-listen-all=false", f"--rpc-listen-port={port}",
+               f"--rpc-secret={secret}", f"--stop-with-process={os.getpid()}", *DAEMON_OPTIONS]
+        self.process = await asyncio.create_subprocess_exec(
+            *cmd, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+            creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+        )
+        rpc = Aria2Client(f"http://127.0.0.1:{port}/jsonrpc", secret)
+        deadline = asyncio.get_running_loop().time() + timeout
+        while True:
+            try:
+                version = await rpc.call("aria2.getVersion")
+                break
+            except Aria2Error:
+                if self.process.returncode is not None or asyncio.get_running_loop().time() > deadline:
+                    raise Aria2Error("aria2c did not start")
+                await asyncio.sleep(0.2)
+        self.rpc = rpc
+        logger.info(f"aria2c {version.get('version')} listening on port {port}")
+
+    async def stop(self):
+        if self._poller:
+            self._poller.cancel()
+        if self.process and self.process.returncode is None:
+            try:
+                await self.rpc.call("aria2.shutdown")
+                await asyncio.wait_for(self.process.wait(), 10)
+            except (Aria2Error, asyncio.TimeoutError):
+                self.process.terminate()
+        if self.rpc:
+            await self.rpc.aclose()
+
+    async def add(self, uri: Optional[str] = None, torrent: Optional[bytes] = None, options: Optional[dict] = None) -> str:
+        if torrent is not None:
+            return await self.rpc.call("aria2.addTorrent", base64.b64encode(torrent).decode(), [], options or {})
+        return await self.rpc.call("aria2.addUri", [uri], options or {})
+
+    async def files(self, gid: str) -> List[dict]:
+        return await self.rpc.call("aria2.getFiles", gid)
+
+    async def change_option(self, gid: str, options: dict):
+        await self.rpc.call("aria2.changeOption", gid, options)
+
+    async def pause(self, gid: str):
+        await self.rpc.call("aria2.forcePause", gid)
+
+    async def unpause(self, gid: str):
+        await self.rpc.call("aria2.unpause", gid)
+
+    async def remove(self, gid: str):
+        """Stop and forget a download. Its files and control file stay, so adding it again continues it."""
+        self._watchers.pop(gid, None)
+        results = await self.rpc.multicall([("aria2.forceRemove", gid), ("aria2.removeDownloadResult", gid)])
+        for result in results:
+            if isinstance(result, Aria2Error):
+                logger.debug(f"Removing {gid}: {result}")
+
+    def watch(self, gid: str, callback: Callable[[Aria2Status], None]):
+        self._watchers[gid] = callback
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.ensure_future(self._poll())
+
+    async def _apply_bandwidth(self):
+        limit = bandwidth.rate
+        if limit != self._limit:
+            await self.rpc.call("aria2.changeGlobalOption", {"max-overall-download-limit": str(limit)})
+            self._limit = limit
+
+    async def _poll(self):
+        while self._watchers:
+            gids = list(self._watchers)
+            try:
+                await self._apply_bandwidth()
+                results = await self.rpc.multicall([("aria2.tellStatus", gid, STATUS_KEYS) for gid in gids])
+            except Aria2Error as e:
+                logger.warning(f"aria2 poll failed: {e}")
+                results = [e] * len(gids)
+            for gid, result in zip(gids, results):
+                callback = self._watchers.get(gid)
+                if callback is None:
+                    continue
+                if isinstance(result, Aria2Error):
+                    status = Aria2Status(gid, "error", error=str(result))
+                else:
+                    status = Aria2Status.from_rpc(result)
+                if status.status == "complete" and status.followed_by:
+                    # Metadata of a magnet is in; keep following the actual download
+                    del self._watchers[gid]
+                    self._watchers[status.followed_by[0]] = callback
+                elif status.status in ("complete", "error", "removed"):
+                    del self._watchers[gid]
+                callback(status)
+            await asyncio.sleep(self._poll_interval)
+
+
+_daemons: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Aria2Daemon]" = weakref.WeakKeyDictionary()
+_daemon_lock: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+
+async def shared_daemon() -> Aria2Daemon:
+    """The aria2c of the running event loop, started on first use."""
+    loop = asyncio.get_running_loop()
+    async with _daemon_lock.setdefault(loop, asyncio.Lock()):
+        daemon = _daemons.get(loop)
+        if daemon is None or (daemon.process is not None and daemon.process.returncode is not None):
+            daemon = Aria2Daemon()
+            await daemon.start()
+            _daemons[loop] = daemon
+        return daemon
+
+
+async def stop_shared_daemon():
+    daemon = _daemons.pop(asyncio.get_running_loop(), None)
+    if daemon is not None:
+        await daemon.stop()
+
+
+class Aria2Download:
+    """
+    One torrent or magnet in the shared daemon, awaited like the native backends.
+    With `episode` set only that episode's files are downloaded from a batch.
+    """
+
+    def __init__(self, uri: str, directory: str, daemon: Optional[Aria2Daemon] = None,
+                 progress_callback: Optional[ProgressCallback] = None, resume: Optional[dict] = None,
+                 options: Optional[dict] = None, episode: Optional[int] = None):
+        self.uri = uri
+        self.directory = directory
+        self._daemon = daemon
+        self._progress = ProgressReporter(progress_callback)
+        self._resume = resume or {}
+        self._options = options or {}
+        self.episode = episode
+        self.selection: Optional[str] = self._resume.get("select")  # select-file value, "" for everything
+        self.gid: Optional[str] = None
+        self.status: Optional[Aria2Status] = None
+
+    def resume_state(self) -> Optional[dict]:
+        """The .torrent aria2 saved for the magnet, so a restart skips the metadata fetch."""
+        info_hash = self.status.info_hash if self.status else ""
+        if not info_hash:
+            return None
+        state = {"torrent": os.path.join(self.directory, info_hash + ".torrent")}
+        if self.selection is not None:
+            state["select"] = self.selection
+        return state
+
+    def _on_status(self, status: Aria2Status, ready: asyncio.Future, done: asyncio.Future):
+        self.gid, self.status = status.gid, status
+        if not status.is_metadata:
+            self._progress.bytes_total = status.total or None
+            self._progress.bytes_done = status.completed
+            self._progress.report()
+        if status.status == "paused" and not status.is_metadata and not ready.done():
+            ready.set_result(status)
+        if done.done():
+            return
+        if status.status == "complete" and not status.followed_by:
+            done.set_result(status)
+        elif status.status == "error":
+            done.set_exception(Aria2Error(status.error or "aria2 download failed"))
+        elif status.status == "removed":
+            done.set_exception(Aria2Error("Removed from aria2"))
+
+    async def _select(self, daemon: Aria2Daemon, gid: str):
+        """Narrow the paused download to the episode's files and start it."""
+        files = await daemon.files(gid)
+        indices = select_episode_files(files, self.episode)
+        self.selection = ",".join(map(str, indices))
+        if indices:
+            logger.info(f"Downloading {len(indices)} of {len(files)} files for episode {self.episode}")
+            await daemon.change_option(gid, {"select-file": self.selection})
+        elif len(files) > 1:
+            logger.warning(f"No files of episode {self.episode} recognized, downloading the whole torrent")
+        await daemon.unpause(gid)
+
+    async def download(self, directory: Optional[str] = None) -> List[str]:
+        """Run the download to completion. Returns the paths of the downloaded files."""
+        self.directory = directory or self.directory
+        daemon = self._daemon or await shared_daemon()
+        options = {"dir": self.directory, **self._options}
+        select = self.episode is not None and self.selection is None
+        if self.selection:
+            options["select-file"] = self.selection
+        torrent = self._resume.get("torrent")
+        if torrent and os.path.exists(torrent):
+            logger.info(f"Resuming torrent from {torrent}")
+            with open(torrent, "rb") as f:
+                self.gid = await daemon.add(torrent=f.read(), options={**options, "pause": "true"} if select else options)
+        else:
+            if select:
+                options["pause-metadata"] = "true"
+            self.gid = await daemon.add(self.uri, options=options)
+
+        loop = asyncio.get_running_loop()
+        ready, done = loop.create_future(), loop.create_future()
+        daemon.watch(self.gid, lambda status: self._on_status(status, ready, done))
+        try:
+            if select:
+                await asyncio.wait([ready, done], return_when=asyncio.FIRST_COMPLETED)
+                if ready.done():
+                    await self._select(daemon, self.gid)
+            status = await done
+        except (asyncio.CancelledError, Aria2Error):
+            await daemon.remove(self.gid)
+            raise
+        self._progress.report(force=True)
+        return status.files
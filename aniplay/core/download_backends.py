@@ -0,0 +1,174 @@
+# AniPlay - Personal media server and player for anime libraries.
+# Copyright (C) 2026  Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Shared pieces of the native download backends (hls_downloader,
+http_downloader): progress reporting with measured speed, retrying
+requests and one pooled httpx.AsyncClient per event loop. Nothing here
+depends on Qt; backends report through a plain callback.
+"""
+
+import asyncio
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+import httpx
+
+from ..config import DOWNLOAD_RETRIES
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/121.0"
+
+
+class DownloadError(Exception):
+    pass
+
+
+@dataclass
+class TransferProgress:
+    bytes_done: int
+    bytes_total: Optional[int]  # may be an estimate (HLS) or unknown
+    speed: float  # bytes/s, smoothed
+    elapsed: float
+    parts_done: int = 0  # segments or chunks
+    parts_total: int = 0
+
+    @property
+    def percent(self) -> float:
+        if self.bytes_total:
+            return min(100.0, self.bytes_done / self.bytes_total * 100)
+        if self.parts_total:
+            return self.parts_done / self.parts_total * 100
+        return 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        if not self.bytes_total or self.speed <= 0:
+            return None
+        return max(0.0, (self.bytes_total - self.bytes_done) / self.speed)
+
+
+ProgressCallback = Callable[[TransferProgress], None]
+
+
+class SpeedMeter:
+    """Exponentially smoothed transfer rate from (time, total bytes) samples."""
+
+    def __init__(self, smoothing: float = 0.3, min_interval: float = 0.25):
+        self._smoothing = smoothing
+        self._min_interval = min_interval
+        self._last_time: Optional[float] = None
+        self._last_bytes = 0
+        self.speed = 0.0
+
+    def update(self, total_bytes: int, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        if self._last_time is None:
+            self._last_time, self._last_bytes = now, total_bytes
+            return self.speed
+        elapsed = now - self._last_time
+        if elapsed >= self._min_interval:
+            rate = max(0, total_bytes - self._last_bytes) / elapsed
+            self.speed = rate if self.speed == 0 else self._smoothing * rate + (1 - self._smoothing) * self.speed
+            self._last_time, self._last_bytes = now, total_bytes
+        return self.speed
+
+
+class ProgressReporter:
+    """Counts transferred bytes and calls the callback at most every `interval` seconds."""
+
+    def __init__(self, callback: Optional[ProgressCallback], interval: float = 0.5):
+        self._callback = callback
+        self._interval = interval
+        self._started = time.monotonic()
+        self._last_report = 0.0
+        self._meter = SpeedMeter()
+        self.bytes_done = 0
+        self.bytes_total: Optional[int] = None
+        self.parts_done = 0
+        self.parts_total = 0
+
+    def add(self, n: int):
+        self.bytes_done += n
+        self.report()
+
+    def snapshot(self) -> TransferProgress:
+        return TransferProgress(self.bytes_done, self.bytes_total, self._meter.update(self.bytes_done),
+                                time.monotonic() - self._started, self.parts_done, self.parts_total)
+
+    def report(self, force: bool = False):
+        now = time.monotonic()
+        if not self._callback or (not force and now - self._last_report < self._interval):
+            return
+        self._last_report = now
+        self._callback(self.snapshot())
+
+
+def _retryable(error: Exception) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status >= 500 or status in (408, 429)
+    return isinstance(error, httpx.TransportError)
+
+
+async def with_retries(attempt: Callable, what: str, retries: int = DOWNLOAD_RETRIES, backoff: float = 0.5):
+    """Run `attempt()` (a coroutine function) again on network errors and 5xx/408/429, with exponential backoff."""
+    for n in range(retries + 1):
+        try:
+            return await attempt()
+        except httpx.HTTPError as e:
+            if n == retries or not _retryable(e):
+                raise DownloadError(f"{what} failed: {e}") from e
+            delay = min(backoff * 2 ** n, 10.0)
+            logger.debug(f"{what} failed ({e}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def shared_client() -> httpx.AsyncClient:
+    """The pooled client of the running event loop, so every download reuses keep-alive connections."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=httpx.Timeout(30.0, connect=15.0),
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+            headers={"User-Agent": USER_AGENT},
+        )
+        _clients[loop] = client
+    return client
+
+
+async def close_shared_client():
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def request_headers(referrer: Optional[str] = None, extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    headers = {}
+    if referrer:
+        headers["Referer"] = referrer
+    if extra:
+        headers.update(extra)
+    return headers
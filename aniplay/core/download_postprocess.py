@@ -0,0 +1,241 @@
+# AniPlay - Personal media server and player for anime libraries.
+# Copyright (C) 2026  Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Checks run on a finished download before it is reported as done.
+
+The container is checked for the obvious signs of a cut-off transfer (an
+MP4 without moov, a Matroska file without its EBML header, a transport
+stream that loses packet sync) and the probed duration is compared with
+what the source announced, so a truncated stream fails here instead of
+at playback. Tracks come from the probe of a library episode with the
+same content when there is one, from the media analyzer otherwise.
+MP4s with the index at the end can optionally be rewritten with it in
+front (faststart) for streaming.
+
+Everything blocking runs in a small thread pool; nothing here depends on Qt.
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import struct
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from functools import partial
+from typing import Callable, List, Optional
+
+from ..config import DOWNLOAD_FASTSTART, DOWNLOAD_POSTPROCESS_WORKERS
+from ..database.db import DatabaseManager
+from ..utils.file_identity import file_identity
+from ..utils.logger import get_logger
+from ..utils.media_analyzer import MediaAnalyzer, MediaMetadata, TrackInfo
+from ..utils.mp4_parser import Mp4ParseError, Mp4Parser
+from .scan_scheduler import throttle_current_thread
+
+logger = get_logger(__name__)
+
+TS_PACKET = 188
+EBML_MAGIC = b"\x1a\x45\xdf\xa3"
+CONTAINER_EXTENSIONS = Mp4Parser.EXTENSIONS | {".mkv", ".webm", ".ts"}
+
+
+@dataclass
+class DownloadCheck:
+    path: str
+    size: int = 0
+    duration: float = 0.0
+    expected_duration: Optional[float] = None  # announced by the source (HLS playlist, ffmpeg input)
+    tracks: List[dict] = field(default_factory=list)  # {"type", "codec", "language"}
+    content_hash: Optional[str] = None
+    probe_cached: bool = False
+    faststart: bool = False
+    error: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return not self.error
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self))
+
+
+def sniff_container(head: bytes) -> Optional[str]:
+    """"mp4", "matroska" or "ts" from the first bytes of a file, None if it is none of them."""
+    if head[4:8] in (b"ftyp", b"moov", b"mdat", b"free", b"wide", b"skip"):
+        return "mp4"
+    if head[:4] == EBML_MAGIC:
+        return "matroska"
+    if head[:1] == b"\x47" and (len(head) <= TS_PACKET or head[TS_PACKET:TS_PACKET + 1] == b"\x47"):
+        return "ts"
+    return None
+
+
+def container_error(path: str, size: int) -> str:
+    """
+    Why the file is obviously incomplete, or "" if it looks whole. The container is
+    taken from the content (a download kept as .mp4 may hold a transport stream).
+    """
+    if size == 0:
+        return "Empty file"
+    with open(path, "rb") as f:
+        kind = sniff_container(f.read(TS_PACKET + 1))
+        if kind == "mp4":
+            try:
+                Mp4Parser.find_moov(f, size)
+            except Mp4ParseError as e:
+                return f"Incomplete MP4 ({e})"
+        elif kind == "ts":
+            if size % TS_PACKET:
+                return "Transport stream cut off mid-packet"
+            last = size - TS_PACKET
+            f.seek(last)
+            if f.read(1) != b"\x47":
+                return f"Transport stream out of sync at byte {last}"
+        elif kind is None and os.path.splitext(path)[1].lower() in CONTAINER_EXTENSIONS:
+            # e.g. an HTML error page saved under the video's name
+            return "Not a video file"
+    return ""
+
+
+def duration_error(duration: float, expected: Optional[float]) -> str:
+    """A duration clearly shorter than the source's (beyond rounding of segment lengths)."""
+    if not expected or not duration:
+        return ""
+    if duration < expected - max(2.0, expected * 0.01):
+        return f"Truncated: {duration:.0f}s of {expected:.0f}s"
+    return ""
+
+
+def needs_faststart(path: str) -> bool:
+    """An MP4 whose moov comes after mdat (players have to seek to the end before playing)."""
+    size = os.path.getsize(path)
+    pos = 0
+    with open(path, "rb") as f:
+        if sniff_container(f.read(TS_PACKET + 1)) != "mp4":
+            return False
+        while pos + 8 <= size:
+            f.seek(pos)
+            header = f.read(16)
+            box_size, box_type = struct.unpack_from(">I4s", header, 0)
+            if box_type in (b"moov", b"mdat"):
+                return box_type == b"mdat"
+            if box_size == 1 and len(header) == 16:
+                box_size = struct.unpack_from(">Q", header, 8)[0]
+            if box_size < 8:
+                return False
+            pos += box_size
+    return False
+
+
+def faststart(path: str, timeout: float = 600) -> bool:
+    """Rewrite an MP4 with moov in front (stream copy). Runs in a worker thread."""
+    tmp = path + ".faststart.mp4"
+    cmd = ["ffmpeg", "-v", "error", "-nostdin", "-y", "-i", path, "-map", "0", "-c", "copy",
+           "-movflags", "+faststart", tmp]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, encoding="utf-8", errors="replace",
+                                timeout=timeout, creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.warning(f"faststart failed for {path}: {e}")
+        result = None
+    if result is None or result.returncode != 0:
+        if result is not None:
+            logger.warning(f"faststart failed for {path}: {result.stderr.strip()[-300:]}")
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return False
+    os.replace(tmp, path)
+    return True
+
+
+class PostProcessor:
+    """Runs DownloadCheck on finished downloads, at most `workers` at a time."""
+
+    def __init__(self, db: Optional[DatabaseManager] = None, workers: int = DOWNLOAD_POSTPROCESS_WORKERS,
+                 fast_start: bool = DOWNLOAD_FASTSTART,
+                 probe: Callable[[str], Optional[MediaMetadata]] = MediaAnalyzer.probe_file):
+        self._db = db
+        self._workers = max(1, workers)
+        self._fast_start = fast_start
+        self._probe = probe
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def _run(self, fn, *args):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="postprocess",
+                                            initializer=partial(throttle_current_thread, 10, "idle"))
+        return asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+
+    @staticmethod
+    def _inspect(check: DownloadCheck):
+        check.size = os.path.getsize(check.path)
+        check.error = container_error(check.path, check.size)
+        if not check.error:
+            check.content_hash = file_identity(check.path, check.size)
+
+    async def _cached_probe(self, content_hash: Optional[str]) -> Optional[MediaMetadata]:
+        """Duration and tracks of a library episode with the same content, if it was probed."""
+        if self._db is None or not content_hash:
+            return None
+        for episode in await self._db.get_episodes_by_hash([content_hash]):
+            if episode.duration and episode.duration > 0:
+                tracks = await self._db.get_tracks_for_episode(episode.id)
+                return MediaMetadata(episode.duration, [TrackInfo(t.index, t.type, t.codec, t.language, t.title,
+                                                                  t.sub_index) for t in tracks])
+        return None
+
+    def _faststart(self, check: DownloadCheck):
+        if needs_faststart(check.path) and faststart(check.path):
+            check.faststart = True
+            check.size = os.path.getsize(check.path)
+            check.content_hash = file_identity(check.path, check.size)
+
+    async def process(self, path: str, expected_duration: Optional[float] = None) -> DownloadCheck:
+        check = DownloadCheck(path, expected_duration=expected_duration)
+        try:
+            await self._run(self._inspect, check)
+        except OSError as e:
+            check.error = f"Cannot read the download: {e}"
+        if check.error:
+            logger.warning(f"Download check failed for {path}: {check.error}")
+            return check
+
+        metadata = await self._cached_probe(check.content_hash)
+        check.probe_cached = metadata is not None
+        if metadata is None:
+            metadata = await self._run(self._probe, path)
+        if metadata is None:
+            # No ffprobe (or a format it cannot read): nothing more to compare
+            logger.info(f"Could not probe {path}, skipping the duration check")
+        else:
+            check.duration = metadata.duration
+            check.tracks = [{"type": t.type, "codec": t.codec, "language": t.language} for t in metadata.tracks]
+            check.error = duration_error(metadata.duration, expected_duration)
+            if check.error:
+                logger.warning(f"Download check failed for {path}: {check.error}")
+                return check
+
+        if self._fast_start and shutil.which("ffmpeg"):
+            await self._run(self._faststart, check)
+        return check
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,143 @@
+# AniPlay - Personal media server and player for anime libraries.
+# Copyright (C) 2026  Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Coalesced progress of all running downloads.
+
+Tasks report as often as their backend produces numbers (ffmpeg once per
+stderr line); ProgressAggregator only keeps the latest sample of each.
+A ticker then publishes the tasks that changed as one batch every
+DOWNLOAD_PROGRESS_INTERVAL, with speed and ETA smoothed here rather than
+taken from the backend, and hands the state of every task to `persist`
+every DOWNLOAD_PROGRESS_SAVE_INTERVAL so it can be written in one
+transaction. Nothing here depends on Qt.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Optional
+
+from ..config import DOWNLOAD_PROGRESS_INTERVAL, DOWNLOAD_PROGRESS_SAVE_INTERVAL
+from ..utils.format_utils import format_size, format_time
+from ..utils.logger import get_logger
+from .download_backends import SpeedMeter
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class _Track:
+    started: float
+    percent: float = 0.0
+    bytes_done: Optional[int] = None
+    bytes_total: Optional[int] = None
+    speed_note: Optional[str] = None  # the backend's own speed text (ffmpeg's "1.5x") or a phase ("Remuxing...")
+    eta_note: Optional[str] = None
+    changed: bool = True
+    # Sampled once per tick, so smoothing over roughly the last couple of seconds
+    bytes_meter: SpeedMeter = field(default_factory=lambda: SpeedMeter(smoothing=0.15, min_interval=0.05))
+    percent_meter: SpeedMeter = field(default_factory=lambda: SpeedMeter(smoothing=0.15, min_interval=0.05))
+
+
+class ProgressAggregator:
+    """
+    `publish` gets {filename: state} with the tasks that changed since the last
+    tick; `persist` (a coroutine function) gets the state of every tracked task.
+    A state has the "progress", "speed", "eta" and "elapsed" keys of
+    DownloadService.task_states.
+    """
+
+    def __init__(self, publish: Callable[[Dict[str, dict]], None],
+                 persist: Optional[Callable[[Dict[str, dict]], Awaitable[None]]] = None,
+                 interval: float = DOWNLOAD_PROGRESS_INTERVAL, save_interval: float = DOWNLOAD_PROGRESS_SAVE_INTERVAL,
+                 clock: Callable[[], float] = time.monotonic):
+        self._publish = publish
+        self._persist = persist
+        self._interval = interval
+        self._save_interval = save_interval
+        self._clock = clock
+        self._tracks: Dict[str, _Track] = {}
+        self._states: Dict[str, dict] = {}
+        self._last_save: Optional[float] = None
+        self._ticker: Optional[asyncio.Task] = None
+
+    def update(self, filename: str, percent: float, bytes_done: Optional[int] = None,
+               bytes_total: Optional[int] = None, speed: Optional[str] = None, eta: Optional[str] = None):
+        """Record the latest numbers of a task. Cheap; nothing is published until the next tick."""
+        track = self._tracks.get(filename)
+        if track is None:
+            track = self._tracks[filename] = _Track(self._clock())
+        track.percent = percent
+        track.bytes_done, track.bytes_total = bytes_done, bytes_total
+        track.speed_note, track.eta_note = speed, eta
+        track.changed = True
+        if self._ticker is None or self._ticker.done():
+            self._ticker = asyncio.ensure_future(self._run())
+
+    def remove(self, filename: str) -> Optional[dict]:
+        """Stop tracking a task. Returns its last published state."""
+        self._tracks.pop(filename, None)
+        return self._states.pop(filename, None)
+
+    def _state(self, track: _Track, now: float) -> dict:
+        speed = track.bytes_meter.update(track.bytes_done, now) if track.bytes_done is not None else 0.0
+        rate = track.percent_meter.update(track.percent, now)  # percent per second
+        if track.bytes_total and speed > 0:
+            eta = (track.bytes_total - track.bytes_done) / speed
+        elif rate > 0:
+            eta = (100.0 - track.percent) / rate
+        else:
+            eta = None
+        if track.speed_note is not None:
+            speed_text = track.speed_note
+        else:
+            speed_text = f"{format_size(int(speed))}/s"
+        if eta is not None and track.eta_note is None:
+            eta_text = format_time(max(0.0, eta))
+        else:
+            eta_text = track.eta_note or "..."
+        return {"progress": min(track.percent, 100.0), "speed": speed_text, "eta": eta_text,
+                "elapsed": format_time(now - track.started)}
+
+    def tick(self) -> Dict[str, dict]:
+        """Publish the tasks that changed since the last tick (one call for all of them)."""
+        now = self._clock()
+        batch = {}
+        for filename, track in self._tracks.items():
+            if track.changed:
+                track.changed = False
+                batch[filename] = self._states[filename] = self._state(track, now)
+        if batch:
+            self._publish(batch)
+        return batch
+
+    async def save(self):
+        """Hand the current state of all tasks to `persist`."""
+        self._last_save = self._clock()
+        if self._persist and self._states:
+            try:
+                await self._persist(dict(self._states))
+            except Exception as e:
+                logger.warning(f"Could not save download progress: {e}")
+
+    async def _run(self):
+        self._last_save = self._clock()
+        while self._tracks:
+            await asyncio.sleep(self._interval)
+            self.tick()
+            if self._clock() - self._last_save >= self._save_interval:
+                await self.save()
@@ -0,0 +1,298 @@
+# AniPlay - Personal media server and player for anime libraries.
+# Copyright (C) 2026  Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Download queue and limits, kept free of Qt so they can be tested alone.
+
+DownloadQueue keeps the waiting downloads in a dict (lookups, removal)
+plus a heap ordered by priority and then arrival, so starting, finding
+and cancelling a download never scans the whole queue. SlotLimits caps
+running downloads in total, per host and per provider. `bandwidth` is
+the process-wide token bucket the native backends draw from, with its
+rate taken from a time-of-day schedule.
+"""
+
+import asyncio
+import heapq
+import itertools
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from ..config import DOWNLOAD_BANDWIDTH_LIMIT, DOWNLOAD_BANDWIDTH_SCHEDULE
+
+
+def provider_of(url: str, metadata: Optional[dict] = None) -> str:
+    if url.startswith("magnet:") or url.endswith(".torrent"):
+        return "torrent"
+    show_id = (metadata or {}).get("show_id") or ""
+    if show_id.startswith("nyaa-"):
+        return "nyaa"
+    return "allanime" if show_id else urlsplit(url).hostname or ""
+
+
+def episode_priority(ep_no, progress: Iterable) -> int:
+    """
+    Queue priority for an episode given the show's online progress rows:
+    2 for the one to watch next (the first after the last completed, or a
+    started one past it), 1 for later episodes, 0 for ones already behind.
+    Finished downloads also leave a row (with no timestamp); those do not
+    count as started.
+    """
+    try:
+        ep = int(float(ep_no))
+    except (TypeError, ValueError):
+        return 0
+    progress = list(progress)
+    next_ep = max((p.episode_number for p in progress if p.completed), default=0) + 1
+    started = [p.episode_number for p in progress if not p.completed and p.timestamp > 0 and p.episode_number > next_ep]
+    if started:
+        next_ep = min(started)
+    if ep == next_ep:
+        return 2
+    return 1 if ep > next_ep else 0
+
+
+@dataclass
+class QueuedDownload:
+    url: str
+    filename: str
+    referrer: Optional[str] = None
+    metadata: dict = field(default_factory=dict)
+    priority: int = 0  # higher starts first
+    paused: bool = False
+    order: Optional[int] = None  # arrival (set by the queue), breaks ties between equal priorities
+
+    @property
+    def host(self) -> str:
+        return urlsplit(self.url).hostname or ""
+
+    @property
+    def provider(self) -> str:
+        return provider_of(self.url, self.metadata)
+
+
+class DownloadQueue:
+    """Waiting downloads by filename, popped by (priority, arrival). Paused ones stay queued but are never popped."""
+
+    def __init__(self):
+        self._items: Dict[str, QueuedDownload] = {}
+        self._heap: List[Tuple[int, int, str]] = []
+        self._arrival = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, filename: str) -> bool:
+        return filename in self._items
+
+    def get(self, filename: str) -> Optional[QueuedDownload]:
+        return self._items.get(filename)
+
+    def _key(self, item: QueuedDownload) -> Tuple[int, int, str]:
+        return -item.priority, item.order, item.filename
+
+    def _current(self, key: Tuple[int, int, str]) -> Optional[QueuedDownload]:
+        # Heap entries go stale when an item is removed, paused or re-prioritised
+        item = self._items.get(key[2])
+        if item is None or item.paused or self._key(item) != key:
+            return None
+        return item
+
+    def _heappush(self, item: QueuedDownload):
+        heapq.heappush(self._heap, self._key(item))
+        if len(self._heap) > 2 * len(self._items) + 64:
+            self._heap = [self._key(i) for i in self._items.values() if not i.paused]
+            heapq.heapify(self._heap)
+
+    def push(self, item: QueuedDownload):
+        """Add a download; one that was queued before (e.g. paused while running) keeps its place."""
+        if item.order is None:
+            item.order = next(self._arrival)
+        self._items[item.filename] = item
+        if not item.paused:
+            self._heappush(item)
+
+    def remove(self, filename: str) -> Optional[QueuedDownload]:
+        return self._items.pop(filename, None)
+
+    def set_priority(self, filename: str, priority: int) -> bool:
+        item = self._items.get(filename)
+        if item is None:
+            return False
+        item.priority = priority
+        if not item.paused:
+            self._heappush(item)
+        return True
+
+    def set_paused(self, filename: str, paused: bool) -> bool:
+        item = self._items.get(filename)
+        if item is None or item.paused == paused:
+            return False
+        item.paused = paused
+        if not paused:
+            self._heappush(item)
+        return True
+
+    @property
+    def top_priority(self) -> int:
+        return max((i.priority for i in self._items.values()), default=0)
+
+    def pop_next(self, allowed: Callable[[QueuedDownload], bool] = lambda item: True) -> Optional[QueuedDownload]:
+        """Remove and return the first unpaused download that `allowed` accepts (e.g. its host has a free slot)."""
+        blocked, found = [], None
+        while self._heap:
+            key = heapq.heappop(self._heap)
+            item = self._current(key)
+            if item is None:
+                continue
+            if not allowed(item):
+                blocked.append(key)
+                continue
+            found = self._items.pop(item.filename)
+            break
+        for key in blocked:
+            heapq.heappush(self._heap, key)
+        return found
+
+    def ordered(self) -> Iterator[QueuedDownload]:
+        """Queue order for display: runnable ones by priority, then paused ones."""
+        return iter(sorted(self._items.values(), key=lambda i: (i.paused, -i.priority, i.order)))
+
+
+class SlotLimits:
+    """Concurrent downloads allowed in total, per host and per provider (0 = no limit)."""
+
+    def __init__(self, total: int, per_host: int = 0, per_provider: Optional[Dict[str, int]] = None):
+        self.total = total
+        self.per_host = per_host
+        self.per_provider = per_provider or {}
+        self.running = 0
+        self._hosts: Counter = Counter()
+        self._providers: Counter = Counter()
+
+    def allows(self, item: QueuedDownload) -> bool:
+        if self.total and self.running >= self.total:
+            return False
+        if self.per_host and item.host and self._hosts[item.host] >= self.per_host:
+            return False
+        limit = self.per_provider.get(item.provider)
+        return not limit or self._providers[item.provider] < limit
+
+    @property
+    def full(self) -> bool:
+        return bool(self.total) and self.running >= self.total
+
+    def acquire(self, item: QueuedDownload):
+        self.running += 1
+        self._hosts[item.host] += 1
+        self._providers[item.provider] += 1
+
+    def release(self, item: QueuedDownload):
+        self.running -= 1
+        self._hosts[item.host] -= 1
+        self._providers[item.provider] -= 1
+
+
+_WINDOW = re.compile(r"^(\d{1,2}):(\d{2})-(\d{1,2}):(\d{2})=(\d+)$")
+
+
+class BandwidthSchedule:
+    """
+    KiB/s cap by time of day: "HH:MM-HH:MM=KiB" windows separated by commas
+    (a window may wrap past midnight, 0 means unlimited), `default` elsewhere.
+    """
+
+    def __init__(self, default: int = 0, windows: Optional[List[Tuple[int, int, int]]] = None):
+        self.default = default
+        self.windows = windows or []  # (start minute, end minute, KiB/s)
+
+    @classmethod
+    def parse(cls, text: str, default: int = 0) -> "BandwidthSchedule":
+        windows = []
+        for part in filter(None, (p.strip() for p in text.split(","))):
+            match = _WINDOW.match(part)
+            if not match:
+                raise ValueError(f"Bad bandwidth window {part!r}, expected HH:MM-HH:MM=KiB")
+            h1, m1, h2, m2, kib = map(int, match.groups())
+            windows.append((h1 * 60 + m1, h2 * 60 + m2, kib))
+        return cls(default, windows)
+
+    def limit_at(self, when: datetime) -> int:
+        """Cap in bytes/s at `when` (0 = unlimited)."""
+        minute = when.hour * 60 + when.minute
+        for start, end, kib in self.windows:
+            inside = start <= minute < end if start <= end else (minute >= start or minute < end)
+            if inside:
+                return kib * 1024
+        return self.default * 1024
+
+
+class TokenBucket:
+    """Bytes/s limiter. Consumers may overdraw; they then sleep until the debt is paid back."""
+
+    def __init__(self, rate: int = 0):
+        self.rate = 0
+        self._tokens = 0.0
+        self._last = time.monotonic()
+        self.set_rate(rate)
+
+    def set_rate(self, rate: int):
+        if rate != self.rate:
+            self.rate = rate
+            self._tokens = min(self._tokens, self.capacity)
+
+    @property
+    def capacity(self) -> float:
+        return max(self.rate * 0.5, 64 * 1024)  # half a second of burst
+
+    async def consume(self, n: int):
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate) - n
+        self._last = now
+        if self._tokens < 0:
+            await asyncio.sleep(-self._tokens / self.rate)
+
+
+class BandwidthLimiter:
+    """TokenBucket whose rate follows a BandwidthSchedule (re-read at most once a second)."""
+
+    def __init__(self, schedule: BandwidthSchedule, clock: Callable[[], datetime] = datetime.now):
+        self.schedule = schedule
+        self._clock = clock
+        self._bucket = TokenBucket(schedule.limit_at(clock()))
+        self._checked = time.monotonic()
+
+    @property
+    def rate(self) -> int:
+        now = time.monotonic()
+        if now - self._checked >= 1.0:
+            self._checked = now
+            self._bucket.set_rate(self.schedule.limit_at(self._clock()))
+        return self._bucket.rate
+
+    async def consume(self, n: int):
+        if self.rate:
+            await self._bucket.consume(n)
+
+
+bandwidth = BandwidthLimiter(BandwidthSchedule.parse(DOWNLOAD_BANDWIDTH_SCHEDULE, DOWNLOAD_BANDWIDTH_LIMIT))
@@ -0,0 +1,777 @@
+# AniPlay - Personal media server and player for anime libraries.
+# Copyright (C) 2026  Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+The download queue and its tasks, in plain asyncio.
+
+DownloadService owns the queue, the slot limits, progress, post-processing
+and the DB-persisted task list; DownloadTask runs one download on the
+backend that fits its url. Both report through Event callbacks, so they
+run the same in the GUI (wrapped in Qt signals by download_manager.py)
+and headless (cli/download.py).
+"""
+
+import asyncio
+import itertools
+import os
+import shutil
+import subprocess
+import re
+import json
+import time
+from dataclasses import asdict
+from ..utils.logger import get_logger
+from ..config import (DOWNLOADS_PATH, DOWNLOAD_CHECKPOINT_INTERVAL, DOWNLOAD_HOST_LIMIT, DOWNLOAD_MAX_CONCURRENT,
+                      DOWNLOAD_PROVIDER_LIMITS, VIDEO_EXTENSIONS)
+from .download_backends import DownloadError, TransferProgress, close_shared_client, request_headers
+from .download_postprocess import DownloadCheck, PostProcessor
+from .download_progress import ProgressAggregator
+from .downloads_index import DownloadsIndex, episode_key
+from .hls_downloader import HlsDownloader, HlsUnsupported, is_hls_url
+from .http_downloader import HttpDownloader, probe
+from .download_scheduler import DownloadQueue, QueuedDownload, SlotLimits, provider_of
+from .aria2_rpc import Aria2Download, stop_shared_daemon
+
+logger = get_logger(__name__)
+
+
+class Event:
+    """A list of callbacks, called in order by emit() (connect/emit like a Qt signal, minus Qt)."""
+
+    def __init__(self):
+        self._callbacks = []
+
+    def connect(self, callback):
+        self._callbacks.append(callback)
+
+    def disconnect(self, callback):
+        self._callbacks.remove(callback)
+
+    def emit(self, *args):
+        for callback in list(self._callbacks):
+            callback(*args)
+
+
+class DownloadTask:
+    def __init__(self, url, filename, referrer=None, metadata=None, resume=None):
+        self.progress_updated = Event() # filename, latest sample (ProgressAggregator.update arguments)
+        self.finished = Event() # filename, success, message, metadata
+        self.checkpoint = Event() # filename, resume state
+        self.url = url
+        self.filename = filename
+        self.referrer = referrer
+        self.metadata = metadata or {}
+        self.process = None
+        self._native = None  # asyncio future of a native (non-subprocess) transfer
+        self._remote = None  # probe result of a direct HTTP url
+        self.resume = resume or {}  # last checkpoint of an earlier run ({"backend": ..., ...})
+        self._is_cancelled = False
+        self.paused = False  # stopped by pause(): partial data is kept
+        self.output_path = None  # the finished file, checked by the manager's post-processing
+        self.source_duration = None  # seconds the source announced, to compare the file with
+
+    async def run(self):
+        show_id = self.metadata.get('show_id')
+        base_dir = DOWNLOADS_PATH
+        
+        if show_id:
+            # Hash-only folder names (no series name) for both Nyaa and AllAnime
+            if show_id.startswith("nyaa-"):
+                # show_id is already the prefixed hash
+                base_dir = os.path.join(DOWNLOADS_PATH, show_id)
+            else:
+                # For AllAnime, get prefixed hash
+                from .online_library_manager import OnlineLibraryManager
+                ol_manager = OnlineLibraryManager(DOWNLOADS_PATH, None)
+                folder_name = ol_manager.get_allanime_folder_name(show_id)
+                base_dir = os.path.join(DOWNLOADS_PATH, folder_name)
+            
+            os.makedirs(base_dir, exist_ok=True)
+            
+        output_path = os.path.join(base_dir, self.filename)
+
+        backend = await self._pick_backend()
+        if self.paused:  # paused while the url was being probed
+            self.finished.emit(self.filename, False, "Paused", self.metadata)
+            return
+        if backend == "hls":
+            try:
+                await self._run_native_hls(output_path)
+                return
+            except HlsUnsupported as e:
+                logger.info(f"{e}; downloading {self.filename} with ffmpeg instead")
+        elif backend == "http":
+            await self._run_native_http(output_path)
+            return
+        elif backend == "aria2":
+            await self._run_aria2(base_dir)
+            return
+        
+        # ffmpeg for anything the native downloaders cannot handle
+        cmd = ["ffmpeg", "-y"]
+        if self.referrer:
+            cmd.extend(["-headers", f"Referer: {self.referrer}\r\n"])
+        cmd.extend(["-i", self.url, "-stats", "-c", "copy", "-bsf:a", "aac_adtstoasc", output_path])
+        logger.info(f"Starting stream download via ffmpeg: {' '.join(cmd)}")
+
+        try:
+            self.process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+            )
+            
+            duration = 0
+            # Use read(1024) and split by \r or \n to catch all progress updates
+            buffer = ""
+            while True:
+                chunk = await self.process.stderr.read(1024)
+                if not chunk: break
+                buffer += chunk.decode(errors='replace')
+                lines = re.split(r'[\r\n]+', buffer)
+                if buffer and buffer[-1] not in ['\r', '\n']: buffer = lines.pop()
+                else: buffer = ""
+                
+                for line_str in lines:
+                    line_str = line_str.strip()
+                    if not line_str: continue
+                    
+                    if not duration:
+                        dur_match = re.search(r"Duration: (\d+):(\d+):(\d+\.\d+)", line_str)
+                        if dur_match:
+                            h, m, s = map(float, dur_match.groups())
+                            duration = h * 3600 + m * 60 + s
+                            logger.info(f"Detected download duration: {duration}s")
+                    
+                    time_match = re.search(r"time=(\d+):(\d+):(\d+\.\d+)", line_str)
+                    speed_match = re.search(r"speed=\s*([\d.]+[xX]?)", line_str)
+                    
+                    if time_match:
+                        # Only the latest sample is used; the manager's aggregator derives the ETA
+                        speed_str = speed_match.group(1) if speed_match else "0.0x"
+                        h, m, s = map(float, time_match.groups())
+                        current_time = h * 3600 + m * 60 + s
+                        if duration > 0:
+                            self.progress_updated.emit(self.filename, {"percent": min(current_time / duration * 100, 100.0),
+                                                                       "speed": speed_str})
+                        else:
+                            self.progress_updated.emit(self.filename, {"percent": 0.0, "speed": f"{speed_str} @ {int(current_time)}s",
+                                                                       "eta": "..."})
+
+            await self.process.wait()
+            
+            if self._is_cancelled:
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+                self.finished.emit(self.filename, False, "Cancelled", self.metadata)
+            elif self.paused:
+                # ffmpeg cannot continue a partial file; resuming starts over
+                self.finished.emit(self.filename, False, "Paused", self.metadata)
+            elif self.process.returncode == 0:
+                logger.info(f"Download finished: {self.filename}")
+                self.output_path, self.source_duration = output_path, duration or None
+                self.finished.emit(self.filename, True, "Success", self.metadata)
+            else:
+                logger.error(f"Download failed with code {self.process.returncode}")
+                self.finished.emit(self.filename, False, f"Process exited with code {self.process.returncode}", self.metadata)
+                
+        except Exception as e:
+            logger.error(f"Download error: {e}")
+            self.finished.emit(self.filename, False, str(e), self.metadata)
+
+    def _emit_transfer(self, progress: TransferProgress):
+        self.progress_updated.emit(self.filename, {"percent": progress.percent, "bytes_done": progress.bytes_done,
+                                                   "bytes_total": progress.bytes_total})
+
+    async def _pick_backend(self):
+        """aria2 for torrents, the native HLS or ranged HTTP downloader where they apply, ffmpeg otherwise."""
+        if provider_of(self.url) == "torrent":
+            return "aria2"
+        if is_hls_url(self.url):
+            return "hls"
+        try:
+            self._remote = await probe(self.url, request_headers(self.referrer))
+        except DownloadError as e:
+            logger.info(f"Could not probe {self.url} ({e}), leaving it to ffmpeg")
+            return "ffmpeg"
+        if self._remote.is_playlist:
+            return "hls"
+        return "http" if self._remote.is_media else "ffmpeg"
+
+    def _resume_for(self, backend):
+        return self.resume if self.resume.get("backend") == backend else None
+
+    async def _checkpoints(self, backend, downloader):
+        while True:
+            await asyncio.sleep(DOWNLOAD_CHECKPOINT_INTERVAL)
+            state = downloader.resume_state()
+            if state:
+                self.checkpoint.emit(self.filename, {"backend": backend, **state})
+
+    async def _run_native(self, backend, downloader, target, finalize=None, discard=()):
+        """
+        Run `downloader.download(target)`, then `finalize()`, and report the outcome; the
+        `discard` paths are deleted if it fails or is cancelled. HlsUnsupported is passed on
+        so the caller can fall back to ffmpeg. Partial files are kept when the app shuts
+        down, to be resumed from the last checkpoint.
+        """
+        checkpoints = asyncio.ensure_future(self._checkpoints(backend, downloader))
+        try:
+            self._native = asyncio.ensure_future(downloader.download(target))
+            await self._native
+            if finalize:
+                await finalize()
+            logger.info(f"Download finished: {self.filename}")
+            self.finished.emit(self.filename, True, "Success", self.metadata)
+        except HlsUnsupported:
+            raise
+        except (asyncio.CancelledError, Exception) as e:
+            if self.paused:
+                state = downloader.resume_state()
+                if state:
+                    self.checkpoint.emit(self.filename, {"backend": backend, **state})
+                self.finished.emit(self.filename, False, "Paused", self.metadata)
+                return
+            if not self._is_cancelled and isinstance(e, asyncio.CancelledError):
+                # Shutting down: keep the partial file and its latest resume point
+                state = downloader.resume_state()
+                if state:
+                    self.checkpoint.emit(self.filename, {"backend": backend, **state})
+                raise
+            for path in discard:
+                if os.path.exists(path):
+                    os.remove(path)
+            if self._is_cancelled:
+                self.finished.emit(self.filename, False, "Cancelled", self.metadata)
+            else:
+                logger.error(f"Download error: {e}")
+                self.finished.emit(self.filename, False, str(e), self.metadata)
+        finally:
+            checkpoints.cancel()
+            self._native = None
+
+    async def _run_native_hls(self, output_path):
+        """
+        Fetch the segments in parallel into a .part.ts file, then remux it once.
+        Raises HlsUnsupported before anything is written if ffmpeg has to do it instead.
+        """
+        downloader = HlsDownloader(self.url, request_headers(self.referrer), progress_callback=self._emit_transfer,
+                                   resume=self._resume_for("hls"))
+
+        partial = output_path + ".part.ts"
+
+        async def finalize():
+            self.progress_updated.emit(self.filename, {"percent": 100.0, "speed": "Remuxing...", "eta": "..."})
+            await self._remux(partial, output_path)
+            self.output_path, self.source_duration = output_path, downloader.playlist.duration
+
+        await self._run_native("hls", downloader, partial, finalize, discard=(partial, output_path))
+
+    async def _run_native_http(self, output_path):
+        """Fetch a direct file in ranged chunks over several connections into a .part file."""
+        downloader = HttpDownloader(self.url, request_headers(self.referrer), remote=self._remote,
+                                    progress_callback=self._emit_transfer, resume=self._resume_for("http"))
+
+        partial = output_path + ".part"
+
+        async def finalize():
+            os.replace(partial, output_path)
+            self.output_path = output_path
+
+        await self._run_native("http", downloader, partial, finalize, discard=(partial, output_path))
+
+    async def _run_aria2(self, base_dir):
+        """
+        Torrents and magnets go to the app's single aria2c; its files stay in base_dir if stopped.
+        Only the requested episode is fetched out of a batch.
+        """
+        try:
+            episode = int(float(self.metadata.get('ep_no')))
+        except (TypeError, ValueError):
+            episode = None
+        downloader = Aria2Download(self.url, base_dir, progress_callback=self._emit_transfer,
+                                   resume=self._resume_for("aria2"), episode=episode)
+        self.progress_updated.emit(self.filename, {"percent": 0.0, "speed": "Searching...", "eta": "Wait"})
+
+        async def finalize():
+            videos = [p for p in downloader.status.files if os.path.splitext(p)[1].lower() in VIDEO_EXTENSIONS and os.path.exists(p)]
+            self.output_path = max(videos, key=os.path.getsize, default=None)
+
+        await self._run_native("aria2", downloader, None, finalize)
+
+    async def _remux(self, partial, output_path):
+        """Copy the downloaded transport stream into the target container (or keep it as is without ffmpeg)."""
+        if output_path.lower().endswith(".ts") or not shutil.which("ffmpeg"):
+            os.replace(partial, output_path)
+            return
+        cmd = ["ffmpeg", "-y", "-v", "error", "-i", partial, "-c", "copy", "-bsf:a", "aac_adtstoasc", output_path]
+        self.process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+            creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+        )
+        _, stderr = await self.process.communicate()
+        if self._is_cancelled:
+            raise asyncio.CancelledError()
+        if self.process.returncode != 0:
+            raise DownloadError(f"Remux failed: {stderr.decode(errors='replace').strip()[-300:]}")
+        os.remove(partial)
+
+    def pause(self):
+        """Stop like cancel(), but keep the partial download so it can continue later."""
+        self.paused = True
+        self._stop()
+
+    def cancel(self):
+        self._is_cancelled = True
+        self._stop()
+
+    def _stop(self):
+        if self._native:
+            self._native.cancel()
+        if self.process:
+            try:
+                self.process.terminate()
+            except Exception as e:
+                logger.error(f"Error occurred while terminating process for {self.filename}: {e}")
+                pass
+
+class DownloadService:
+    """
+    The download queue: starts tasks as the slot limits allow, tracks their progress
+    and outcome, and keeps the DB task list in step so a restart resumes it.
+    """
+
+    def __init__(self, db_manager=None):
+        self.progress_batch = Event() # filename -> {progress, speed, eta, elapsed} of the tasks that changed
+        self.task_finished = Event() # filename, success, message, metadata
+        self.queue_updated = Event() # number of pending tasks
+        self.db = db_manager
+        self.active_tasks = {} # filename -> DownloadTask
+        self.queue = DownloadQueue() # waiting and paused downloads, by priority
+        self.limits = SlotLimits(DOWNLOAD_MAX_CONCURRENT, DOWNLOAD_HOST_LIMIT, DOWNLOAD_PROVIDER_LIMITS)
+        self._running = {} # filename -> QueuedDownload of an active task (its slot in self.limits)
+        self.history = [] # list of {filename, success, message, metadata, timestamp}
+        self.task_states = {} # filename -> {status, progress, speed, eta, elapsed, metadata}
+        self.resume_states = {} # filename -> last checkpoint, handed to the next DownloadTask of that file
+        self.progress = ProgressAggregator(self._on_progress_batch, self._save_progress if db_manager else None)
+        self.postprocessor = PostProcessor(db_manager)
+        self._processing = {} # filename -> post-processing of a finished download
+        self._runs = {} # filename -> asyncio task running DownloadTask.run()
+        self._writes = set() # DB writes in flight, awaited by shutdown()
+        self.index = DownloadsIndex(str(DOWNLOADS_PATH))
+        asyncio.ensure_future(asyncio.to_thread(self.index.build))
+        
+        self.loaded = asyncio.ensure_future(self._load_from_db()) # the DB queue, restored and started
+
+    def _write(self, coro):
+        write = asyncio.ensure_future(coro)
+        self._writes.add(write)
+        write.add_done_callback(self._writes.discard)
+
+    def _save_task(self, item, status):
+        if not self.db:
+            return
+        from ..database.models import DownloadTaskState
+        state = self.task_states.get(item.filename, {})
+        self._write(self.db.update_download_task(DownloadTaskState(
+            filename=item.filename, url=item.url, status=status, progress=state.get("progress", 0.0),
+            referrer=item.referrer, metadata_json=json.dumps(item.metadata or {}),
+            resume_json=json.dumps(self.resume_states.get(item.filename) or {}), priority=item.priority
+        )))
+
+    def start_download(self, url, filename, referrer=None, metadata=None, priority=0):
+        """Adds a download to the queue. Higher priorities start first (e.g. the next episode to watch)."""
+        # Ensure filename is safe and has a valid extension (default to .mp4)
+        filename = re.sub(r'[/\\:*?"<>|]', '_', filename)
+        if not any(filename.lower().endswith(ext) for ext in ['.mp4', '.mkv', '.avi', '.ts', '.mov']):
+            filename += ".mp4"
+
+        if self.is_downloading(filename):
+            logger.warning(f"Download already in progress or queued for {filename}")
+            return False
+            
+        item = QueuedDownload(url, filename, referrer, metadata or {}, priority)
+        self.queue.push(item)
+        self.resume_states.pop(filename, None)
+        self.task_states[filename] = {
+            "status": "Queued",
+            "progress": 0.0,
+            "speed": "0.0x",
+            "eta": "Waiting...",
+            "elapsed": "0:00",
+            "metadata": metadata or {}
+        }
+        self.queue_updated.emit(len(self.queue))
+        self._save_task(item, "Queued")
+        self._process_queue()
+        return True
+
+    def process_queue(self):
+        """Public method to manually trigger queue processing."""
+        logger.info("Manually triggering queue processing...")
+        self._process_queue()
+
+    def _process_queue(self):
+        """Starts the highest-priority tasks that the total, per-host and per-provider limits allow."""
+        started = False
+        while not self.limits.full:
+            item = self.queue.pop_next(self.limits.allows)
+            if item is None:
+                break
+            self._start(item)
+            started = True
+        if started:
+            self.queue_updated.emit(len(self.queue))
+
+    def _start(self, item):
+        filename = item.filename
+        task = DownloadTask(item.url, filename, item.referrer, item.metadata, resume=self.resume_states.get(filename))
+        task.progress_updated.connect(self._on_task_progress)
+        task.finished.connect(self._on_task_finished)
+        task.checkpoint.connect(self._on_task_checkpoint)
+
+        self.limits.acquire(item)
+        self._running[filename] = item
+        self.active_tasks[filename] = task
+        self.task_states[filename]["status"] = "Downloading"
+        # Recorded so an app restart picks it up again, from its resume state
+        self._save_task(item, "Downloading")
+        run = self._runs[filename] = asyncio.ensure_future(task.run())
+        run.add_done_callback(lambda r: self._runs.pop(filename) if self._runs.get(filename) is r else None)
+
+    def _on_task_checkpoint(self, filename, resume):
+        # Written to the DB with the next progress save
+        if filename in self.active_tasks:
+            self.resume_states[filename] = resume
+
+    def _on_task_progress(self, filename, sample):
+        if filename in self.active_tasks:
+            self.progress.update(filename, **sample)
+
+    def _on_progress_batch(self, batch):
+        for filename, state in batch.items():
+            if filename in self.task_states:
+                self.task_states[filename].update(state)
+        self.progress_batch.emit(batch)
+
+    async def _save_progress(self, states):
+        """Progress and resume points of all running downloads, in one transaction."""
+        rows = [(filename, state["progress"], state["speed"], state["eta"], state["elapsed"],
+                 json.dumps(self.resume_states.get(filename) or {}))
+                for filename, state in states.items() if filename in self.active_tasks]
+        if rows:
+            await self.db.save_download_progress(rows)
+
+    def _on_task_finished(self, filename, success, message, metadata):
+        task = self.active_tasks.pop(filename, None)
+        item = self._running.pop(filename, None)
+        if item:
+            self.limits.release(item)
+        self.progress.remove(filename)
+
+        if task is not None and task.paused and item:
+            # Back into the queue at its old position, to continue from the last checkpoint
+            item.paused = True
+            self.queue.push(item)
+            if filename in self.task_states:
+                self.task_states[filename].update({"status": "Paused", "speed": "", "eta": ""})
+            self._save_task(item, "Paused")
+            self.queue_updated.emit(len(self.queue))
+            self._process_queue()
+            return
+
+        self.resume_states.pop(filename, None)
+        if success and task is not None and task.output_path:
+            # The slot is free already; the download only counts as done once the file checks out
+            if filename in self.task_states:
+                self.task_states[filename].update({"status": "Processing", "progress": 100.0, "speed": "", "eta": ""})
+            self._processing[filename] = asyncio.ensure_future(
+                self._post_process(filename, task.output_path, task.source_duration, metadata))
+            self.queue_updated.emit(len(self.queue))
+        else:
+            self._record_outcome(filename, success, message, metadata)
+
+        # Start next in queue
+        self._process_queue()
+
+    async def _post_process(self, filename, path, expected_duration, metadata):
+        """Verify and probe a finished download, then register it as the episode's local file."""
+        try:
+            check = await self.postprocessor.process(path, expected_duration)
+        except Exception as e:
+            logger.exception(f"Post-processing failed for {filename}")
+            check = DownloadCheck(path, expected_duration=expected_duration, error=str(e))
+        finally:
+            self._processing.pop(filename, None)
+        if check.ok:
+            self.index.add(check.path)
+        else:
+            self.index.exclude({path, check.path})
+        if check.ok and self.db and metadata and metadata.get('show_id'):
+            from ..database.models import OnlineProgress
+            ep_no = metadata.get('ep_no')
+            await self.db.update_online_progress(OnlineProgress(
+                show_id=metadata['show_id'],
+                show_name=metadata.get('show_name', ''),
+                episode_number=int(float(ep_no)) if str(ep_no).replace('.', '', 1).isdigit() else 0,
+                thumbnail_url=metadata.get('thumbnail_url'),
+                local_path=check.path
+            ))
+            logger.info(f"Saved local cache path for {filename} to database")
+        self._record_outcome(filename, check.ok, "Success" if check.ok else check.error, metadata, check)
+
+    def _record_outcome(self, filename, success, message, metadata, check=None):
+        self.history.insert(0, {
+            "filename": filename,
+            "success": success,
+            "message": message,
+            "metadata": metadata,
+            "timestamp": time.time()
+        })
+        
+        if filename in self.task_states:
+            self.task_states[filename]["status"] = "Finished" if success else "Failed"
+            if success:
+                self.task_states[filename]["progress"] = 100.0
+            else:
+                self.task_states[filename]["message"] = message
+            if check is not None:
+                self.task_states[filename]["check"] = asdict(check)
+        
+        # Keep history reasonable
+        if len(self.history) > 50:
+            self.history.pop()
+
+        self.task_finished.emit(filename, success, message, metadata)
+        
+        if self.db:
+            from ..database.models import DownloadTaskState
+            state = self.task_states.get(filename, {})
+            self._write(self.db.update_download_task(DownloadTaskState(
+                filename=filename, url="", status="Finished" if success else "Failed",
+                progress=state.get("progress", 100.0 if success else 0.0),
+                speed=state.get("speed", ""), eta=state.get("eta", ""), elapsed=state.get("elapsed", ""),
+                metadata_json=json.dumps(metadata or {}), check_json=check.to_json() if check else "{}"
+            )))
+
+    def is_downloading(self, filename):
+        return filename in self.active_tasks or filename in self.queue or filename in self._processing
+
+    def set_priority(self, filename, priority):
+        """Changes the priority of a queued task (running ones are not interrupted)."""
+        if not self.queue.set_priority(filename, priority):
+            return False
+        item = self.queue.get(filename)
+        self._save_task(item, "Paused" if item.paused else "Queued")
+        self.queue_updated.emit(len(self.queue))
+        self._process_queue()
+        return True
+
+    def force_start_task(self, filename):
+        """Moves a task to the front of the queue (unpausing it) and starts it if a slot is free."""
+        if filename in self.active_tasks:
+            return True
+        if filename not in self.queue:
+            return False
+        self.resume_download(filename)
+        return self.set_priority(filename, self.queue.top_priority + 1)
+
+    def pause_download(self, filename):
+        """Holds a queued task, or stops a running one keeping its partial data for resume_download."""
+        if filename in self.queue:
+            if self.queue.set_paused(filename, True):
+                self.task_states[filename]["status"] = "Paused"
+                self._save_task(self.queue.get(filename), "Paused")
+                self.queue_updated.emit(len(self.queue))
+            return True
+        if filename in self.active_tasks:
+            self.active_tasks[filename].pause()
+            return True
+        return False
+
+    def resume_download(self, filename):
+        if not self.queue.set_paused(filename, False):
+            return False
+        self.task_states[filename]["status"] = "Queued"
+        self._save_task(self.queue.get(filename), "Queued")
+        self.queue_updated.emit(len(self.queue))
+        self._process_queue()
+        return True
+
+    def cancel_download(self, filename):
+
+        # Check pending
+        if self.queue.remove(filename):
+            self.resume_states.pop(filename, None)
+            self.queue_updated.emit(len(self.queue))
+            if self.db:
+                self._write(self.db.remove_download_task(filename))
+            return True
+
+        # Check active
+        if filename in self.active_tasks:
+            self.active_tasks[filename].cancel()
+            if self.db:
+                self._write(self.db.remove_download_task(filename))
+            return True
+        return False
+
+    async def _load_from_db(self):
+        """
+        Reloads tasks from database on startup. Also safe to call again later, to pick up
+        downloads queued in the DB by another process (the headless daemon polls it).
+        """
+        if not self.db: 
+            return
+        tasks = await self.db.get_all_download_tasks()
+        waiting = []
+        for t in tasks:
+            if self.is_downloading(t.filename):
+                continue
+            if self.task_states.get(t.filename, {}).get("status") in ("Finished", "Failed", "Cancelled") and t.status != "Queued":
+                continue  # known already, or our own outcome whose write has not landed yet
+            meta = {}
+            try: 
+                meta = json.loads(t.metadata_json)
+            except Exception as e: 
+                logger.error(f"Error parsing metadata for {t.filename}: {e}")
+                pass
+            
+            self.task_states[t.filename] = {
+                "status": t.status,
+                "progress": t.progress,
+                "speed": t.speed,
+                "eta": t.eta,
+                "elapsed": t.elapsed,
+                "metadata": meta
+            }
+            if t.check_json and t.check_json != "{}":
+                try:
+                    check = self.task_states[t.filename]["check"] = json.loads(t.check_json)
+                except ValueError:
+                    check = {}
+                if t.status == "Failed" and check.get("error"):
+                    self.index.exclude([check.get("path")])
+            if t.status in ("Queued", "Downloading", "Paused"):
+                # Downloads that were running when the app closed continue from their last checkpoint
+                try:
+                    resume = json.loads(t.resume_json or "{}")
+                except ValueError:
+                    resume = {}
+                if resume:
+                    self.resume_states[t.filename] = resume
+                paused = t.status == "Paused"
+                self.task_states[t.filename]["status"] = "Paused" if paused else "Queued"
+                waiting.append((t.id or 0, QueuedDownload(t.url, t.filename, t.referrer, meta, t.priority, paused)))
+            elif t.status in ["Finished", "Failed", "Cancelled"]:
+                self.history.append({
+                    "filename": t.filename,
+                    "success": t.status == "Finished",
+                    "message": t.status if t.status != "Finished" else "Success",
+                    "metadata": meta,
+                    "timestamp": t.last_updated.timestamp()
+                })
+
+        # Rows come newest first; queue them in the order they were added
+        for _, item in sorted(waiting, key=lambda w: w[0]):
+            self.queue.push(item)
+        if waiting:
+            self.queue_updated.emit(len(self.queue))
+            self._process_queue()
+
+    def get_local_path(self, filename, show_id=None, ep_no=None):
+        """Downloaded file of an episode, from the downloads index. None while it is still downloading."""
+        if filename in self.active_tasks or filename in self._processing:
+            return None
+        return self.index.lookup(show_id, ep_no, filename)
+
+    def get_local_paths(self, show_id, episodes):
+        """Downloaded files of several episodes of a show: {episode: path} for those that have one and are not still downloading."""
+        busy = set()
+        for filename in itertools.chain(self.active_tasks, self._processing):
+            metadata = self.task_states.get(filename, {}).get("metadata") or {}
+            if metadata.get("show_id") == show_id:
+                busy.add(episode_key(metadata.get("ep_no")))
+        found = self.index.lookup_many(show_id, episodes)
+        return {episode: path for episode, path in found.items() if episode_key(episode) not in busy}
+
+    def get_all_tasks(self):
+        """Returns all tasks (active, pending, history) for UI display."""
+        return {
+            "active": self.active_tasks.keys(),
+            "pending": [item.filename for item in self.queue.ordered()],
+            "history": self.history,
+            "states": self.task_states
+        }
+
+    def clear_history(self):
+        self.history = []
+        if self.db:
+            self._write(self.db.clear_download_history())
+        # Also clean up task_states for finished/failed tasks
+        to_remove = [fn for fn, state in self.task_states.items() 
+                     if state["status"] in ["Finished", "Failed", "Cancelled"]]
+        for fn in to_remove:
+            del self.task_states[fn]
+
+    async def reload(self):
+        """Queue the downloads added to the DB since the last load."""
+        await self._load_from_db()
+
+    @property
+    def idle(self):
+        """Nothing running, post-processing or waiting to start (held downloads do not count)."""
+        return not (self.active_tasks or self._processing or any(not item.paused for item in self.queue.ordered()))
+
+    def status(self):
+        """Snapshot of the queue for status output: JSON-serialisable."""
+        def entry(filename):
+            state = self.task_states.get(filename, {})
+            return {"filename": filename, **{k: state.get(k) for k in ("status", "progress", "speed", "eta", "elapsed")}}
+
+        return {
+            "active": [entry(fn) for fn in self.active_tasks],
+            "processing": [entry(fn) for fn in self._processing],
+            "queued": [{**entry(item.filename), "priority": item.priority} for item in self.queue.ordered()],
+            "finished": sum(1 for h in self.history if h["success"]),
+            "failed": sum(1 for h in self.history if not h["success"]),
+        }
+
+    async def shutdown(self):
+        """
+        Stop the running downloads as an app exit would (their partial files and resume points
+        are kept in the DB for the next start), finish post-processing and pending writes, and
+        close the shared aria2c and HTTP client.
+        """
+        runs = list(self._runs.values())
+        for run in runs:
+            run.cancel()
+        for task in self.active_tasks.values():
+            if task.process and task.process.returncode is None:
+                try:
+                    task.process.terminate()
+                except ProcessLookupError:
+                    pass
+        await asyncio.gather(*runs, return_exceptions=True)
+        await self.progress.save()
+        await asyncio.gather(*self._processing.values(), return_exceptions=True)
+        await asyncio.gather(*self._writes, return_exceptions=True)
+        self.postprocessor.shutdown()
+        await stop_shared_daemon()
+        await close_shared_client()
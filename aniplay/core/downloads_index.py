@@ -0,0 +1,264 @@
+# AniPlay - Personal media server and player for anime libraries.
+# Copyright (C) 2026  Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+In-memory index of DOWNLOADS_PATH: show folder -> {episode -> best file}.
+
+Built with one scandir pass over the downloads folder (recursing into show
+folders, which torrents fill with subfolders) and then kept current by
+finished downloads (add) and the filesystem watcher (refresh). Lookups
+are dictionary hits, so listing every episode of a long show costs no
+filesystem calls. The best file for an episode is the largest one, as
+get_local_path always picked. Files whose download check failed are
+excluded, so neither a rebuild nor the watcher brings them back.
+"""
+
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from ..config import DOWNLOADS_PATH, VIDEO_EXTENSIONS
+from ..utils.logger import get_logger
+from ..utils.release_parser import parse_release
+from .online_library_manager import OnlineLibraryManager
+
+logger = get_logger(__name__)
+
+_OWN_EPISODE = re.compile(r"- Ep (\d+(?:\.\d+)?)")  # "Show - Ep 12.5" as DownloadTask names files
+_NYAA_SUFFIX = re.compile(r"\[(nyaa-[^\]]+)\]$")
+_TEMPORARY = re.compile(r"\.(?:part|faststart)\.\w+$")  # files of downloads still being written
+_UNSAFE = re.compile(r'[/\\:*?"<>|]')
+
+
+def episode_key(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def episode_of(name: str) -> Optional[float]:
+    match = _OWN_EPISODE.search(name)
+    if match:
+        return float(match.group(1))
+    info = parse_release(name)
+    if info.episode_decimal is not None:
+        return info.episode_decimal
+    return float(info.episode) if info.episode is not None else None
+
+
+@dataclass
+class _Folder:
+    episodes: Dict[float, Tuple[str, int]] = field(default_factory=dict)  # episode -> (path, size)
+    names: Dict[str, str] = field(default_factory=dict)  # top-level file name -> path
+    largest: Optional[Tuple[str, int]] = None
+
+    def add(self, path: str, size: int, top_level: bool):
+        name = os.path.basename(path)
+        if top_level:
+            self.names[name] = path
+        if self.largest is None or size > self.largest[1]:
+            self.largest = (path, size)
+        episode = episode_of(name)
+        if episode is not None:
+            best = self.episodes.get(episode)
+            if best is None or size > best[1]:
+                self.episodes[episode] = (path, size)
+
+
+def _is_video(name: str) -> bool:
+    return os.path.splitext(name)[1].lower() in VIDEO_EXTENSIONS and not _TEMPORARY.search(name)
+
+
+def _scan_folder(path: str, excluded: Set[str] = frozenset()) -> _Folder:
+    folder = _Folder()
+    stack = [(path, True)]
+    while stack:
+        current, top_level = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append((entry.path, False))
+                        elif _is_video(entry.name) and entry.path not in excluded:
+                            folder.add(entry.path, entry.stat().st_size, top_level)
+                    except OSError:
+                        continue
+        except OSError as e:
+            logger.debug(f"Cannot list {current}: {e}")
+    return folder
+
+
+class DownloadsIndex:
+    def __init__(self, root: str = str(DOWNLOADS_PATH)):
+        self.root = os.path.abspath(root)
+        self._lock = threading.Lock()
+        self._folders: Dict[str, _Folder] = {}
+        self._nyaa: Dict[str, str] = {}  # nyaa id -> "Title [nyaa-id]" folder of older versions
+        self._loose: Dict[str, str] = {}  # files directly in the downloads folder (oldest layout)
+        self._excluded: Set[str] = set()  # failed downloads left on disk
+        self._built = False
+
+    def build(self):
+        """Index the whole downloads folder (blocking; safe to run in a worker thread)."""
+        folders, loose = {}, {}
+        try:
+            with os.scandir(self.root) as it:
+                entries = list(it)
+        except OSError:
+            entries = []
+        with self._lock:
+            excluded = set(self._excluded)
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    folders[entry.name] = _scan_folder(entry.path, excluded)
+                elif _is_video(entry.name) and entry.path not in excluded:
+                    loose[entry.name] = entry.path
+            except OSError:
+                continue
+        with self._lock:
+            self._folders, self._loose = folders, loose
+            self._nyaa = {m.group(1): name for name in folders if (m := _NYAA_SUFFIX.search(name))}
+            self._built = True
+            late = [p for p in self._excluded - excluded if self._top_folder(p)]  # excluded while this scan ran
+        if late:
+            self.refresh(late)
+        logger.debug(f"Indexed {sum(len(f.episodes) for f in folders.values())} episodes in {len(folders)} download folders")
+
+    def _ensure_built(self):
+        if not self._built:
+            self.build()
+
+    def _top_folder(self, path: str) -> Optional[str]:
+        """Name of the show folder `path` is in (or is), None for the root itself or outside it."""
+        rel = os.path.relpath(os.path.abspath(path), self.root)
+        if rel == "." or rel.startswith(os.pardir):
+            return None
+        return rel.split(os.sep, 1)[0]
+
+    def refresh(self, paths: Iterable[str]):
+        """Re-list the show folders that `paths` are in (from the watcher, or after the app moved or deleted files)."""
+        if not self._built:
+            return self.build()
+        names = set()
+        for path in paths:
+            name = self._top_folder(path)
+            if name is None:
+                if os.path.abspath(path) == self.root:
+                    return self.build()
+                continue  # outside the downloads folder
+            names.add(name)
+        with self._lock:
+            excluded = set(self._excluded)
+        for name in names:
+            full = os.path.join(self.root, name)
+            folder = _scan_folder(full, excluded) if os.path.isdir(full) else None
+            with self._lock:
+                if folder is not None:
+                    self._folders[name] = folder
+                    self._loose.pop(name, None)
+                    m = _NYAA_SUFFIX.search(name)
+                    if m:
+                        self._nyaa[m.group(1)] = name
+                else:
+                    self._folders.pop(name, None)
+                    if os.path.isfile(full) and _is_video(name) and full not in excluded:
+                        self._loose[name] = full
+                    else:
+                        self._loose.pop(name, None)
+
+    def add(self, path: str):
+        """Record a finished download."""
+        self._ensure_built()
+        name = self._top_folder(path)
+        if name is None or not _is_video(path):
+            return
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        with self._lock:
+            self._excluded.discard(os.path.abspath(path))
+            if os.path.dirname(os.path.abspath(path)) == self.root:
+                self._loose[name] = path
+                return
+            top_level = os.path.dirname(os.path.abspath(path)) == os.path.join(self.root, name)
+            self._folders.setdefault(name, _Folder()).add(path, size, top_level)
+
+    def exclude(self, paths: Iterable[str]):
+        """Keep files whose download check failed out of the index (until a later add of the same path)."""
+        new = {os.path.abspath(p) for p in paths if p}
+        with self._lock:
+            new -= self._excluded
+            self._excluded |= new
+        inside = [p for p in new if self._top_folder(p)]
+        if inside and self._built:
+            self.refresh(inside)
+
+    def folder_for(self, show_id: str) -> Optional[str]:
+        """Name of the existing download folder of a show, trying the older naming schemes too."""
+        self._ensure_built()
+        if show_id.startswith("nyaa-"):
+            candidates = [show_id, self._nyaa.get(show_id)]
+        else:
+            candidates = [OnlineLibraryManager(self.root, None).get_allanime_folder_name(show_id),
+                          _UNSAFE.sub("_", show_id)]
+        return next((c for c in candidates if c and c in self._folders), None)
+
+    def folder_names(self) -> List[str]:
+        self._ensure_built()
+        return list(self._folders)
+
+    def _find(self, folder: Optional[_Folder], episode: Optional[float], filename: Optional[str]) -> Optional[str]:
+        if filename:
+            for name in (filename, filename + ".mp4"):
+                if folder is not None and name in folder.names:
+                    return folder.names[name]
+        if folder is not None:
+            if episode is None and filename:
+                episode = episode_of(filename)
+            if episode is not None:
+                best = folder.episodes.get(episode)
+                if best:
+                    return best[0]
+            elif folder.largest:
+                return folder.largest[0]
+        if filename:
+            return self._loose.get(filename)
+        return None
+
+    def lookup(self, show_id: Optional[str], episode=None, filename: Optional[str] = None) -> Optional[str]:
+        """Path of the downloaded file of an episode, or None."""
+        self._ensure_built()
+        folder = self._folders.get(self.folder_for(show_id)) if show_id else None
+        return self._find(folder, episode_key(episode), filename)
+
+    def lookup_many(self, show_id: str, episodes: Iterable) -> Dict[object, str]:
+        """Downloaded files of several episodes of a show at once: {episode: path} for those found."""
+        self._ensure_built()
+        folder = self._folders.get(self.folder_for(show_id))
+        if folder is None:
+            return {}
+        found = {}
+        for episode in episodes:
+            best = folder.episodes.get(episode_key(episode))
+            if best:
+                found[episode] = best[0]
+        return found
@@ -0,0 +1,330 @@
+# AniPlay - Personal media server and player for anime libraries.
+# Copyright (C) 2026  Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Native HLS downloads: parse the master and media playlists, fetch several
+segments at once over the shared HTTP client and append them in playlist
+order to one transport stream (or fMP4) file, which is remuxed once at the
+end by the caller.
+
+AES-128 encrypted playlists need the optional `cryptography` package;
+anything this module cannot handle raises HlsUnsupported so the caller
+can fall back to ffmpeg.
+
+Segments are appended in order, so resume_state() is just the media
+playlist, the number of segments written and the file length at that
+point; a restarted download truncates to it and carries on.
+"""
+
+import asyncio
+import os
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin
+
+import httpx
+
+from ..config import DOWNLOAD_RETRIES, HLS_SEGMENT_WORKERS
+from ..utils.logger import get_logger
+from .download_backends import DownloadError, ProgressCallback, ProgressReporter, shared_client, with_retries
+from .download_scheduler import bandwidth
+
+try:
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+except ImportError:  # optional, only needed for encrypted streams
+    Cipher = None
+
+logger = get_logger(__name__)
+
+_ATTRIBUTE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+
+class HlsUnsupported(DownloadError):
+    """The stream uses a feature the native downloader does not handle."""
+
+
+@dataclass
+class SegmentKey:
+    method: str
+    uri: Optional[str] = None
+    iv: Optional[bytes] = None
+
+
+@dataclass
+class Segment:
+    uri: str
+    duration: float
+    sequence: int
+    byterange: Optional[Tuple[int, int]] = None  # (offset, length)
+    key: Optional[SegmentKey] = None
+
+
+@dataclass
+class Variant:
+    uri: str
+    bandwidth: int = 0
+    height: Optional[int] = None
+
+
+@dataclass
+class MediaPlaylist:
+    segments: List[Segment] = field(default_factory=list)
+    init: Optional[Segment] = None  # EXT-X-MAP (fMP4 streams)
+
+    @property
+    def duration(self) -> float:
+        return sum(s.duration for s in self.segments)
+
+
+def parse_attributes(text: str) -> Dict[str, str]:
+    return {k: v.strip('"') for k, v in _ATTRIBUTE.findall(text)}
+
+
+def _byterange(value: str, previous_end: int) -> Tuple[int, int]:
+    length, _, offset = value.partition("@")
+    return (int(offset) if offset else previous_end), int(length)
+
+
+def is_master(text: str) -> bool:
+    return "#EXT-X-STREAM-INF" in text
+
+
+def parse_master(text: str, base_url: str) -> List[Variant]:
+    variants = []
+    attributes = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("#EXT-X-STREAM-INF:"):
+            attributes = parse_attributes(line.split(":", 1)[1])
+        elif line and not line.startswith("#") and attributes is not None:
+            resolution = re.match(r"\d+x(\d+)", attributes.get("RESOLUTION", ""))
+            variants.append(Variant(urljoin(base_url, line), int(attributes.get("BANDWIDTH", 0) or 0),
+                                    int(resolution.group(1)) if resolution else None))
+            attributes = None
+    return variants
+
+
+def parse_media(text: str, base_url: str) -> MediaPlaylist:
+    if not text.lstrip().startswith("#EXTM3U"):
+        raise DownloadError("Not an HLS playlist")
+    playlist = MediaPlaylist()
+    sequence = 0
+    duration = 0.0
+    key: Optional[SegmentKey] = None
+    byterange = None
+    range_end = 0
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("#EXT-X-MEDIA-SEQUENCE:"):
+            sequence = int(line.split(":", 1)[1])
+        elif line.startswith("#EXTINF:"):
+            duration = float(line.split(":", 1)[1].split(",", 1)[0] or 0)
+        elif line.startswith("#EXT-X-BYTERANGE:"):
+            byterange = _byterange(line.split(":", 1)[1], range_end)
+        elif line.startswith("#EXT-X-KEY:"):
+            attrs = parse_attributes(line.split(":", 1)[1])
+            method = attrs.get("METHOD", "NONE")
+            if method == "NONE":
+                key = None
+            else:
+                iv = attrs.get("IV")
+                key = SegmentKey(method, urljoin(base_url, attrs["URI"]) if "URI" in attrs else None,
+                                 bytes.fromhex(iv[2:] if iv.lower().startswith("0x") else iv) if iv else None)
+        elif line.startswith("#EXT-X-MAP:"):
+            attrs = parse_attributes(line.split(":", 1)[1])
+            init_range = _byterange(attrs["BYTERANGE"], 0) if "BYTERANGE" in attrs else None
+            playlist.init = Segment(urljoin(base_url, attrs["URI"]), 0.0, -1, init_range, key)
+        elif line and not line.startswith("#"):
+            playlist.segments.append(Segment(urljoin(base_url, line), duration, sequence, byterange, key))
+            if byterange:
+                range_end = byterange[0] + byterange[1]
+            sequence += 1
+            duration = 0.0
+            byterange = None
+    return playlist
+
+
+def pick_variant(variants: List[Variant], max_height: Optional[int] = None) -> Variant:
+    """Highest bandwidth variant, limited to max_height when any variant fits."""
+    fitting = [v for v in variants if max_height is None or v.height is None or v.height <= max_height]
+    return max(fitting or variants, key=lambda v: (v.bandwidth, v.height or 0))
+
+
+def _append(out, data: bytes):
+    out.write(data)
+    out.flush()  # so the checkpointed length is always in the file
+
+
+class HlsDownloader:
+    def __init__(self, url: str, headers: Optional[Dict[str, str]] = None,
+                 client: Optional[httpx.AsyncClient] = None,
+                 workers: int = HLS_SEGMENT_WORKERS, retries: int = DOWNLOAD_RETRIES,
+                 progress_callback: Optional[ProgressCallback] = None,
+                 max_height: Optional[int] = None, resume: Optional[dict] = None):
+        self.url = url
+        self._headers = headers or {}
+        self._client = client
+        self._workers = max(1, workers)
+        self._retries = retries
+        self._progress = ProgressReporter(progress_callback)
+        self._max_height = max_height
+        self._keys: Dict[str, bytes] = {}
+        self._resume = resume
+        self.playlist: Optional[MediaPlaylist] = None
+        self.playlist_url: Optional[str] = None
+        self._segments_written = 0
+        self._bytes_written = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = shared_client()
+        return self._client
+
+    async def _get(self, url: str, byterange: Optional[Tuple[int, int]] = None, count: bool = False) -> bytes:
+        headers = dict(self._headers)
+        if byterange:
+            headers["Range"] = f"bytes={byterange[0]}-{byterange[0] + byterange[1] - 1}"
+
+        async def attempt():
+            received = bytearray()
+            try:
+                async with self.client.stream("GET", url, headers=headers) as response:
+                    response.raise_for_status()
+                    async for chunk in response.aiter_bytes():
+                        await bandwidth.consume(len(chunk))
+                        received += chunk
+                        if count:
+                            self._progress.add(len(chunk))
+            except BaseException:
+                if count:
+                    self._progress.add(-len(received))  # counted again by the retry
+                raise
+            return bytes(received)
+
+        return await with_retries(attempt, f"GET {url}", self._retries)
+
+    def resume_state(self) -> Optional[dict]:
+        if not self.playlist_url:
+            return None
+        return {"playlist": self.playlist_url, "segments": self._segments_written, "bytes": self._bytes_written}
+
+    async def load_playlist(self) -> MediaPlaylist:
+        # A resumed download keeps the variant it started with
+        url = (self._resume or {}).get("playlist") or self.url
+        text = (await self._get(url)).decode("utf-8", "replace")
+        if is_master(text):
+            variant = pick_variant(parse_master(text, url), self._max_height)
+            logger.info(f"HLS variant: {variant.height or '?'}p, {variant.bandwidth} bps")
+            url = variant.uri
+            text = (await self._get(url)).decode("utf-8", "replace")
+        playlist = parse_media(text, url)
+        self.playlist_url = url
+        if not playlist.segments:
+            raise DownloadError("Playlist has no segments")
+        for segment in playlist.segments:
+            if segment.key and (segment.key.method != "AES-128" or Cipher is None or not segment.key.uri):
+                raise HlsUnsupported(f"Unsupported HLS encryption: {segment.key.method}")
+        return playlist
+
+    async def _decrypt(self, segment: Segment, data: bytes) -> bytes:
+        key = segment.key
+        if key is None:
+            return data
+        if key.uri not in self._keys:
+            self._keys[key.uri] = await self._get(key.uri)
+        iv = key.iv or segment.sequence.to_bytes(16, "big")
+        decryptor = Cipher(algorithms.AES(self._keys[key.uri]), modes.CBC(iv)).decryptor()
+        plain = decryptor.update(data) + decryptor.finalize()
+        return plain[:-plain[-1]] if plain and 0 < plain[-1] <= 16 else plain  # PKCS#7
+
+    def _estimate_total(self, done: List[Segment]):
+        # Sizes are unknown until fetched; extrapolate from the fetched share of the duration
+        fetched = sum(s.duration for s in done)
+        if fetched > 0:
+            self._progress.bytes_total = max(self._progress.bytes_done,
+                                             int(self._progress.bytes_done * self.playlist.duration / fetched))
+
+    def _resume_point(self, output_path: str) -> Tuple[int, int]:
+        """(segments, bytes) already in output_path that can be kept, or (0, 0)."""
+        state = self._resume or {}
+        segments, length = state.get("segments", 0), state.get("bytes", 0)
+        if not segments or state.get("playlist") != self.playlist_url or segments > len(self.playlist.segments):
+            return 0, 0
+        try:
+            if os.path.getsize(output_path) < length:
+                return 0, 0
+        except OSError:
+            return 0, 0
+        return segments, length
+
+    async def download(self, output_path: str) -> int:
+        """Write the whole stream to output_path. Returns the number of bytes written."""
+        self.playlist = await self.load_playlist()
+        segments = self.playlist.segments
+        self._progress.parts_total = len(segments)
+        loop = asyncio.get_running_loop()
+        pending = deque()
+        skip, written = self._resume_point(output_path)
+        if skip:
+            logger.info(f"Resuming HLS download at segment {skip + 1} of {len(segments)}")
+        remaining = iter(segments[skip:])
+        done: List[Segment] = list(segments[:skip])
+        self._segments_written, self._bytes_written = skip, written
+        self._progress.bytes_done, self._progress.parts_done = written, skip
+
+        def fill():
+            while len(pending) < self._workers:
+                segment = next(remaining, None)
+                if segment is None:
+                    break
+                pending.append((segment, asyncio.ensure_future(self._get(segment.uri, segment.byterange, count=True))))
+
+        try:
+            with open(output_path, "r+b" if skip else "wb") as out:
+                if skip:
+                    out.truncate(written)
+                    out.seek(written)
+                elif self.playlist.init:
+                    init = await self._decrypt(self.playlist.init, await self._get(self.playlist.init.uri, self.playlist.init.byterange))
+                    await loop.run_in_executor(None, _append, out, init)
+                    written += len(init)
+                fill()
+                while pending:
+                    segment, fetch = pending.popleft()
+                    data = await self._decrypt(segment, await fetch)
+                    fill()
+                    await loop.run_in_executor(None, _append, out, data)
+                    written += len(data)
+                    done.append(segment)
+                    self._segments_written, self._bytes_written = len(done), written
+                    self._progress.parts_done = len(done)
+                    self._estimate_total(done)
+        finally:
+            for _, fetch in pending:
+                fetch.cancel()
+            if pending:
+                await asyncio.gather(*(f for _, f in pending), return_exceptions=True)
+        self._progress.bytes_total = self._progress.bytes_done
+        self._progress.report(force=True)
+        logger.info(f"HLS download complete: {len(segments)} segments, {written} bytes")
+        return written
+
+
+def is_hls_url(url: str) -> bool:
+    return ".m3u8" in httpx.URL(url).path.lower()
@@ -0,0 +1,300 @@
+# AniPlay - Personal media server and player for anime libraries.
+# Copyright (C) 2026  Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Native downloads of plain HTTP files (the direct MP4 sources). The file
+is probed first; if the server honours byte ranges it is split into
+HTTP_CHUNK_SIZE_MB chunks that HTTP_CONNECTIONS pooled connections fetch
+in parallel, writing each one in place into a preallocated file. Servers
+without range support get a single streamed request.
+
+resume_state() lists the byte ranges still missing, so a ranged download
+can continue in the same .part file after a restart if the remote file
+is unchanged.
+"""
+
+import asyncio
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from ..config import DOWNLOAD_RETRIES, HTTP_CHUNK_SIZE_MB, HTTP_CONNECTIONS
+from ..utils.logger import get_logger
+from .download_backends import DownloadError, ProgressCallback, ProgressReporter, shared_client, with_retries
+from .download_scheduler import bandwidth
+
+logger = get_logger(__name__)
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".webm", ".avi", ".mov", ".m4v", ".ts")
+WRITE_BUFFER = 256 * 1024
+_CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+_seek_lock = threading.Lock()
+
+
+@dataclass
+class RemoteFile:
+    url: str  # after redirects
+    size: Optional[int]
+    accepts_ranges: bool
+    content_type: str = ""
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def validator(self) -> Optional[str]:
+        """Value for If-Range, so a file replaced mid-download is not stitched together."""
+        if self.etag and not self.etag.startswith("W/"):
+            return self.etag
+        return self.last_modified
+
+    @property
+    def is_playlist(self) -> bool:
+        return "mpegurl" in self.content_type
+
+    @property
+    def is_media(self) -> bool:
+        if self.content_type.startswith("video/") or self.content_type in ("application/octet-stream", "binary/octet-stream"):
+            return True
+        return httpx.URL(self.url).path.lower().endswith(VIDEO_EXTENSIONS)
+
+
+def _remote_file(response: httpx.Response) -> RemoteFile:
+    headers = response.headers
+    size, ranges = None, False
+    match = _CONTENT_RANGE.match(headers.get("Content-Range", ""))
+    if response.status_code == 206 and match:
+        ranges = True
+        size = int(match.group(3)) if match.group(3) != "*" else None
+    else:
+        ranges = headers.get("Accept-Ranges", "").lower() == "bytes"
+        if headers.get("Content-Length", "").isdigit():
+            size = int(headers["Content-Length"])
+    return RemoteFile(str(response.url), size, ranges and size is not None,
+                      headers.get("Content-Type", "").split(";")[0].strip().lower(),
+                      headers.get("ETag"), headers.get("Last-Modified"))
+
+
+async def probe(url: str, headers: Optional[Dict[str, str]] = None, client: Optional[httpx.AsyncClient] = None,
+                retries: int = DOWNLOAD_RETRIES) -> RemoteFile:
+    """Size, range support and type of `url`: HEAD, or a one-byte ranged GET where HEAD is refused."""
+    client = client or shared_client()
+    headers = headers or {}
+
+    async def head():
+        response = await client.head(url, headers=headers, follow_redirects=True)
+        response.raise_for_status()
+        return response
+
+    async def ranged_get():
+        async with client.stream("GET", url, headers={**headers, "Range": "bytes=0-0"},
+                                 follow_redirects=True) as response:
+            response.raise_for_status()
+            return response  # the body is not read
+
+    try:
+        remote = _remote_file(await with_retries(head, f"HEAD {url}", retries))
+        if remote.accepts_ranges:
+            return remote
+    except DownloadError as e:
+        logger.debug(f"{e}; probing with a ranged GET")
+    return _remote_file(await with_retries(ranged_get, f"GET {url}", retries))
+
+
+def preallocate(fd: int, size: int):
+    """Reserve the whole file up front (less fragmentation, and a full disk fails now rather than at 90%)."""
+    if hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(fd, 0, size)
+            return
+        except OSError:
+            pass  # e.g. not supported by the filesystem
+    os.ftruncate(fd, size)
+
+
+def pwrite(fd: int, data: bytes, offset: int):
+    view = memoryview(data)
+    while view:
+        if hasattr(os, "pwrite"):
+            n = os.pwrite(fd, view, offset)
+        else:  # Windows
+            with _seek_lock:
+                os.lseek(fd, offset, os.SEEK_SET)
+                n = os.write(fd, view)
+        view = view[n:]
+        offset += n
+
+
+def split(size: int, chunk_size: int) -> Iterator[Tuple[int, int]]:
+    """Inclusive (start, end) byte ranges covering `size` bytes."""
+    for start in range(0, size, chunk_size):
+        yield start, min(start + chunk_size, size) - 1
+
+
+class HttpDownloader:
+    def __init__(self, url: str, headers: Optional[Dict[str, str]] = None,
+                 client: Optional[httpx.AsyncClient] = None,
+                 connections: int = HTTP_CONNECTIONS, chunk_size: int = HTTP_CHUNK_SIZE_MB * 1024 * 1024,
+                 retries: int = DOWNLOAD_RETRIES, progress_callback: Optional[ProgressCallback] = None,
+                 remote: Optional[RemoteFile] = None, resume: Optional[dict] = None):
+        self.url = url
+        self._headers = headers or {}
+        self._client = client
+        self._connections = max(1, connections)
+        self._chunk_size = max(WRITE_BUFFER, chunk_size)
+        self._retries = retries
+        self._progress = ProgressReporter(progress_callback)
+        self.remote = remote
+        self._resume = resume
+        self._missing: Dict[int, List[int]] = {}  # chunk -> [next byte, last byte] while ranged
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = shared_client()
+        return self._client
+
+    def resume_state(self) -> Optional[dict]:
+        """Checkpoint of a ranged download: the remote file and the byte ranges not written yet."""
+        if not self._missing:
+            return None
+        return {"url": self.remote.url, "size": self.remote.size, "validator": self.remote.validator,
+                "ranges": sorted(list(r) for r in self._missing.values() if r[0] <= r[1])}
+
+    def _resumable_ranges(self, output_path: str) -> Optional[List[Tuple[int, int]]]:
+        state = self._resume
+        if not state or not state.get("ranges"):
+            return None
+        if state.get("size") != self.remote.size or state.get("validator") != self.remote.validator:
+            logger.info("Remote file changed since the last run, downloading it again")
+            return None
+        try:
+            if os.path.getsize(output_path) != self.remote.size:
+                return None
+        except OSError:
+            return None
+        return [(start, end) for start, end in state["ranges"]]
+
+    async def _fetch_range(self, fd: int, chunk: int, start: int, end: int):
+        """Fetch bytes start..end into the file; a retry continues from the last byte written."""
+        loop = asyncio.get_running_loop()
+        position = start
+        headers = dict(self._headers)
+        if self.remote.validator:
+            headers["If-Range"] = self.remote.validator
+
+        async def flush(buffer: bytearray):
+            nonlocal position
+            await loop.run_in_executor(None, pwrite, fd, bytes(buffer), position)
+            position += len(buffer)
+            self._missing[chunk][0] = position
+            self._progress.add(len(buffer))
+
+        async def attempt():
+            headers["Range"] = f"bytes={position}-{end}"
+            async with self.client.stream("GET", self.remote.url, headers=headers) as response:
+                response.raise_for_status()
+                match = _CONTENT_RANGE.match(response.headers.get("Content-Range", ""))
+                if response.status_code != 206 or not match or int(match.group(1)) != position:
+                    raise DownloadError("Server ignored the range request (was the file replaced?)")
+                buffer = bytearray()
+                async for data in response.aiter_bytes():
+                    await bandwidth.consume(len(data))
+                    if position + len(buffer) + len(data) > end + 1:
+                        raise DownloadError("Server sent more data than requested")
+                    buffer += data
+                    if len(buffer) >= WRITE_BUFFER:
+                        await flush(buffer)
+                        buffer = bytearray()
+                if buffer:
+                    await flush(buffer)
+            if position <= end:
+                raise httpx.RemoteProtocolError(f"Connection closed at byte {position} of {start}-{end}")
+
+        await with_retries(attempt, f"GET {self.remote.url} [{start}-{end}]", self._retries)
+        del self._missing[chunk]
+        self._progress.parts_done += 1
+        self._progress.report()
+
+    async def _download_ranges(self, output_path: str) -> int:
+        size = self.remote.size
+        ranges = self._resumable_ranges(output_path)
+        flags = os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0)
+        if ranges is None:
+            ranges = list(split(size, self._chunk_size))
+            flags |= os.O_TRUNC
+        else:
+            self._progress.bytes_done = size - sum(end - start + 1 for start, end in ranges)
+            logger.info(f"Resuming at {self._progress.bytes_done} of {size} bytes")
+        self._missing = {i: [start, end] for i, (start, end) in enumerate(ranges)}
+        self._progress.parts_total = len(ranges)
+        chunks = enumerate(ranges)
+        fd = os.open(output_path, flags, 0o644)
+
+        async def worker():
+            for chunk, (start, end) in chunks:  # shared iterator: each connection takes the next free chunk
+                await self._fetch_range(fd, chunk, start, end)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(min(self._connections, len(ranges)))]
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, preallocate, fd, size)
+            await asyncio.gather(*workers)
+            written = os.fstat(fd).st_size
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            os.close(fd)
+        if written != size or self._progress.bytes_done != size:
+            raise DownloadError(f"Size mismatch: expected {size} bytes, got {self._progress.bytes_done}")
+        return size
+
+    async def _download_stream(self, output_path: str) -> int:
+        loop = asyncio.get_running_loop()
+
+        async def attempt():
+            self._progress.add(-self._progress.bytes_done)
+            with open(output_path, "wb") as out:
+                async with self.client.stream("GET", self.remote.url, headers=self._headers) as response:
+                    response.raise_for_status()
+                    async for data in response.aiter_bytes(WRITE_BUFFER):
+                        await bandwidth.consume(len(data))
+                        await loop.run_in_executor(None, out.write, data)
+                        self._progress.add(len(data))
+            return self._progress.bytes_done
+
+        written = await with_retries(attempt, f"GET {self.remote.url}", self._retries)
+        if self.remote.size is not None and written != self.remote.size:
+            raise DownloadError(f"Size mismatch: expected {self.remote.size} bytes, got {written}")
+        return written
+
+    async def download(self, output_path: str) -> int:
+        """Write the file to output_path. Returns the number of bytes written."""
+        if self.remote is None:
+            self.remote = await probe(self.url, self._headers, self.client, self._retries)
+        self._progress.bytes_total = self.remote.size
+        if self.remote.accepts_ranges and self.remote.size:
+            logger.info(f"Ranged download: {self.remote.size} bytes over up to {self._connections} connections")
+            written = await self._download_ranges(output_path)
+        else:
+            logger.info("Server does not support ranges, using a single connection")
+            written = await self._download_stream(output_path)
+        self._progress.bytes_total = written
+        self._progress.report(force=True)
+        return written
@@ -15,15 +15,20 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import os
+import asyncio
 import logging
+from functools import partial
 from pathlib import Path
-from typing import Optional, List, Callable
+from typing import Optional, List, Callable, Iterable
 from ..database.db import DatabaseManager
-from ..database.models import Series, Episode, MediaTrack
+from ..database.models import Series, Episode, LibraryRoot
 from ..utils.file_scanner import FileScanner
 from ..utils.media_analyzer import MediaAnalyzer
-from ..config import DEFAULT_LIBRARY_PATH
+from ..config import DEFAULT_LIBRARY_PATH, SCAN_WORKERS, PROBE_WORKERS, PRUNE_GRACE_DAYS, SCAN_INTERVAL
 from ..utils.logger import get_logger
+from .scan_pipeline import ScanPipeline, ScanProgress, CancelToken, ScanCancelled
+from .scan_profiler import ScanProfiler
+from .scan_scheduler import throttle_current_thread, is_root_online
 
 logger = get_logger(__name__)
 
@@ -33,116 +38,164 @@ class LibraryManager:
         self._scanner = FileScanner()
         self._analyzer = MediaAnalyzer()
 
+    def _pipeline(self, progress_callback, cancel_token, full_scan=False,
+                  scan_workers: int = SCAN_WORKERS, probe_workers: int = PROBE_WORKERS,
+                  prune_grace_days: float = PRUNE_GRACE_DAYS,
+                  worker_init: Optional[Callable[[], None]] = None,
+                  profiler: Optional[ScanProfiler] = None) -> ScanPipeline:
+        return ScanPipeline(self._db, self._scanner, self._analyzer, self._find_poster,
+                            progress_callback, cancel_token, full_scan, scan_workers, probe_workers,
+                            prune_grace_days, worker_init, profiler)
+
+    async def get_library_roots(self, enabled_only: bool = False) -> List[LibraryRoot]:
+        """Configured library roots. DEFAULT_LIBRARY_PATH becomes the first root on a fresh database."""
+        roots = await self._db.get_library_roots(enabled_only)
+        if not roots and not await self._db.get_library_roots() and os.path.isdir(DEFAULT_LIBRARY_PATH):
+            await self._db.add_library_root(LibraryRoot(path=DEFAULT_LIBRARY_PATH, scan_interval=SCAN_INTERVAL))
+            roots = await self._db.get_library_roots(enabled_only)
+        return roots
+
+    def root_for_path(self, roots: Iterable[LibraryRoot], path: str) -> Optional[LibraryRoot]:
+        """The most specific root containing path."""
+        path = os.path.abspath(path)
+        best = None
+        for root in roots:
+            root_abs = os.path.abspath(root.path)
+            if (path == root_abs or path.startswith(root_abs.rstrip(os.sep) + os.sep)) and \
+                    (best is None or len(root_abs) > len(os.path.abspath(best.path))):
+                best = root
+        return best
+
+    async def scan_root(self, root: LibraryRoot,
+                        progress_callback: Optional[Callable[[ScanProgress], None]] = None,
+                        full_scan: bool = False,
+                        cancel_token: Optional[CancelToken] = None) -> str:
+        """
+        Scan one library root with its own worker counts and priorities.
+        Returns "ok", "offline" (root missing or not answering in time) or "cancelled",
+        and records it on the root. Other errors are recorded as "failed" and re-raised.
+        """
+        if not await asyncio.to_thread(is_root_online, root.path, root.offline_timeout):
+            logger.warning(f"Skipping offline library root: {root.path}")
+            status = "offline"
+        else:
+            try:
+                await self.scan_library(
+                    root.path, progress_callback, full_scan,
+                    scan_workers=root.scan_workers or SCAN_WORKERS,
+                    probe_workers=root.probe_workers or PROBE_WORKERS,
+                    cancel_token=cancel_token,
+                    worker_init=partial(throttle_current_thread, root.nice, root.io_class)
+                )
+                status = "ok"
+            except ScanCancelled:
+                await self._db.record_library_root_scan(root.id, "cancelled")
+                raise
+            except Exception:
+                await self._db.record_library_root_scan(root.id, "failed")
+                raise
+        await self._db.record_library_root_scan(root.id, status)
+        return status
+
+    async def _removed_series(self, root: Path, present: Iterable[str]) -> List[Series]:
+        """DB series that live directly under root but are not among the present folder paths."""
+        present = set(present)
+        return [s for s in await self._db.get_all_series(include_missing=True)
+                if Path(s.path).parent == root and s.path not in present]
+
     async def scan_library(self, library_path: str = DEFAULT_LIBRARY_PATH, 
-                           progress_callback: Optional[Callable[[str], None]] = None,
-                           full_scan: bool = False):
+                           progress_callback: Optional[Callable[[ScanProgress], None]] = None,
+                           full_scan: bool = False,
+                           scan_workers: int = SCAN_WORKERS,
+                           probe_workers: int = PROBE_WORKERS,
+                           cancel_token: Optional[CancelToken] = None,
+                           prune_grace_days: float = PRUNE_GRACE_DAYS,
+                           worker_init: Optional[Callable[[], None]] = None) -> Optional[dict]:
         """
         Scan the library path and sync with database.
         If full_scan is False, existing metadata (titles, etc) are preserved.
+
+        Full scans are checkpointed per series: if one is cancelled or the app
+        closes, the next full scan of the same library resumes where it stopped.
+        Episodes and series whose files are gone are pruned at the end (see PRUNE_GRACE_DAYS).
+
+        Every scan is profiled and stored in scan_runs (also when cancelled or failed);
+        the report is returned, or None if the library path does not exist.
+        Raises ScanCancelled when cancel_token fires.
         """
         logger.info(f"Starting library scan: {library_path} (Full Scan: {full_scan})")
         root = Path(library_path)
         if not root.exists():
-            return
+            return None
 
-        # Get all top-level directories (Series)
-        series_folders = [f for f in root.iterdir() if f.is_dir()]
-        
-        for folder in series_folders:
-            logger.info(f"Scanning series: {folder.name}")
-            if progress_callback:
-                progress_callback(f"Scanning {folder.name}...")
-            
-            # 1. Detect Poster
-            poster_path = self._find_poster(folder)
-            
-            # 2. Add/Get Series
-            series = Series(name=folder.name, path=str(folder), thumbnail_path=poster_path)
-            series_id = await self._db.add_series(series)
-            
-            # 3. Update poster if missing or in full scan
-            existing_series = await self._db.get_series(series_id)
-            if poster_path and existing_series:
-                should_update_poster = full_scan or not existing_series.thumbnail_path or not os.path.exists(existing_series.thumbnail_path)
-                if should_update_poster:
-                    await self._db.update_series_poster(series_id, poster_path)
-            
-            # 4. Scan episodes in folder
-            ep_data_list = self._scanner.scan_series_folder(str(folder))
-            logger.info(f"  Found {len(ep_data_list)} media files in {folder.name}")
-            
-            # 5. Process episodes
-            series_total_size = 0
-            for data in ep_data_list:
-                # Calculate file size
-                file_size = os.path.getsize(data["path"]) if os.path.exists(data["path"]) else 0
-                series_total_size += file_size
-
-                # Check if episode exists
-                episode = Episode(
-                    series_id=series_id,
-                    filename=data["filename"],
-                    path=data["path"],
-                    episode_number=data["episode_number"],
-                    season_number=data["season_number"],
-                    folder_name=data["folder_name"],
-                    size_bytes=file_size
-                )
-                
-                # add_episode returns existing or new ID
-                ep_id = await self._db.add_episode(episode)
-                
-                # Get possibly existing episode for comparison
-                existing_ep = await self._db.get_episode_by_id(ep_id)
-                
-                if full_scan:
-                    # Full scan: overwrite everything
-                    await self._db.update_episode_metadata(episode)
-                    await self._db.update_episode_size(ep_id, file_size)
+        profiler = ScanProfiler()
+        status = "failed"
+        try:
+            with profiler.tracing_db():
+                # Get all top-level directories (Series)
+                series_folders = sorted((f for f in root.iterdir() if f.is_dir()), key=lambda f: f.name.lower())
+                if series_folders:
+                    removed = await self._removed_series(root, (str(f) for f in series_folders))
                 else:
-                    if existing_ep:
-                        if not existing_ep.title:
-                            await self._db.update_episode_metadata(episode)
-                        if existing_ep.size_bytes <= 0:
-                            await self._db.update_episode_size(ep_id, file_size)
-
-                # 6. Deep Metadata Scan (if needed)
-                existing_tracks = await self._db.get_tracks_for_episode(ep_id)
-                
-                # Reload existing_ep to get updated duration if it was just added
-                existing_ep = await self._db.get_episode_by_id(ep_id)
-                
-                if existing_ep and (existing_ep.duration <= 0 or not existing_tracks):
-                    logger.info(f"    Probing Metadata: {episode.filename}")
-                    if progress_callback:
-                        progress_callback(f"  Probing {episode.filename}...")
-                    
-                    metadata = self._analyzer.probe_file(episode.path)
-                    if metadata:
-                        # Update Duration
-                        await self._db.update_episode_duration(ep_id, metadata.duration)
-                        
-                        # Update Tracks
-                        await self._db.clear_episode_tracks(ep_id)
-                        for t in metadata.tracks:
-                            track = MediaTrack(
-                                episode_id=ep_id,
-                                index=t.index,
-                                type=t.type,
-                                codec=t.codec,
-                                language=t.language,
-                                title=t.title,
-                                sub_index=t.sub_index
-                            )
-                            await self._db.add_media_track(track)
-                        logger.info(f"      Success: {len(metadata.tracks)} tracks found")
-
-            # Update total series size after processing all episodes
-            await self._db.update_series_size(series_id, series_total_size)
-
-        logger.info("Library scan complete!")
-        if progress_callback:
-            progress_callback("Scan complete!")
+                    # An empty root is far more likely an unmounted drive than a deleted library
+                    logger.warning(f"Library root is empty, not pruning series: {library_path}")
+                    removed = []
+                checkpoint_key = library_path if full_scan else None
+                pipeline = self._pipeline(progress_callback, cancel_token, full_scan, scan_workers, probe_workers,
+                                          prune_grace_days, worker_init, profiler)
+                await pipeline.run(series_folders, checkpoint_key, removed)
+                if checkpoint_key:
+                    await self._db.clear_scan_checkpoint(checkpoint_key)
+            status = "ok"
+        except ScanCancelled:
+            status = "cancelled"
+            raise
+        finally:
+            profiler.finish()
+            report = profiler.report(library_path=library_path, full_scan=full_scan, status=status)
+            try:
+                await self._db.add_scan_run(report)
+            except Exception:
+                logger.exception("Could not save scan report")
+
+        logger.info(f"Library scan complete in {report['duration']:.1f}s")
+        return report
+
+    async def scan_paths(self, paths: Iterable[str], library_path: str = DEFAULT_LIBRARY_PATH,
+                         progress_callback: Optional[Callable[[ScanProgress], None]] = None,
+                         cancel_token: Optional[CancelToken] = None) -> List[str]:
+        """
+        Incrementally rescan only the series folders containing the given paths
+        (e.g. from the filesystem watcher). Returns the series folders that were scanned.
+        """
+        root = Path(library_path)
+        root_abs = os.path.abspath(library_path)
+        folders = {}
+        gone = set()
+        for p in paths:
+            rel = os.path.relpath(os.path.abspath(p), root_abs)
+            if rel == os.pardir or rel.startswith(os.pardir + os.sep):
+                continue
+            if rel == os.curdir:
+                # The root itself changed (e.g. inotify overflow): fall back to a quick sync
+                await self.scan_library(library_path, progress_callback, cancel_token=cancel_token)
+                return [library_path]
+            # Keep the same path form as scan_library so series rows are matched by path
+            folder = root / Path(rel).parts[0]
+            if folder.is_dir():
+                folders[str(folder)] = folder
+            else:
+                gone.add(str(folder))
+
+        removed = []
+        if gone:
+            removed = [s for s in await self._removed_series(root, folders) if s.path in gone]
+        if not folders and not removed:
+            return []
+        logger.info(f"Incremental scan of {len(folders)} series: {', '.join(f.name for f in folders.values())}")
+        pipeline = self._pipeline(progress_callback, cancel_token)
+        await pipeline.run(sorted(folders.values(), key=lambda f: f.name.lower()), removed_series=removed)
+        return list(folders.keys()) + [s.path for s in removed]
 
     def _find_poster(self, folder_path: Path) -> Optional[str]:
         """Look for common poster filenames in the series folder."""
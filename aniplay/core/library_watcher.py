@@ -0,0 +1,304 @@
+# AniPlay - Personal media server and player for anime libraries.
+# Copyright (C) 2026  Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Filesystem watcher for the library and downloads folders.
+Uses inotify through ctypes on Linux and falls back to `watchdog` elsewhere.
+Events are debounced and coalesced into a set of affected paths.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Callable, Iterable, List, Optional, Set
+
+from ..config import VIDEO_EXTENSIONS
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# inotify constants (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+               IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _is_relevant(path: str, is_dir: bool) -> bool:
+    return is_dir or os.path.splitext(path)[1].lower() in VIDEO_EXTENSIONS
+
+
+class _Coalescer:
+    """
+    Collects paths and flushes them to a callback once no new event arrived
+    for `debounce` seconds (or after `max_delay` under a constant stream).
+    Sleeps on a condition variable while idle.
+    """
+
+    def __init__(self, callback: Callable[[Set[str]], None], debounce: float, max_delay: float):
+        self._callback = callback
+        self._debounce = debounce
+        self._max_delay = max(max_delay, debounce)
+        self._pending: Set[str] = set()
+        self._first_at = 0.0
+        self._last_at = 0.0
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="watcher-flush", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join(timeout=2)
+
+    def add(self, paths: Iterable[str]):
+        with self._cond:
+            now = time.monotonic()
+            if not self._pending:
+                self._first_at = now
+            before = len(self._pending)
+            self._pending.update(paths)
+            if len(self._pending) != before:
+                self._last_at = now
+                self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    if not self._pending:
+                        self._cond.wait()
+                        continue
+                    now = time.monotonic()
+                    due = min(self._last_at + self._debounce, self._first_at + self._max_delay)
+                    if now >= due:
+                        break
+                    self._cond.wait(due - now)
+                if self._stopped:
+                    return
+                batch, self._pending = self._pending, set()
+            try:
+                self._callback(batch)
+            except Exception:
+                logger.exception("Watcher callback failed")
+
+
+class _InotifyBackend:
+    """Recursive inotify watcher on top of libc via ctypes."""
+
+    def __init__(self, roots: List[str], emit: Callable[[Iterable[str]], None]):
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._roots = roots
+        self._emit = emit
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._wake_r, self._wake_w = os.pipe()
+        self._watches = {}  # wd -> directory path
+        self._thread = threading.Thread(target=self._run, name="watcher-inotify", daemon=True)
+
+    def start(self):
+        for root in self._roots:
+            self._add_tree(root)
+        logger.info(f"inotify watching {len(self._watches)} directories")
+        self._thread.start()
+
+    def stop(self):
+        os.write(self._wake_w, b"x")
+        self._thread.join(timeout=2)
+        for fd in (self._fd, self._wake_r, self._wake_w):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def _add_watch(self, path: str):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                logger.warning("inotify watch limit reached; raise fs.inotify.max_user_watches")
+            elif err not in (errno.ENOENT, errno.ENOTDIR):
+                logger.warning(f"inotify_add_watch failed for {path}: {os.strerror(err)}")
+            return
+        self._watches[wd] = path
+
+    def _add_tree(self, root: str):
+        stack = [root]
+        while stack:
+            current = stack.pop()
+            self._add_watch(current)
+            try:
+                with os.scandir(current) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+            except OSError:
+                pass
+
+    def _run(self):
+        while True:
+            try:
+                readable, _, _ = select.select([self._fd, self._wake_r], [], [])
+            except OSError:
+                return
+            if self._wake_r in readable:
+                return
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            except OSError:
+                return
+            self._emit(self._parse(data))
+
+    def _parse(self, data: bytes) -> List[str]:
+        paths = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped; let the consumer rescan the roots
+                paths.extend(self._roots)
+                continue
+            directory = self._watches.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                paths.append(directory)
+                continue
+
+            path = os.path.join(directory, os.fsdecode(name)) if name else directory
+            is_dir = bool(mask & IN_ISDIR)
+            if is_dir and mask & (IN_CREATE | IN_MOVED_TO):
+                # New folders need their own watches; report them so files moved in with them get scanned
+                self._add_tree(path)
+                paths.append(path)
+            elif mask & IN_CREATE and not is_dir:
+                # Wait for IN_CLOSE_WRITE so half-written files are not probed
+                continue
+            elif _is_relevant(path, is_dir):
+                paths.append(path)
+        return paths
+
+
+class _WatchdogBackend:
+    """Portable fallback using the optional `watchdog` package."""
+
+    def __init__(self, roots: List[str], emit: Callable[[Iterable[str]], None]):
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.event_type in ("opened", "closed_no_write"):
+                    return
+                paths = [event.src_path, getattr(event, "dest_path", "")]
+                emit([p for p in paths if p and _is_relevant(p, event.is_directory)])
+
+        self._observer = Observer()
+        for root in roots:
+            self._observer.schedule(_Handler(), root, recursive=True)
+
+    def start(self):
+        self._observer.start()
+
+    def stop(self):
+        self._observer.stop()
+        self._observer.join(timeout=2)
+
+
+class LibraryWatcher:
+    """
+    Watches a set of root folders and reports affected paths in debounced batches.
+    The callback runs on a background thread.
+    """
+
+    def __init__(self, roots: Iterable[str], on_changes: Callable[[Set[str]], None],
+                 debounce: float = 2.0, max_delay: float = 10.0):
+        self.roots = [os.path.abspath(str(r)) for r in roots if r and os.path.isdir(str(r))]
+        self._coalescer = _Coalescer(on_changes, debounce, max_delay)
+        self._backend = None
+
+    def _create_backend(self):
+        if sys.platform.startswith("linux"):
+            try:
+                return _InotifyBackend(self.roots, self._coalescer.add)
+            except (OSError, AttributeError) as e:
+                logger.warning(f"inotify unavailable ({e}), trying watchdog")
+        try:
+            return _WatchdogBackend(self.roots, self._coalescer.add)
+        except ImportError:
+            return None
+
+    def start(self) -> bool:
+        if not self.roots:
+            logger.info("Library watcher: no existing roots to watch")
+            return False
+        self._backend = self._create_backend()
+        if not self._backend:
+            logger.warning("Library watcher disabled: no inotify and `watchdog` is not installed")
+            return False
+        self._coalescer.start()
+        self._backend.start()
+        logger.info(f"Library watcher started for: {', '.join(self.roots)}")
+        return True
+
+    def stop(self):
+        if self._backend:
+            self._backend.stop()
+            self._coalescer.stop()
+            self._backend = None
+
+    def root_for(self, path: str) -> Optional[str]:
+        """Return the watched root that contains path, if any."""
+        path = os.path.abspath(path)
+        for root in self.roots:
+            if path == root or path.startswith(root + os.sep):
+                return root
+        return None
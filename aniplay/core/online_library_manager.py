@@ -5,6 +5,7 @@ import shutil
 import asyncio
 from typing import List, Dict, Any, Optional
 from ..utils.logger import get_logger
+from ..utils.release_parser import parse_release
 
 logger = get_logger(__name__)
 
@@ -28,14 +29,7 @@ class OnlineLibraryManager:
 
     def _clean_name(self, title: str) -> str:
         """Helper to get series name from torrent title."""
-        # Strip [tags] and (brackets)
-        cleaned = re.sub(r'\[.*?\]|\(.*?\)', '', title).strip()
-        # Also strip common resolution/version strings that might not be in brackets
-        cleaned = re.sub(r'(?i)\d{3,4}p|x264|x265|hevc|web-dl|bluray', '', cleaned).strip()
-        # Strip episode numbers like " - 01" or " 01" at the end
-        cleaned = re.sub(r'\s+-\s+\d+.*$', '', cleaned).strip()
-        cleaned = re.sub(r'\s+\d+(?:\s|$).*$', '', cleaned).strip()
-        return cleaned if cleaned else title
+        return parse_release(title).title or title
 
     async def migrate_downloads(self):
         """
@@ -0,0 +1,258 @@
+# AniPlay - Personal media server and player for anime libraries.
+# Copyright (C) 2026  Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Episode preview images: one representative frame per episode plus a
+trickplay sprite sheet (a small frame every PREVIEW_INTERVAL seconds) for
+the seek bar, both made with ffmpeg.
+
+Previews are stored by content hash (see utils/file_identity.py) under
+PREVIEW_CACHE_DIR/<xx>/<digest>/, so renames and moves keep them and
+identical files share them. sprite.json is written last and marks a
+finished episode; the job skips those and can be stopped at any point.
+"""
+
+import asyncio
+import json
+import math
+import os
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from functools import partial
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from ..config import PREVIEW_CACHE_DIR, PREVIEW_INTERVAL, PREVIEW_NICE, PREVIEW_WORKERS
+from ..database.db import DatabaseManager
+from ..database.models import Episode
+from ..utils.file_identity import build_identity_index
+from ..utils.logger import get_logger
+from .scan_pipeline import CancelToken
+from .scan_scheduler import throttle_current_thread
+
+logger = get_logger(__name__)
+
+THUMB_WIDTH = 320
+TILE_WIDTH, TILE_HEIGHT = 160, 90
+COLUMNS = 10
+
+
+@dataclass
+class SpriteManifest:
+    interval: float
+    count: int
+    columns: int
+    tile_width: int
+    tile_height: int
+
+    def tile_for(self, seconds: float) -> tuple:
+        """Top-left corner (x, y) in the sprite of the tile shown at `seconds`."""
+        index = min(max(int(seconds // self.interval), 0), self.count - 1)
+        return (index % self.columns) * self.tile_width, (index // self.columns) * self.tile_height
+
+
+@dataclass
+class EpisodePreviews:
+    thumbnail: Path
+    sprite: Path
+    manifest: SpriteManifest
+
+
+def preview_dir(content_hash: str, cache_dir: Path = PREVIEW_CACHE_DIR) -> Path:
+    digest = content_hash.rsplit(":", 1)[-1]
+    return Path(cache_dir) / digest[:2] / digest
+
+
+def thumbnail_for(content_hash: Optional[str], cache_dir: Path = PREVIEW_CACHE_DIR) -> Optional[Path]:
+    """Path of the episode frame (it may not exist yet)."""
+    return preview_dir(content_hash, cache_dir) / "thumb.jpg" if content_hash else None
+
+
+def load_previews(content_hash: Optional[str], cache_dir: Path = PREVIEW_CACHE_DIR) -> Optional[EpisodePreviews]:
+    """Finished previews for a content hash, or None."""
+    if not content_hash:
+        return None
+    folder = preview_dir(content_hash, cache_dir)
+    try:
+        with open(folder / "sprite.json", encoding="utf-8") as f:
+            manifest = SpriteManifest(**json.load(f))
+    except (OSError, ValueError, TypeError):
+        return None
+    return EpisodePreviews(folder / "thumb.jpg", folder / "sprite.jpg", manifest)
+
+
+def ffmpeg_available() -> bool:
+    return shutil.which("ffmpeg") is not None
+
+
+def _ffmpeg(cmd: List[str], timeout: float) -> bool:
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, encoding="utf-8", errors="replace", timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.warning(f"ffmpeg failed: {e}")
+        return False
+    if result.returncode != 0:
+        logger.warning(f"ffmpeg exited with {result.returncode}: {result.stderr.strip()[-500:]}")
+        return False
+    return True
+
+
+def generate_previews(path: str, duration: float, folder: Path, interval: float = PREVIEW_INTERVAL) -> bool:
+    """Write thumb.jpg, sprite.jpg and sprite.json for one video. Runs in a worker thread."""
+    folder.mkdir(parents=True, exist_ok=True)
+    count = max(1, math.ceil(duration / interval))
+    rows = math.ceil(count / COLUMNS)
+    timeout = max(120.0, duration)
+    thumb_tmp = folder / "thumb.tmp.jpg"
+    sprite_tmp = folder / "sprite.tmp.jpg"
+
+    # A third in is usually past the cold open and the OP; the thumbnail filter
+    # then picks the most representative of the next 50 frames
+    thumb_cmd = [
+        "ffmpeg", "-v", "error", "-nostdin", "-threads", "1",
+        "-ss", f"{duration * 0.3:.2f}", "-i", path,
+        "-vf", f"thumbnail=50,scale={THUMB_WIDTH}:-2", "-frames:v", "1", "-q:v", "4",
+        "-an", "-sn", "-y", str(thumb_tmp)
+    ]
+    # Keyframes only: far less decoding, and the nearest keyframe is close enough for seeking
+    sprite_cmd = [
+        "ffmpeg", "-v", "error", "-nostdin", "-threads", "1",
+        "-skip_frame", "nokey", "-i", path,
+        "-vf", (f"fps=1/{interval:g},"
+                f"scale={TILE_WIDTH}:{TILE_HEIGHT}:force_original_aspect_ratio=decrease,"
+                f"pad={TILE_WIDTH}:{TILE_HEIGHT}:(ow-iw)/2:(oh-ih)/2,"
+                f"tile={COLUMNS}x{rows}"),
+        "-frames:v", "1", "-q:v", "5", "-an", "-sn", "-y", str(sprite_tmp)
+    ]
+    if not _ffmpeg(thumb_cmd, timeout) or not _ffmpeg(sprite_cmd, timeout):
+        for tmp in (thumb_tmp, sprite_tmp):
+            tmp.unlink(missing_ok=True)
+        return False
+
+    os.replace(thumb_tmp, folder / "thumb.jpg")
+    os.replace(sprite_tmp, folder / "sprite.jpg")
+    manifest = SpriteManifest(interval=interval, count=count, columns=COLUMNS,
+                              tile_width=TILE_WIDTH, tile_height=TILE_HEIGHT)
+    tmp = folder / "sprite.json.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(asdict(manifest), f)
+    os.replace(tmp, folder / "sprite.json")
+    return True
+
+
+class PreviewGenerator:
+    """
+    Incremental background job over library episodes. Files that ffmpeg cannot
+    handle get a `failed` marker and are not retried until retry_failed is set.
+    """
+
+    def __init__(self, db: DatabaseManager, cache_dir: Path = PREVIEW_CACHE_DIR,
+                 workers: int = PREVIEW_WORKERS, interval: float = PREVIEW_INTERVAL, nice: int = PREVIEW_NICE,
+                 progress_callback: Optional[Callable[[int, int, Episode], None]] = None,
+                 cancel_token: Optional[CancelToken] = None,
+                 generate: Callable[[str, float, Path, float], bool] = generate_previews):
+        self._db = db
+        self._cache_dir = Path(cache_dir)
+        self._workers = max(1, workers)
+        self._interval = interval
+        self._nice = nice
+        self._callback = progress_callback
+        self._token = cancel_token or CancelToken()
+        self._generate = generate
+
+    async def _ensure_hashes(self, episodes: List[Episode]):
+        missing = [e for e in episodes if not e.content_hash]
+        if not missing:
+            return
+        identities = await asyncio.to_thread(
+            build_identity_index, [(e.path, e.size_bytes or None) for e in missing], self._workers
+        )
+        updates = []
+        for e in missing:
+            e.content_hash = identities.get(e.path)
+            if e.content_hash:
+                updates.append((e.content_hash, e.id))
+        if updates:
+            await self._db.update_episode_hashes(updates)
+
+    def _pending(self, episodes: List[Episode], retry_failed: bool) -> Dict[str, Episode]:
+        todo = {}
+        for e in episodes:
+            if not e.content_hash or e.content_hash in todo:
+                continue
+            folder = preview_dir(e.content_hash, self._cache_dir)
+            if (folder / "sprite.json").exists():
+                continue
+            if (folder / "failed").exists() and not retry_failed:
+                continue
+            todo[e.content_hash] = e
+        return todo
+
+    def _run_one(self, episode: Episode) -> Optional[bool]:
+        """True/False for generated/failed, None if skipped because the job was cancelled."""
+        if self._token.cancelled:
+            return None
+        folder = preview_dir(episode.content_hash, self._cache_dir)
+        try:
+            ok = self._generate(episode.path, episode.duration, folder, self._interval)
+        except Exception:
+            logger.exception(f"Preview generation failed for {episode.path}")
+            ok = False
+        if ok:
+            (folder / "failed").unlink(missing_ok=True)
+        else:
+            folder.mkdir(parents=True, exist_ok=True)
+            (folder / "failed").touch()
+        return ok
+
+    async def run(self, episodes: Optional[List[Episode]] = None, retry_failed: bool = False) -> dict:
+        """Generate previews for episodes that have none yet. Returns counts per outcome."""
+        if episodes is None:
+            episodes = await self._db.get_all_episodes()
+        episodes = [e for e in episodes if e.duration and e.duration > 0 and os.path.exists(e.path)]
+        await self._ensure_hashes(episodes)
+        todo = self._pending(episodes, retry_failed)
+        stats = {"generated": 0, "failed": 0, "skipped": len(episodes) - len(todo), "cancelled": False}
+        if not todo:
+            return stats
+        logger.info(f"Generating previews for {len(todo)} episodes")
+
+        loop = asyncio.get_running_loop()
+        pool = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="previews",
+                                  initializer=partial(throttle_current_thread, self._nice, "idle"))
+        try:
+            futures = {loop.run_in_executor(pool, self._run_one, e): e for e in todo.values()}
+            done_count = 0
+            pending = set(futures)
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=0.5, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    ok = future.result()
+                    if ok is None:
+                        continue
+                    done_count += 1
+                    stats["generated" if ok else "failed"] += 1
+                    if self._callback:
+                        self._callback(done_count, len(todo), futures[future])
+                if self._token.cancelled:
+                    stats["cancelled"] = True
+                    break
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+        logger.info(f"Previews: {stats['generated']} generated, {stats['failed']} failed")
+        return stats
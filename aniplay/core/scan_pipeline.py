@@ -0,0 +1,528 @@
+# AniPlay - Personal media server and player for anime libraries.
+# Copyright (C) 2026  Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Staged library scan: discover -> stat -> diff -> persist -> probe -> hash -> relink -> prune.
+
+Series folders are walked in a thread pool with a bounded lookahead and
+consumed in folder order, so database writes and progress stay sequential.
+Only new or changed episodes are written. A series is checkpointed once it
+is persisted and all of its probes finished, which lets an interrupted full
+scan pick up where it stopped. Probed files are also hashed, as are unchanged
+rows that were stored before hashing existed (once, after the probes). An older
+row whose file vanished is relinked to the new row with the same content, or,
+if it was never hashed, the one with the same filename, or else the new row
+for the same season and episode of its series.
+The diff also collects episodes whose file is gone; whatever the relink stage
+did not claim is pruned at the end in one transaction.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, List, Optional, Sequence, Set
+
+from ..database.db import DatabaseManager
+from ..database.models import Series, Episode, MediaTrack
+from ..utils.file_scanner import FileScanner
+from ..utils.media_analyzer import MediaAnalyzer
+from ..utils.file_identity import CHUNK_SIZE, file_identity
+from ..config import SCAN_WORKERS, PROBE_WORKERS, PRUNE_GRACE_DAYS
+from ..utils.logger import get_logger
+from .scan_profiler import ScanProfiler
+
+logger = get_logger(__name__)
+
+
+class ScanCancelled(Exception):
+    pass
+
+
+class CancelToken:
+    """Thread-safe cancellation flag checked by the pipeline between units of work."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise ScanCancelled()
+
+
+@dataclass
+class ScanProgress:
+    """Structured progress event. str() gives the human readable message."""
+    phase: str  # discover, scan, probe, relink, prune, done, cancelled
+    message: str
+    series_done: int = 0
+    series_total: int = 0
+    files_seen: int = 0
+    bytes_seen: int = 0
+    probes_done: int = 0
+    probes_total: int = 0
+    elapsed: float = 0.0
+    eta: Optional[float] = None
+
+    def __str__(self) -> str:
+        return self.message
+
+
+class ScanPipeline:
+    def __init__(self, db: DatabaseManager, scanner: FileScanner, analyzer: MediaAnalyzer,
+                 find_poster: Callable[[Path], Optional[str]],
+                 progress_callback: Optional[Callable[[ScanProgress], None]] = None,
+                 cancel_token: Optional[CancelToken] = None,
+                 full_scan: bool = False,
+                 scan_workers: int = SCAN_WORKERS,
+                 probe_workers: int = PROBE_WORKERS,
+                 prune_grace_days: float = PRUNE_GRACE_DAYS,
+                 worker_init: Optional[Callable[[], None]] = None,
+                 profiler: Optional[ScanProfiler] = None):
+        self._db = db
+        self._scanner = scanner
+        self._analyzer = analyzer
+        self._find_poster = find_poster
+        self._callback = progress_callback
+        self._token = cancel_token or CancelToken()
+        self._full_scan = full_scan
+        self._scan_workers = max(1, scan_workers)
+        self._probe_workers = max(1, probe_workers)
+        self._prune_grace_days = prune_grace_days
+        self._worker_init = worker_init  # runs once in every walk/probe thread, e.g. to lower its priority
+        self.profiler = profiler or ScanProfiler()
+
+        self._started = 0.0
+        self._series_done = 0
+        self._series_total = 0
+        self._files_seen = 0
+        self._bytes_seen = 0
+        self._probes_done = 0
+        self._probes_total = 0
+
+        self._probes = []  # (series_path, episode_id, path, future)
+        self._outstanding: Dict[str, int] = {}  # series_path -> running probes
+        self._persisted: Set[str] = set()
+        self._identities: Dict[str, int] = {}  # content hash -> episode id probed in this run
+        self._unhashed: List[tuple] = []  # (episode id, path) of unchanged rows without a content hash
+        self._created: Dict[str, Episode] = {}  # path -> row this run added (id set once persisted)
+        self._checkpoint_key: Optional[str] = None
+        self._vanished: Dict[int, str] = {}  # episode id -> path no longer on disk
+        self._restored: Set[int] = set()  # missing episodes whose file is back
+        self._removed_series: Set[int] = set()
+        self.prune_report: Optional[dict] = None
+
+    # Progress
+
+    def _emit(self, phase: str, message: str):
+        if not self._callback:
+            return
+        elapsed = time.monotonic() - self._started
+        units_total = self._series_total + self._probes_total
+        units_done = self._series_done + self._probes_done
+        eta = None
+        if 0 < units_done < units_total:
+            eta = elapsed / units_done * (units_total - units_done)
+        self._callback(ScanProgress(
+            phase=phase, message=message,
+            series_done=self._series_done, series_total=self._series_total,
+            files_seen=self._files_seen, bytes_seen=self._bytes_seen,
+            probes_done=self._probes_done, probes_total=self._probes_total,
+            elapsed=elapsed, eta=eta
+        ))
+
+    # Entry point
+
+    async def run(self, series_folders: List[Path], checkpoint_key: Optional[str] = None,
+                  removed_series: Sequence[Series] = ()):
+        """
+        Scan the given series folders. With a checkpoint_key, series finished by an
+        earlier interrupted run are skipped and progress is recorded as we go.
+        removed_series are DB series whose folder is gone; their episodes are pruned.
+        Raises ScanCancelled if the cancel token fires.
+        """
+        self._started = time.monotonic()
+        self._checkpoint_key = checkpoint_key
+        with self.profiler.phase("discover"):
+            folders = await self._discover(series_folders)
+        for series in removed_series:
+            self._removed_series.add(series.id)
+            for path, state in (await self._db.get_episode_states(series.id)).items():
+                self._vanished[state[0]] = path
+
+        loop = asyncio.get_running_loop()
+        walk_pool = ThreadPoolExecutor(max_workers=self._scan_workers, thread_name_prefix="scan-walk",
+                                       initializer=self._worker_init)
+        probe_pool = ThreadPoolExecutor(max_workers=self._probe_workers, thread_name_prefix="scan-probe",
+                                        initializer=self._worker_init)
+        try:
+            async for collected in self._stat(folders, walk_pool):
+                folder = collected["folder"]
+                logger.info(f"Scanning series: {folder.name}")
+                self._emit("scan", f"Scanning {folder.name}... ({self._series_done + 1}/{self._series_total})")
+                self._token.raise_if_cancelled()
+
+                with self.profiler.phase("diff"):
+                    series_id, changed, to_probe, total_size = await self._diff(collected)
+                with self.profiler.phase("persist"):
+                    to_probe += await self._persist(series_id, changed, total_size)
+                self._series_done += 1
+                await self._probe(str(folder), to_probe, probe_pool, loop)
+
+                # Store probes that already finished so results land while walking continues
+                await self._drain(wait=False)
+
+            await self._drain(wait=True)
+            with self.profiler.phase("hash"):
+                await self._backfill_hashes(probe_pool, loop)
+            with self.profiler.phase("relink"):
+                await self._relink()
+            with self.profiler.phase("prune"):
+                await self._prune()
+        except ScanCancelled:
+            logger.info("Library scan cancelled")
+            self._emit("cancelled", "Scan cancelled")
+            raise
+        finally:
+            # Never block the event loop on leftover work if the scan was aborted
+            walk_pool.shutdown(wait=False, cancel_futures=True)
+            probe_pool.shutdown(wait=False, cancel_futures=True)
+
+        self._emit("done", "Scan complete!")
+
+    # Stages
+
+    async def _discover(self, series_folders: List[Path]) -> List[Path]:
+        completed: Set[str] = set()
+        if self._checkpoint_key:
+            checkpoint = await self._db.get_scan_checkpoint(self._checkpoint_key)
+            if checkpoint and checkpoint["full_scan"] == self._full_scan:
+                completed = checkpoint["completed"]
+            else:
+                await self._db.start_scan_checkpoint(self._checkpoint_key, self._full_scan)
+
+        folders = [f for f in series_folders if str(f) not in completed]
+        skipped = len(series_folders) - len(folders)
+        self._series_total = len(series_folders)
+        self._series_done = skipped
+        if skipped:
+            logger.info(f"Resuming scan: {skipped}/{len(series_folders)} series already done")
+            self._emit("discover", f"Resuming scan ({skipped}/{len(series_folders)} series already done)")
+        else:
+            self._emit("discover", f"Found {len(series_folders)} series")
+        return folders
+
+    async def _stat(self, folders: List[Path], pool: ThreadPoolExecutor) -> AsyncIterator[dict]:
+        """Walk folders in the pool, keeping a bounded number in flight, and yield them in order."""
+        loop = asyncio.get_running_loop()
+        pending = deque()
+        remaining = iter(folders)
+        lookahead = self._scan_workers * 2
+
+        def fill():
+            while len(pending) < lookahead and not self._token.cancelled:
+                folder = next(remaining, None)
+                if folder is None:
+                    break
+                pending.append(loop.run_in_executor(pool, self._collect_series, folder))
+
+        fill()
+        while pending:
+            with self.profiler.phase("walk_wait"):
+                collected = await pending.popleft()
+            fill()
+            if collected is not None:
+                yield collected
+
+    def _collect_series(self, folder: Path) -> Optional[dict]:
+        """Filesystem half of a series scan; runs in the walk pool."""
+        if self._token.cancelled:
+            return None
+        counts = {}
+        with self.profiler.work("walk"):
+            collected = {
+                "folder": folder,
+                "poster": self._find_poster(folder),
+                "episodes": self._scanner.scan_series_folder(str(folder), counts),
+            }
+        counts["series"] = 1
+        counts["files_walked"] = len(collected["episodes"])
+        self.profiler.add(counts)
+        return collected
+
+    async def _diff(self, collected: dict):
+        """
+        Ensure the series row exists and compare the walked files against the DB.
+        Returns (series_id, episodes to write, unchanged (id, path) pairs that still need probing, total size).
+        """
+        folder = collected["folder"]
+        poster_path = collected["poster"]
+        ep_data_list = collected["episodes"]
+
+        series_id = await self._db.add_series(Series(name=folder.name, path=str(folder), thumbnail_path=poster_path))
+        existing_series = await self._db.get_series(series_id)
+        if poster_path and existing_series:
+            should_update_poster = self._full_scan or not existing_series.thumbnail_path or not os.path.exists(existing_series.thumbnail_path)
+            if should_update_poster:
+                await self._db.update_series_poster(series_id, poster_path)
+
+        logger.info(f"  Found {len(ep_data_list)} media files in {folder.name}")
+        states = await self._db.get_episode_states(series_id)
+
+        changed = []
+        to_probe = []
+        total_size = 0
+        for data in ep_data_list:
+            total_size += data["size_bytes"]
+            self._files_seen += 1
+            self._bytes_seen += data["size_bytes"]
+            state = states.pop(data["path"], None)
+            if state is not None and state[8] is not None:
+                self._restored.add(state[0])
+            if state is not None and not self._full_scan:
+                ep_id, title, size_bytes, duration, track_count, ep_num, season_num, folder_name, _, content_hash = state
+                parsed_changed = not title and (ep_num, season_num, folder_name) != (
+                    data["episode_number"], data["season_number"], data["folder_name"])
+                if (size_bytes or 0) == data["size_bytes"] and not parsed_changed:
+                    if (duration or 0) <= 0 or track_count == 0:
+                        to_probe.append((ep_id, data["path"]))
+                    else:
+                        self.profiler.count("probes_cached")
+                        if not content_hash:
+                            self._unhashed.append((ep_id, data["path"]))
+                    continue
+            episode = Episode(
+                series_id=series_id,
+                filename=data["filename"],
+                path=data["path"],
+                episode_number=data["episode_number"],
+                season_number=data["season_number"],
+                folder_name=data["folder_name"],
+                size_bytes=data["size_bytes"]
+            )
+            changed.append(episode)
+            if state is None:
+                self._created[data["path"]] = episode
+
+        # Whatever is left in states was not found on disk
+        for path, state in states.items():
+            self._vanished[state[0]] = path
+
+        if existing_series and existing_series.size_bytes == total_size:
+            total_size = None
+        return series_id, changed, to_probe, total_size
+
+    async def _persist(self, series_id: int, changed: List[Episode], total_size: Optional[int]) -> list:
+        """Write new/changed episodes. Returns the written ones that need probing."""
+        to_probe = []
+        if changed:
+            synced = await self._db.sync_series_episodes(series_id, changed, self._full_scan)
+            self.profiler.count("episodes_written", len(changed))
+            for ep_id, path, _ in synced:
+                if path in self._created:
+                    self._created[path].id = ep_id
+            to_probe = [(ep_id, path) for ep_id, path, needs_probe in synced if needs_probe]
+        if total_size is not None:
+            await self._db.update_series_size(series_id, total_size)
+        return to_probe
+
+    async def _probe(self, series_path: str, to_probe: list, pool: ThreadPoolExecutor, loop):
+        self._persisted.add(series_path)
+        self._outstanding[series_path] = len(to_probe)
+        for ep_id, path in to_probe:
+            logger.info(f"    Probing Metadata: {os.path.basename(path)}")
+            self._probes_total += 1
+            self._emit("probe", f"  Probing {os.path.basename(path)}...")
+            self._probes.append((series_path, ep_id, path, loop.run_in_executor(pool, self._probe_file, path)))
+        if not to_probe:
+            await self._series_finished(series_path)
+
+    def _probe_file(self, path: str):
+        """Runs in the probe pool: media metadata plus the content identity used for move detection."""
+        with self.profiler.work("probe"):
+            metadata = self._analyzer.probe_file(path)
+        with self.profiler.work("hash"):
+            identity = file_identity(path)
+        self.profiler.count("probes_run")
+        if identity:
+            # Only the head and tail chunks are read (see file_identity)
+            size = int(identity.split(":", 1)[0])
+            self.profiler.count("bytes_hashed", min(size, 2 * CHUNK_SIZE))
+        return metadata, identity
+
+    def _hash_files(self, batch: List[tuple]) -> List[tuple]:
+        """Runs in the probe pool: (content_hash, episode_id) for the files of `batch`."""
+        hashes = []
+        for ep_id, path in batch:
+            if self._token.cancelled:
+                break
+            with self.profiler.work("hash"):
+                identity = file_identity(path)
+            if identity:
+                hashes.append((identity, ep_id))
+                self.profiler.count("bytes_hashed", min(int(identity.split(":", 1)[0]), 2 * CHUNK_SIZE))
+        self.profiler.count("hashes_backfilled", len(hashes))
+        return hashes
+
+    async def _backfill_hashes(self, pool: ThreadPoolExecutor, loop):
+        """
+        Hash unchanged rows that have none yet, one file at a time in the (low priority) probe
+        pool. Stored hashes are never recomputed, so this runs once per file.
+        """
+        for i in range(0, len(self._unhashed), 100):
+            self._token.raise_if_cancelled()
+            if i == 0:
+                self._emit("hash", f"Hashing {len(self._unhashed)} files for move detection...")
+            hashes = await loop.run_in_executor(pool, self._hash_files, self._unhashed[i:i + 100])
+            await self._db.update_episode_hashes(hashes)
+
+    async def _drain(self, wait: bool):
+        while self._probes:
+            self._token.raise_if_cancelled()
+            done = [p for p in self._probes if p[3].done()]
+            if not done:
+                if not wait:
+                    return
+                # Short timeout so a cancel request is noticed while probes run
+                with self.profiler.phase("probe_wait"):
+                    await asyncio.wait([p[3] for p in self._probes], timeout=0.25,
+                                       return_when=asyncio.FIRST_COMPLETED)
+                continue
+            for probe in done:
+                self._probes.remove(probe)
+                with self.profiler.phase("store"):
+                    await self._store_probe(*probe)
+
+    async def _store_probe(self, series_path: str, ep_id: int, path: str, future):
+        try:
+            metadata, identity = await future
+        except Exception:
+            logger.exception(f"Probe failed for {path}")
+            metadata, identity = None, None
+        if identity:
+            self._identities[identity] = ep_id
+        if metadata:
+            tracks = [MediaTrack(
+                episode_id=ep_id,
+                index=t.index,
+                type=t.type,
+                codec=t.codec,
+                language=t.language,
+                title=t.title,
+                sub_index=t.sub_index
+            ) for t in metadata.tracks]
+            await self._db.save_episode_media(ep_id, metadata.duration, tracks, identity)
+            logger.info(f"      Success: {len(metadata.tracks)} tracks found")
+        elif identity:
+            await self._db.update_episode_hashes([(identity, ep_id)])
+        self._probes_done += 1
+        self._outstanding[series_path] -= 1
+        if self._outstanding[series_path] == 0:
+            await self._series_finished(series_path)
+
+    async def _relink(self):
+        """
+        Fold rows whose file vanished into the row this scan added for the same file
+        (renames/moves): by content hash, else, for rows never hashed, by filename, else by
+        season and episode within the series (a renamed or replaced release). Only
+        unambiguous matches are taken; the rest is left to _prune.
+        """
+        relinked = 0
+        claimed = set()  # new rows already folded into an old one
+        if self._identities:
+            for old in await self._db.get_episodes_by_hash(list(self._identities)):
+                new_id = self._identities.get(old.content_hash)
+                if new_id is None or new_id == old.id or os.path.exists(old.path):
+                    continue
+                logger.info(f"Relinking moved file: {old.path}")
+                await self._db.merge_episode_into(old.id, new_id)
+                self._identities.pop(old.content_hash)
+                self._vanished.pop(old.id, None)
+                claimed.add(new_id)
+                relinked += 1
+
+        created = [e for e in self._created.values() if e.id is not None and e.id not in claimed]
+        if self._vanished and created:
+            by_name: Dict[str, List[Episode]] = {}
+            for episode in created:
+                by_name.setdefault(episode.filename, []).append(episode)
+            by_episode: Dict[tuple, List[Episode]] = {}
+            for episode in created:
+                if episode.episode_number is not None:
+                    by_episode.setdefault((episode.series_id, episode.season_number, episode.episode_number),
+                                          []).append(episode)
+            old_rows = await self._db.get_episodes_by_ids(list(self._vanished))
+            vanished_per_episode: Dict[tuple, int] = {}
+            for old in old_rows:
+                key = (old.series_id, old.season_number, old.episode_number)
+                vanished_per_episode[key] = vanished_per_episode.get(key, 0) + 1
+
+            for old in old_rows:
+                matches = [] if old.content_hash else by_name.get(old.filename, [])
+                how = "name"
+                key = (old.series_id, old.season_number, old.episode_number)
+                if len(matches) != 1 and old.episode_number is not None and vanished_per_episode[key] == 1:
+                    matches, how = by_episode.get(key, []), "episode number"
+                if len(matches) != 1 or matches[0].id in claimed:
+                    continue
+                logger.info(f"Relinking moved file by {how}: {old.path}")
+                await self._db.merge_episode_into(old.id, matches[0].id)
+                self._vanished.pop(old.id)
+                claimed.add(matches[0].id)
+                relinked += 1
+        if relinked:
+            self._emit("relink", f"Relinked {relinked} moved or renamed files")
+
+    async def _prune(self):
+        """Delete (or, with a grace period, mark missing) episodes whose file is gone."""
+        if not (self._vanished or self._restored or self._removed_series):
+            return
+        report = await self._db.prune_episodes(
+            list(self._vanished), list(self._restored),
+            grace_days=self._prune_grace_days, removed_series_ids=list(self._removed_series)
+        )
+        self.prune_report = report
+        for path in report["deleted"]:
+            logger.info(f"Pruned missing file: {path}")
+        for path in report["deleted_series"]:
+            logger.info(f"Removed series: {path}")
+        parts = []
+        if report["deleted"]:
+            parts.append(f"removed {len(report['deleted'])} missing episodes")
+        if report["deleted_series"]:
+            parts.append(f"{len(report['deleted_series'])} series")
+        if report["marked_missing"]:
+            parts.append(f"{report['marked_missing']} episodes marked missing")
+        if report["restored"]:
+            parts.append(f"{report['restored']} restored")
+        if parts:
+            message = ", ".join(parts)
+            self._emit("prune", message[0].upper() + message[1:])
+
+    async def _series_finished(self, series_path: str):
+        if self._checkpoint_key and series_path in self._persisted:
+            await self._db.add_scan_checkpoint_item(self._checkpoint_key, series_path)
@@ -0,0 +1,119 @@
+# AniPlay - Personal media server and player for anime libraries.
+# Copyright (C) 2026  Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Per-scan timers and counters.
+
+Phases are wall-clock time on the event loop (what the scan waited for),
+worker time is summed across the walk/probe threads (what the threads
+were busy with). SQL statements are counted through a trace callback on
+every connection the DatabaseManager opens while tracing_db() is active.
+"""
+
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional
+
+from ..database.db import statement_listener
+from ..utils.format_utils import format_size
+
+
+class ScanProfiler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.phases: Dict[str, float] = defaultdict(float)
+        self.worker_time: Dict[str, float] = defaultdict(float)
+        self.counters: Counter = Counter()
+        self.started_at = datetime.now()
+        self._started = time.perf_counter()
+        self.duration: Optional[float] = None
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a step on the event loop."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] += time.perf_counter() - start
+
+    @contextmanager
+    def work(self, name: str):
+        """Time a step in a worker thread."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.worker_time[name] += elapsed
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] += n
+
+    def add(self, counts: Dict[str, int]):
+        with self._lock:
+            self.counters.update(counts)
+
+    def _on_statement(self, sql: str):
+        # Runs on the aiosqlite worker thread
+        self.count("db_statements")
+
+    @contextmanager
+    def tracing_db(self):
+        """Count SQL statements issued by this task (and tasks it starts) while active."""
+        token = statement_listener.set(self._on_statement)
+        try:
+            yield
+        finally:
+            statement_listener.reset(token)
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._started
+
+    def report(self, **extra) -> dict:
+        duration = self.duration if self.duration is not None else time.perf_counter() - self._started
+        return {
+            **extra,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "duration": round(duration, 3),
+            "phases": {k: round(v, 3) for k, v in sorted(self.phases.items(), key=lambda kv: -kv[1])},
+            "worker_time": {k: round(v, 3) for k, v in sorted(self.worker_time.items(), key=lambda kv: -kv[1])},
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+
+def format_report(report: dict) -> str:
+    """Short human readable summary of a report (for the dialog and the CLI)."""
+    c = report.get("counters", {})
+    lines = [
+        f"{report.get('library_path', '')} ({'full' if report.get('full_scan') else 'quick'} scan, "
+        f"{report.get('status', 'ok')}) in {report['duration']:.1f}s",
+        f"  {c.get('series', 0)} series, {c.get('files_walked', 0)} files, "
+        f"{c.get('dirs_listed', 0)} dirs listed, {c.get('stats', 0)} stats",
+        f"  {c.get('probes_run', 0)} probes run, {c.get('probes_cached', 0)} cached, "
+        f"{format_size(c.get('bytes_hashed', 0))} hashed",
+        f"  {c.get('episodes_written', 0)} episodes written, {c.get('db_statements', 0)} SQL statements",
+    ]
+    if report.get("phases"):
+        lines.append("  Phases: " + ", ".join(f"{k} {v:.2f}s" for k, v in report["phases"].items()))
+    if report.get("worker_time"):
+        lines.append("  Workers: " + ", ".join(f"{k} {v:.2f}s" for k, v in report["worker_time"].items()))
+    return "\n".join(lines)
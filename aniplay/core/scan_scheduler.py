@@ -0,0 +1,203 @@
+# AniPlay - Personal media server and player for anime libraries.
+# Copyright (C) 2026  Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Background scanning of several library roots, each on its own interval.
+
+Every root has its own lock, so a slow NFS mount never holds up the SSD.
+Scan threads (and the ffprobe processes they start) run with a raised
+niceness and a lower I/O class so playback keeps priority on the disk,
+and a root that does not answer within its timeout is skipped as offline.
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import functools
+import os
+import platform
+import sys
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from ..database.models import LibraryRoot
+from ..utils.logger import get_logger
+from .scan_pipeline import CancelToken, ScanCancelled, ScanProgress
+
+logger = get_logger(__name__)
+
+# ioprio_set(2) syscall numbers; other architectures just skip I/O priorities
+_IOPRIO_SYSCALL = {"x86_64": 251, "amd64": 251, "i386": 289, "i686": 289, "aarch64": 30, "arm64": 30, "armv7l": 314}
+_IOPRIO_WHO_PROCESS = 1
+_IOPRIO_CLASS_SHIFT = 13
+# io_class -> (ioprio class, level); "normal" leaves the thread alone
+IO_CLASSES = {"normal": None, "best-effort": (2, 7), "idle": (3, 0)}
+
+
+def _set_io_priority(io_class: str) -> bool:
+    prio = IO_CLASSES.get(io_class)
+    if prio is None or not sys.platform.startswith("linux"):
+        return False
+    number = _IOPRIO_SYSCALL.get(platform.machine().lower())
+    if number is None:
+        return False
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    # who = 0 targets the calling thread
+    if libc.syscall(number, _IOPRIO_WHO_PROCESS, 0, (prio[0] << _IOPRIO_CLASS_SHIFT) | prio[1]) != 0:
+        logger.debug(f"ioprio_set failed: {os.strerror(ctypes.get_errno())}")
+        return False
+    return True
+
+
+def throttle_current_thread(nice: int = 0, io_class: str = "normal"):
+    """
+    Lower the CPU and I/O priority of the calling thread. Used as the thread
+    pool initializer for scan workers. On Linux both are per-thread and are
+    inherited by child processes such as ffprobe. Elsewhere nice applies to
+    the whole process (and adds up per call), so it is left alone there.
+    """
+    if nice > 0 and sys.platform.startswith("linux"):
+        try:
+            os.nice(nice)
+        except OSError as e:
+            logger.debug(f"os.nice failed: {e}")
+    _set_io_priority(io_class)
+
+
+def is_root_online(path: str, timeout: float) -> bool:
+    """
+    True if the root answers a stat and a directory listing within `timeout` seconds.
+    The check runs in a daemon thread so a hung network mount cannot block us.
+    """
+    done = threading.Event()
+    result = []
+
+    def probe():
+        try:
+            with os.scandir(path) as it:
+                next(it, None)
+            result.append(True)
+        except OSError:
+            result.append(False)
+        finally:
+            done.set()
+
+    threading.Thread(target=probe, name="root-probe", daemon=True).start()
+    if not done.wait(timeout):
+        logger.warning(f"Library root did not respond within {timeout:.0f}s: {path}")
+        return False
+    return result[0]
+
+
+class ScanScheduler:
+    """
+    Runs scans of library roots: on demand through scan(), and in the background
+    for roots with a scan_interval once start() was called.
+
+    busy: optional callable; while it returns True no background scan is started
+    (manual scans and scans already running are not affected).
+    """
+
+    def __init__(self, library, progress_callback: Optional[Callable[[LibraryRoot, ScanProgress], None]] = None,
+                 on_finished: Optional[Callable[[LibraryRoot, str], None]] = None,
+                 busy: Optional[Callable[[], bool]] = None, tick: float = 30.0):
+        self._library = library
+        self._progress_callback = progress_callback
+        self._on_finished = on_finished
+        self._busy = busy
+        self._tick = tick
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._tokens: Dict[str, CancelToken] = {}
+        self._background: Dict[str, asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def lock_for(self, root: LibraryRoot) -> asyncio.Lock:
+        """Per-root lock; hold it for anything that writes scan results for this root."""
+        return self._locks.setdefault(root.path, asyncio.Lock())
+
+    def is_scanning(self, root: LibraryRoot) -> bool:
+        return self.lock_for(root).locked()
+
+    async def scan(self, root: LibraryRoot, full_scan: bool = False,
+                   progress_callback: Optional[Callable[[ScanProgress], None]] = None,
+                   cancel_token: Optional[CancelToken] = None) -> str:
+        """Scan one root now, waiting for a scan already running on it. Returns the status."""
+        token = cancel_token or CancelToken()
+        async with self.lock_for(root):
+            self._tokens[root.path] = token
+            try:
+                status = await self._library.scan_root(root, progress_callback, full_scan, token)
+            finally:
+                self._tokens.pop(root.path, None)
+        if self._on_finished:
+            self._on_finished(root, status)
+        return status
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        """Stop scheduling and cancel every running scan (full scans resume from their checkpoint)."""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        for token in self._tokens.values():
+            token.cancel()
+
+    def due(self, root: LibraryRoot, now: Optional[datetime] = None) -> bool:
+        if not root.enabled or root.scan_interval <= 0:
+            return False
+        if root.last_scan_at is None:
+            return True
+        now = now or datetime.now()
+        return (now - root.last_scan_at).total_seconds() >= root.scan_interval * 60
+
+    async def run_due(self):
+        """Start a background scan for every root that is due and not already being scanned."""
+        if self._busy and self._busy():
+            return
+        for root in await self._library.get_library_roots(enabled_only=True):
+            task = self._background.get(root.path)
+            if (task and not task.done()) or self.is_scanning(root) or not self.due(root):
+                continue
+            self._background[root.path] = asyncio.ensure_future(self._scan_in_background(root))
+
+    async def _scan_in_background(self, root: LibraryRoot):
+        callback = None
+        if self._progress_callback:
+            callback = functools.partial(self._progress_callback, root)
+        try:
+            await self.scan(root, progress_callback=callback)
+        except ScanCancelled:
+            pass
+        except Exception:
+            logger.exception(f"Background scan failed: {root.path}")
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_due()
+            except Exception:
+                logger.exception("Scan scheduler tick failed")
+            await asyncio.sleep(self._tick)
+
+    async def wait_idle(self):
+        """Wait for background scans started so far (used by tests and on shutdown)."""
+        tasks = [t for t in self._background.values() if not t.done()]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -17,23 +17,43 @@
 import aiosqlite
 # stdlib
 import json
-#import sqlite3
-from typing import List, Optional, Any  # noqa: F401
+import os
+import re
+import sqlite3
+from contextvars import ContextVar
+from functools import partial
+from typing import Callable, Iterable, List, Optional, Any  # noqa: F401
 from datetime import datetime
-from .models import Series, Episode, WatchProgress, MediaTrack, OnlineProgress, DownloadTaskState, PlannerEntry
-from ..config import DB_PATH
+from .models import Series, Episode, WatchProgress, MediaTrack, OnlineProgress, DownloadTaskState, PlannerEntry, LibraryRoot
+from ..config import DB_PATH, DOWNLOADS_PATH
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Called with every SQL statement run on connections opened in the current context (see core/scan_profiler.py)
+statement_listener: ContextVar[Optional[Callable[[str], None]]] = ContextVar("statement_listener", default=None)
+
+
+class _TracedConnection(sqlite3.Connection):
+    def __init__(self, *args, listener=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_trace_callback(listener)
+
+
 class DatabaseManager:
     def __init__(self, db_path: str = str(DB_PATH)):
         self.db_path = db_path
         logger.debug(f"DatabaseManager initialized with path: {self.db_path}")
 
+    def _connect(self):
+        listener = statement_listener.get()
+        if listener is None:
+            return aiosqlite.connect(self.db_path)
+        return aiosqlite.connect(self.db_path, factory=partial(_TracedConnection, listener=listener))
+
     async def initialize(self):
         logger.info("Initializing database...")
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute("PRAGMA foreign_keys = ON")
             
             # Series table
@@ -124,7 +144,10 @@ class DatabaseManager:
                     elapsed TEXT,
                     referrer TEXT,
                     metadata_json TEXT DEFAULT '{}',
-                    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    resume_json TEXT DEFAULT '{}',
+                    priority INTEGER DEFAULT 0,
+                    check_json TEXT DEFAULT '{}'
                 )
             """)
             
@@ -149,6 +172,53 @@ class DatabaseManager:
                     last_synced TIMESTAMP
                 )
             """)
+            # Library roots with per-root scan settings
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS library_roots (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    path TEXT UNIQUE NOT NULL,
+                    name TEXT,
+                    enabled BOOLEAN DEFAULT 1,
+                    scan_interval INTEGER DEFAULT 0,
+                    scan_workers INTEGER,
+                    probe_workers INTEGER,
+                    nice INTEGER DEFAULT 0,
+                    io_class TEXT DEFAULT 'idle',
+                    offline_timeout REAL DEFAULT 10,
+                    last_scan_at TIMESTAMP,
+                    last_status TEXT
+                )
+            """)
+            # One row per library scan with its profiler report
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS scan_runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    library_path TEXT NOT NULL,
+                    full_scan BOOLEAN DEFAULT 0,
+                    status TEXT,
+                    started_at TIMESTAMP,
+                    duration REAL,
+                    report_json TEXT
+                )
+            """)
+            # Checkpoints for resumable full scans
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS scan_checkpoints (
+                    library_path TEXT PRIMARY KEY,
+                    full_scan BOOLEAN DEFAULT 1,
+                    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS scan_checkpoint_items (
+                    library_path TEXT NOT NULL,
+                    series_path TEXT NOT NULL,
+                    PRIMARY KEY (library_path, series_path),
+                    FOREIGN KEY (library_path) REFERENCES scan_checkpoints (library_path) ON DELETE CASCADE
+                )
+            """)
+
             async with db.execute("PRAGMA table_info(episodes)") as cursor:
                 columns = [row[1] for row in await cursor.fetchall()]
                 if 'folder_name' not in columns:
@@ -157,6 +227,11 @@ class DatabaseManager:
                     await db.execute("ALTER TABLE episodes ADD COLUMN title TEXT")
                 if 'size_bytes' not in columns:
                     await db.execute("ALTER TABLE episodes ADD COLUMN size_bytes INTEGER DEFAULT 0")
+                if 'content_hash' not in columns:
+                    await db.execute("ALTER TABLE episodes ADD COLUMN content_hash TEXT")
+                if 'missing_since' not in columns:
+                    await db.execute("ALTER TABLE episodes ADD COLUMN missing_since TIMESTAMP")
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_episodes_content_hash ON episodes (content_hash)")
             
             async with db.execute("PRAGMA table_info(series)") as cursor:
                 columns = [row[1] for row in await cursor.fetchall()]
@@ -186,6 +261,15 @@ class DatabaseManager:
                 if 'local_path' not in columns:
                     await db.execute("ALTER TABLE online_progress ADD COLUMN local_path TEXT")
 
+            async with db.execute("PRAGMA table_info(download_tasks)") as cursor:
+                columns = [row[1] for row in await cursor.fetchall()]
+                if 'resume_json' not in columns:
+                    await db.execute("ALTER TABLE download_tasks ADD COLUMN resume_json TEXT DEFAULT '{}'")
+                if 'priority' not in columns:
+                    await db.execute("ALTER TABLE download_tasks ADD COLUMN priority INTEGER DEFAULT 0")
+                if 'check_json' not in columns:
+                    await db.execute("ALTER TABLE download_tasks ADD COLUMN check_json TEXT DEFAULT '{}'")
+
             # Migration: ensure planner has AniList enrichment columns
             async with db.execute("PRAGMA table_info(planner)") as cursor:
                 pcols = [row[1] for row in await cursor.fetchall()]
@@ -247,7 +331,7 @@ class DatabaseManager:
     
     async def add_series(self, series: Series) -> int:
         logger.debug(f"Adding series: {series.name} (path: {series.path})")
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             cursor = await db.execute(
                 "INSERT OR IGNORE INTO series (name, path, thumbnail_path, rpc_image_url, size_bytes) VALUES (?, ?, ?, ?, ?)",
                 (series.name, series.path, series.thumbnail_path, series.rpc_image_url, series.size_bytes)
@@ -265,10 +349,17 @@ class DatabaseManager:
                 logger.debug(f"Series already exists: {series.name} (ID: {series_id})")
                 return series_id
 
-    async def get_all_series(self) -> List[Series]:
-        async with aiosqlite.connect(self.db_path) as db:
+    async def get_all_series(self, include_missing: bool = False) -> List[Series]:
+        """All series, hiding ones whose episodes are all missing unless include_missing is set."""
+        query = "SELECT * FROM series ORDER BY name"
+        if not include_missing:
+            query = """SELECT * FROM series WHERE id NOT IN (
+                           SELECT series_id FROM episodes GROUP BY series_id
+                           HAVING SUM(missing_since IS NULL) = 0
+                       ) ORDER BY name"""
+        async with self._connect() as db:
             db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM series ORDER BY name") as cursor:
+            async with db.execute(query) as cursor:
                 rows = await cursor.fetchall()
                 logger.debug(f"Fetched {len(rows)} series from database")
                 return [Series(
@@ -282,7 +373,7 @@ class DatabaseManager:
                 ) for row in rows]
 
     async def get_series(self, series_id: int) -> Optional[Series]:
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             db.row_factory = aiosqlite.Row
             async with db.execute("SELECT * FROM series WHERE id = ?", (series_id,)) as cursor:
                 row = await cursor.fetchone()
@@ -300,7 +391,7 @@ class DatabaseManager:
 
     async def update_series_poster(self, series_id: int, poster_path: str):
         logger.info(f"Updating poster for series {series_id} to: {poster_path}")
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute(
                 "UPDATE series SET thumbnail_path = ? WHERE id = ?",
                 (poster_path, series_id)
@@ -309,7 +400,7 @@ class DatabaseManager:
 
     async def update_series_rpc_url(self, series_id: int, rpc_url: str):
         logger.info(f"Updating RPC image URL for series {series_id} to: {rpc_url}")
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute(
                 "UPDATE series SET rpc_image_url = ? WHERE id = ?",
                 (rpc_url, series_id)
@@ -317,7 +408,7 @@ class DatabaseManager:
             await db.commit()
 
     async def update_series_size(self, series_id: int, size_bytes: int):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute(
                 "UPDATE series SET size_bytes = ? WHERE id = ?",
                 (size_bytes, series_id)
@@ -325,7 +416,7 @@ class DatabaseManager:
             await db.commit()
 
     async def update_series_metadata(self, series: Series):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute(
                 "UPDATE series SET name = ?, path = ?, thumbnail_path = ? WHERE id = ?",
                 (series.name, series.path, series.thumbnail_path, series.id)
@@ -336,7 +427,7 @@ class DatabaseManager:
 
     async def add_episode(self, episode: Episode) -> int:
         logger.debug(f"Adding episode: {episode.filename} to series {episode.series_id}")
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             cursor = await db.execute(
                 """INSERT OR IGNORE INTO episodes 
                    (series_id, filename, path, title, duration, size_bytes, episode_number, season_number, folder_name) 
@@ -357,7 +448,7 @@ class DatabaseManager:
                 return ep_id
 
     async def update_episode_metadata(self, episode: Episode):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute(
                 """UPDATE episodes SET 
                    episode_number = ?, 
@@ -369,8 +460,246 @@ class DatabaseManager:
             )
             await db.commit()
 
+    async def sync_series_episodes(self, series_id: int, episodes: List[Episode], full_scan: bool = False) -> List[tuple]:
+        """
+        Insert/update all episodes of a series in a single transaction.
+        Applies the same rules as the per-episode scan (full scan overwrites metadata and size,
+        quick scan only fills in missing ones).
+        Returns (episode_id, path, needs_probe) for every episode passed in.
+        """
+        if not episodes:
+            return []
+        async with self._connect() as db:
+            await db.executemany(
+                """INSERT OR IGNORE INTO episodes
+                   (series_id, filename, path, title, duration, size_bytes, episode_number, season_number, folder_name)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                [(series_id, e.filename, e.path, e.title, e.duration, e.size_bytes,
+                  e.episode_number, e.season_number, e.folder_name) for e in episodes]
+            )
+
+            existing = {}
+            paths = [e.path for e in episodes]
+            for i in range(0, len(paths), 500):
+                chunk = paths[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                async with db.execute(
+                    f"""SELECT id, path, title, size_bytes, duration,
+                               (SELECT COUNT(*) FROM media_tracks WHERE episode_id = episodes.id) AS track_count
+                        FROM episodes WHERE path IN ({placeholders})""",
+                    chunk
+                ) as cursor:
+                    for row in await cursor.fetchall():
+                        existing[row[1]] = row
+
+            metadata_updates = []
+            size_updates = []
+            results = []
+            for e in episodes:
+                row = existing.get(e.path)
+                if not row:
+                    continue
+                ep_id, _, title, size_bytes, duration, track_count = row
+                if full_scan or not title:
+                    metadata_updates.append((e.episode_number, e.season_number, e.folder_name, e.title, e.path))
+                # A different size means the file was replaced, so its old probe data is stale
+                replaced = (size_bytes or 0) > 0 and size_bytes != e.size_bytes
+                if full_scan or replaced or (size_bytes or 0) <= 0:
+                    size_updates.append((e.size_bytes, ep_id))
+                results.append((ep_id, e.path, replaced or (duration or 0) <= 0 or track_count == 0))
+
+            if metadata_updates:
+                await db.executemany(
+                    """UPDATE episodes SET
+                       episode_number = ?,
+                       season_number = ?,
+                       folder_name = ?,
+                       title = ?
+                       WHERE path = ?""",
+                    metadata_updates
+                )
+            if size_updates:
+                await db.executemany("UPDATE episodes SET size_bytes = ? WHERE id = ?", size_updates)
+            await db.commit()
+            logger.debug(f"Synced {len(results)} episodes for series {series_id}")
+            return results
+
+    async def get_episode_states(self, series_id: int) -> dict:
+        """
+        Lightweight per-path snapshot of a series' episodes used by the scan diff stage.
+        Returns path -> (id, title, size_bytes, duration, track_count, episode_number, season_number,
+        folder_name, missing_since, content_hash).
+        """
+        async with self._connect() as db:
+            async with db.execute(
+                """SELECT path, id, title, size_bytes, duration,
+                          (SELECT COUNT(*) FROM media_tracks WHERE episode_id = episodes.id) AS track_count,
+                          episode_number, season_number, folder_name, missing_since, content_hash
+                   FROM episodes WHERE series_id = ?""",
+                (series_id,)
+            ) as cursor:
+                return {row[0]: tuple(row[1:]) for row in await cursor.fetchall()}
+
+    async def save_episode_media(self, episode_id: int, duration: float, tracks: List[MediaTrack],
+                                 content_hash: Optional[str] = None):
+        """Replace duration and tracks (and the content identity, if given) of an episode in one transaction."""
+        async with self._connect() as db:
+            await db.execute(
+                "UPDATE episodes SET duration = ?, content_hash = COALESCE(?, content_hash) WHERE id = ?",
+                (duration, content_hash, episode_id)
+            )
+            await db.execute("DELETE FROM media_tracks WHERE episode_id = ?", (episode_id,))
+            await db.executemany(
+                """INSERT INTO media_tracks
+                   (episode_id, stream_index, track_type, codec, language, title, sub_index)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                [(episode_id, t.index, t.type, t.codec, t.language, t.title, t.sub_index) for t in tracks]
+            )
+            await db.commit()
+
+    async def update_episode_hashes(self, hashes: List[tuple]):
+        """Store content identities given as (content_hash, episode_id) pairs."""
+        if not hashes:
+            return
+        async with self._connect() as db:
+            await db.executemany("UPDATE episodes SET content_hash = ? WHERE id = ?", hashes)
+            await db.commit()
+
+    async def get_episodes_by_hash(self, hashes: List[str]) -> List[Episode]:
+        return await self._get_episodes_where("content_hash", hashes)
+
+    async def get_episodes_by_ids(self, episode_ids: List[int]) -> List[Episode]:
+        return await self._get_episodes_where("id", episode_ids)
+
+    async def _get_episodes_where(self, column: str, values: list) -> List[Episode]:
+        episodes = []
+        async with self._connect() as db:
+            db.row_factory = aiosqlite.Row
+            for i in range(0, len(values), 500):
+                chunk = values[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                async with db.execute(f"SELECT * FROM episodes WHERE {column} IN ({placeholders})", chunk) as cursor:
+                    for row in await cursor.fetchall():
+                        episodes.append(Episode(
+                            id=row['id'],
+                            series_id=row['series_id'],
+                            filename=row['filename'],
+                            path=row['path'],
+                            title=row['title'],
+                            duration=row['duration'],
+                            size_bytes=row['size_bytes'],
+                            episode_number=row['episode_number'],
+                            season_number=row['season_number'],
+                            folder_name=row['folder_name'],
+                            content_hash=row['content_hash']
+                        ))
+        return episodes
+
+    async def merge_episode_into(self, keep_id: int, duplicate_id: int):
+        """
+        Relink a moved/renamed episode: `keep_id` (the old row, with its progress and title)
+        takes over the path and file metadata of `duplicate_id` (the row a scan created for
+        the new location), which is then deleted. Progress recorded only on the duplicate is kept.
+        If the duplicate was probed, its duration and tracks replace the old ones (a row matched
+        by name or episode number may hold a different release of the episode).
+        """
+        async with self._connect() as db:
+            await db.execute("PRAGMA foreign_keys = ON")
+            db.row_factory = aiosqlite.Row
+            async with db.execute("SELECT * FROM episodes WHERE id = ?", (duplicate_id,)) as cursor:
+                dup = await cursor.fetchone()
+            if not dup:
+                return
+            async with db.execute("SELECT COUNT(*) FROM watch_progress WHERE episode_id = ?", (keep_id,)) as cursor:
+                keep_has_progress = (await cursor.fetchone())[0] > 0
+            if not keep_has_progress:
+                await db.execute("UPDATE watch_progress SET episode_id = ? WHERE episode_id = ?", (keep_id, duplicate_id))
+            if (dup['duration'] or 0) > 0:
+                await db.execute("DELETE FROM media_tracks WHERE episode_id = ?", (keep_id,))
+                await db.execute("UPDATE media_tracks SET episode_id = ? WHERE episode_id = ?", (keep_id, duplicate_id))
+                await db.execute("UPDATE episodes SET duration = ? WHERE id = ?", (dup['duration'], keep_id))
+            await db.execute("DELETE FROM episodes WHERE id = ?", (duplicate_id,))
+            await db.execute(
+                """UPDATE episodes SET
+                   series_id = ?, path = ?, filename = ?, folder_name = ?, season_number = ?,
+                   episode_number = ?, size_bytes = ?, content_hash = COALESCE(?, content_hash),
+                   missing_since = NULL
+                   WHERE id = ?""",
+                (dup['series_id'], dup['path'], dup['filename'], dup['folder_name'], dup['season_number'],
+                 dup['episode_number'], dup['size_bytes'], dup['content_hash'], keep_id)
+            )
+            await db.commit()
+
+    async def drop_duplicate_episode(self, keep_id: Optional[int], duplicate_id: int):
+        """
+        Delete the row of a duplicate file that was removed from disk. Its progress moves to
+        keep_id (the episode of the copy that stays) unless that one has progress of its own.
+        """
+        async with self._connect() as db:
+            await db.execute("PRAGMA foreign_keys = ON")
+            if keep_id is not None:
+                async with db.execute("SELECT COUNT(*) FROM watch_progress WHERE episode_id = ?", (keep_id,)) as cursor:
+                    keep_has_progress = (await cursor.fetchone())[0] > 0
+                if not keep_has_progress:
+                    await db.execute("UPDATE watch_progress SET episode_id = ? WHERE episode_id = ?", (keep_id, duplicate_id))
+            await db.execute("DELETE FROM episodes WHERE id = ?", (duplicate_id,))
+            await db.commit()
+
+    async def prune_episodes(self, episode_ids: List[int], restore_ids: List[int] = (),
+                             grace_days: float = 0, removed_series_ids: List[int] = ()) -> dict:
+        """
+        Apply the scan's vanished/reappeared sets in one transaction.
+        With grace_days > 0 vanished episodes are only marked missing (keeping progress so a
+        remounted drive or a later move can restore them) and deleted once the grace period ran out.
+        Series left without episodes are removed. Returns what was pruned.
+        """
+        now = datetime.now()
+        report = {"marked_missing": 0, "restored": 0, "deleted": [], "deleted_series": []}
+        async with self._connect() as db:
+            await db.execute("PRAGMA foreign_keys = ON")
+            if restore_ids:
+                await db.executemany("UPDATE episodes SET missing_since = NULL WHERE id = ?", [(i,) for i in restore_ids])
+                report["restored"] = len(restore_ids)
+
+            to_delete = list(episode_ids)
+            if grace_days > 0:
+                cursor = await db.executemany(
+                    "UPDATE episodes SET missing_since = ? WHERE id = ? AND missing_since IS NULL",
+                    [(now, i) for i in episode_ids]
+                )
+                report["marked_missing"] = max(cursor.rowcount, 0)
+                cutoff = datetime.fromtimestamp(now.timestamp() - grace_days * 86400)
+                async with db.execute(
+                    "SELECT id FROM episodes WHERE missing_since IS NOT NULL AND missing_since < ?", (cutoff,)
+                ) as cursor:
+                    to_delete = [row[0] for row in await cursor.fetchall()]
+
+            affected_series = set(removed_series_ids)
+            for i in range(0, len(to_delete), 500):
+                chunk = to_delete[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                async with db.execute(
+                    f"SELECT series_id, path FROM episodes WHERE id IN ({placeholders})", chunk
+                ) as cursor:
+                    for series_id, path in await cursor.fetchall():
+                        affected_series.add(series_id)
+                        report["deleted"].append(path)
+                await db.execute(f"DELETE FROM episodes WHERE id IN ({placeholders})", chunk)
+
+            for series_id in affected_series:
+                async with db.execute(
+                    "SELECT path FROM series WHERE id = ? AND NOT EXISTS (SELECT 1 FROM episodes WHERE series_id = ?)",
+                    (series_id, series_id)
+                ) as cursor:
+                    row = await cursor.fetchone()
+                if row:
+                    await db.execute("DELETE FROM series WHERE id = ?", (series_id,))
+                    report["deleted_series"].append(row[0])
+            await db.commit()
+        return report
+
     async def update_episode_path(self, episode_id: int, new_path: str, new_filename: str, new_folder: Optional[str], new_season: Optional[int]):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute(
                 """UPDATE episodes SET 
                    path = ?, 
@@ -382,10 +711,11 @@ class DatabaseManager:
             )
             await db.commit()
 
-    async def get_all_episodes(self) -> List[Episode]:
-        async with aiosqlite.connect(self.db_path) as db:
+    async def get_all_episodes(self, include_missing: bool = False) -> List[Episode]:
+        query = "SELECT * FROM episodes" if include_missing else "SELECT * FROM episodes WHERE missing_since IS NULL"
+        async with self._connect() as db:
             db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM episodes") as cursor:
+            async with db.execute(query) as cursor:
                 rows = await cursor.fetchall()
                 return [Episode(
                     id=row['id'],
@@ -397,11 +727,12 @@ class DatabaseManager:
                     size_bytes=row['size_bytes'],
                     episode_number=row['episode_number'],
                     season_number=row['season_number'],
-                    folder_name=row['folder_name']
+                    folder_name=row['folder_name'],
+                    content_hash=row['content_hash']
                 ) for row in rows]
 
     async def update_episode_series(self, episode_id: int, new_series_id: int):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute(
                 "UPDATE episodes SET series_id = ? WHERE id = ?",
                 (new_series_id, episode_id)
@@ -409,9 +740,13 @@ class DatabaseManager:
             await db.commit()
 
     async def get_episodes_for_series(self, series_id: int) -> List[Episode]:
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM episodes WHERE series_id = ? ORDER BY season_number, episode_number, filename", (series_id,)) as cursor:
+            async with db.execute(
+                """SELECT * FROM episodes WHERE series_id = ? AND missing_since IS NULL
+                   ORDER BY season_number, episode_number, filename""",
+                (series_id,)
+            ) as cursor:
                 rows = await cursor.fetchall()
                 return [Episode(
                     id=row['id'],
@@ -423,11 +758,12 @@ class DatabaseManager:
                     size_bytes=row['size_bytes'],
                     episode_number=row['episode_number'],
                     season_number=row['season_number'],
-                    folder_name=row['folder_name']
+                    folder_name=row['folder_name'],
+                    content_hash=row['content_hash']
                 ) for row in rows]
 
     async def get_episode_by_id(self, episode_id: int) -> Optional[Episode]:
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             db.row_factory = aiosqlite.Row
             async with db.execute("SELECT * FROM episodes WHERE id = ?", (episode_id,)) as cursor:
                 row = await cursor.fetchone()
@@ -442,14 +778,155 @@ class DatabaseManager:
                         size_bytes=row['size_bytes'],
                         episode_number=row['episode_number'],
                         season_number=row['season_number'],
-                        folder_name=row['folder_name']
+                        folder_name=row['folder_name'],
+                        content_hash=row['content_hash']
                     )
                 return None
 
+    # Library Root Operations
+
+    def _row_to_library_root(self, row) -> LibraryRoot:
+        return LibraryRoot(
+            id=row['id'],
+            path=row['path'],
+            name=row['name'],
+            enabled=bool(row['enabled']),
+            scan_interval=row['scan_interval'] or 0,
+            scan_workers=row['scan_workers'],
+            probe_workers=row['probe_workers'],
+            nice=row['nice'] or 0,
+            io_class=row['io_class'] or "idle",
+            offline_timeout=row['offline_timeout'],
+            last_scan_at=datetime.fromisoformat(row['last_scan_at']) if isinstance(row['last_scan_at'], str) else row['last_scan_at'],
+            last_status=row['last_status']
+        )
+
+    async def add_library_root(self, root: LibraryRoot) -> int:
+        async with self._connect() as db:
+            await db.execute(
+                """INSERT OR IGNORE INTO library_roots
+                   (path, name, enabled, scan_interval, scan_workers, probe_workers, nice, io_class, offline_timeout)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (root.path, root.name, int(root.enabled), root.scan_interval, root.scan_workers,
+                 root.probe_workers, root.nice, root.io_class, root.offline_timeout)
+            )
+            await db.commit()
+            async with db.execute("SELECT id FROM library_roots WHERE path = ?", (root.path,)) as cursor:
+                return (await cursor.fetchone())[0]
+
+    async def get_library_roots(self, enabled_only: bool = False) -> List[LibraryRoot]:
+        query = "SELECT * FROM library_roots"
+        if enabled_only:
+            query += " WHERE enabled = 1"
+        async with self._connect() as db:
+            db.row_factory = aiosqlite.Row
+            async with db.execute(query + " ORDER BY id") as cursor:
+                return [self._row_to_library_root(row) for row in await cursor.fetchall()]
+
+    async def update_library_root(self, root: LibraryRoot):
+        async with self._connect() as db:
+            await db.execute(
+                """UPDATE library_roots SET
+                   path = ?, name = ?, enabled = ?, scan_interval = ?, scan_workers = ?, probe_workers = ?,
+                   nice = ?, io_class = ?, offline_timeout = ?
+                   WHERE id = ?""",
+                (root.path, root.name, int(root.enabled), root.scan_interval, root.scan_workers,
+                 root.probe_workers, root.nice, root.io_class, root.offline_timeout, root.id)
+            )
+            await db.commit()
+
+    async def record_library_root_scan(self, root_id: int, status: str):
+        async with self._connect() as db:
+            await db.execute(
+                "UPDATE library_roots SET last_scan_at = ?, last_status = ? WHERE id = ?",
+                (datetime.now(), status, root_id)
+            )
+            await db.commit()
+
+    async def remove_library_root(self, root_id: int):
+        """Forget a root. Its series stay in the library until pruned by hand."""
+        async with self._connect() as db:
+            await db.execute("DELETE FROM library_roots WHERE id = ?", (root_id,))
+            await db.commit()
+
+    # Scan Run Operations
+
+    async def add_scan_run(self, report: dict) -> int:
+        async with self._connect() as db:
+            cursor = await db.execute(
+                "INSERT INTO scan_runs (library_path, full_scan, status, started_at, duration, report_json) VALUES (?, ?, ?, ?, ?, ?)",
+                (report["library_path"], int(report.get("full_scan", False)), report.get("status"),
+                 report["started_at"], report["duration"], json.dumps(report))
+            )
+            await db.commit()
+            return cursor.lastrowid
+
+    async def get_scan_runs(self, library_path: Optional[str] = None, limit: int = 20) -> List[dict]:
+        """Most recent scan reports first, each with its row id added as "id"."""
+        query = "SELECT id, report_json FROM scan_runs"
+        params = []
+        if library_path:
+            query += " WHERE library_path = ?"
+            params.append(library_path)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        async with self._connect() as db:
+            async with db.execute(query, params) as cursor:
+                return [{"id": row[0], **json.loads(row[1])} for row in await cursor.fetchall()]
+
+    async def get_scan_run(self, run_id: int) -> Optional[dict]:
+        async with self._connect() as db:
+            async with db.execute("SELECT id, report_json FROM scan_runs WHERE id = ?", (run_id,)) as cursor:
+                row = await cursor.fetchone()
+                return {"id": row[0], **json.loads(row[1])} if row else None
+
+    # Scan Checkpoint Operations
+
+    async def get_scan_checkpoint(self, library_path: str) -> Optional[dict]:
+        async with self._connect() as db:
+            db.row_factory = aiosqlite.Row
+            async with db.execute("SELECT * FROM scan_checkpoints WHERE library_path = ?", (library_path,)) as cursor:
+                row = await cursor.fetchone()
+            if not row:
+                return None
+            async with db.execute("SELECT series_path FROM scan_checkpoint_items WHERE library_path = ?", (library_path,)) as cursor:
+                completed = {r[0] for r in await cursor.fetchall()}
+            return {
+                "library_path": row["library_path"],
+                "full_scan": bool(row["full_scan"]),
+                "started_at": datetime.fromisoformat(row["started_at"]) if isinstance(row["started_at"], str) else row["started_at"],
+                "completed": completed
+            }
+
+    async def start_scan_checkpoint(self, library_path: str, full_scan: bool = True):
+        """Begin a fresh checkpoint, dropping any previous progress for this library."""
+        async with self._connect() as db:
+            await db.execute("DELETE FROM scan_checkpoint_items WHERE library_path = ?", (library_path,))
+            await db.execute(
+                "INSERT OR REPLACE INTO scan_checkpoints (library_path, full_scan, started_at, updated_at) VALUES (?, ?, ?, ?)",
+                (library_path, int(full_scan), datetime.now(), datetime.now())
+            )
+            await db.commit()
+
+    async def add_scan_checkpoint_item(self, library_path: str, series_path: str):
+        async with self._connect() as db:
+            await db.execute(
+                "INSERT OR IGNORE INTO scan_checkpoint_items (library_path, series_path) VALUES (?, ?)",
+                (library_path, series_path)
+            )
+            await db.execute("UPDATE scan_checkpoints SET updated_at = ? WHERE library_path = ?", (datetime.now(), library_path))
+            await db.commit()
+
+    async def clear_scan_checkpoint(self, library_path: str):
+        async with self._connect() as db:
+            await db.execute("DELETE FROM scan_checkpoint_items WHERE library_path = ?", (library_path,))
+            await db.execute("DELETE FROM scan_checkpoints WHERE library_path = ?", (library_path,))
+            await db.commit()
+
     # Media Track Operations
 
     async def add_media_track(self, track: MediaTrack):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute(
                 """INSERT INTO media_tracks 
                    (episode_id, stream_index, track_type, codec, language, title, sub_index)
@@ -459,7 +936,7 @@ class DatabaseManager:
             await db.commit()
 
     async def update_media_track(self, track: MediaTrack):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute(
                 """UPDATE media_tracks SET 
                    stream_index = ?, 
@@ -474,12 +951,12 @@ class DatabaseManager:
             await db.commit()
 
     async def clear_episode_tracks(self, episode_id: int):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute("DELETE FROM media_tracks WHERE episode_id = ?", (episode_id,))
             await db.commit()
 
     async def get_tracks_for_episode(self, episode_id: int) -> List[MediaTrack]:
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             db.row_factory = aiosqlite.Row
             async with db.execute("SELECT * FROM media_tracks WHERE episode_id = ?", (episode_id,)) as cursor:
                 rows = await cursor.fetchall()
@@ -495,7 +972,7 @@ class DatabaseManager:
                 ) for row in rows]
 
     async def get_all_media_tracks(self) -> List[MediaTrack]:
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             db.row_factory = aiosqlite.Row
             async with db.execute("SELECT * FROM media_tracks") as cursor:
                 rows = await cursor.fetchall()
@@ -511,19 +988,19 @@ class DatabaseManager:
                 ) for row in rows]
 
     async def update_episode_duration(self, episode_id: int, duration: float):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute("UPDATE episodes SET duration = ? WHERE id = ?", (duration, episode_id))
             await db.commit()
 
     async def update_episode_size(self, episode_id: int, size_bytes: int):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute("UPDATE episodes SET size_bytes = ? WHERE id = ?", (size_bytes, episode_id))
             await db.commit()
 
     # Progress Operations
 
     async def update_progress(self, progress: WatchProgress):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute(
                 """INSERT INTO watch_progress (episode_id, timestamp, last_watched, completed)
                    VALUES (?, ?, ?, ?)
@@ -536,7 +1013,7 @@ class DatabaseManager:
             await db.commit()
 
     async def get_progress(self, episode_id: int) -> Optional[WatchProgress]:
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             db.row_factory = aiosqlite.Row
             async with db.execute("SELECT * FROM watch_progress WHERE episode_id = ?", (episode_id,)) as cursor:
                 row = await cursor.fetchone()
@@ -551,7 +1028,7 @@ class DatabaseManager:
                 return None
 
     async def get_all_progress(self) -> List[WatchProgress]:
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             db.row_factory = aiosqlite.Row
             async with db.execute("SELECT * FROM watch_progress ORDER BY last_watched DESC") as cursor:
                 rows = await cursor.fetchall()
@@ -564,7 +1041,7 @@ class DatabaseManager:
                 ) for row in rows]
 
     async def mark_episode_watched(self, episode_id: int, watched: bool):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             if watched:
                 # Mark as completed (100% timestamp)
                 await db.execute(
@@ -582,7 +1059,7 @@ class DatabaseManager:
             await db.commit()
 
     async def mark_series_watched(self, series_id: int, watched: bool):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             if watched:
                 # Mark all episodes as completed
                 await db.execute(
@@ -604,7 +1081,7 @@ class DatabaseManager:
     # Online Progress Operations
 
     async def update_online_progress(self, progress: OnlineProgress):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute(
                 """INSERT INTO online_progress (show_id, show_name, episode_number, timestamp, thumbnail_url, local_path, completed, allmanga_id, nyaa_query)
                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
@@ -621,7 +1098,7 @@ class DatabaseManager:
             await db.commit()
 
     async def get_online_progress_for_show(self, show_id: str) -> List[OnlineProgress]:
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             db.row_factory = aiosqlite.Row
             async with db.execute("SELECT * FROM online_progress WHERE show_id = ?", (show_id,)) as cursor:
                 rows = await cursor.fetchall()
@@ -640,7 +1117,7 @@ class DatabaseManager:
                 ) for row in rows]
 
     async def get_all_online_progress(self) -> List[OnlineProgress]:
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             db.row_factory = aiosqlite.Row
             async with db.execute("SELECT * FROM online_progress ORDER BY last_watched DESC") as cursor:
                 rows = await cursor.fetchall()
@@ -659,7 +1136,7 @@ class DatabaseManager:
                 ) for row in rows]
 
     async def get_recent_online_shows(self, limit: int = 20) -> List[dict]:
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             db.row_factory = aiosqlite.Row
             # Get unique show_id/show_name pairs ordered by most recent last_watched
             # Using GROUP BY and MAX(last_watched)
@@ -673,8 +1150,12 @@ class DatabaseManager:
             async with db.execute(query, (limit,)) as cursor:
                 rows = await cursor.fetchall()
                 return [{"show_id": r["show_id"], "show_name": r["show_name"], "thumbnail_url": r["thumbnail_url"], "allmanga_id": r["allmanga_id"], "nyaa_query": r["nyaa_query"]} for r in rows]
-    async def get_downloaded_online_shows(self) -> List[dict]:
-        async with aiosqlite.connect(self.db_path) as db:
+    async def get_downloaded_online_shows(self, folders: Optional[Iterable[str]] = None) -> List[dict]:
+        """
+        Online shows with a downloaded episode or a download folder. `folders` are the names
+        of the folders in DOWNLOADS_PATH (DownloadsIndex.folder_names()); listed once if not given.
+        """
+        async with self._connect() as db:
             db.row_factory = aiosqlite.Row
             query = """
                 SELECT show_id, show_name, thumbnail_url, MAX(allmanga_id) as allmanga_id, MAX(nyaa_query) as nyaa_query, MAX(local_path) as local_path
@@ -685,48 +1166,35 @@ class DatabaseManager:
             async with db.execute(query) as cursor:
                 rows = await cursor.fetchall()
 
-            results = []
-            from ..config import DOWNLOADS_PATH
-            import os
-
-            for r in rows:
-                show_id = r["show_id"]
-                local_path = r["local_path"]
-                has_local = bool(local_path and os.path.exists(local_path))
-
-                if not has_local:
-                    # Accept show as downloaded if folder exists by canonical naming
-                    candidate_dir = os.path.join(DOWNLOADS_PATH, show_id)
-                    if os.path.isdir(candidate_dir):
-                        has_local = True
-                    elif show_id.startswith("allanime-"):
-                        # Already canonical for allanime
-                        has_local = os.path.isdir(candidate_dir)
-                    elif show_id.startswith("nyaa-"):
-                        # Nyaa flexible folder style may include brackets
-                        if os.path.exists(DOWNLOADS_PATH):
-                            for d in os.listdir(DOWNLOADS_PATH):
-                                if d.endswith(f"[{show_id}]") or d == show_id:
-                                    has_local = True
-                                    break
-
-                if not has_local:
-                    continue
+        if folders is None:
+            try:
+                with os.scandir(DOWNLOADS_PATH) as it:
+                    folders = [e.name for e in it if e.is_dir()]
+            except OSError:
+                folders = []
+        # Canonical names, plus the "Title [nyaa-id]" folders of older versions
+        known = set(folders)
+        known.update(m.group(1) for m in (re.search(r"\[(nyaa-[^\]]+)\]$", f) for f in folders) if m)
 
-                results.append({
-                    "show_id": show_id,
-                    "show_name": r["show_name"],
-                    "thumbnail_url": r["thumbnail_url"],
-                    "allmanga_id": r["allmanga_id"],
-                    "nyaa_query": r["nyaa_query"]
-                })
-
-            return results
+        results = []
+        for r in rows:
+            show_id = r["show_id"]
+            local_path = r["local_path"]
+            if show_id not in known and not (local_path and os.path.exists(local_path)):
+                continue
+            results.append({
+                "show_id": show_id,
+                "show_name": r["show_name"],
+                "thumbnail_url": r["thumbnail_url"],
+                "allmanga_id": r["allmanga_id"],
+                "nyaa_query": r["nyaa_query"]
+            })
+        return results
 
     async def migrate_online_show(self, old_id: str, new_id: str, show_name: str, allmanga_id: str = None):
         """Migrates online progress entries from an old ID to a new canonical ID."""
         logger.info(f"Database: Migrating online progress {old_id} -> {new_id} ({show_name})")
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             # To avoid unique constraint conflicts, delete duplicates from old_id side
             await db.execute("""
                 DELETE FROM online_progress 
@@ -778,23 +1246,46 @@ class DatabaseManager:
     # Download Task Operations
 
     async def update_download_task(self, task: DownloadTaskState):
-        async with aiosqlite.connect(self.db_path) as db:
+        """Insert or update a task row. Outcome writes pass url="" and keep the task's url, referrer and metadata."""
+        async with self._connect() as db:
             await db.execute(
-                """INSERT INTO download_tasks (filename, url, status, progress, speed, eta, elapsed, referrer, metadata_json, last_updated)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """INSERT INTO download_tasks (filename, url, status, progress, speed, eta, elapsed, referrer, metadata_json, last_updated, resume_json, priority, check_json)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                    ON CONFLICT(filename) DO UPDATE SET
+                   url = CASE WHEN excluded.url != '' THEN excluded.url ELSE download_tasks.url END,
+                   referrer = CASE WHEN excluded.url != '' THEN excluded.referrer ELSE download_tasks.referrer END,
+                   metadata_json = CASE WHEN excluded.url != '' THEN excluded.metadata_json ELSE download_tasks.metadata_json END,
                    status = excluded.status,
                    progress = excluded.progress,
                    speed = excluded.speed,
                    eta = excluded.eta,
                    elapsed = excluded.elapsed,
-                   last_updated = excluded.last_updated""",
-                (task.filename, task.url, task.status, task.progress, task.speed, task.eta, task.elapsed, task.referrer, task.metadata_json, datetime.now())
+                   last_updated = excluded.last_updated,
+                   resume_json = excluded.resume_json,
+                   priority = excluded.priority,
+                   check_json = excluded.check_json""",
+                (task.filename, task.url, task.status, task.progress, task.speed, task.eta, task.elapsed, task.referrer, task.metadata_json, datetime.now(), task.resume_json, task.priority, task.check_json)
+            )
+            await db.commit()
+
+    async def save_download_progress(self, rows: List[tuple]):
+        """
+        Progress of the running downloads, in one transaction. Rows are (filename,
+        progress, speed, eta, elapsed, resume_json), resume_json being where a
+        download can pick up again after a restart.
+        """
+        now = datetime.now()
+        async with self._connect() as db:
+            await db.executemany(
+                "UPDATE download_tasks SET progress = ?, speed = ?, eta = ?, elapsed = ?, resume_json = ?, "
+                "last_updated = ? WHERE filename = ?",
+                [(progress, speed, eta, elapsed, resume_json, now, filename)
+                 for filename, progress, speed, eta, elapsed, resume_json in rows]
             )
             await db.commit()
 
     async def get_all_download_tasks(self) -> List[DownloadTaskState]:
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             db.row_factory = aiosqlite.Row
             async with db.execute("SELECT * FROM download_tasks ORDER BY last_updated DESC") as cursor:
                 rows = await cursor.fetchall()
@@ -809,23 +1300,26 @@ class DatabaseManager:
                     elapsed=row['elapsed'],
                     referrer=row['referrer'],
                     metadata_json=row['metadata_json'],
-                    last_updated=datetime.fromisoformat(row['last_updated']) if isinstance(row['last_updated'], str) else row['last_updated']
+                    last_updated=datetime.fromisoformat(row['last_updated']) if isinstance(row['last_updated'], str) else row['last_updated'],
+                    resume_json=row['resume_json'] or '{}',
+                    priority=row['priority'] or 0,
+                    check_json=row['check_json'] or '{}'
                 ) for row in rows]
 
     async def remove_download_task(self, filename: str):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute("DELETE FROM download_tasks WHERE filename = ?", (filename,))
             await db.commit()
 
     async def clear_download_history(self):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute("DELETE FROM download_tasks WHERE status IN ('Finished', 'Failed', 'Cancelled')")
             await db.commit()
 
     # Planner Operations
 
     async def add_planner_entry(self, entry: PlannerEntry) -> int:
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             genres_text = json.dumps(entry.genres or [])
             cursor = await db.execute(
                 "INSERT INTO planner (show_id, show_name, status, notes, anilist_id, cover_url, display_title, genres, description, episodes, average_score, next_episode, next_episode_airing, last_synced) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
@@ -850,7 +1344,7 @@ class DatabaseManager:
             return cursor.lastrowid
 
     async def update_planner_entry(self, entry: PlannerEntry):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             genres_text = json.dumps(entry.genres or [])
             await db.execute(
                 """UPDATE planner SET 
@@ -881,7 +1375,7 @@ class DatabaseManager:
             await db.commit()
 
     async def get_all_planner_entries(self) -> List[PlannerEntry]:
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             db.row_factory = aiosqlite.Row
             async with db.execute("SELECT * FROM planner ORDER BY date_added DESC") as cursor:
                 rows = await cursor.fetchall()
@@ -924,7 +1418,7 @@ class DatabaseManager:
                 return results
 
     async def update_planner_entry(self, entry: PlannerEntry):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             genres_text = json.dumps(entry.genres or [])
             await db.execute(
                 "UPDATE planner SET show_id = ?, show_name = ?, status = ?, notes = ?, anilist_id = ?, cover_url = ?, display_title = ?, genres = ?, description = ?, episodes = ?, average_score = ?, next_episode = ?, next_episode_airing = ?, last_synced = ? WHERE id = ?",
@@ -949,6 +1443,6 @@ class DatabaseManager:
             await db.commit()
 
     async def remove_planner_entry(self, entry_id: int):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute("DELETE FROM planner WHERE id = ?", (entry_id,))
             await db.commit()
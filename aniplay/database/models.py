@@ -28,6 +28,21 @@ class Series:
     size_bytes: int = 0
     date_added: datetime = field(default_factory=datetime.now)
 
+@dataclass
+class LibraryRoot:
+    path: str
+    id: Optional[int] = None
+    name: Optional[str] = None
+    enabled: bool = True
+    scan_interval: int = 0  # minutes between background scans, 0 = manual only
+    scan_workers: Optional[int] = None  # None = SCAN_WORKERS
+    probe_workers: Optional[int] = None  # None = PROBE_WORKERS
+    nice: int = 0  # added to the CPU niceness of scan threads (and the ffprobe they start)
+    io_class: str = "idle"  # "idle", "best-effort" or "normal", see core/scan_scheduler.py
+    offline_timeout: float = 10.0  # seconds the root may take to answer before it counts as offline
+    last_scan_at: Optional[datetime] = None
+    last_status: Optional[str] = None  # ok, offline, cancelled, failed
+
 @dataclass
 class MediaTrack:
     episode_id: int
@@ -52,6 +67,7 @@ class Episode:
     episode_number: Optional[int] = None
     season_number: Optional[int] = None
     folder_name: Optional[str] = None
+    content_hash: Optional[str] = None  # size + head/tail digest, see utils/file_identity.py
     tracks: List[MediaTrack] = field(default_factory=list)
 
 @dataclass
@@ -89,6 +105,9 @@ class DownloadTaskState:
     metadata_json: str = "{}"
     last_updated: datetime = field(default_factory=datetime.now)
     id: Optional[int] = None
+    resume_json: str = "{}"  # backend checkpoint of an unfinished download
+    priority: int = 0  # higher starts first
+    check_json: str = "{}"  # DownloadCheck of a finished download
 
 @dataclass
 class PlannerEntry:
@@ -277,8 +277,8 @@ class DatabaseBrowser(QDialog):
         
         # Fetch data for all tables
         data_futures = [
-            self.db.get_all_series(),
-            self.db.get_all_episodes(),
+            self.db.get_all_series(include_missing=True),
+            self.db.get_all_episodes(include_missing=True),
             self.db.get_all_progress(),
             self.db.get_all_media_tracks(),
             self.db.get_all_online_progress(),
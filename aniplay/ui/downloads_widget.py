@@ -22,6 +22,7 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtCore import Qt, pyqtSignal
 import qasync
 import asyncio
+from ..utils.format_utils import format_time
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -30,6 +31,8 @@ class DownloadItemWidget(QFrame):
     cancel_requested = pyqtSignal(str) # filename
     remove_requested = pyqtSignal(str) # filename
     start_requested = pyqtSignal(str) # filename
+    pause_requested = pyqtSignal(str) # filename
+    resume_requested = pyqtSignal(str) # filename
 
     def __init__(self, filename, state):
         super().__init__()
@@ -133,8 +136,18 @@ class DownloadItemWidget(QFrame):
         self.start_btn.clicked.connect(lambda: self.start_requested.emit(self.filename))
         self.start_btn.hide()
 
+        self.pause_btn = QPushButton("⏸ Pause")
+        self.pause_btn.clicked.connect(lambda: self.pause_requested.emit(self.filename))
+        self.pause_btn.hide()
+
+        self.resume_btn = QPushButton("▶ Resume")
+        self.resume_btn.clicked.connect(lambda: self.resume_requested.emit(self.filename))
+        self.resume_btn.hide()
+
         self.actions_layout.addWidget(self.folder_btn)
         self.actions_layout.addWidget(self.start_btn)
+        self.actions_layout.addWidget(self.pause_btn)
+        self.actions_layout.addWidget(self.resume_btn)
         self.actions_layout.addWidget(self.cancel_btn)
         self.actions_layout.addWidget(self.remove_btn)
 
@@ -153,6 +166,9 @@ class DownloadItemWidget(QFrame):
         eta = state.get("eta", "-")
         elapsed = state.get("elapsed", "-")
         
+        self.pause_btn.setVisible(self.status in ("Downloading", "Queued"))
+        self.resume_btn.setVisible(self.status == "Paused")
+
         if self.status == "Downloading":
             self.info_label.setText(f"{progress:.1f}% • {speed} • ETA: {eta} • Elapsed: {elapsed}")
             self.cancel_btn.show()
@@ -166,8 +182,30 @@ class DownloadItemWidget(QFrame):
             self.remove_btn.hide()
             self.folder_btn.hide()
             self.status_label.setStyleSheet("color: #ff9800;")
+        elif self.status == "Paused":
+            self.info_label.setText(f"Paused at {progress:.1f}%")
+            self.cancel_btn.show()
+            self.start_btn.hide()
+            self.remove_btn.hide()
+            self.folder_btn.hide()
+            self.status_label.setStyleSheet("color: #9e9e9e;")
+        elif self.status == "Processing":
+            self.info_label.setText("Checking the downloaded file...")
+            self.cancel_btn.hide()
+            self.start_btn.hide()
+            self.remove_btn.hide()
+            self.folder_btn.hide()
+            self.status_label.setStyleSheet("color: #2196f3;")
         elif self.status == "Finished":
-            self.info_label.setText("Download complete.")
+            check = state.get("check") or {}
+            if check.get("duration"):
+                tracks = check.get("tracks", [])
+                audio = sum(1 for t in tracks if t["type"] == "audio")
+                subs = sum(1 for t in tracks if t["type"] == "subtitle")
+                self.info_label.setText(f"Download complete. {format_time(check['duration'])}, "
+                                        f"{audio} audio, {subs} subtitle tracks.")
+            else:
+                self.info_label.setText("Download complete.")
             self.cancel_btn.hide()
             self.start_btn.hide()
             self.remove_btn.show()
@@ -197,7 +235,7 @@ class DownloadsWidget(QWidget):
         self.setup_ui()
         
         # Connect signals
-        self.download_manager.task_progress.connect(self.on_task_progress)
+        self.download_manager.progress_batch.connect(self.on_progress_batch)
         self.download_manager.task_finished.connect(self.on_task_finished)
         self.download_manager.queue_updated.connect(self.refresh_all)
         
@@ -284,16 +322,23 @@ class DownloadsWidget(QWidget):
         item.cancel_requested.connect(self.cancel_download)
         item.remove_requested.connect(self.remove_item)
         item.start_requested.connect(self.start_task)
+        item.pause_requested.connect(self.download_manager.pause_download)
+        item.resume_requested.connect(self.download_manager.resume_download)
         self.items[filename] = item
         self.container_layout.addWidget(item)
 
-    def on_task_progress(self, filename, progress, speed, eta, elapsed):
-        if filename in self.items:
-            state = self.download_manager.task_states.get(filename, {})
-            self.items[filename].update_state(state)
-        else:
+    def on_progress_batch(self, batch):
+        """All running downloads that changed since the last tick, repainted once."""
+        if any(filename not in self.items for filename in batch):
             # Should not usually happen if refresh_all is called on queue_updated
             self.refresh_all()
+            return
+        self.container.setUpdatesEnabled(False)
+        try:
+            for filename in batch:
+                self.items[filename].update_state(self.download_manager.task_states.get(filename, {}))
+        finally:
+            self.container.setUpdatesEnabled(True)
 
     def on_task_finished(self, filename, success, message, metadata):
         if filename in self.items:
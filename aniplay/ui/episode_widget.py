@@ -19,6 +19,9 @@ from PyQt6.QtCore import pyqtSignal, Qt, QSize
 from .selection_info_widget import SelectionInfoWidget
 from ..database.models import Episode, WatchProgress
 from ..utils.format_utils import format_size, format_time
+from ..core.preview_generator import thumbnail_for
+from ..config import PREVIEWS
+from .thumbnail_service import ThumbnailService
 
 class EpisodeItem(QFrame):
     play_clicked = pyqtSignal(Episode)
@@ -44,6 +47,21 @@ class EpisodeItem(QFrame):
         self.main_layout = QHBoxLayout(self)
         self.main_layout.setContentsMargins(20, 15, 20, 15)
         self.main_layout.setSpacing(10)
+
+        # Episode frame from the preview job (placeholder until it has run)
+        if PREVIEWS:
+            self.main_layout.setContentsMargins(12, 10, 20, 10)
+            self.preview_label = QLabel()
+            self.preview_label.setFixedSize(112, 63)
+            self.preview_label.setStyleSheet("background-color: #111; border-radius: 6px;")
+            self.main_layout.addWidget(self.preview_label)
+            thumb = thumbnail_for(episode.content_hash)
+            pixmap = ThumbnailService.instance().request(
+                str(thumb) if thumb else None, 112, 63, 6, self.devicePixelRatioF(),
+                callback=self.preview_label.setPixmap
+            )
+            if pixmap is not None:
+                self.preview_label.setPixmap(pixmap)
         
         # Info Container (Title + Progress)
         self.info_container = QWidget()
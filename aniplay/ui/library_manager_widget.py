@@ -20,9 +20,10 @@ from ..utils.logger import get_logger
 logger = get_logger(__name__)
 
 class LibraryManagerWidget(QWidget):
-    def __init__(self, db_manager, parent=None):
+    def __init__(self, db_manager, download_manager=None, parent=None):
         super().__init__(parent)
         self.db = db_manager
+        self.download_manager = download_manager
         self.setup_ui()
         
     def setup_ui(self):
@@ -61,6 +62,8 @@ class LibraryManagerWidget(QWidget):
         self.model = QFileSystemModel()
         self.model.setRootPath(str(DOWNLOADS_PATH))
         self.model.setReadOnly(False)
+        self.model.fileRenamed.connect(
+            lambda path, old, new: self.refresh_downloads_index([os.path.join(path, old), os.path.join(path, new)]))
         
         # Tree View
         self.tree = QTreeView()
@@ -88,9 +91,14 @@ class LibraryManagerWidget(QWidget):
 
         self.import_btn = QPushButton("📥 Import Downloads")
         self.import_btn.clicked.connect(self.import_downloaded_shows)
+
+        self.duplicates_btn = QPushButton("🧬 Find Duplicates")
+        self.duplicates_btn.setToolTip("Find identical videos in the library and downloads, then hardlink or delete the extra copies")
+        self.duplicates_btn.clicked.connect(self.find_duplicates)
         
         self.bottom_layout.addWidget(self.refresh_btn)
         self.bottom_layout.addStretch()
+        self.bottom_layout.addWidget(self.duplicates_btn)
         self.bottom_layout.addWidget(self.import_btn)
         self.bottom_layout.addWidget(self.relink_btn)
         
@@ -99,6 +107,11 @@ class LibraryManagerWidget(QWidget):
     def refresh_view(self):
         self.tree.setRootIndex(self.model.index(str(DOWNLOADS_PATH)))
 
+    def refresh_downloads_index(self, paths):
+        """Re-index download folders changed here; the filesystem watcher is off by default."""
+        if self.download_manager and paths:
+            asyncio.ensure_future(asyncio.to_thread(self.download_manager.index.refresh, list(paths)))
+
     def copy_hash(self, provider):
         name = self.name_input.text().strip()
         if not name:
@@ -188,6 +201,7 @@ class LibraryManagerWidget(QWidget):
                 except Exception as e:
                     logger.error(f"Failed to delete {p}: {e}")
             self.refresh_view()
+            self.refresh_downloads_index(paths)
 
     @qasync.asyncSlot()
     async def relink_folder(self):
@@ -246,16 +260,71 @@ class LibraryManagerWidget(QWidget):
                 QMessageBox.information(self, "Success", f"Folder {folder_name} relinked to {show_name} ({show_id})")
 
             self.refresh_view()
+            self.refresh_downloads_index([folder_path, new_folder_path])
             parent_window = getattr(self, 'main_window', None) or self.parent()
             if parent_window and hasattr(parent_window, 'online_widget'):
                 asyncio.create_task(parent_window.online_widget.load_recent())
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Relink failed: {e}")
 
+    @qasync.asyncSlot()
+    async def find_duplicates(self):
+        from ..core.library_manager import LibraryManager
+        from ..utils.duplicate_finder import DuplicateFinder
+        from ..utils.format_utils import format_size
+
+        self.duplicates_btn.setEnabled(False)
+        self.duplicates_btn.setText("🧬 Searching...")
+        try:
+            roots = await LibraryManager(self.db).get_library_roots(enabled_only=True)
+            finder = DuplicateFinder(self.db)
+            groups = await finder.find([r.path for r in roots] + [str(DOWNLOADS_PATH)])
+            if not groups:
+                QMessageBox.information(self, "Duplicates", "No duplicate videos found.")
+                return
+
+            reclaimable = sum(g.reclaimable for g in groups)
+            details = "\n\n".join(
+                "\n".join(("KEEP  " if p == g.keep else "      ") + p for p in g.paths) for g in groups
+            )
+            box = QMessageBox(self)
+            box.setWindowTitle("Duplicates")
+            box.setIcon(QMessageBox.Icon.Question)
+            box.setText(f"Found {len(groups)} files with identical copies ({format_size(reclaimable)} reclaimable).")
+            box.setInformativeText("The copy with watch progress is kept. Hardlinks keep every path working "
+                                   "and only need the copies to be on the same drive.")
+            box.setDetailedText(details)
+            hardlink_btn = box.addButton("Hardlink", QMessageBox.ButtonRole.AcceptRole)
+            delete_btn = box.addButton("Delete Copies", QMessageBox.ButtonRole.DestructiveRole)
+            box.addButton(QMessageBox.StandardButton.Cancel)
+            box.exec()
+            mode = {hardlink_btn: "hardlink", delete_btn: "delete"}.get(box.clickedButton())
+            if mode is None:
+                return
+
+            reclaimed, failed = 0, []
+            for group in groups:
+                results = await finder.resolve(group, mode, dry_run=False)
+                reclaimed += results["reclaimed"]
+                failed += results["failed"]
+            message = f"Reclaimed {format_size(reclaimed)}."
+            if failed:
+                message += f"\n{len(failed)} files failed:\n" + "\n".join(f"{f['path']}: {f['error']}" for f in failed[:10])
+            QMessageBox.information(self, "Duplicates", message)
+            self.refresh_view()
+            if mode == "delete":
+                self.refresh_downloads_index([p for g in groups for p in g.paths])
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Duplicate search failed: {e}")
+        finally:
+            self.duplicates_btn.setEnabled(True)
+            self.duplicates_btn.setText("🧬 Find Duplicates")
+
     @qasync.asyncSlot()
     async def import_downloaded_shows(self):
         from ..database.models import OnlineProgress
         from ..config import VIDEO_EXTENSIONS
+        from ..utils.release_parser import parse_release
 
         if not self.db:
             QMessageBox.warning(self, "Error", "No database connection available.")
@@ -264,35 +333,6 @@ class LibraryManagerWidget(QWidget):
         existing = await self.db.get_downloaded_online_shows()
         existing_ids = {item['show_id'] for item in existing}
 
-        def extract_episode_number(filename: str):
-            patterns = [
-                r'[Ss](\d{1,2})[Ee](\d{1,3})',
-                r'[Ee]pisode[\s._-]?(\d{1,3})',
-                r'[Ee]p[\s._-]?(\d{1,3})',
-                r'\b(\d{1,3})\b'
-            ]
-            for pat in patterns:
-                match = re.search(pat, filename)
-                if match:
-                    try:
-                        return int(match.group(2) if len(match.groups()) > 1 else match.group(1))
-                    except Exception:
-                        continue
-            return 0
-
-        def extract_show_name_from_filename(path: str):
-            name = os.path.basename(path)
-            patterns = [
-                r'^(?P<name>.+?)\s*[-_]\s*[Ss]\d{1,2}[Ee]\d{1,3}',
-                r'^(?P<name>.+?)\s*[-_]\s*[Ee]p\d{1,3}',
-                r'^(?P<name>.+?)\s*[-_]\s*\d{1,3}',
-            ]
-            for pat in patterns:
-                m = re.search(pat, name, re.IGNORECASE)
-                if m and m.group('name').strip():
-                    return m.group('name').strip()
-            return None
-
         imported_shows = 0
         imported_episodes = 0
 
@@ -338,7 +378,7 @@ class LibraryManagerWidget(QWidget):
                 continue
 
             if not show_name or show_name in (show_id, f"{show_id}"):
-                extracted_name = extract_show_name_from_filename(candidate_files[0])
+                extracted_name = parse_release(os.path.basename(candidate_files[0])).title
                 if extracted_name:
                     show_name = extracted_name
 
@@ -363,7 +403,7 @@ class LibraryManagerWidget(QWidget):
             for fpath in candidate_files:
                 f = os.path.basename(fpath)
                 found_video = True
-                ep_num = extract_episode_number(f) or 0
+                ep_num = parse_release(f).episode or 0
 
                 progress = OnlineProgress(
                     show_id=show_id,
@@ -15,6 +15,7 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import ctypes
+import json
 import os
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QSplitter, QVBoxLayout, QHBoxLayout, 
@@ -38,9 +39,15 @@ from ..database.db import DatabaseManager
 from ..database.models import WatchProgress
 from ..core.library_manager import LibraryManager
 from ..core.discord_manager import DiscordManager
+from ..core.library_watcher import LibraryWatcher
+from ..core.scan_pipeline import CancelToken, ScanCancelled
+from ..core.scan_scheduler import ScanScheduler
+from ..core.scan_profiler import format_report
+from ..core.preview_generator import PreviewGenerator, ffmpeg_available, load_previews
 from .database_browser import DatabaseBrowser
-from ..config import PREFERRED_PLAYER
+from ..config import PREFERRED_PLAYER, DOWNLOADS_PATH, LIBRARY_WATCHER, WATCHER_DEBOUNCE, PREVIEWS
 from ..utils.logger import get_logger
+from ..utils.format_utils import format_time, format_size
 
 logger = get_logger(__name__)
 
@@ -59,7 +66,7 @@ class MainWindow(QMainWindow):
         self.discord = DiscordManager()
         
         # Connect Download Signals
-        self.download_manager.task_progress.connect(self.on_download_progress)
+        self.download_manager.progress_batch.connect(self.on_download_progress)
         self.download_manager.task_finished.connect(self.on_download_finished)
         self.download_manager.queue_updated.connect(self.on_queue_updated)
 
@@ -68,6 +75,19 @@ class MainWindow(QMainWindow):
         self.current_online_show = None # {id, name, thumbnail}
         self.current_online_episode = None # number
 
+        # Owns per-root locks shared by manual syncs, background and watcher-triggered scans.
+        # Background scans are not started while something is playing.
+        self._playback_active = False
+        self.scan_scheduler = ScanScheduler(self.library, progress_callback=self.on_background_scan_progress,
+                                            on_finished=self.on_root_scanned, busy=lambda: self._playback_active)
+        self._scan_token = None
+        self.roots = []
+        # Episode preview job: one at a time, re-run once if new episodes arrive meanwhile
+        self._preview_task = None
+        self._preview_token = None
+        self._previews_dirty = False
+        self.watcher = None
+
         self.setup_ui()
         logger.info("MainWindow initialized")
 
@@ -112,6 +132,11 @@ class MainWindow(QMainWindow):
         scan_menu.addAction("Full Re-scan (Overwrite Titles)", lambda: self.run_scan(full_scan=True))
         self.scan_btn.setMenu(scan_menu)
         self.scan_btn.clicked.connect(lambda: self.run_scan(full_scan=False))
+
+        self.cancel_scan_btn = QPushButton("✖ Cancel Scan")
+        self.cancel_scan_btn.setFixedHeight(40)
+        self.cancel_scan_btn.clicked.connect(self.cancel_scan)
+        self.cancel_scan_btn.hide()
         
         self.mount_btn = QPushButton("🔒 Mount Drive")
         self.mount_btn.setFixedHeight(40)
@@ -144,6 +169,7 @@ class MainWindow(QMainWindow):
         """)
         
         self.top_bar.addWidget(self.scan_btn)
+        self.top_bar.addWidget(self.cancel_scan_btn)
         self.top_bar.addSpacing(10)
         
         self.meta_btn = QPushButton("🗄️ Database")
@@ -317,7 +343,7 @@ class MainWindow(QMainWindow):
         
         self.online_widget = OnlineSearchWidget(self.player_widget, self.db, self, self.download_manager)
         self.downloads_widget = DownloadsWidget(self.download_manager)
-        self.library_manager_widget = LibraryManagerWidget(self.db)
+        self.library_manager_widget = LibraryManagerWidget(self.db, self.download_manager)
         
         self.tabs.addTab(self.library_splitter, "📁 Local Library")
         self.tabs.addTab(self.online_widget, "🌐 Online Search")
@@ -338,33 +364,160 @@ class MainWindow(QMainWindow):
         logger.info("Loading initial data...")
         series = await self.library.get_all_series()
         self.series_widget.set_series(series)
+        self.roots = await self.library.get_library_roots()
+        if LIBRARY_WATCHER:
+            self.start_library_watcher()
+        self.scan_scheduler.start()
+        self.start_preview_job()
 
     @qasync.asyncSlot()
     async def run_scan(self, full_scan=False):
+        if self._scan_token:
+            return
+        self._scan_token = CancelToken()
         try:
             self.scan_btn.setEnabled(False)
+            self.cancel_scan_btn.setEnabled(True)  # cancel_scan() disabled it on the last cancelled scan
+            self.cancel_scan_btn.show()
             logger.info(f"Starting library sync (full_scan={full_scan})")
-            await self.library.scan_library(full_scan=full_scan)
+            self.roots = await self.library.get_library_roots(enabled_only=True)
+            offline = []
+            reports = []
+            for root in self.roots:
+                status = await self.scan_scheduler.scan(root, full_scan, self.on_scan_progress, self._scan_token)
+                if status == "offline":
+                    offline.append(root.path)
+                elif status == "ok":
+                    reports += await self.db.get_scan_runs(root.path, limit=1)
             
             # Refresh library view
             logger.debug("Refreshing series list after scan")
             series_list = await self.library.get_all_series()
             self.series_widget.set_series(series_list)
-            
-            self.scan_btn.setEnabled(True)
-            self.scan_btn.setText("🔄 Quick Sync")
-            QMessageBox.information(self, "Scan Complete", "Library sync finished!")
-            
+            self.start_preview_job()
+            self.show_scan_summary(reports, offline)
+
+        except ScanCancelled:
+            series_list = await self.library.get_all_series()
+            self.series_widget.set_series(series_list)
+            resume_hint = " Run a full re-scan again to resume." if full_scan else ""
+            self.statusBar().showMessage(f"Library scan cancelled.{resume_hint}", 8000)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Library scan failed: {e}")
+        finally:
+            self._scan_token = None
+            self.cancel_scan_btn.hide()
             self.scan_btn.setEnabled(True)
             self.scan_btn.setText("🔄 Quick Sync")
 
+    def show_scan_summary(self, reports, offline):
+        """Per-root timings and counters of the sync that just finished; the full JSON is under Show Details."""
+        text = "Library sync finished!"
+        if offline:
+            text = "Library sync finished, but these roots are offline:\n" + "\n".join(offline)
+        box = QMessageBox(self)
+        box.setWindowTitle("Scan Complete")
+        box.setIcon(QMessageBox.Icon.Warning if offline else QMessageBox.Icon.Information)
+        box.setText(text)
+        if reports:
+            box.setInformativeText("\n\n".join(format_report(r) for r in reports))
+            box.setDetailedText(json.dumps(reports, indent=2))
+        box.exec()
+
+    def on_scan_progress(self, event):
+        if event.phase == "probe":
+            self.statusBar().showMessage(str(event).strip())
+            return
+        if event.series_total:
+            self.scan_btn.setText(f"🔄 {event.series_done}/{event.series_total}")
+        eta = f" · ~{format_time(event.eta)} left" if event.eta else ""
+        self.statusBar().showMessage(
+            f"{event} · {event.files_seen} files, {format_size(event.bytes_seen)}{eta}"
+        )
+
+    def on_background_scan_progress(self, root, event):
+        if event.phase in ("scan", "prune", "done"):
+            self.statusBar().showMessage(f"[{root.name or os.path.basename(root.path)}] {event}", 5000)
+
+    @qasync.asyncSlot(object, str)
+    async def on_root_scanned(self, root, status):
+        if status == "ok" and not self._scan_token:
+            series_list = await self.library.get_all_series()
+            self.series_widget.set_series(series_list)
+            self.start_preview_job()
+        elif status == "offline":
+            self.statusBar().showMessage(f"Library root offline: {root.path}", 8000)
+
+    def start_preview_job(self):
+        """Generate missing episode previews in the background (needs ffmpeg)."""
+        if not PREVIEWS or not ffmpeg_available():
+            return
+        if self._preview_task and not self._preview_task.done():
+            self._previews_dirty = True
+            return
+        self._previews_dirty = False
+        self._preview_token = CancelToken()
+        self._preview_task = asyncio.ensure_future(self._run_preview_job(self._preview_token))
+
+    async def _run_preview_job(self, token):
+        try:
+            stats = await PreviewGenerator(self.db, cancel_token=token).run()
+            if stats["generated"]:
+                logger.info(f"Generated previews for {stats['generated']} episodes")
+        except Exception:
+            logger.exception("Preview job failed")
+        if self._previews_dirty and not token.cancelled:
+            self.start_preview_job()
+
+    def cancel_scan(self):
+        if self._scan_token:
+            self._scan_token.cancel()
+            self.cancel_scan_btn.setEnabled(False)
+
     @qasync.asyncSlot()
     async def scan_library(self, checked=False):
         # Compatibility/Legacy
         await self.run_scan(full_scan=False)
 
+    def start_library_watcher(self):
+        loop = asyncio.get_event_loop()
+
+        def on_changes(paths):
+            # Called from the watcher thread; hop onto the Qt/asyncio loop
+            loop.call_soon_threadsafe(lambda: asyncio.ensure_future(self.apply_filesystem_changes(paths)))
+
+        roots = [r.path for r in self.roots if r.enabled] + [str(DOWNLOADS_PATH)]
+        self.watcher = LibraryWatcher(roots, on_changes, debounce=WATCHER_DEBOUNCE)
+        if not self.watcher.start():
+            self.watcher = None
+
+    async def apply_filesystem_changes(self, paths):
+        downloads_root = self.watcher.root_for(str(DOWNLOADS_PATH)) if self.watcher else None
+        download_paths = [p for p in paths if downloads_root and self.watcher.root_for(p) == downloads_root]
+        by_root = {}
+        for p in paths:
+            root = self.library.root_for_path(self.roots, p)
+            if root and root.enabled:
+                by_root.setdefault(root.id, (root, []))[1].append(p)
+
+        try:
+            scanned = []
+            for root, root_paths in by_root.values():
+                async with self.scan_scheduler.lock_for(root):
+                    scanned += await self.library.scan_paths(root_paths, root.path)
+            if scanned:
+                self.statusBar().showMessage(f"Library updated ({len(scanned)} series)", 5000)
+                self.start_preview_job()
+                series_list = await self.library.get_all_series()
+                self.series_widget.set_series(series_list)
+                if self.current_series:
+                    await self.on_series_selected(self.current_series)
+            if download_paths:
+                await asyncio.to_thread(self.download_manager.index.refresh, download_paths)
+                await self.online_widget.load_recent()
+        except Exception as e:
+            logger.error(f"Failed to apply filesystem changes: {e}")
+
     @qasync.asyncSlot(object)
     async def on_series_selected(self, series):
         logger.info(f"Series selected: {series.name}")
@@ -420,11 +573,13 @@ class MainWindow(QMainWindow):
         
         progress = await self.db.get_progress(episode.id)
         start_time = progress.timestamp if progress else 0
+        previews = load_previews(episode.content_hash) if PREVIEWS else None
 
         # Update Discord RPC
         await self.update_discord_rpc(episode, start_time)
             
-        self.player_widget.load_video(episode.path, start_time)
+        self._playback_active = True
+        self.player_widget.load_video(episode.path, start_time, previews=previews)
 
     async def update_discord_rpc(self, episode=None, timestamp=None, online_data=None):
         """
@@ -514,11 +669,13 @@ class MainWindow(QMainWindow):
 
     @qasync.asyncSlot(float)
     async def on_playback_paused(self, timestamp):
+        self._playback_active = False
         await self.save_progress(timestamp)
         await self.update_discord_rpc(timestamp=timestamp)
 
     @qasync.asyncSlot()
     async def on_playback_resumed(self):
+        self._playback_active = True
         await self.update_discord_rpc()
 
     @qasync.asyncSlot(float)
@@ -569,6 +726,7 @@ class MainWindow(QMainWindow):
     @qasync.asyncSlot()
     async def on_playback_finished(self):
         logger.info("Playback finished. Handling next steps...")
+        self._playback_active = False
         if self.current_episode:
             await self.save_progress(timestamp=self.player_widget._duration)
         elif self.current_online_show:
@@ -629,11 +787,14 @@ class MainWindow(QMainWindow):
         self.db_window = DatabaseBrowser(self.db, self)
         self.db_window.show()
 
-    def on_download_progress(self, filename, progress, speed, eta, elapsed):
+    def on_download_progress(self, batch):
         # We don't need to show detailed progress in status bar anymore as we have a dedicated page
         # but let's show a small indicator if we are not on the downloads tab
         if self.tabs.currentIndex() != 2:
-            msg = f"Downloading {filename}: {progress:.1f}% ({speed})"
+            filename, state = next(iter(batch.items()))
+            msg = f"Downloading {filename}: {state['progress']:.1f}% ({state['speed']})"
+            if len(batch) > 1:
+                msg += f" and {len(batch) - 1} more"
             self.statusBar().showMessage(msg, 2000)
 
     def on_queue_updated(self, count):
@@ -642,30 +803,9 @@ class MainWindow(QMainWindow):
             self.statusBar().showMessage(f"Added to queue. {count} tasks pending.", 3000)
 
     def on_download_finished(self, filename, success, message, metadata):
+        # The download manager has checked the file and saved it as the episode's local path
         if success:
             self.statusBar().showMessage(f"Download complete: {filename}", 10000)
-            
-            # Save to database
-            if self.db and metadata:
-                from ..database.models import OnlineProgress
-                
-                async def save_cache():
-                    progress = OnlineProgress(
-                        show_id=metadata['show_id'],
-                        show_name=metadata['show_name'],
-                        episode_number=int(float(metadata['ep_no'])) if str(metadata['ep_no']).replace('.','',1).isdigit() else 0,
-                        thumbnail_url=metadata.get('thumbnail_url'),
-                        local_path=self.download_manager.get_local_path(filename, metadata.get('show_id'), ep_no=metadata.get('ep_no'))
-                    )
-                    await self.db.update_online_progress(progress)
-                    logger.info(f"Saved local cache path for {filename} to database")
-                    
-                    # Notify online widget to refresh if it's showing the same show
-                    if hasattr(self, 'online_widget'):
-                        # This is a bit simple, but better than nothing
-                        pass
-                
-                asyncio.create_task(save_cache())
         else:
             self.statusBar().showMessage(f"Download failed: {filename} ({message})", 10000)
 
@@ -682,10 +822,19 @@ class MainWindow(QMainWindow):
 
     def closeEvent(self, event):
         self.player_widget.shutdown()
+        # A cancelled full scan leaves its checkpoint behind and resumes next time
+        self.cancel_scan()
+        self.scan_scheduler.stop()
+        if self._preview_token:
+            self._preview_token.cancel()
+        if self.watcher:
+            self.watcher.stop()
         
         # Async cleanup (fire and forget in sync closeEvent)
         asyncio.create_task(self.discord.clear())
         asyncio.create_task(self.discord.shutdown())
+        # Running downloads keep their partial files and continue on the next start
+        asyncio.create_task(self.download_manager.shutdown())
         
         app = QApplication.instance()
         if app:
@@ -26,6 +26,7 @@ from PyQt6.QtCore import Qt
 import qasync
 import re
 
+from ..core.download_scheduler import episode_priority
 from ..utils.ani_scraper import AniScraper
 from ..utils.nyaa_scraper import NyaaScraper
 from ..utils.logger import get_logger
@@ -368,7 +369,8 @@ class OnlineSearchWidget(QWidget):
             
         try:
             recent = await self.db_manager.get_recent_online_shows()
-            downloaded = await self.db_manager.get_downloaded_online_shows()
+            folders = self.download_manager.index.folder_names() if self.download_manager else None
+            downloaded = await self.db_manager.get_downloaded_online_shows(folders)
             
             if self.stack.currentIndex() == 0 and not self.search_input.text():
                 self.results_list.clear() # Only clear if we are showing "Recent"
@@ -519,6 +521,7 @@ class OnlineSearchWidget(QWidget):
                 target_id = allmanga_id if allmanga_id else show_id
                 episodes = await current_scraper.get_episodes(target_id, mode=mode, show_name=show_name)
             watched_episodes = [p.episode_number for p in progress_list if p.completed]
+            local_paths = self.download_manager.get_local_paths(show_id, episodes) if self.download_manager else {}
 
             for ep in episodes:
                 try:
@@ -544,8 +547,8 @@ class OnlineSearchWidget(QWidget):
                 
                 is_downloaded = False
                 if self.download_manager:
-                    safe_name = re.sub(r'[/\\:*?"<>|]', '_', f"{show_name} - Ep {ep}")
-                    is_downloaded = self.download_manager.get_local_path(safe_name, show_id, ep_no=ep) is not None
+                    is_downloaded = ep in local_paths
+                    epi_data["local_path"] = local_paths.get(ep)
                     
                     for p in progress_list:
                         if p.episode_number == ep_int and p.local_path and os.path.exists(p.local_path):
@@ -852,7 +855,14 @@ class OnlineSearchWidget(QWidget):
         if best_item:
             self.on_link_selected(best_item, start_time=self._current_episode_progress.timestamp)
 
-    def on_download_clicked(self):
+    async def _download_priority(self, show_id, ep_no):
+        """Queue the next episode to watch ahead of the rest of the show."""
+        if not self.db_manager or not show_id:
+            return 0
+        return episode_priority(ep_no, await self.db_manager.get_online_progress_for_show(show_id))
+
+    @qasync.asyncSlot()
+    async def on_download_clicked(self):
         # Use selected item if any, otherwise first recommended, otherwise first link
         best_item = self.links_list.currentItem()
         
@@ -889,7 +899,9 @@ class OnlineSearchWidget(QWidget):
                 "thumbnail_url": data.get('thumbnail_url')
             }
             
-            if self.download_manager.start_download(data['url'], safe_name, referrer=data.get('referrer'), metadata=metadata):
+            priority = await self._download_priority(data.get('show_id'), ep_no)
+            if self.download_manager.start_download(data['url'], safe_name, referrer=data.get('referrer'), metadata=metadata,
+                                                    priority=priority):
                 self.status_label.setText(f"Started download: {safe_name}")
             else:
                 self.status_label.setText(f"Download already in progress for {safe_name}")
@@ -1009,7 +1021,8 @@ class OnlineSearchWidget(QWidget):
                     best_link['url'], 
                     safe_name, 
                     referrer=best_link.get('referrer'),
-                    metadata=metadata
+                    metadata=metadata,
+                    priority=await self._download_priority(episode_data.get('show_id'), ep_no)
                 )
         except Exception as e:
             logger.error(f"Error queueing episode {ep_no}: {e}")
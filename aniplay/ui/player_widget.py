@@ -93,7 +93,9 @@ class PlayerWidget(QWidget):
         self.poll_timer.timeout.connect(self._poll_progress)
         self.poll_timer.setInterval(1000)
 
-    def load_video(self, path: str, start_time: float = 0, referrer: str = None, subtitle: str = None):
+    def load_video(self, path: str, start_time: float = 0, referrer: str = None, subtitle: str = None,
+                   previews=None):
+        """previews: EpisodePreviews for seek-bar thumbnails (embedded VLC only)."""
         logger.info(f"Loading video: {path} (Start time: {start_time}, Referrer: {referrer}, Subtitle: {subtitle})")
         self.shutdown() 
         
@@ -102,7 +104,7 @@ class PlayerWidget(QWidget):
         elif self.player_type == "vlc":
             self._load_vlc(path, start_time, referrer, subtitle)
         elif self.player_type == "embedded_vlc":
-            self._load_embedded_vlc(path, start_time, referrer, subtitle)
+            self._load_embedded_vlc(path, start_time, referrer, subtitle, previews)
 
     def _find_executable(self, name: str) -> str:
         """Find executable in PATH or common Windows locations."""
@@ -211,7 +213,7 @@ class PlayerWidget(QWidget):
         except FileNotFoundError:
             self.info_label.setText(f"Error: '{exe}' not found.")
 
-    def _load_embedded_vlc(self, path, start_time, referrer=None, subtitle=None):
+    def _load_embedded_vlc(self, path, start_time, referrer=None, subtitle=None, previews=None):
         if not vlc:
             self.info_label.setText("Error: python-vlc not installed")
             return
@@ -224,6 +226,7 @@ class PlayerWidget(QWidget):
             self.vlc_window.playback_finished.connect(self.playback_finished.emit)
             self.vlc_window.window_closed.connect(self.shutdown)
             
+            self.vlc_window.set_previews(previews)
             self.vlc_window.show()
             self.vlc_window.play_path(path, start_time, referrer, subtitle)
 
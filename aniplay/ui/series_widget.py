@@ -14,16 +14,15 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-import os
 import qasync
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QLabel, QHBoxLayout, 
     QFrame, QLineEdit, QMenu, QScrollArea, QGridLayout
 )
 from PyQt6.QtCore import pyqtSignal, Qt, QSize, QEvent
-from PyQt6.QtGui import QPixmap, QPainter, QPainterPath, QColor
 from ..database.models import Series
 from .selection_info_widget import SelectionInfoWidget
+from .thumbnail_service import ThumbnailService
 
 class SeriesCard(QFrame):
     clicked = pyqtSignal(object) # Series
@@ -81,44 +80,18 @@ class SeriesCard(QFrame):
 
     def _set_poster(self, path):
         radius = 10
-        if path and os.path.exists(path):
-            pixmap = QPixmap(path)
-            if not pixmap.isNull():
-                # Scale to card size
-                scaled = pixmap.scaled(
-                    180, 260, 
-                    Qt.AspectRatioMode.KeepAspectRatioByExpanding, 
-                    Qt.TransformationMode.SmoothTransformation
-                )
-                
-                # Crop to fit precisely 180x260 if needed
-                if scaled.width() > 180 or scaled.height() > 260:
-                    scaled = scaled.copy(
-                        (scaled.width() - 180) // 2,
-                        (scaled.height() - 260) // 2,
-                        180, 260
-                    )
-
-                # Create rounded pixmap
-                rounded = QPixmap(180, 260)
-                rounded.fill(QColor(0, 0, 0, 0))
-                
-                painter = QPainter(rounded)
-                painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-                painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
-                
-                path = QPainterPath()
-                path.addRoundedRect(0, 0, 180, 260, radius, radius)
-                painter.setClipPath(path)
-                painter.drawPixmap(0, 0, scaled)
-                painter.end()
-                
-                self.poster_label.setPixmap(rounded)
-                return
-        
-        # Fallback for missing poster
+        # Placeholder until the thumbnail service has the pre-scaled poster
         self.poster_label.setText("🎞️")
         self.poster_label.setStyleSheet(f"font-size: 40px; border-radius: {radius}px; background-color: #1a1a1a;")
+        pixmap = ThumbnailService.instance().request(
+            path, 180, 260, radius, self.devicePixelRatioF(), callback=self._show_poster
+        )
+        if pixmap is not None:
+            self._show_poster(pixmap)
+
+    def _show_poster(self, pixmap):
+        self.poster_label.setStyleSheet("background-color: #1a1a1a; border-radius: 10px;")
+        self.poster_label.setPixmap(pixmap)
 
 class SeriesWidget(QWidget):
     series_selected = pyqtSignal(Series)
@@ -0,0 +1,171 @@
+# AniPlay - Personal media server and player for anime libraries.
+# Copyright (C) 2026  Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Poster thumbnails: decode, scale, crop and round full-size posters in a
+QThreadPool and keep the result as a small PNG in THUMBNAIL_CACHE_DIR.
+Later requests are served from memory, or from the cached PNG on disk.
+"""
+
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from PyQt6.QtCore import QObject, QRunnable, QSize, QThreadPool, Qt, pyqtSignal
+from PyQt6.QtGui import QColor, QImage, QImageReader, QPainter, QPainterPath, QPixmap
+
+from ..config import THUMBNAIL_CACHE_DIR
+from ..utils.logger import get_logger
+from ..utils.thumbnail_cache import stale_variants, thumbnail_path
+
+logger = get_logger(__name__)
+
+
+def render_thumbnail(source: str, width: int, height: int, radius: int) -> Optional[QImage]:
+    """Decode `source` at roughly the target size, center-crop to width x height and round the corners."""
+    reader = QImageReader(source)
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if size.isValid():
+        # Let the decoder downscale (JPEG can skip most of the work at reduced sizes)
+        reader.setScaledSize(size.scaled(QSize(width, height), Qt.AspectRatioMode.KeepAspectRatioByExpanding))
+    image = reader.read()
+    if image.isNull():
+        logger.warning(f"Could not decode poster {source}: {reader.errorString()}")
+        return None
+    fits = image.width() >= width and image.height() >= height and (image.width() == width or image.height() == height)
+    if not fits:
+        image = image.scaled(width, height, Qt.AspectRatioMode.KeepAspectRatioByExpanding,
+                             Qt.TransformationMode.SmoothTransformation)
+    image = image.copy((image.width() - width) // 2, (image.height() - height) // 2, width, height)
+
+    rounded = QImage(width, height, QImage.Format.Format_ARGB32_Premultiplied)
+    rounded.fill(QColor(0, 0, 0, 0))
+    painter = QPainter(rounded)
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+    painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+    path = QPainterPath()
+    path.addRoundedRect(0, 0, width, height, radius, radius)
+    painter.setClipPath(path)
+    painter.drawImage(0, 0, image)
+    painter.end()
+    return rounded
+
+
+class _Signals(QObject):
+    done = pyqtSignal(str, QImage)  # cache file, image (null on failure)
+
+
+class _RenderTask(QRunnable):
+    def __init__(self, source: str, cache_file: Path, width: int, height: int, radius: int, signals: _Signals):
+        super().__init__()
+        self._source = source
+        self._cache_file = cache_file
+        self._size = (width, height, radius)
+        self._signals = signals
+
+    def run(self):
+        image = None
+        try:
+            image = render_thumbnail(self._source, *self._size)
+            if image is not None:
+                tmp = self._cache_file.with_suffix(".tmp.png")
+                if image.save(str(tmp), "PNG"):
+                    os.replace(tmp, self._cache_file)
+                    for old in stale_variants(self._cache_file):
+                        old.unlink(missing_ok=True)
+        except Exception:
+            logger.exception(f"Thumbnail render failed for {self._source}")
+        self._signals.done.emit(str(self._cache_file), image if image is not None else QImage())
+
+
+class ThumbnailService(QObject):
+    """
+    Shared by all series cards. request() returns the pixmap immediately when it is
+    cached (in memory or on disk); otherwise it is rendered in the pool and handed to
+    the callback on the GUI thread.
+    """
+
+    _instance = None
+
+    @classmethod
+    def instance(cls) -> "ThumbnailService":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, cache_dir: Path = THUMBNAIL_CACHE_DIR, max_threads: int = 2, memory_items: int = 512):
+        super().__init__()
+        self._cache_dir = Path(cache_dir)
+        self._cache_dir.mkdir(parents=True, exist_ok=True)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max_threads)
+        self._memory: "OrderedDict[str, QPixmap]" = OrderedDict()
+        self._memory_items = memory_items
+        self._waiting: Dict[str, Tuple[float, List[Callable]]] = {}  # cache file -> (scale, callbacks)
+        self._signals = _Signals()
+        self._signals.done.connect(self._on_done)
+
+    def request(self, source: Optional[str], width: int, height: int, radius: int = 0, scale: float = 1.0,
+                callback: Optional[Callable[[QPixmap], None]] = None) -> Optional[QPixmap]:
+        """
+        Thumbnail of `source` at width x height logical pixels for a screen with the given
+        device pixel ratio. Returns None if it is not ready (or the source does not exist).
+        """
+        if not source:
+            return None
+        px_w, px_h = round(width * scale), round(height * scale)
+        cache_file = thumbnail_path(source, px_w, px_h, scale, self._cache_dir)
+        if cache_file is None:
+            return None
+        key = str(cache_file)
+
+        pixmap = self._memory.get(key)
+        if pixmap is not None:
+            self._memory.move_to_end(key)
+            return pixmap
+        if cache_file.exists():
+            pixmap = QPixmap(key)
+            if not pixmap.isNull():
+                return self._remember(key, pixmap, scale)
+
+        if key not in self._waiting:
+            self._waiting[key] = (scale, [])
+            self._pool.start(_RenderTask(source, cache_file, px_w, px_h, round(radius * scale), self._signals))
+        if callback:
+            self._waiting[key][1].append(callback)
+        return None
+
+    def _remember(self, key: str, pixmap: QPixmap, scale: float) -> QPixmap:
+        pixmap.setDevicePixelRatio(scale)
+        self._memory[key] = pixmap
+        while len(self._memory) > self._memory_items:
+            self._memory.popitem(last=False)
+        return pixmap
+
+    def _on_done(self, key: str, image: QImage):
+        scale, callbacks = self._waiting.pop(key, (1.0, []))
+        if image.isNull():
+            return
+        pixmap = self._remember(key, QPixmap.fromImage(image), scale)
+        for callback in callbacks:
+            try:
+                callback(pixmap)
+            except RuntimeError:
+                # The card was deleted (e.g. the grid was rebuilt) before the render finished
+                pass
+
@@ -16,9 +16,9 @@
 
 import os
 import vlc
-from PyQt6.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QSlider, QFrame, QComboBox
-from PyQt6.QtCore import Qt, QTimer, pyqtSignal
-from PyQt6.QtGui import QWheelEvent
+from PyQt6.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QSlider, QFrame, QComboBox, QStyle
+from PyQt6.QtCore import Qt, QTimer, QPoint, pyqtSignal
+from PyQt6.QtGui import QWheelEvent, QPixmap, QPainter, QColor
 from ..utils.format_utils import format_time
 from ..utils.media_matcher import MediaMatcher
 from ..config import PREFERRED_AUDIO, PREFERRED_SUBTITLE
@@ -51,6 +51,9 @@ class VlcPlayerWindow(QMainWindow):
         
         # Track fullscreen state
         self.is_fullscreen = False
+
+        # Trickplay sprite (QPixmap, SpriteManifest) for seek previews
+        self._sprite = None
         
         self.setup_ui()
         self._setup_events()
@@ -94,6 +97,12 @@ class VlcPlayerWindow(QMainWindow):
         self.seek_slider = QSlider(Qt.Orientation.Horizontal)
         self.seek_slider.setRange(0, 1000)
         self.seek_slider.sliderReleased.connect(self._on_seek_released)
+        self.seek_slider.setMouseTracking(True)
+
+        # Seek preview popup; a tooltip-type window so it stays above the native video surface
+        self.seek_preview = QLabel(None, Qt.WindowType.ToolTip)
+        self.seek_preview.setStyleSheet("border: 2px solid #3d5afe; background-color: black;")
+        self.seek_preview.hide()
         
         # Buttons and Time
         self.btns_layout = QHBoxLayout()
@@ -424,6 +433,37 @@ class VlcPlayerWindow(QMainWindow):
         value = self.seek_slider.value()
         self.player.set_position(value / 1000.0)
 
+    def set_previews(self, previews):
+        """Use an EpisodePreviews sprite for seek previews (None disables them)."""
+        self._sprite = None
+        if previews and previews.sprite.exists():
+            pixmap = QPixmap(str(previews.sprite))
+            if not pixmap.isNull():
+                self._sprite = (pixmap, previews.manifest)
+
+    def _show_seek_preview(self, x: int):
+        length = self.player.get_length()
+        if not self._sprite or length <= 0:
+            return
+        value = QStyle.sliderValueFromPosition(self.seek_slider.minimum(), self.seek_slider.maximum(),
+                                               x, self.seek_slider.width())
+        seconds = value / 1000.0 * length / 1000.0
+        sprite, manifest = self._sprite
+        tx, ty = manifest.tile_for(seconds)
+        tile = sprite.copy(tx, ty, manifest.tile_width, manifest.tile_height)
+
+        painter = QPainter(tile)
+        painter.fillRect(0, tile.height() - 18, tile.width(), 18, QColor(0, 0, 0, 160))
+        painter.setPen(QColor("white"))
+        painter.drawText(0, tile.height() - 18, tile.width(), 18, Qt.AlignmentFlag.AlignCenter, self._format_time(seconds))
+        painter.end()
+
+        self.seek_preview.setPixmap(tile)
+        self.seek_preview.adjustSize()
+        pos = self.seek_slider.mapToGlobal(QPoint(x, 0))
+        self.seek_preview.move(pos.x() - self.seek_preview.width() // 2, pos.y() - self.seek_preview.height() - 8)
+        self.seek_preview.show()
+
     def _poll_progress(self):
         if not self.player: 
             return
@@ -510,6 +550,12 @@ class VlcPlayerWindow(QMainWindow):
                 self.keyPressEvent(event)
                 return True  # Event handled
         
+        if obj is self.seek_slider:
+            if event.type() == event.Type.MouseMove:
+                self._show_seek_preview(int(event.position().x()))
+            elif event.type() in (event.Type.Leave, event.Type.Hide):
+                self.seek_preview.hide()
+
         # Pass other events to the parent class
         return super().eventFilter(obj, event)
     
@@ -531,6 +577,8 @@ class VlcPlayerWindow(QMainWindow):
         # Stop polling immediately to prevent further UI updates
         if hasattr(self, 'poll_timer'):
             self.poll_timer.stop()
+        # The seek preview is a separate top-level window
+        self.seek_preview.close()
         
         # Detach VLC from the window handle before it's destroyed.
         # This is critical on Windows to prevent deadlocks when closing
@@ -14,52 +14,236 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+"""
+Junk file cleanup (Jellyfin/Kodi leftovers such as -thumb.jpg, .nfo and .actors folders).
+
+The library is walked once with os.scandir and every entry is matched
+against all patterns, with sizes taken from the DirEntry. Matches are
+removed in a bounded thread pool. Instead of deleting, they can be moved
+to a trash folder with a manifest.json, which restore() reverses.
+"""
+
+import fnmatch
+import json
 import os
-import logging
+import re
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+
+from ..config import CLEANUP_PATTERNS, CLEANUP_DIR_PATTERNS, CLEANUP_EMPTY_DIRS, CLEANUP_WORKERS, CLEANUP_TRASH_DIR
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+MANIFEST = "manifest.json"
+
+
+@dataclass
+class JunkItem:
+    path: str
+    size: int
+    kind: str  # "file", "dir" (a matched folder, removed with its contents) or "empty_dir"
+    rule: str  # the pattern that matched, "empty" for empty folders
+
+
+def _compile(patterns: Iterable[str]) -> Optional[re.Pattern]:
+    patterns = list(patterns)
+    if not patterns:
+        return None
+    return re.compile("|".join(fnmatch.translate(p) for p in patterns), re.IGNORECASE)
+
+
+def _rule(patterns: List[str], name: str) -> str:
+    return next((p for p in patterns if fnmatch.fnmatch(name.lower(), p.lower())), patterns[0])
 
-logger = logging.getLogger(__name__)
 
 class CleanupManager:
-    def __init__(self, dry_run: bool = True):
+    def __init__(self, dry_run: bool = True,
+                 patterns: Iterable[str] = CLEANUP_PATTERNS,
+                 dir_patterns: Iterable[str] = CLEANUP_DIR_PATTERNS,
+                 empty_dirs: bool = CLEANUP_EMPTY_DIRS,
+                 workers: int = CLEANUP_WORKERS,
+                 trash_dir: Optional[Path] = CLEANUP_TRASH_DIR):
+        """trash_dir=None deletes for good instead of moving to the trash."""
         self.dry_run = dry_run
-        self.junk_patterns = [
-            "*-thumb.jpg",
-            "*-thumb.jpeg",
-            "*.nfo"
-        ]
+        # We only look for specific patterns to avoid deleting user custom posters
+        self.junk_patterns = list(patterns)
+        self.dir_patterns = list(dir_patterns)
+        self.empty_dirs = empty_dirs
+        self.workers = max(1, workers)
+        self.trash_dir = Path(trash_dir) if trash_dir else None
+        self._files = _compile(self.junk_patterns)
+        self._dirs = _compile(self.dir_patterns)
+
+    # Scanning
+
+    def scan(self, library_path: str) -> List[JunkItem]:
+        """Everything that would be cleaned, files before the folders that contain them."""
+        items: List[JunkItem] = []
+        self._scan_dir(os.path.abspath(library_path), items, is_root=True)
+        return items
+
+    def _scan_dir(self, path: str, items: List[JunkItem], is_root: bool = False) -> bool:
+        """Collect junk under path. Returns True if nothing would be left in it afterwards."""
+        if self.trash_dir and os.path.abspath(path) == os.path.abspath(self.trash_dir):
+            return False
+        kept = 0
+        try:
+            with os.scandir(path) as it:
+                entries = list(it)
+        except OSError as e:
+            logger.warning(f"Could not list {path}: {e}")
+            return False
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if self._dirs and self._dirs.match(entry.name):
+                        items.append(JunkItem(entry.path, self._tree_size(entry.path), "dir",
+                                              _rule(self.dir_patterns, entry.name)))
+                    elif not self._scan_dir(entry.path, items):
+                        kept += 1
+                elif self._files and self._files.match(entry.name) and entry.is_file(follow_symlinks=False):
+                    items.append(JunkItem(entry.path, entry.stat(follow_symlinks=False).st_size, "file",
+                                          _rule(self.junk_patterns, entry.name)))
+                else:
+                    kept += 1
+            except OSError:
+                kept += 1
+        if kept:
+            return False
+        if self.empty_dirs and not is_root:
+            items.append(JunkItem(path, 0, "empty_dir", "empty"))
+            return True
+        return False
+
+    @staticmethod
+    def _tree_size(path: str) -> int:
+        total = 0
+        stack = [path]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        else:
+                            total += entry.stat(follow_symlinks=False).st_size
+            except OSError:
+                pass
+        return total
 
     def scan_for_junk(self, library_path: str) -> List[Path]:
         """Scan library for junk files based on patterns."""
-        root = Path(library_path)
-        junk_files = []
-        
-        # We only look for specific patterns to avoid deleting user custom posters
-        # Common Jellyfin junk: -thumb.jpg, -thumb.jpeg, *.nfo
-        for pattern in self.junk_patterns:
-            junk_files.extend(root.rglob(pattern))
-            
-        return sorted(list(set(junk_files)))
-
-    def cleanup(self, files: List[Path]) -> Dict[str, Any]:
-        """Remove the specified files."""
+        return [Path(item.path) for item in self.scan(library_path) if item.kind != "empty_dir"]
+
+    # Removal
+
+    def cleanup(self, items: List[JunkItem], library_path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Remove the given items (moved to a new folder in the trash if trash_dir is set).
+        library_path is needed for the trash so items keep their relative layout there.
+        """
         results = {
             "deleted": [],
             "failed": [],
-            "total_size": 0
+            "total_size": 0,
+            "manifest": None
         }
-        
-        for file_path in files:
+        batch = None
+        if self.trash_dir and not self.dry_run:
+            if library_path is None:
+                raise ValueError("library_path is required when moving to the trash")
+            batch = self.trash_dir / datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+            batch.mkdir(parents=True)
+
+        def remove(item: JunkItem) -> Tuple[JunkItem, Optional[str], Optional[str]]:
             try:
-                size = file_path.stat().st_size
+                target = None
                 if not self.dry_run:
-                    file_path.unlink()
-                
-                results["deleted"].append(str(file_path))
-                results["total_size"] += size
+                    if batch is not None:
+                        target = str(batch / os.path.relpath(item.path, library_path))
+                        os.makedirs(os.path.dirname(target), exist_ok=True)
+                        shutil.move(item.path, target)
+                    elif item.kind == "dir":
+                        shutil.rmtree(item.path)
+                    else:
+                        os.unlink(item.path)
+                return item, target, None
             except Exception as e:
-                logger.error(f"Failed to delete {file_path}: {e}")
-                results["failed"].append({"path": str(file_path), "error": str(e)})
+                return item, None, str(e)
+
+        moved = []
+        files = [i for i in items if i.kind != "empty_dir"]
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="cleanup") as pool:
+            outcomes = list(pool.map(remove, files))
+        # Folders only once their contents are gone, deepest first
+        for item in sorted((i for i in items if i.kind == "empty_dir"), key=lambda i: -i.path.count(os.sep)):
+            try:
+                if not self.dry_run:
+                    os.rmdir(item.path)
+                outcomes.append((item, None, None))
+            except OSError as e:
+                outcomes.append((item, None, str(e)))
 
+        for item, target, error in outcomes:
+            if error:
+                logger.error(f"Failed to delete {item.path}: {error}")
+                results["failed"].append({"path": item.path, "error": error})
+                continue
+            results["deleted"].append(item.path)
+            results["total_size"] += item.size
+            moved.append({**asdict(item), "trash_path": target})
+
+        if batch is not None:
+            manifest = batch / MANIFEST
+            with open(manifest, "w", encoding="utf-8") as f:
+                json.dump({"library_path": os.path.abspath(library_path),
+                           "created_at": datetime.now().isoformat(timespec="seconds"),
+                           "items": moved}, f, indent=2)
+            results["manifest"] = str(manifest)
+        return results
+
+    # Trash
+
+    def list_trash(self) -> List[Dict[str, Any]]:
+        """Manifests in the trash, newest first."""
+        if not self.trash_dir or not self.trash_dir.is_dir():
+            return []
+        batches = []
+        for manifest in sorted(self.trash_dir.glob(f"*/{MANIFEST}"), reverse=True):
+            try:
+                with open(manifest, encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            batches.append({"manifest": str(manifest), "library_path": data["library_path"],
+                            "created_at": data["created_at"], "items": len(data["items"]),
+                            "size": sum(i["size"] for i in data["items"])})
+        return batches
+
+    def restore(self, manifest_path: str) -> Dict[str, Any]:
+        """Move everything in a trash batch back. Existing files are never overwritten."""
+        with open(manifest_path, encoding="utf-8") as f:
+            data = json.load(f)
+        results = {"restored": [], "failed": []}
+        # Recreate folders first, then put files back
+        for item in sorted(data["items"], key=lambda i: i["kind"] != "empty_dir"):
+            try:
+                if item["kind"] == "empty_dir":
+                    os.makedirs(item["path"], exist_ok=True)
+                else:
+                    if os.path.lexists(item["path"]):
+                        raise FileExistsError(f"{item['path']} already exists")
+                    os.makedirs(os.path.dirname(item["path"]), exist_ok=True)
+                    shutil.move(item["trash_path"], item["path"])
+                results["restored"].append(item["path"])
+            except Exception as e:
+                logger.error(f"Failed to restore {item['path']}: {e}")
+                results["failed"].append({"path": item["path"], "error": str(e)})
+        if not results["failed"]:
+            shutil.rmtree(os.path.dirname(manifest_path), ignore_errors=True)
         return results
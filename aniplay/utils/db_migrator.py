@@ -15,24 +15,32 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import os
+import asyncio
 import logging
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Tuple
 from ..database.db import DatabaseManager
 from ..database.models import Series, Episode
 from .file_scanner import FileScanner
+from .file_identity import build_identity_index
+from ..config import SCAN_WORKERS
 
 logger = logging.getLogger(__name__)
 
 class DatabaseMigrator:
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, hash_workers: int = SCAN_WORKERS):
         self.db = db_manager
         self.scanner = FileScanner()
+        self.hash_workers = hash_workers
 
     async def migrate_paths(self, library_path: str, dry_run: bool = True) -> Dict[str, Any]:
         """
         Migrate episode paths in the database to match the current filesystem structure.
         Handles moved files, reorganized season folders, and merged series.
+
+        Moved/renamed files are matched by content identity (size + head/tail hash)
+        first and by filename second. Identities of files still in place are stored
+        so later moves can be detected even after the old path is gone.
         """
         stats = {
             "total_files_found": 0,
@@ -40,7 +48,9 @@ class DatabaseMigrator:
             "missing_in_physical": [],
             "not_moved": 0,
             "failed": [],
-            "merged": 0
+            "merged": 0,
+            "relinked_by_hash": 0,
+            "hashes_stored": 0
         }
 
         root = Path(library_path)
@@ -49,59 +59,66 @@ class DatabaseMigrator:
 
         # 1. Global Physical Scan
         # We scan the entire library to build a map of where files are NOW.
-        all_physical_eps = []
+        loop = asyncio.get_running_loop()
         series_folders = [f for f in root.iterdir() if f.is_dir()]
+        all_physical_eps = []
         for folder in series_folders:
             all_physical_eps.extend(self.scanner.scan_series_folder(str(folder)))
-        
         stats["total_files_found"] = len(all_physical_eps)
-        
-        # Map filename -> List[phys_ep_data]
+
+        phys_by_path = {pe["path"]: pe for pe in all_physical_eps}
         phys_filename_map = {}
         for pe in all_physical_eps:
-            fname = pe["filename"]
-            if fname not in phys_filename_map:
-                phys_filename_map[fname] = []
-            phys_filename_map[fname].append(pe)
-            
+            phys_filename_map.setdefault(pe["filename"], []).append(pe)
+
         # Map physical series root -> series_id (from DB)
-        all_series_in_db = await self.db.get_all_series()
+        all_series_in_db = await self.db.get_all_series(include_missing=True)
         series_path_to_id = {str(Path(s.path)): s.id for s in all_series_in_db}
 
-        # 2. Iterate DB Episodes
-        # We check every episode record and try to see if its path matches reality.
-        db_episodes = await self.db.get_all_episodes()
-        
+        db_episodes = await self.db.get_all_episodes(include_missing=True)
+        db_by_path = {e.path: e for e in db_episodes}
+
+        # 2. Identity index
+        # Reuse stored hashes when the size still matches; hash everything else in a pool.
+        identities = {}
+        to_hash = []
+        for pe in all_physical_eps:
+            known = db_by_path.get(pe["path"])
+            if known and known.content_hash and known.size_bytes == pe["size_bytes"]:
+                identities[pe["path"]] = known.content_hash
+            else:
+                to_hash.append((pe["path"], pe["size_bytes"]))
+        if to_hash:
+            logger.info(f"Hashing {len(to_hash)} files for move detection...")
+            identities.update(await loop.run_in_executor(None, build_identity_index, to_hash, self.hash_workers))
+
+        phys_by_identity = {}
+        for path, ident in identities.items():
+            phys_by_identity.setdefault(ident, []).append(phys_by_path[path])
+
+        # Remember identities of files that are still in place
+        new_hashes = [(identities[e.path], e.id) for e in db_episodes
+                      if e.path in identities and e.content_hash != identities[e.path]]
+        stats["hashes_stored"] = len(new_hashes)
+        if not dry_run:
+            await self.db.update_episode_hashes(new_hashes)
+
+        # 3. Iterate DB Episodes
+        claimed = set()  # physical paths already taken by an orphan
+        merged_away = set()  # rows folded into an older row for the same file
         for db_ep in db_episodes:
-            # 2.1 Check if current path exists (quick path)
-            current_path = Path(db_ep.path)
-            
-            # Find best physical match
-            match = None
-            if current_path.exists():
-                # Still where it was, but let's see if metadata (season/folder) changed
-                # (e.g. it was in root but now we consider it Season 1)
-                match = next((pe for pe in all_physical_eps if pe["path"] == db_ep.path), None)
-            
+            if db_ep.id in merged_away:
+                continue
+            match = phys_by_path.get(db_ep.path)
+            method = "metadata"
+
             if not match:
-                # ORPHAN! The file moved. Try to find it by filename.
-                potential_matches = phys_filename_map.get(db_ep.filename, [])
-                
-                if len(potential_matches) == 1:
-                    # Unique filename in library! Highly likely it's the same file.
-                    match = potential_matches[0]
-                elif len(potential_matches) > 1:
-                    # Multiple files with same name? Try to match by season/episode numbers.
-                    match = next((pe for pe in potential_matches 
-                                 if pe["season_number"] == db_ep.season_number 
-                                 and pe["episode_number"] == db_ep.episode_number), None)
-                    
-                    # If still no match, try matching by parent folder name hint
-                    if not match:
-                        # Very defensive, but better than a wrong match
-                        pass
-
-            # 2.2 Process Match
+                # ORPHAN! The file moved or was renamed.
+                match, method = self._find_moved(db_ep, phys_by_identity, phys_filename_map, db_by_path, claimed)
+                if match:
+                    claimed.add(match["path"])
+
+            # 3.1 Process Match
             if match:
                 new_path = match["path"]
                 
@@ -118,26 +135,36 @@ class DatabaseMigrator:
                         new_series_id = series_path_to_id.get(str(new_series_root))
                         
                         is_merge = new_series_id is not None and new_series_id != db_ep.series_id
+                        # A rescan may already have added the new location as its own row
+                        duplicate = db_by_path.get(new_path) if path_changed else None
 
                         if not dry_run:
-                            # Update path and metadata
-                            await self.db.update_episode_path(
-                                db_ep.id, 
-                                new_path, 
-                                match["filename"], 
-                                match["folder_name"], 
-                                match["season_number"]
-                            )
-                            # Update parent series if merged
-                            if is_merge:
-                                await self.db.update_episode_series(db_ep.id, new_series_id)
-                                stats["merged"] += 1
-                        
+                            if duplicate and duplicate.id != db_ep.id:
+                                await self.db.merge_episode_into(db_ep.id, duplicate.id)
+                                merged_away.add(duplicate.id)
+                            else:
+                                # Update path and metadata
+                                await self.db.update_episode_path(
+                                    db_ep.id, 
+                                    new_path, 
+                                    match["filename"], 
+                                    match["folder_name"], 
+                                    match["season_number"]
+                                )
+                                # Update parent series if merged
+                                if is_merge:
+                                    await self.db.update_episode_series(db_ep.id, new_series_id)
+                        if is_merge:
+                            stats["merged"] += 1
+                        if method == "hash":
+                            stats["relinked_by_hash"] += 1
+
                         stats["updated"].append({
                             "series_hint": rel_path.parts[0],
                             "old_path": db_ep.path,
                             "new_path": new_path,
-                            "merged": is_merge
+                            "merged": is_merge,
+                            "method": method
                         })
                     except Exception as e:
                         logger.error(f"Failed to migrate episode {db_ep.id}: {e}")
@@ -148,3 +175,37 @@ class DatabaseMigrator:
                 stats["missing_in_physical"].append(db_ep.path)
 
         return stats
+
+    @staticmethod
+    def _find_moved(db_ep: Episode, phys_by_identity: Dict[str, List[dict]], phys_filename_map: Dict[str, List[dict]],
+                    db_by_path: Dict[str, Episode], claimed: set) -> Tuple[Optional[dict], str]:
+        """Find the new location of an orphaned episode. Returns (physical episode, match method)."""
+        def available(pe):
+            if pe["path"] in claimed:
+                return False
+            # Skip files that belong to another DB row that still exists in place with different content
+            other = db_by_path.get(pe["path"])
+            return other is None or other.id == db_ep.id or not other.content_hash or other.content_hash == db_ep.content_hash
+
+        if db_ep.content_hash:
+            candidates = [pe for pe in phys_by_identity.get(db_ep.content_hash, []) if available(pe)]
+            if len(candidates) > 1:
+                # Identical copies: prefer the one keeping the filename, then the episode numbers
+                candidates.sort(key=lambda pe: (pe["filename"] != db_ep.filename,
+                                                pe["episode_number"] != db_ep.episode_number))
+            if candidates:
+                return candidates[0], "hash"
+
+        # Fall back to the filename for episodes that were never hashed
+        potential_matches = [pe for pe in phys_filename_map.get(db_ep.filename, []) if available(pe)]
+        if len(potential_matches) == 1:
+            # Unique filename in library! Highly likely it's the same file.
+            return potential_matches[0], "filename"
+        if len(potential_matches) > 1:
+            # Multiple files with same name? Try to match by season/episode numbers.
+            match = next((pe for pe in potential_matches
+                          if pe["season_number"] == db_ep.season_number
+                          and pe["episode_number"] == db_ep.episode_number), None)
+            if match:
+                return match, "filename"
+        return None, ""
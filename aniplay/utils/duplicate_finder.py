@@ -0,0 +1,205 @@
+# AniPlay - Personal media server and player for anime libraries.
+# Copyright (C) 2026  Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Find identical video files across the library and the downloads folder.
+
+Files are bucketed by size first, so most files are never read. Same-size
+candidates are compared by their partial content identity (the head/tail
+hash also stored on episodes, reused when the size still matches), and
+groups that agree are confirmed with a full hash. Paths that are already
+hardlinks of each other count as one file.
+
+Duplicates can be replaced by hardlinks to the kept copy or deleted. The
+kept copy is the one with watch progress, then one that is a library
+episode, then one outside DOWNLOADS_PATH.
+"""
+
+import asyncio
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ..config import DOWNLOADS_PATH, SCAN_WORKERS
+from ..database.db import DatabaseManager
+from .file_identity import CHUNK_SIZE, file_identity, full_hash
+from .file_scanner import FileScanner
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+MIN_SIZE = 1024 * 1024
+
+
+@dataclass
+class DuplicateGroup:
+    size: int
+    digest: str
+    paths: List[str]
+    keep: Optional[str] = None
+    episode_ids: Dict[str, int] = field(default_factory=dict)  # library episodes among paths
+
+    @property
+    def duplicates(self) -> List[str]:
+        return [p for p in self.paths if p != (self.keep or self.paths[0])]
+
+    @property
+    def reclaimable(self) -> int:
+        return self.size * (len(self.paths) - 1)
+
+
+def _group(items: Iterable[Tuple[str, Optional[str]]]) -> Dict[str, List[str]]:
+    """key -> paths for keys shared by more than one path."""
+    buckets = defaultdict(list)
+    for path, key in items:
+        if key:
+            buckets[key].append(path)
+    return {key: paths for key, paths in buckets.items() if len(paths) > 1}
+
+
+def find_duplicates(files: Iterable[Tuple[str, int]], known_hashes: Optional[Dict[str, str]] = None,
+                    workers: int = SCAN_WORKERS, min_size: int = MIN_SIZE, verify: bool = True,
+                    hashed: Optional[Dict[str, str]] = None) -> List[DuplicateGroup]:
+    """
+    Group identical files among (path, size) pairs, largest reclaimable space first.
+    known_hashes maps path -> stored content identity; identities computed here are
+    added to `hashed` if given. Without verify, matching partial hashes are trusted
+    for files too large to be hashed whole.
+    """
+    known_hashes = known_hashes or {}
+    by_size = defaultdict(list)
+    seen_inodes = set()
+    for path, size in files:
+        if size < min_size:
+            continue
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        inode = (st.st_dev, st.st_ino)
+        if inode in seen_inodes:
+            continue  # the same file under another name (hardlink), nothing to reclaim
+        seen_inodes.add(inode)
+        by_size[size].append(path)
+
+    candidates = [(path, size) for size, paths in by_size.items() if len(paths) > 1 for path in paths]
+    if not candidates:
+        return []
+
+    def identity(item):
+        path, size = item
+        known = known_hashes.get(path)
+        if known and known.startswith(f"{size}:"):
+            return path, known
+        ident = file_identity(path, size)
+        if ident and hashed is not None:
+            hashed[path] = ident
+        return path, ident
+
+    groups = []
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="duplicates") as pool:
+        for ident, paths in _group(pool.map(identity, candidates)).items():
+            size = int(ident.split(":", 1)[0])
+            if size <= 2 * CHUNK_SIZE or not verify:
+                # The partial hash already covers the whole file
+                groups.append(DuplicateGroup(size=size, digest=ident, paths=sorted(paths)))
+                continue
+            for digest, same in _group(pool.map(lambda p: (p, full_hash(p)), paths)).items():
+                groups.append(DuplicateGroup(size=size, digest=digest, paths=sorted(same)))
+    groups.sort(key=lambda g: (-g.reclaimable, g.paths[0]))
+    return groups
+
+
+def hardlink(keep: str, duplicate: str):
+    """Replace duplicate with a hardlink to keep. The swap is atomic, so duplicate is never missing."""
+    tmp = f"{duplicate}.aniplay-link"
+    os.link(keep, tmp)
+    try:
+        os.replace(tmp, duplicate)
+    except OSError:
+        os.unlink(tmp)
+        raise
+
+
+class DuplicateFinder:
+    def __init__(self, db: DatabaseManager, workers: int = SCAN_WORKERS):
+        self.db = db
+        self.workers = workers
+        self.scanner = FileScanner()
+
+    async def find(self, folders: Iterable[str], min_size: int = MIN_SIZE, verify: bool = True) -> List[DuplicateGroup]:
+        """Duplicate video files under the given folders, each with the copy to keep chosen."""
+        files = {}
+        for folder in folders:
+            if os.path.isdir(folder):
+                entries = await asyncio.to_thread(self.scanner.walk_video_entries, str(folder))
+                files.update((os.path.abspath(p), size) for p, size in entries)
+
+        episodes = {os.path.abspath(e.path): e for e in await self.db.get_all_episodes()}
+        known = {path: e.content_hash for path, e in episodes.items() if e.content_hash}
+        hashed = {}
+        groups = await asyncio.to_thread(find_duplicates, files.items(), known, self.workers, min_size, verify, hashed)
+
+        # Store new identities of library episodes so the next run (and move detection) can reuse them
+        updates = [(ident, episodes[path].id) for path, ident in hashed.items() if path in episodes]
+        if updates:
+            await self.db.update_episode_hashes(updates)
+
+        progress = {p.episode_id: p for p in await self.db.get_all_progress()}
+        downloads = os.path.abspath(DOWNLOADS_PATH) + os.sep
+        for group in groups:
+            group.episode_ids = {p: episodes[p].id for p in group.paths if p in episodes}
+
+            def rank(path):
+                watched = progress.get(group.episode_ids.get(path))
+                return (
+                    watched is None,
+                    not (watched and watched.completed),
+                    -(watched.timestamp if watched else 0),
+                    path not in group.episode_ids,
+                    path.startswith(downloads),
+                    path,
+                )
+            group.keep = min(group.paths, key=rank)
+        return groups
+
+    async def resolve(self, group: DuplicateGroup, mode: str = "hardlink", dry_run: bool = True) -> dict:
+        """
+        Hardlink ("hardlink") or delete ("delete") every copy but group.keep.
+        Deleted library episodes hand their watch progress to the kept episode when it has none.
+        """
+        if mode not in ("hardlink", "delete"):
+            raise ValueError(f"Unknown mode: {mode}")
+        results = {"done": [], "failed": [], "reclaimed": 0}
+        keep_id = group.episode_ids.get(group.keep)
+        for path in group.duplicates:
+            try:
+                if not dry_run:
+                    if mode == "hardlink":
+                        await asyncio.to_thread(hardlink, group.keep, path)
+                    else:
+                        await asyncio.to_thread(os.unlink, path)
+                        dup_id = group.episode_ids.get(path)
+                        if dup_id is not None:
+                            await self.db.drop_duplicate_episode(keep_id, dup_id)
+                results["done"].append(path)
+                results["reclaimed"] += group.size
+            except OSError as e:
+                logger.error(f"Failed to {mode} {path}: {e}")
+                results["failed"].append({"path": path, "error": str(e)})
+        return results
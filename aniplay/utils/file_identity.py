@@ -0,0 +1,84 @@
+# AniPlay - Personal media server and player for anime libraries.
+# Copyright (C) 2026  Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Content identity for video files: size plus a BLAKE2b digest of the first
+and last few MB. Cheap enough to compute for a whole library and stable
+across renames and moves, which lets us relink episodes to their new path.
+"""
+
+import hashlib
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def file_identity(path: str, size: Optional[int] = None, chunk_size: int = CHUNK_SIZE) -> Optional[str]:
+    """
+    Return "<size>:<hex digest>" for the file, or None if it cannot be read.
+    Only the head and tail chunks are read (through mmap), so cost is bounded per file.
+    """
+    try:
+        with open(path, "rb") as f:
+            if size is None:
+                size = os.fstat(f.fileno()).st_size
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(size.to_bytes(8, "little"))
+            if size > 0:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if size <= chunk_size * 2:
+                        digest.update(mm)
+                    else:
+                        digest.update(mm[:chunk_size])
+                        digest.update(mm[size - chunk_size:])
+        return f"{size}:{digest.hexdigest()}"
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not hash {path}: {e}")
+        return None
+
+
+def full_hash(path: str, block_size: int = 4 * CHUNK_SIZE) -> Optional[str]:
+    """BLAKE2b of the whole file (read through mmap), for confirming that two files are identical."""
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            digest = hashlib.blake2b(digest_size=16)
+            if size > 0:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    # Slices keep the memory bound; hashlib releases the GIL on large buffers
+                    for offset in range(0, size, block_size):
+                        digest.update(mm[offset:offset + block_size])
+        return f"{size}:{digest.hexdigest()}"
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not hash {path}: {e}")
+        return None
+
+
+def build_identity_index(files: Iterable[Tuple[str, int]], workers: int = 4) -> Dict[str, str]:
+    """Hash (path, size) pairs in a thread pool. Returns path -> identity for readable files."""
+    files = list(files)
+    if not files:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="identity") as pool:
+        identities = pool.map(lambda item: file_identity(item[0], item[1]), files)
+        return {path: ident for (path, _), ident in zip(files, identities) if ident}
@@ -17,72 +17,62 @@
 import os
 import re
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from ..config import VIDEO_EXTENSIONS
+from .release_parser import parse_release
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
 
 class FileScanner:
-    # Regex patterns for episode parsing
-    # 1. S01E01 / S1E1
-    # 2. 01 (just a number)
-    # 3. Episode 01
-    # 4. - 01
-    PATTERNS = [
-        re.compile(r'[Ss](\d+)[Ee](\d+)'),              # S01E01
-        re.compile(r' - (\d+)\b'),                      # - 01
-        re.compile(r'[Ee]pisode\s*(\d+)'),              # Episode 01
-        re.compile(r'\b(\d{1,3})\b'),                    # 01 (fallback)
-    ]
-
     @staticmethod
     def parse_episode_info(filename: str) -> Dict[str, Optional[int]]:
         """Extract season and episode number from filename."""
-        # Remove extension
-        name = os.path.splitext(filename)[0]
-        
-        season = None
-        episode = None
-
-        # Try S01E01 pattern first as it's most specific
-        match = FileScanner.PATTERNS[0].search(filename)
-        if match:
-            season = int(match.group(1))
-            episode = int(match.group(2))
-            return {"season": season, "episode": episode}
+        info = parse_release(filename)
+        # Season folders ("Season 1") are handled in scan_series_folder
+        return {"season": info.season, "episode": info.episode}
 
-        # Try other patterns for episode number
-        for i in range(1, len(FileScanner.PATTERNS)):
-            match = FileScanner.PATTERNS[i].search(filename)
-            if match:
-                # If found multiple numbers in a generic pattern, it might be tricky
-                # But usually the first one after Name - is the episode
-                episode = int(match.group(1))
-                break
-        
-        # Try to find season if it's in the path (e.g. "Season 1")
-        # This will be handled in scan_directory
-        
-        return {"season": season, "episode": episode}
+    @staticmethod
+    def walk_video_entries(directory: str, counters: Optional[Dict[str, int]] = None) -> List[Tuple[str, int]]:
+        """
+        Recursively collect (path, size) for every video file under directory.
+        Uses a single os.scandir pass so the size comes from the DirEntry
+        instead of a separate os.path.getsize per file.
+        If given, counters gets "dirs_listed" and "stats" added.
+        """
+        results = []
+        stack = [directory]
+        dirs_listed = 0
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as it:
+                    dirs_listed += 1
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            elif os.path.splitext(entry.name)[1].lower() in VIDEO_EXTENSIONS:
+                                results.append((entry.path, entry.stat().st_size))
+                        except OSError as e:
+                            logger.warning(f"Could not stat {entry.path}: {e}")
+            except OSError as e:
+                logger.warning(f"Could not list {current}: {e}")
+        results.sort()
+        if counters is not None:
+            counters["dirs_listed"] = counters.get("dirs_listed", 0) + dirs_listed
+            counters["stats"] = counters.get("stats", 0) + len(results)
+        return results
 
     @staticmethod
     def get_video_files(directory: str) -> List[Path]:
         """Get all video files in a directory (recursive)."""
-        video_files = []
-        path = Path(directory)
-        
-        if not path.exists():
+        if not os.path.isdir(directory):
             return []
-
-        for ext in VIDEO_EXTENSIONS:
-            video_files.extend(path.rglob(f"*{ext}"))
-            video_files.extend(path.rglob(f"*{ext.upper()}"))
-            
-        return sorted(list(set(video_files)))
+        return [Path(p) for p, _ in FileScanner.walk_video_entries(directory)]
 
     @staticmethod
-    def scan_series_folder(series_path: str) -> List[Dict[str, Any]]:
+    def scan_series_folder(series_path: str, counters: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
         """
         Scan a single series folder.
         Handles:
@@ -93,7 +83,8 @@ class FileScanner:
         episodes = []
         base_path = Path(series_path)
         
-        for file_path in FileScanner.get_video_files(series_path):
+        for path_str, size in FileScanner.walk_video_entries(series_path, counters):
+            file_path = Path(path_str)
             relative_path = file_path.relative_to(base_path)
             parts = relative_path.parts
             
@@ -115,7 +106,8 @@ class FileScanner:
                 "path": str(file_path),
                 "episode_number": info["episode"],
                 "season_number": info["season"],
-                "folder_name": folder_name
+                "folder_name": folder_name,
+                "size_bytes": size
             })
             
         logger.debug(f"Scan complete. Found {len(episodes)} episodes.")
@@ -16,6 +16,7 @@
 
 import json
 import logging
+import os
 import subprocess
 from typing import Dict, Any, List, Optional
 from dataclasses import dataclass
@@ -41,6 +42,21 @@ class MediaMetadata:
 class MediaAnalyzer:
     @staticmethod
     def probe_file(file_path: str) -> Optional[MediaMetadata]:
+        """
+        Extract tracks and duration from a media file.
+        MP4/MOV files are parsed natively first; anything else (or a failed parse) goes to ffprobe.
+        """
+        from .mp4_parser import Mp4Parser
+        if os.path.splitext(file_path)[1].lower() in Mp4Parser.EXTENSIONS:
+            metadata = Mp4Parser.parse(file_path)
+            if metadata:
+                logger.debug(f"Parsed {len(metadata.tracks)} streams natively for {file_path}")
+                return metadata
+            logger.debug(f"Falling back to ffprobe for {file_path}")
+        return MediaAnalyzer.ffprobe_file(file_path)
+
+    @staticmethod
+    def ffprobe_file(file_path: str) -> Optional[MediaMetadata]:
         """Use ffprobe to extract tracks and duration from a media file."""
         logger.debug(f"Probing file: {file_path}")
         cmd = [
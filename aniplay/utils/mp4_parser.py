@@ -0,0 +1,285 @@
+# AniPlay - Personal media server and player for anime libraries.
+# Copyright (C) 2026  Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Minimal ISO-BMFF (MP4/MOV) box walker.
+Reads only the box headers needed to locate `moov` and then parses
+mvhd/mdhd/hdlr/stsd to build the same MediaMetadata that ffprobe gives us.
+"""
+
+import os
+import struct
+from typing import Iterator, List, Optional, Tuple, BinaryIO
+
+from .logger import get_logger
+from .media_analyzer import MediaMetadata, TrackInfo
+
+logger = get_logger(__name__)
+
+# Refuse to load absurd moov boxes into memory (corrupt size field)
+_MAX_MOOV_SIZE = 64 * 1024 * 1024
+
+# hdlr handler_type -> track type used by MediaAnalyzer
+_HANDLER_TYPES = {
+    b"vide": "video",
+    b"soun": "audio",
+    b"sbtl": "subtitle",
+    b"subt": "subtitle",
+    b"text": "subtitle",
+    b"clcp": "subtitle",
+}
+
+# stsd sample entry fourcc -> ffprobe codec_name
+_CODEC_NAMES = {
+    b"avc1": "h264", b"avc3": "h264",
+    b"hvc1": "hevc", b"hev1": "hevc",
+    b"av01": "av1", b"vp09": "vp9", b"vp08": "vp8",
+    b"mp4v": "mpeg4",
+    b"mp4a": "aac",
+    b"ac-3": "ac3", b"ec-3": "eac3",
+    b"Opus": "opus", b"fLaC": "flac",
+    b".mp3": "mp3", b"alac": "alac",
+    b"tx3g": "mov_text", b"text": "mov_text",
+    b"wvtt": "webvtt", b"stpp": "ttml",
+    b"c608": "eia_608",
+}
+
+# esds objectTypeIndication values that are not AAC
+_MP4A_OBJECT_TYPES = {0x69: "mp3", 0x6B: "mp3", 0xA9: "dts", 0xA5: "ac3", 0xA6: "eac3"}
+
+
+class Mp4ParseError(Exception):
+    pass
+
+
+def _iter_boxes(data: bytes, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[bytes, int, int]]:
+    """Yield (type, payload_start, payload_end) for boxes inside an in-memory buffer."""
+    pos = start
+    end = len(data) if end is None else end
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, pos)
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                raise Mp4ParseError("Truncated largesize header")
+            size = struct.unpack_from(">Q", data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            raise Mp4ParseError(f"Invalid size for box {box_type!r}")
+        yield box_type, pos + header, pos + size
+        pos += size
+
+
+def _find_child(data: bytes, start: int, end: int, box_type: bytes) -> Optional[Tuple[int, int]]:
+    for t, s, e in _iter_boxes(data, start, end):
+        if t == box_type:
+            return s, e
+    return None
+
+
+def _decode_language(packed: int) -> str:
+    """ISO-639-2/T packed into 15 bits (3 x 5 bits, offset 0x60)."""
+    if packed in (0, 0x7FFF):
+        return "und"
+    chars = [((packed >> shift) & 0x1F) + 0x60 for shift in (10, 5, 0)]
+    if not all(0x61 <= c <= 0x7A for c in chars):
+        return "und"
+    return bytes(chars).decode("ascii")
+
+
+class Mp4Parser:
+    EXTENSIONS = {".mp4", ".m4v", ".mov"}
+
+    @staticmethod
+    def find_moov(f: BinaryIO, file_size: int) -> bytes:
+        """
+        Walk top-level box headers, seeking over everything (notably mdat)
+        until moov is found. Works whether moov is before or after mdat.
+        """
+        pos = 0
+        while pos + 8 <= file_size:
+            f.seek(pos)
+            header = f.read(16)
+            if len(header) < 8:
+                break
+            size, box_type = struct.unpack_from(">I4s", header, 0)
+            header_size = 8
+            if size == 1:
+                if len(header) < 16:
+                    break
+                size = struct.unpack_from(">Q", header, 8)[0]
+                header_size = 16
+            elif size == 0:
+                size = file_size - pos
+            if size < header_size:
+                raise Mp4ParseError(f"Invalid top-level box size at {pos}")
+
+            if box_type == b"moov":
+                payload_size = size - header_size
+                if payload_size > _MAX_MOOV_SIZE:
+                    raise Mp4ParseError("moov box too large")
+                f.seek(pos + header_size)
+                payload = f.read(payload_size)
+                if len(payload) != payload_size:
+                    raise Mp4ParseError("Truncated moov box")
+                return payload
+            pos += size
+        raise Mp4ParseError("No moov box found")
+
+    @staticmethod
+    def _parse_mvhd(data: bytes, s: int) -> Tuple[int, int]:
+        version = data[s]
+        if version == 1:
+            timescale, duration = struct.unpack_from(">IQ", data, s + 20)
+        else:
+            timescale, duration = struct.unpack_from(">II", data, s + 12)
+        return timescale, duration
+
+    @staticmethod
+    def _parse_mdhd(data: bytes, s: int) -> Tuple[int, int, str]:
+        version = data[s]
+        if version == 1:
+            timescale, duration = struct.unpack_from(">IQ", data, s + 20)
+            lang_offset = s + 32
+        else:
+            timescale, duration = struct.unpack_from(">II", data, s + 12)
+            lang_offset = s + 20
+        packed = struct.unpack_from(">H", data, lang_offset)[0]
+        return timescale, duration, _decode_language(packed)
+
+    @staticmethod
+    def _parse_codec(data: bytes, stbl: Tuple[int, int]) -> str:
+        stsd = _find_child(data, stbl[0], stbl[1], b"stsd")
+        if not stsd:
+            return ""
+        # version/flags (4) + entry_count (4), then the first sample entry box
+        entries_start = stsd[0] + 8
+        for fourcc, es, ee in _iter_boxes(data, entries_start, stsd[1]):
+            codec = _CODEC_NAMES.get(fourcc, fourcc.decode("latin-1").strip())
+            if fourcc == b"mp4a":
+                codec = Mp4Parser._mp4a_codec(data, es, ee) or codec
+            return codec
+        return ""
+
+    @staticmethod
+    def _mp4a_codec(data: bytes, es: int, ee: int) -> Optional[str]:
+        # AudioSampleEntry has a fixed 28 byte body before child boxes
+        try:
+            esds = _find_child(data, es + 28, ee, b"esds")
+        except Mp4ParseError:
+            return None
+        if not esds:
+            return None
+        # Look for the DecoderConfigDescriptor (tag 0x04); OTI is the byte after its length
+        body = data[esds[0] + 4:esds[1]]
+        idx = body.find(b"\x04")
+        while idx != -1:
+            p = idx + 1
+            while p < len(body) and body[p] & 0x80:
+                p += 1
+            p += 1
+            if p < len(body):
+                return _MP4A_OBJECT_TYPES.get(body[p], "aac")
+            idx = body.find(b"\x04", idx + 1)
+        return None
+
+    @staticmethod
+    def _parse_track_name(data: bytes, trak: Tuple[int, int]) -> Optional[str]:
+        udta = _find_child(data, trak[0], trak[1], b"udta")
+        if not udta:
+            return None
+        name = _find_child(data, udta[0], udta[1], b"name")
+        if not name:
+            return None
+        text = data[name[0]:name[1]].split(b"\x00", 1)[0]
+        return text.decode("utf-8", errors="replace").strip() or None
+
+    @classmethod
+    def parse_moov(cls, moov: bytes) -> MediaMetadata:
+        """Turn a moov payload into MediaMetadata (same shape as the ffprobe path)."""
+        movie_duration = 0.0
+        mvhd = _find_child(moov, 0, len(moov), b"mvhd")
+        if mvhd:
+            timescale, duration = cls._parse_mvhd(moov, mvhd[0])
+            if timescale:
+                movie_duration = duration / timescale
+
+        tracks: List[TrackInfo] = []
+        track_durations = []
+        sub_count = 0
+        stream_index = 0
+        for box_type, s, e in _iter_boxes(moov):
+            if box_type != b"trak":
+                continue
+            index = stream_index
+            stream_index += 1
+
+            mdia = _find_child(moov, s, e, b"mdia")
+            if not mdia:
+                continue
+            hdlr = _find_child(moov, mdia[0], mdia[1], b"hdlr")
+            if not hdlr:
+                continue
+            handler = moov[hdlr[0] + 8:hdlr[0] + 12]
+            codec_type = _HANDLER_TYPES.get(handler)
+            if codec_type is None:
+                continue
+
+            language = "und"
+            mdhd = _find_child(moov, mdia[0], mdia[1], b"mdhd")
+            if mdhd:
+                timescale, duration, language = cls._parse_mdhd(moov, mdhd[0])
+                if timescale:
+                    track_durations.append(duration / timescale)
+
+            codec = ""
+            minf = _find_child(moov, mdia[0], mdia[1], b"minf")
+            if minf:
+                stbl = _find_child(moov, minf[0], minf[1], b"stbl")
+                if stbl:
+                    codec = cls._parse_codec(moov, stbl)
+
+            title = cls._parse_track_name(moov, (s, e)) or f"{codec_type.capitalize()} {index}"
+            track = TrackInfo(index=index, type=codec_type, codec=codec, language=language, title=title)
+            if codec_type == "subtitle":
+                track.sub_index = sub_count
+                sub_count += 1
+            tracks.append(track)
+
+        if movie_duration <= 0 and track_durations:
+            movie_duration = max(track_durations)
+        if movie_duration <= 0:
+            # Fragmented files keep their duration in moof boxes; leave those to ffprobe
+            raise Mp4ParseError("No usable duration in moov")
+
+        return MediaMetadata(duration=movie_duration, tracks=tracks)
+
+    @classmethod
+    def parse(cls, file_path: str) -> Optional[MediaMetadata]:
+        """
+        Parse an MP4/MOV file natively.
+        Returns MediaMetadata, or None if the file could not be parsed.
+        """
+        try:
+            file_size = os.path.getsize(file_path)
+            with open(file_path, "rb") as f:
+                moov = cls.find_moov(f, file_size)
+            return cls.parse_moov(moov)
+        except (OSError, struct.error, Mp4ParseError) as e:
+            logger.debug(f"Native MP4 parse failed for {file_path}: {e}")
+            return None
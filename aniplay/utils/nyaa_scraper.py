@@ -8,10 +8,10 @@
 
 import httpx
 import xml.etree.ElementTree as ET
-import re
 import hashlib
 from typing import List, Dict, Any, Optional
 from .logger import get_logger
+from .release_parser import parse_release
 
 logger = get_logger(__name__)
 
@@ -31,11 +31,7 @@ class NyaaScraper:
 
     def _clean_name(self, title: str) -> str:
         """Strips tags and brackets to get the series name."""
-        cleaned = re.sub(r'\[.*?\]|\(.*?\)', '', title).strip()
-        # Also strip episode numbers like " - 01" at the end
-        cleaned = re.sub(r'\s+-\s+\d+.*$', '', cleaned).strip()
-        cleaned = re.sub(r'\s+\d+.*$', '', cleaned).strip() # Fallback for space-separated
-        return cleaned if cleaned else title
+        return parse_release(title).title or title
 
     async def _fetch_raw_results(self, query: str) -> List[Dict[str, Any]]:
         """Internal method to get raw torrent list from Nyaa."""
@@ -108,19 +104,8 @@ class NyaaScraper:
 
     def _extract_episode(self, title: str, series_name: str) -> str:
         """Extracts episode number from title."""
-        # Try to find number after " - "
-        match = re.search(r' - (\d+)', title)
-        if match: return str(int(match.group(1)))
-        
-        # Try to find number after "Episode "
-        match = re.search(r'Episode\s+(\d+)', title, re.I)
-        if match: return str(int(match.group(1)))
-        
-        # Try to find any stand-alone number
-        match = re.search(r'\s(\d{1,3})\s', title)
-        if match: return str(int(match.group(1)))
-        
-        return "1"
+        episode = parse_release(title).episode
+        return str(episode) if episode is not None else "1"
 
     async def get_episodes(self, show_id: str, show_name: str = None) -> List[str]:
         """Returns a list of unique episode numbers for the series."""
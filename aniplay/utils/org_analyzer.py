@@ -16,61 +16,72 @@
 
 import os
 import re
-from pathlib import Path
-from typing import List, Dict, Any, Optional
+from collections import defaultdict
+from typing import List, Dict, Any, Iterable, Optional
 from .file_scanner import FileScanner
-from ..config import VIDEO_EXTENSIONS
+
+SEASON_FOLDER = re.compile(r'^([Ss]eason\s*\d+|[Ss]pecials)$')
 
 class OrgAnalyzer:
     def __init__(self):
         self.scanner = FileScanner()
 
-    def analyze_series(self, series_path: str) -> Dict[str, Any]:
+    def analyze_series(self, series_path: str, files: Optional[Iterable[str]] = None) -> Dict[str, Any]:
         """
         Analyze a series folder for organization issues.
         Returns a dictionary with issues found.
+        files are the video paths relative to series_path (e.g. from the last scan);
+        without them the folder is walked once.
         """
-        base_path = Path(series_path)
+        if files is None:
+            if not os.path.isdir(series_path):
+                return {"status": "empty", "issues": []}
+            files = [os.path.relpath(p, series_path) for p, _ in self.scanner.walk_video_entries(series_path)]
+        return self.analyze_files(files)
+
+    def analyze_files(self, files: Iterable[str]) -> Dict[str, Any]:
+        """The checks of analyze_series on relative video paths; does not touch the disk."""
         issues = []
-        
-        # 1. Get all video files
-        all_videos = self.scanner.get_video_files(series_path)
-        if not all_videos:
+
+        # 1. Group videos by folder in one pass
+        by_folder: Dict[str, List[str]] = defaultdict(list)  # relative folder ("" for the root) -> filenames
+        for rel in sorted(os.path.normpath(f) for f in files):
+            folder, name = os.path.split(rel)
+            by_folder[folder].append(name)
+        if not by_folder:
             return {"status": "empty", "issues": []}
+        total_videos = sum(len(names) for names in by_folder.values())
 
         # 2. Check for loose files vs folders
-        root_videos = [v for v in all_videos if v.parent == base_path]
-        subfolder_videos = [v for v in all_videos if v.parent != base_path]
-        
-        subfolders = [f for f in base_path.iterdir() if f.is_dir()]
-        media_subfolders = []
-        for sf in subfolders:
-            if any(v.is_relative_to(sf) for v in subfolder_videos):
-                media_subfolders.append(sf)
+        root_videos = by_folder.get("", [])
+        media_subfolders = sorted({folder.split(os.sep, 1)[0] for folder in by_folder if folder})
 
         if root_videos and media_subfolders:
             issues.append({
                 "type": "mixed_content",
                 "message": f"Found {len(root_videos)} videos in root and {len(media_subfolders)} subfolders containing media.",
-                "files": [v.name for v in root_videos[:3]]
+                "files": root_videos[:3]
             })
 
         # 3. Check subfolder names
         for sf in media_subfolders:
             # Standard: "Season X" or "Specials"
-            if not re.match(r'^([Ss]eason\s*\d+|[Ss]pecials)$', sf.name):
+            if not SEASON_FOLDER.match(sf):
                 issues.append({
                     "type": "non_standard_folder",
-                    "message": f"Subfolder '{sf.name}' does not follow 'Season X' or 'Specials' naming convention.",
-                    "folder": sf.name
+                    "message": f"Subfolder '{sf}' does not follow 'Season X' or 'Specials' naming convention.",
+                    "folder": sf
                 })
 
+        # Parse every filename once; checks 4 and 5 both use the season
+        folder_to_seasons: Dict[str, set] = {}
+        for folder, names in by_folder.items():
+            seasons = {self.scanner.parse_episode_info(name)["season"] for name in names} - {None}
+            if seasons:
+                folder_to_seasons[folder or "."] = seasons
+
         # 4. Check for multiple seasons without season folders
-        seasons_found = set()
-        for video in all_videos:
-            info = self.scanner.parse_episode_info(video.name)
-            if info["season"] is not None:
-                seasons_found.add(info["season"])
+        seasons_found = set().union(*folder_to_seasons.values())
         
         if len(seasons_found) > 1 and not media_subfolders:
             issues.append({
@@ -87,15 +98,6 @@ class OrgAnalyzer:
             })
 
         # 5. Check for inconsistent seasons in a folder
-        folder_to_seasons = {}
-        for video in all_videos:
-            rel_folder = video.parent.relative_to(base_path)
-            info = self.scanner.parse_episode_info(video.name)
-            if info["season"] is not None:
-                if str(rel_folder) not in folder_to_seasons:
-                    folder_to_seasons[str(rel_folder)] = set()
-                folder_to_seasons[str(rel_folder)].add(info["season"])
-        
         for folder, seasons in folder_to_seasons.items():
             if len(seasons) > 1:
                 issues.append({
@@ -108,7 +110,7 @@ class OrgAnalyzer:
         return {
             "status": "issues" if issues else "ok",
             "issues": issues,
-            "total_videos": len(all_videos),
+            "total_videos": total_videos,
             "root_videos": len(root_videos),
-            "media_folders": [sf.name for sf in media_subfolders]
+            "media_folders": media_subfolders
         }
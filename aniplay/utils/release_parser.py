@@ -0,0 +1,493 @@
+# AniPlay - Personal media server and player for anime libraries.
+# Copyright (C) 2026  Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Release-name tokenizer shared by the library scanner, title extraction,
+Nyaa grouping and download imports.
+
+A name is split once into bracket groups, words and " - " separators.
+Words are classified (episode markers, season markers, resolution, codec,
+source tags...) and the title is whatever comes before the episode anchor.
+Results are memoized, so parsing the same filename repeatedly is free.
+"""
+
+import os
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Tuple
+
+from ..config import VIDEO_EXTENSIONS
+
+_STRIP_EXTENSIONS = VIDEO_EXTENSIONS | {".torrent"}
+_BRACKETS = {"[": "]", "(": ")", "{": "}", "【": "】"}
+_DASHES = {"-", "–", "—", "~"}
+
+WORD, BRACKET, DASH = "word", "bracket", "dash"
+
+
+class _Token(NamedTuple):
+    kind: str
+    text: str
+
+
+@dataclass(frozen=True)
+class ReleaseInfo:
+    group: Optional[str] = None
+    title: Optional[str] = None
+    season: Optional[int] = None
+    episode: Optional[int] = None
+    episode_end: Optional[int] = None  # last episode of a range/batch
+    episode_decimal: Optional[float] = None  # 12.5 for a "12.5" special; episode is then 12
+    episode_title: Optional[str] = None
+    version: Optional[int] = None
+    resolution: Optional[str] = None
+    codec: Optional[str] = None
+    crc: Optional[str] = None
+
+
+# Episode markers
+_SXXEYY = re.compile(r"^S(\d{1,2})[ ._]?E(\d{1,4})(?:v(\d))?(?:[-~]?E(\d{1,4})(?:v(\d))?)?$", re.I)
+_NXNN = re.compile(r"^(\d{1,2})x(\d{2,3})$", re.I)
+_EP_PREFIXED = re.compile(r"^(?:episode|E|EP|Ep\.?)(\d{1,4})(?:v(\d))?$", re.I)
+_EP_WORDS = {"episode", "ep", "ep.", "e"}
+_NUMBER = re.compile(r"^#?(\d{1,4})(?:v(\d))?$")
+_DECIMAL = re.compile(r"^#?(\d{1,4})\.(\d)$")  # "12.5" specials
+_LEADING = re.compile(r"^(\d{1,4})\.$")  # "01. Title" as the first word
+_WORD_DOT = re.compile(r"(?<!\d)\.|\.(?!\d)|(?<=\d\d)\.|\.(?=\d\d)")
+_RANGE = re.compile(r"^(\d{1,4})\s*[-~]\s*(\d{1,4})$")
+_GLUED_EPISODE = re.compile(r"^(S\d{1,2}E\d{1,4}(?:v\d)?|E[Pp]?\d{1,4}(?:v\d)?|\d{1,4}(?:v\d)?)-(.+)$", re.I)
+
+# Season markers
+_SEASON_SHORT = re.compile(r"^S(\d{1,2})$", re.I)
+_ORDINAL = re.compile(r"^(\d{1,2})(?:st|nd|rd|th)$", re.I)
+
+# Metadata
+_RESOLUTION = re.compile(r"^(\d{3,4})[pi]$", re.I)
+_DIMENSIONS = re.compile(r"^\d{3,4}[x×](\d{3,4})$", re.I)
+_CRC = re.compile(r"^[0-9A-F]{8}$", re.I)
+_VERSION = re.compile(r"^v(\d)$", re.I)
+_YEAR = re.compile(r"^(19|20)\d\d$")
+_AUDIO = re.compile(r"^(?:ddp?|aac|e?ac-?3|flac|opus|dts(?:-hd)?|truehd|mp3|lpcm)(?:\d(?:\.\d)?)?$|^\d\.\d$", re.I)
+_BIT_DEPTH = re.compile(r"^(?:\d{1,2}-?bits?|hi10p?|hi444p?)$", re.I)
+_CODECS = {
+    "x264": "h264", "h264": "h264", "h.264": "h264", "avc": "h264",
+    "x265": "hevc", "h265": "hevc", "h.265": "hevc", "hevc": "hevc",
+    "av1": "av1", "vp9": "vp9", "xvid": "xvid", "divx": "divx",
+}
+_SOURCES = {
+    "bd", "bdrip", "bluray", "blu-ray", "bdremux", "remux", "web-dl", "webdl", "webrip",
+    "web-rip", "hdtv", "hdtvrip", "dvd", "dvdrip", "tvrip", "uncensored", "uncen",
+    "hdr", "hdr10", "sdr", "dual-audio", "multi-sub", "multisub", "multi-subs",
+}
+# Only treated as metadata inside brackets, since they also appear in titles
+_BRACKET_ONLY = {"tv", "raw", "dual", "audio", "eng", "sub", "subs", "multi", "end", "fin", "uhd", "4k"}
+# Sources that are also ordinary words ("The Complete Story", "Web of Lies"): metadata inside
+# brackets, at the end of the name or next to other metadata (1080p.WEB.x264)
+_SOURCE_WORDS = {"web", "batch", "complete"}
+
+
+def _normalize_resolution(word: str) -> Optional[str]:
+    m = _RESOLUTION.match(word)
+    if m:
+        return f"{m.group(1)}p"
+    m = _DIMENSIONS.match(word)
+    if m:
+        return f"{m.group(1)}p"
+    if word.lower() in ("4k", "uhd"):
+        return "2160p"
+    return None
+
+
+@lru_cache(maxsize=4096)
+def _meta(word: str, in_bracket: bool = False) -> Optional[Tuple[str, object]]:
+    """Classify a metadata word. Returns (field, value) or None for ordinary words."""
+    lower = word.lower()
+    resolution = _normalize_resolution(word)
+    if resolution and (in_bracket or lower not in ("4k", "uhd")):
+        return "resolution", resolution
+    if lower in _CODECS:
+        return "codec", _CODECS[lower]
+    m = _VERSION.match(word)
+    if m:
+        return "version", int(m.group(1))
+    if lower in _SOURCES or _AUDIO.match(word) or _BIT_DEPTH.match(word):
+        return "tag", lower
+    if in_bracket:
+        if _CRC.match(word) and not word.isdigit():
+            return "crc", word.upper()
+        if lower in _BRACKET_ONLY or lower in _SOURCE_WORDS:
+            return "tag", lower
+    return None
+
+
+def _split_words(chunk: str, separator: Optional[str]) -> List[_Token]:
+    if separator == ".":
+        # Dots separate words, except inside channel layouts such as 5.1 or 2.0
+        chunk = _WORD_DOT.sub(" ", chunk)
+    else:
+        chunk = chunk.replace("_", " ")
+
+    tokens: List[_Token] = []
+    for word in chunk.split():
+        if word in _DASHES:
+            tokens.append(_Token(DASH, word))
+            continue
+        if tokens and tokens[-1].kind == WORD and tokens[-1].text.upper() == "H" and word[:3] in ("264", "265"):
+            tokens[-1] = _Token(WORD, "H" + word)
+            continue
+        glued = _GLUED_EPISODE.match(word)
+        if glued and not _meta(word) and not _RANGE.match(word) and not _SXXEYY.match(word):
+            # "S01E01-Title" / "01-Title": the dash separates the episode title
+            tokens.append(_Token(WORD, glued.group(1)))
+            tokens.append(_Token(DASH, "-"))
+            tokens.append(_Token(WORD, glued.group(2)))
+            continue
+        tokens.append(_Token(WORD, word.strip(",")))
+    return [t for t in tokens if t.text]
+
+
+def _tokenize(name: str) -> List[_Token]:
+    """Split a release name into bracket groups, words and dash separators."""
+    outside = re.sub(r"\[.*?\]|\(.*?\)|\{.*?\}|【.*?】", "", name).strip()
+    # Names without spaces use underscores or, failing that, dots as word separators
+    separator = None
+    if " " not in outside:
+        separator = "_" if "_" in outside else "." if "." in outside else None
+
+    tokens: List[_Token] = []
+    buf_start = 0
+    i = 0
+    while i < len(name):
+        close_char = _BRACKETS.get(name[i])
+        if close_char:
+            close = name.find(close_char, i + 1)
+            if close != -1:
+                tokens.extend(_split_words(name[buf_start:i], separator))
+                tokens.append(_Token(BRACKET, name[i + 1:close].strip()))
+                i = buf_start = close + 1
+                continue
+        i += 1
+    tokens.extend(_split_words(name[buf_start:], separator))
+    return tokens
+
+
+class _Parse:
+    """Mutable scratch state for a single parse."""
+
+    def __init__(self, tokens: List[_Token]):
+        self.tokens = tokens
+        self.fields = {}
+        self.consumed = set()  # token indices that are markers, never title words
+
+    def set(self, field: str, value):
+        if value is not None and self.fields.get(field) is None:
+            self.fields[field] = value
+
+    # Bracket groups
+
+    def scan_brackets(self):
+        for i, tok in enumerate(self.tokens):
+            if tok.kind != BRACKET or not tok.text:
+                continue
+            text = tok.text
+            m_range = _RANGE.match(text)
+            m_number = _NUMBER.match(text) or _EP_PREFIXED.match(text)
+            parts = [p for p in re.split(r"[\s,_+/|]+", text) if p]
+            metas = [_meta(p, in_bracket=True) for p in parts]
+
+            if i == 0 and not all(metas) and not m_number and not m_range:
+                self.set("group", text)
+            elif m_range:
+                self.fields.setdefault("bracket_episode", (int(m_range.group(1)), int(m_range.group(2)), None))
+            elif m_number and not _YEAR.match(text):
+                self.fields.setdefault("bracket_episode", (int(m_number.group(1)), None, m_number.group(2)))
+            else:
+                season = _season_from_words(parts)
+                if season is not None:
+                    self.set("season", season)
+            for meta in metas:
+                if meta and meta[0] != "tag":
+                    self.set(*meta)
+
+    # Word stream
+
+    def words(self):
+        return [(i, t) for i, t in enumerate(self.tokens) if t.kind == WORD]
+
+    def next_word(self, i: int) -> Optional[Tuple[int, str]]:
+        if i + 1 < len(self.tokens) and self.tokens[i + 1].kind == WORD:
+            return i + 1, self.tokens[i + 1].text
+        return None
+
+    def scan_markers(self) -> Optional[int]:
+        """Find season markers and the episode anchor. Returns the anchor token index."""
+        explicit = None  # (index, episode, end, version, decimal)
+        dashed = None
+        leading = self.leading_number()
+        bare = []
+
+        for i, tok in enumerate(self.tokens):
+            if tok.kind == DASH:
+                nxt = self.next_word(i)
+                if dashed is None and nxt and i not in self.consumed:
+                    m = _NUMBER.match(nxt[1]) or _RANGE.match(nxt[1]) or _DECIMAL.match(nxt[1])
+                    if m and not _YEAR.match(nxt[1]):
+                        if m.re is _RANGE:
+                            dashed = (nxt[0], int(m.group(1)), int(m.group(2)), None, None)
+                        elif m.re is _DECIMAL:
+                            dashed = (nxt[0], int(m.group(1)), None, None, float(nxt[1].lstrip("#")))
+                        else:
+                            dashed = (nxt[0], int(m.group(1)), self.spaced_range_end(nxt[0], int(m.group(1))),
+                                      m.group(2), None)
+                continue
+            if tok.kind != WORD:
+                continue
+            text = tok.text
+            lower = text.lower()
+
+            m = _SXXEYY.match(text)
+            if m:
+                self.set("season", int(m.group(1)))
+                if explicit is None:
+                    end = int(m.group(4)) if m.group(4) else None
+                    explicit = (i, int(m.group(2)), end, m.group(3) or m.group(5), None)
+                continue
+            m = _NXNN.match(text)
+            if m and not _DIMENSIONS.match(text):
+                self.set("season", int(m.group(1)))
+                if explicit is None:
+                    explicit = (i, int(m.group(2)), None, None, None)
+                continue
+            m = _EP_PREFIXED.match(text)
+            if m:
+                if explicit is None:
+                    explicit = (i, int(m.group(1)), None, m.group(2), None)
+                continue
+            if lower in _EP_WORDS:
+                nxt = self.next_word(i)
+                m = (_NUMBER.match(nxt[1]) or _DECIMAL.match(nxt[1])) if nxt else None
+                if m:
+                    self.consumed.add(i)
+                    if explicit is None:
+                        if m.re is _DECIMAL:
+                            explicit = (nxt[0], int(m.group(1)), None, None, float(nxt[1].lstrip("#")))
+                        else:
+                            explicit = (nxt[0], int(m.group(1)), None, m.group(2), None)
+                continue
+
+            m = _SEASON_SHORT.match(text)
+            if m:
+                self.set("season", int(m.group(1)))
+                self.consumed.add(i)
+                continue
+            if lower == "season":
+                nxt = self.next_word(i)
+                if nxt and nxt[1].isdigit():
+                    self.set("season", int(nxt[1]))
+                    self.consumed.update((i, nxt[0]))
+                    continue
+                prev = self.tokens[i - 1] if i > 0 else None
+                m = _ORDINAL.match(prev.text) if prev and prev.kind == WORD else None
+                if m:
+                    self.set("season", int(m.group(1)))
+                    self.consumed.update((i - 1, i))
+                continue
+
+            if i not in self.consumed and not _YEAR.match(text) and (
+                    _NUMBER.match(text) or _RANGE.match(text) or (_DECIMAL.match(text) and not _meta(text))):
+                bare.append(i)
+
+        anchor = explicit or dashed or leading
+        if anchor is None and "bracket_episode" in self.fields:
+            # "[Group] 86 [05]": a bracketed number beats a bare number in the title
+            episode, end, version = self.fields["bracket_episode"]
+            self.set("episode", episode)
+            self.set("episode_end", end)
+            self.set("version", int(version) if version else None)
+            return None
+        if anchor is None and bare:
+            # Prefer the last number before the metadata starts ("Mob Psycho 100 05")
+            stop = self.meta_start()
+            candidates = [i for i in bare if i < stop] or bare
+            i = candidates[-1]
+            text = self.tokens[i].text
+            m = _NUMBER.match(text)
+            if m:
+                anchor = (i, int(m.group(1)), None, m.group(2), None)
+            elif _DECIMAL.match(text):
+                anchor = (i, int(_DECIMAL.match(text).group(1)), None, None, float(text.lstrip("#")))
+            else:
+                m = _RANGE.match(text)  # "Show 01~12"
+                anchor = (i, int(m.group(1)), int(m.group(2)), None, None)
+        if anchor is None:
+            return None
+
+        index, episode, end, version, decimal = anchor
+        self.set("episode", episode)
+        self.set("episode_end", end)
+        self.set("version", int(version) if version else None)
+        self.set("episode_decimal", decimal)
+        return index
+
+    def leading_number(self):
+        """
+        Episode anchor for names that start with the number, "01. Title" / "01 - Title",
+        as files inside a series folder often do. Ranks below " - 05", so "86 - 05" stays episode 5.
+        """
+        i = 1 if self.tokens and self.tokens[0].kind == BRACKET and self.fields.get("group") else 0
+        if i >= len(self.tokens) or self.tokens[i].kind != WORD:
+            return None
+        text = self.tokens[i].text
+        m = _LEADING.match(text)
+        if m:
+            return i, int(m.group(1)), None, None, None
+        m = _NUMBER.match(text)
+        if m and not _YEAR.match(text) and i + 1 < len(self.tokens) and self.tokens[i + 1].kind == DASH:
+            # "01 - 12 [1080p]" is a batch; spaced_range_end consumes its dash
+            return i, int(m.group(1)), self.spaced_range_end(i, int(m.group(1))), m.group(2), None
+        return None
+
+    def spaced_range_end(self, i: int, first: int) -> Optional[int]:
+        """
+        End of a batch range written with spaces, "01 ~ 12" / "01 - 12", when the number at
+        `i` starts one. Only when nothing but metadata follows, so "05 - 12 Days" stays a title.
+        """
+        if i + 2 >= len(self.tokens) or self.tokens[i + 1].kind != DASH or self.tokens[i + 2].kind != WORD:
+            return None
+        m = _NUMBER.match(self.tokens[i + 2].text)
+        if not m or m.group(2) or int(m.group(1)) <= first:
+            return None
+        after = i + 3
+        if after < len(self.tokens) and self.tokens[after].kind != BRACKET and not self.is_meta(after):
+            return None
+        self.consumed.update((i + 1, i + 2))
+        return int(m.group(1))
+
+    def is_meta(self, i: int) -> bool:
+        """Whether the word at `i` is metadata; _SOURCE_WORDS count only at the end or next to metadata."""
+        text = self.tokens[i].text
+        if _meta(text):
+            return True
+        if text.lower() not in _SOURCE_WORDS:
+            return False
+        if i + 1 == len(self.tokens) or self.tokens[i + 1].kind == BRACKET:
+            return True
+        return any(0 <= j < len(self.tokens) and self.tokens[j].kind == WORD and _meta(self.tokens[j].text)
+                   for j in (i - 1, i + 1))
+
+    def meta_start(self) -> int:
+        """Index of the first bracket (after the group) or metadata word."""
+        for i, tok in enumerate(self.tokens):
+            if tok.kind == BRACKET and not (i == 0 and self.fields.get("group")):
+                return i
+            if tok.kind == WORD and self.is_meta(i):
+                return i
+        return len(self.tokens)
+
+    def scan_metadata(self):
+        for tok in self.tokens:
+            if tok.kind == WORD:
+                meta = _meta(tok.text)
+                if meta and meta[0] != "tag":
+                    self.set(*meta)
+
+    def scene_group(self):
+        """Trailing "-GROUP" on scene style names (x264-GRP)."""
+        words = self.words()
+        if self.fields.get("group") or not words:
+            return
+        i, tok = words[-1]
+        head, sep, tail = tok.text.rpartition("-")
+        if sep and head and tail.isalnum() and (_meta(head) or head.lower() in _SOURCE_WORDS):
+            self.set("group", tail)
+            self.tokens[i] = _Token(WORD, head)
+            meta = _meta(head)
+            if meta and meta[0] != "tag":
+                self.set(*meta)
+
+    def phrase(self, start: int, stop: int) -> Optional[str]:
+        """Join the words between start and stop, stopping at the first marker or metadata."""
+        parts = []
+        for i in range(start, stop):
+            tok = self.tokens[i]
+            if tok.kind == BRACKET or i in self.consumed:
+                break
+            if tok.kind == WORD and (self.is_meta(i) or _SEASON_SHORT.match(tok.text)):
+                break
+            parts.append(tok.text if tok.kind == WORD else "-")
+        while parts and parts[0] == "-":
+            parts.pop(0)
+        while parts and parts[-1] == "-":
+            parts.pop()
+        text = " ".join(parts).strip(" ._-")
+        return text or None
+
+
+def _season_from_words(parts: List[str]) -> Optional[int]:
+    for i, part in enumerate(parts):
+        lower = part.lower()
+        m = _SEASON_SHORT.match(part)
+        if m:
+            return int(m.group(1))
+        if lower == "season":
+            if i + 1 < len(parts) and parts[i + 1].isdigit():
+                return int(parts[i + 1])
+            if i > 0:
+                m = _ORDINAL.match(parts[i - 1])
+                if m:
+                    return int(m.group(1))
+    return None
+
+
+def strip_extension(name: str) -> str:
+    base, ext = os.path.splitext(name)
+    return base if ext.lower() in _STRIP_EXTENSIONS else name
+
+
+@lru_cache(maxsize=16384)
+def parse_release(name: str) -> ReleaseInfo:
+    """
+    Parse a release name or filename into its components.
+    Results are cached; ReleaseInfo is immutable so cached instances can be shared.
+    """
+    p = _Parse(_tokenize(strip_extension(name).strip()))
+    p.scan_brackets()
+    p.scene_group()
+    anchor = p.scan_markers()
+    p.scan_metadata()
+
+    start = 1 if p.tokens and p.tokens[0].kind == BRACKET and p.fields.get("group") else 0
+    if anchor is None:
+        title = p.phrase(start, len(p.tokens))
+        episode_title = None
+    else:
+        title = p.phrase(start, anchor)
+        episode_title = p.phrase(anchor + 1, len(p.tokens))
+
+    return ReleaseInfo(
+        group=p.fields.get("group"),
+        title=title,
+        season=p.fields.get("season"),
+        episode=p.fields.get("episode"),
+        episode_end=p.fields.get("episode_end"),
+        episode_decimal=p.fields.get("episode_decimal"),
+        episode_title=episode_title,
+        version=p.fields.get("version"),
+        resolution=p.fields.get("resolution"),
+        codec=p.fields.get("codec"),
+        crc=p.fields.get("crc"),
+    )
@@ -0,0 +1,55 @@
+# AniPlay - Personal media server and player for anime libraries.
+# Copyright (C) 2026  Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+File layout of the pre-scaled thumbnail cache in THUMBNAIL_CACHE_DIR.
+
+A variant is named <source hash>_<w>x<h>@<scale>_<mtime>.png, so editing or
+replacing the source image gives a new name and older variants of the same
+source and size can be found (and removed) by prefix.
+"""
+
+import hashlib
+import os
+from pathlib import Path
+from typing import List, Optional
+
+from ..config import THUMBNAIL_CACHE_DIR
+
+
+def _prefix(source: str, width: int, height: int, scale: float) -> str:
+    digest = hashlib.sha1(os.path.abspath(source).encode("utf-8", "surrogateescape")).hexdigest()[:16]
+    return f"{digest}_{width}x{height}@{scale:g}_"
+
+
+def thumbnail_path(source: str, width: int, height: int, scale: float = 1.0,
+                   cache_dir: Path = THUMBNAIL_CACHE_DIR) -> Optional[Path]:
+    """Cache file for a variant of `source`, or None if the source cannot be stat'ed."""
+    try:
+        st = os.stat(source)
+    except OSError:
+        return None
+    return Path(cache_dir) / f"{_prefix(source, width, height, scale)}{st.st_mtime_ns:x}.png"
+
+
+def stale_variants(cache_file: Path) -> List[Path]:
+    """Other cached files for the same source and size (left over from an older version of the image)."""
+    prefix = cache_file.name.rsplit("_", 1)[0] + "_"
+    try:
+        with os.scandir(cache_file.parent) as it:
+            return [Path(e.path) for e in it if e.name.startswith(prefix) and e.name != cache_file.name]
+    except OSError:
+        return []
@@ -0,0 +1,180 @@
+"""
+Library scan timings over a synthetic library (see synthetic_library.py).
+
+    python -m benchmarks.bench_library_scan [--series N] [--episodes N] [--seasons N] [--flat]
+                                            [--repeat N] [--output results.json] [--compare baseline.json]
+
+Times FileScanner.scan_series_folder, LibraryManager.scan_library (initial,
+quick and full, with a stub analyzer instead of ffprobe),
+DatabaseMigrator.migrate_paths (dry run after reorganizing some series) and
+OrgAnalyzer.analyze_series. --output writes the results as JSON; --compare
+prints the change against such a file, e.g. one written on another commit.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Optional
+
+from aniplay.core.library_manager import LibraryManager
+from aniplay.database.db import DatabaseManager
+from aniplay.utils.db_migrator import DatabaseMigrator
+from aniplay.utils.file_scanner import FileScanner
+from aniplay.utils.media_analyzer import MediaMetadata, TrackInfo
+from aniplay.utils.org_analyzer import OrgAnalyzer
+from benchmarks.synthetic_library import LibrarySpec, reorganize, temporary_library
+
+
+class StubAnalyzer:
+    """Returns fixed metadata so the benchmark measures AniPlay and not ffprobe."""
+
+    def probe_file(self, path):
+        return MediaMetadata(duration=1420.0, tracks=[
+            TrackInfo(index=0, type="video", codec="hevc", language="und", title="Video"),
+            TrackInfo(index=1, type="audio", codec="aac", language="jpn", title="Japanese"),
+            TrackInfo(index=2, type="subtitle", codec="ass", language="eng", title="English", sub_index=0),
+        ])
+
+
+def _summary(runs, files: int, extra: Optional[dict] = None) -> dict:
+    median = statistics.median(runs)
+    result = {
+        "runs": [round(r, 6) for r in runs],
+        "min": round(min(runs), 6),
+        "median": round(median, 6),
+        "files": files,
+        "us_per_file": round(median / files * 1e6, 3) if files else None,
+    }
+    if extra:
+        result.update(extra)
+    return result
+
+
+def _timed(fn, repeat: int):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+async def _atimed(fn, repeat: int):
+    runs = []
+    value = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = await fn()
+        runs.append(time.perf_counter() - start)
+    return runs, value
+
+
+async def run_benchmarks(spec: LibrarySpec, repeat: int, moved_fraction: float, parent: Optional[str] = None) -> dict:
+    results = {}
+    with temporary_library(spec, parent) as root, tempfile.TemporaryDirectory(prefix="aniplay-bench-db-") as db_dir:
+        folders = sorted(f for f in root.iterdir() if f.is_dir())
+        files = spec.total_files
+
+        scanner = FileScanner()
+        runs = _timed(lambda: [scanner.scan_series_folder(str(f)) for f in folders], repeat)
+        results["scan_series_folder"] = _summary(runs, files)
+
+        db = DatabaseManager(str(Path(db_dir) / "bench.db"))
+        await db.initialize()
+        manager = LibraryManager(db)
+        manager._analyzer = StubAnalyzer()
+
+        # The first scan inserts and probes everything, so it only runs once
+        runs, report = await _atimed(lambda: manager.scan_library(str(root)), 1)
+        results["scan_library_initial"] = _summary(runs, files, {"counters": report["counters"]})
+        runs, report = await _atimed(lambda: manager.scan_library(str(root)), repeat)
+        results["scan_library_quick"] = _summary(runs, files, {"counters": report["counters"]})
+        runs, report = await _atimed(lambda: manager.scan_library(str(root), full_scan=True), repeat)
+        results["scan_library_full"] = _summary(runs, files, {"counters": report["counters"]})
+
+        moved = reorganize(folders, moved_fraction) if spec.season_folders else 0
+        migrator = DatabaseMigrator(db)
+        runs, stats = await _atimed(lambda: migrator.migrate_paths(str(root), dry_run=True), repeat)
+        results["migrate_paths"] = _summary(runs, files, {"series_reorganized": moved, "updated": len(stats["updated"])})
+
+        analyzer = OrgAnalyzer()
+        runs = _timed(lambda: [analyzer.analyze_series(str(f)) for f in folders], repeat)
+        results["analyze_series"] = _summary(runs, files)
+    return results
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=Path(__file__).parent, timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+
+
+def _print_results(results: dict, baseline: Optional[dict] = None):
+    header = f"  {'benchmark':<22} {'median':>10} {'min':>10} {'us/file':>10}"
+    if baseline:
+        header += f"  {'baseline':>10}  change"
+    print(header)
+    for name, r in results.items():
+        line = f"  {name:<22} {r['median']:>9.3f}s {r['min']:>9.3f}s {r['us_per_file'] or 0:>10.1f}"
+        old = (baseline or {}).get(name)
+        if old:
+            line += f"  {old['median']:>9.3f}s  {(r['median'] - old['median']) / old['median'] * 100:+6.1f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    defaults = LibrarySpec()
+    parser.add_argument("--series", type=int, default=defaults.series)
+    parser.add_argument("--episodes", type=int, default=defaults.episodes, help="episodes per season")
+    parser.add_argument("--seasons", type=int, default=defaults.seasons)
+    parser.add_argument("--specials", type=int, default=defaults.specials)
+    parser.add_argument("--flat", action="store_true", help="no season folders")
+    parser.add_argument("--file-size", type=int, default=defaults.file_size, help="apparent size of each file in bytes")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--moved", type=float, default=0.1, help="fraction of series reorganized before migrate_paths")
+    parser.add_argument("--tmp", help="directory to build the library in (defaults to the system temp dir)")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--compare", help="JSON results to compare against")
+    args = parser.parse_args()
+
+    spec = LibrarySpec(series=args.series, episodes=args.episodes, seasons=args.seasons,
+                       season_folders=not args.flat, specials=args.specials, file_size=args.file_size)
+    print(f"Synthetic library: {spec.series} series, {spec.total_files} files")
+    results = asyncio.run(run_benchmarks(spec, args.repeat, args.moved, args.tmp))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("spec") != asdict(spec):
+            print(f"Warning: {args.compare} was measured on a different library: {baseline.get('spec')}")
+        print(f"Compared against {baseline.get('commit') or args.compare}")
+        baseline = baseline["results"]
+    _print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "commit": _git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "repeat": args.repeat,
+                "spec": asdict(spec),
+                "results": results,
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# AniPlay - Personal media server and player for anime libraries.
+# Copyright (C) 2026  Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Accuracy and throughput of the release-name parser against the corpus.
+
+    python -m benchmarks.bench_release_parser [--rounds N] [--show-failures N]
+"""
+
+import argparse
+import time
+from collections import Counter
+from dataclasses import asdict
+
+from aniplay.utils.release_parser import parse_release
+from benchmarks.release_corpus import load
+
+FIELDS = ["group", "title", "season", "episode", "episode_end", "episode_decimal", "episode_title",
+          "version", "resolution", "codec", "crc"]
+
+
+def accuracy(corpus, show_failures: int = 0):
+    field_hits = Counter()
+    exact = 0
+    failures = []
+    for item in corpus:
+        got = asdict(parse_release(item["name"]))
+        wrong = [f for f in FIELDS if got[f] != item["expected"][f]]
+        for f in FIELDS:
+            field_hits[f] += f not in wrong
+        if not wrong:
+            exact += 1
+        elif len(failures) < show_failures:
+            failures.append((item["name"], {f: (got[f], item["expected"][f]) for f in wrong}))
+
+    total = len(corpus)
+    print(f"Accuracy on {total} names: {exact / total:.2%} fully correct")
+    for f in FIELDS:
+        print(f"  {f:<14} {field_hits[f] / total:.2%}")
+    for name, diff in failures:
+        print(f"  FAIL {name}")
+        for f, (got, want) in diff.items():
+            print(f"       {f}: got {got!r}, expected {want!r}")
+    return exact / total
+
+
+def throughput(corpus, rounds: int):
+    names = [item["name"] for item in corpus]
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        parse_release.cache_clear()
+        for name in names:
+            parse_release(name)
+    cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for name in names:
+            parse_release(name)
+    warm = time.perf_counter() - start
+
+    parsed = len(names) * rounds
+    print(f"Throughput over {rounds} rounds x {len(names)} names:")
+    print(f"  uncached  {parsed / cold:>12,.0f} names/s  ({cold / parsed * 1e6:.1f} us/name)")
+    print(f"  cached    {parsed / warm:>12,.0f} names/s  ({warm / parsed * 1e6:.2f} us/name)")
+    print(f"  {parse_release.cache_info()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--show-failures", type=int, default=10)
+    args = parser.parse_args()
+
+    corpus = load()
+    accuracy(corpus, args.show_failures)
+    throughput(corpus, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# AniPlay - Personal media server and player for anime libraries.
+# Copyright (C) 2026  Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+The release-name corpus used by bench_release_parser.py and the tests.
+
+benchmarks/data/release_names.jsonl holds real-world style names (fansub,
+batch, scene, Plex-style and AniPlay's own downloads), including the hard
+cases: spaced and bracketed episode ranges, numbers and tag words inside
+titles, underscores, dots, odd brackets. The expected fields are written by
+hand, never generated from the parser's output, so a regression or a name
+the parser cannot handle shows up as a miss. Only non-empty fields are stored.
+"""
+
+import json
+from pathlib import Path
+
+CORPUS_PATH = Path(__file__).parent / "data" / "release_names.jsonl"
+
+
+def _expected(**fields):
+    base = dict(group=None, title=None, season=None, episode=None, episode_end=None, episode_decimal=None,
+                episode_title=None, version=None, resolution=None, codec=None, crc=None)
+    base.update(fields)
+    return base
+
+
+def load(path: Path = CORPUS_PATH):
+    with open(path, encoding="utf-8") as f:
+        items = [json.loads(line) for line in f if line.strip()]
+    for item in items:
+        item["expected"] = _expected(**item["expected"])
+    return items
@@ -0,0 +1,85 @@
+"""
+Synthetic anime libraries for the scan benchmarks.
+
+Files are sparse (created with truncate), so a library of thousands of
+"episodes" takes almost no disk space or time to build while sizes still
+look like real media to the scanner and the content hash.
+"""
+
+import shutil
+import tempfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+
+@dataclass
+class LibrarySpec:
+    series: int = 50
+    episodes: int = 12  # per season
+    seasons: int = 1
+    season_folders: bool = True  # False puts every episode directly in the series folder
+    specials: int = 0  # extra files in a Specials folder per series
+    file_size: int = 1024 * 1024  # apparent size; blocks are not allocated. Files up to 8 MiB are hashed whole
+
+    @property
+    def total_files(self) -> int:
+        return self.series * (self.seasons * self.episodes + self.specials)
+
+
+def series_name(index: int) -> str:
+    return f"Synthetic Show {index:04d}"
+
+
+def build_library(root: Path, spec: LibrarySpec) -> List[Path]:
+    """Create the library under root and return the series folders."""
+    folders = []
+    for s in range(spec.series):
+        name = series_name(s)
+        folder = root / name
+        for season in range(1, spec.seasons + 1):
+            target = folder / f"Season {season}" if spec.season_folders else folder
+            target.mkdir(parents=True, exist_ok=True)
+            for e in range(1, spec.episodes + 1):
+                # Vary the size a little so identical files are not all the same content hash
+                _sparse_file(target / f"[Synth] {name} - S{season:02d}E{e:02d} [1080p].mkv",
+                             spec.file_size + s * 1000 + season * 100 + e)
+        if spec.specials:
+            target = folder / "Specials"
+            target.mkdir(parents=True, exist_ok=True)
+            for e in range(1, spec.specials + 1):
+                _sparse_file(target / f"[Synth] {name} - S00E{e:02d}.mkv", spec.file_size // 4 + e)
+        folders.append(folder)
+    return folders
+
+
+def reorganize(folders: List[Path], fraction: float) -> int:
+    """Rename the first season folder of a fraction of the series (what a user tidying up would do). Returns the count."""
+    moved = 0
+    step = max(1, round(1 / fraction)) if fraction > 0 else 0
+    for i, folder in enumerate(folders):
+        if not step or i % step:
+            continue
+        season = folder / "Season 1"
+        if season.is_dir():
+            season.rename(folder / "S1")
+            moved += 1
+    return moved
+
+
+@contextmanager
+def temporary_library(spec: LibrarySpec, parent: Optional[str] = None) -> Iterator[Path]:
+    """Build the library in a temp dir (parent picks the filesystem) and remove it afterwards."""
+    tmp = Path(tempfile.mkdtemp(prefix="aniplay-bench-", dir=parent))
+    try:
+        root = tmp / "library"
+        build_library(root, spec)
+        yield root
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _sparse_file(path: Path, size: int):
+    with open(path, "wb") as f:
+        f.truncate(size)
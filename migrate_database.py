@@ -37,6 +37,7 @@ async def main():
         print(f"Found {len(results['updated'])} episodes that moved:")
         for up in results["updated"][:15]:
             merge_tag = " [Merged]" if up["merged"] else ""
+            merge_tag += " [Hash]" if up["method"] == "hash" else ""
             print(f"  [M]{merge_tag} {up['series_hint']}: {os.path.basename(up['old_path'])} -> {os.path.basename(up['new_path'])}")
         
         if len(results["updated"]) > 15:
@@ -47,6 +48,8 @@ async def main():
     print("\n" + "=" * 60)
     print("Migration Summary:")
     print(f"  Episodes Updated:    {len(results['updated'])}")
+    print(f"  Matched by Content:  {results['relinked_by_hash']}")
+    print(f"  Hashes Stored:       {results['hashes_stored']}")
     print(f"  Episodes Unchanged:  {results['not_moved']}")
     print(f"  Files Not Found:     {len(results['missing_in_physical'])}")
     if results["failed"]:
@@ -0,0 +1,64 @@
+"""In-process HTTP server stand-in for the download tests (an httpx transport, no sockets)."""
+
+import asyncio
+import re
+from collections import Counter
+
+import httpx
+
+
+class HttpStandIn:
+    def __init__(self, files=None, delay: float = 0.0, ranges: bool = True):
+        self.files = dict(files or {})  # path -> bytes
+        self.delay = delay
+        self.ranges = ranges
+        self.fail_once = set()  # paths answered with a 503 the first time
+        self.short_once = set()  # paths whose next ranged response stops halfway
+        self.head = True
+        self.requests = Counter()
+        self.bytes_sent = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        self.requests[path] += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            if path in self.fail_once:
+                self.fail_once.discard(path)
+                return httpx.Response(503)
+            if path not in self.files:
+                return httpx.Response(404)
+            body = self.files[path]
+            headers = {"Content-Type": "application/octet-stream"}
+            if self.ranges:
+                headers["Accept-Ranges"] = "bytes"
+            if request.method == "HEAD":
+                if not self.head:
+                    return httpx.Response(405)
+                return httpx.Response(200, headers={**headers, "Content-Length": str(len(body))})
+            match = re.match(r"bytes=(\d+)-(\d*)", request.headers.get("Range", ""))
+            if match and self.ranges:
+                start = int(match.group(1))
+                end = int(match.group(2)) if match.group(2) else len(body) - 1
+                if start >= len(body):
+                    return httpx.Response(416, headers={"Content-Range": f"bytes */{len(body)}"})
+                end = min(end, len(body) - 1)
+                content = body[start:end + 1]
+                if path in self.short_once:
+                    self.short_once.discard(path)
+                    content = content[:len(content) // 2]
+                self.bytes_sent += len(content)
+                return httpx.Response(206, content=content, headers={
+                    **headers, "Content-Range": f"bytes {start}-{end}/{len(body)}"})
+            self.bytes_sent += len(body)
+            return httpx.Response(200, content=body, headers=headers)
+        finally:
+            self.in_flight -= 1
+
+    def client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.MockTransport(self.handle), base_url="http://cdn.test")
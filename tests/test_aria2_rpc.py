@@ -0,0 +1,185 @@
+import asyncio
+import json
+from collections import Counter
+
+import httpx
+import pytest
+from aniplay.core.aria2_rpc import Aria2Client, Aria2Daemon, Aria2Download, Aria2Error, select_episode_files
+
+SECRET = "s3cret"
+HASH = "ab" * 20
+
+
+class FakeAria2:
+    """JSON-RPC stand-in for aria2c: each tellStatus advances a download by `step` bytes."""
+
+    def __init__(self, size=1000, step=400, fail=False, batch=None):
+        self.size, self.step, self.fail, self.batch = size, step, fail, batch
+        self.downloads = {}
+        self.methods = Counter()
+        self.requests = 0
+        self.options = {}
+        self._gids = iter(f"{n:016x}" for n in range(1, 1000))
+
+    def _add(self, name, options=None, **extra):
+        gid = next(self._gids)
+        options = options or {}
+        self.downloads[gid] = {"gid": gid, "status": "paused" if options.get("pause") == "true" else "active",
+                               "totalLength": "0", "completedLength": "0", "downloadSpeed": "0", "infoHash": HASH,
+                               "dir": "/dl", "name": name, "options": options, **extra}
+        return gid
+
+    def _files(self, d):
+        if not self.batch:
+            return [{"index": "1", "path": f"/dl/{d['name']}", "selected": "true"},
+                    {"index": "2", "path": "/dl/extra.nfo", "selected": "false"}]
+        select = d["options"].get("select-file")
+        chosen = {int(i) for i in select.split(",")} if select else None
+        return [{"index": str(i), "path": f"/dl/Batch/{name}", "selected": str(not chosen or i in chosen).lower()}
+                for i, name in enumerate(self.batch, 1)]
+
+    def _status(self, gid):
+        d = self.downloads[gid]
+        if d.get("metadata"):
+            d["status"] = "complete"
+            paused = {"pause": d["options"].get("pause-metadata", "false")}
+            d["followedBy"] = [self._add("Batch" if self.batch else "Show - 01.mkv", {**d["options"], **paused})]
+            files = [{"path": "[METADATA]" + HASH, "selected": "true"}]
+            return {**d, "files": files}
+        if d["status"] == "active":
+            if self.fail:
+                d.update(status="error", errorCode="3", errorMessage="Resource not found")
+            else:
+                done = min(self.size, int(d["completedLength"]) + self.step)
+                d.update(totalLength=str(self.size), completedLength=str(done), downloadSpeed="1048576",
+                         status="complete" if done == self.size else "active")
+        return {**d, "files": self._files(d), "bittorrent": {"info": {"name": d["name"]}}}
+
+    def _call(self, method, params):
+        self.methods[method] += 1
+        if params[:1] != [f"token:{SECRET}"]:
+            raise PermissionError("Unauthorized")
+        params = params[1:]
+        if method == "aria2.addUri":
+            return self._add("", params[1], metadata=params[0][0].startswith("magnet:"))
+        if method == "aria2.addTorrent":
+            return self._add("Batch" if self.batch else "Show - 01.mkv", params[2])
+        if method == "aria2.tellStatus":
+            return self._status(params[0])
+        if method == "aria2.getFiles":
+            return self._files(self.downloads[params[0]])
+        if method == "aria2.changeOption":
+            self.downloads[params[0]]["options"].update(params[1])
+            return "OK"
+        if method == "aria2.unpause":
+            self.downloads[params[0]]["status"] = "active"
+            return "OK"
+        if method in ("aria2.forceRemove", "aria2.removeDownloadResult"):
+            self.downloads.get(params[0], {})["status"] = "removed"
+            return "OK"
+        if method == "aria2.changeGlobalOption":
+            self.options.update(params[0])
+            return "OK"
+        if method == "aria2.getVersion":
+            return {"version": "1.37.0"}
+        raise KeyError(method)
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        body = json.loads(request.content)
+        try:
+            if body["method"] == "system.multicall":
+                self.methods["system.multicall"] += 1
+                result = []
+                for call in body["params"][0]:
+                    try:
+                        result.append([self._call(call["methodName"], call["params"])])
+                    except Exception as e:
+                        result.append({"code": 1, "message": str(e)})
+            else:
+                result = self._call(body["method"], body["params"])
+        except Exception as e:
+            return httpx.Response(200, json={"jsonrpc": "2.0", "id": body["id"], "error": {"code": 1, "message": str(e)}})
+        return httpx.Response(200, json={"jsonrpc": "2.0", "id": body["id"], "result": result})
+
+    def daemon(self, secret=SECRET):
+        http = httpx.AsyncClient(transport=httpx.MockTransport(self.handle))
+        return Aria2Daemon(Aria2Client("http://aria2.test/jsonrpc", secret, http), poll_interval=0.01)
+
+
+@pytest.mark.asyncio
+async def test_magnets_share_one_batched_poll(tmp_path):
+    fake = FakeAria2()
+    daemon = fake.daemon()
+    updates = []
+    downloads = [Aria2Download(f"magnet:?xt=urn:btih:{HASH}&n={i}", str(tmp_path), daemon, updates.append)
+                 for i in range(2)]
+    results = await asyncio.gather(*(d.download() for d in downloads))
+
+    assert results == [["/dl/Show - 01.mkv"], ["/dl/Show - 01.mkv"]]  # unselected files left out
+    assert all(d.gid in fake.downloads and not d.status.is_metadata for d in downloads)  # followed the real gid
+    assert fake.methods["aria2.addUri"] == 2
+    assert fake.methods["system.multicall"] == fake.methods["aria2.tellStatus"] / 2  # one request per tick for both
+    assert updates[-1].bytes_done == updates[-1].bytes_total == 1000
+    assert fake.options == {"max-overall-download-limit": "0"}  # the app's bandwidth cap (unlimited here)
+    assert downloads[0].resume_state() == {"torrent": str(tmp_path / f"{HASH}.torrent")}
+
+
+@pytest.mark.asyncio
+async def test_errors_cancel_and_resume(tmp_path):
+    fake = FakeAria2(fail=True)
+    with pytest.raises(Aria2Error, match="Resource not found"):
+        await Aria2Download("magnet:?xt=urn:btih:" + HASH, str(tmp_path), fake.daemon()).download()
+
+    with pytest.raises(Aria2Error, match="Unauthorized"):
+        await Aria2Download("magnet:?xt=urn:btih:" + HASH, str(tmp_path), fake.daemon(secret="wrong")).download()
+
+    # Cancelling removes it from aria2 (its files and control file stay)
+    fake = FakeAria2(size=10 ** 9, step=1)
+    download = Aria2Download("magnet:?xt=urn:btih:" + HASH, str(tmp_path), fake.daemon())
+    task = asyncio.ensure_future(download.download())
+    while download.status is None or download.status.is_metadata:
+        await asyncio.sleep(0.01)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    assert fake.downloads[download.gid]["status"] == "removed"
+
+    # The saved .torrent is added instead of the magnet
+    (tmp_path / f"{HASH}.torrent").write_bytes(b"d4:infod4:name3:abcee")
+    fake = FakeAria2()
+    await Aria2Download("magnet:?xt=urn:btih:" + HASH, str(tmp_path), fake.daemon(),
+                        resume=download.resume_state()).download()
+    assert fake.methods["aria2.addTorrent"] == 1 and fake.methods["aria2.addUri"] == 0
+
+
+def test_select_episode_files():
+    files = [{"index": str(i), "path": f"/dl/[Group] Show - {n}"} for i, n in enumerate(
+        ["01 [1080p].mkv", "02 [1080p].mkv", "02 [1080p].en.ass", "03 [1080p].mkv", "NCOP.mkv"], 1)]
+    assert select_episode_files(files, 2) == [2, 3]
+    assert select_episode_files(files, 7) == []
+    assert select_episode_files(files[:1], 1) == []  # single episode torrent: nothing to narrow down
+    assert select_episode_files([{"index": "1", "path": "/dl/Show - 01-12.mkv"},
+                                 {"index": "2", "path": "/dl/Show - 13.mkv"}], 5) == [1]
+    season = [{"index": str(i), "path": f"/dl/Show/{name}"} for i, name in enumerate(
+        ["05. Title.mkv", "05.5. Recap.mkv", "Show - 05.5.mkv", "episode06.mkv"], 1)]
+    assert select_episode_files(season, 5) == [1]
+    assert select_episode_files(season, 6) == [4]
+
+
+@pytest.mark.asyncio
+async def test_batch_downloads_only_the_episode(tmp_path):
+    batch = [f"[Group] Show - {e:02d} [1080p].mkv" for e in range(1, 13)]
+    fake = FakeAria2(batch=batch)
+    download = Aria2Download("magnet:?xt=urn:btih:" + HASH, str(tmp_path), fake.daemon(), episode=5)
+    assert await download.download() == ["/dl/Batch/[Group] Show - 05 [1080p].mkv"]
+    real = fake.downloads[download.gid]
+    assert real["options"]["select-file"] == "5" and real["options"]["pause"] == "true"  # narrowed before it ran
+    assert download.resume_state() == {"torrent": str(tmp_path / f"{HASH}.torrent"), "select": "5"}
+
+    # A restart passes the selection straight to the saved .torrent
+    (tmp_path / f"{HASH}.torrent").write_bytes(b"d4:infod4:name5:Batchee")
+    fake = FakeAria2(batch=batch)
+    download = Aria2Download("magnet:?xt=urn:btih:" + HASH, str(tmp_path), fake.daemon(),
+                             resume=download.resume_state(), episode=5)
+    assert await download.download() == ["/dl/Batch/[Group] Show - 05 [1080p].mkv"]
+    assert fake.methods["aria2.getFiles"] == 0 and fake.methods["aria2.unpause"] == 0
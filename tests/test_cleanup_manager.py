@@ -0,0 +1,68 @@
+import os
+from pathlib import Path
+
+from aniplay.utils.cleanup_manager import CleanupManager
+
+
+def _write(path, size=10):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+
+
+def _library(root):
+    show = root / "Show"
+    _write(show / "Season 1" / "Show - S01E01.mkv")
+    _write(show / "Season 1" / "Show - S01E01-thumb.jpg", 100)
+    _write(show / "Season 1" / "Show - S01E01.NFO", 20)
+    _write(show / "poster.jpg")
+    _write(show / ".actors" / "Someone.jpg", 300)
+    _write(show / "Extras" / "extra.nfo", 5)  # only junk inside, so the folder goes too
+    (show / "Empty" / "Nested").mkdir(parents=True)
+    return show
+
+
+def test_scan_single_pass(tmp_path):
+    show = _library(tmp_path / "library")
+    manager = CleanupManager(trash_dir=None, empty_dirs=True)
+    items = {os.path.relpath(i.path, show): i for i in manager.scan(str(tmp_path / "library"))}
+    assert set(items) == {
+        os.path.join("Season 1", "Show - S01E01-thumb.jpg"), os.path.join("Season 1", "Show - S01E01.NFO"),
+        ".actors", os.path.join("Extras", "extra.nfo"), "Extras",
+        os.path.join("Empty", "Nested"), "Empty",
+    }
+    assert items[".actors"].kind == "dir" and items[".actors"].size == 300
+    assert items[os.path.join("Season 1", "Show - S01E01.NFO")].rule == "*.nfo"
+    assert items["Empty"].kind == "empty_dir"
+
+
+def test_cleanup_to_trash_and_restore(tmp_path):
+    root = tmp_path / "library"
+    show = _library(root)
+    before = sorted(p.relative_to(root) for p in root.rglob("*"))
+    manager = CleanupManager(dry_run=False, workers=4, trash_dir=tmp_path / "trash", empty_dirs=True)
+
+    results = manager.cleanup(manager.scan(str(root)), str(root))
+    assert not results["failed"] and results["total_size"] == 425
+    assert sorted(p.relative_to(root) for p in root.rglob("*")) == sorted(
+        p.relative_to(root) for p in [show, show / "Season 1", show / "Season 1" / "Show - S01E01.mkv", show / "poster.jpg"])
+    assert Path(results["manifest"]).parent.parent == tmp_path / "trash"
+    assert [b["items"] for b in manager.list_trash()] == [7]
+
+    restored = manager.restore(results["manifest"])
+    assert not restored["failed"]
+    assert sorted(p.relative_to(root) for p in root.rglob("*")) == before
+    assert manager.list_trash() == []
+
+
+def test_dry_run_and_delete(tmp_path):
+    root = tmp_path / "library"
+    _library(root)
+    items = CleanupManager().scan(str(root))
+    assert CleanupManager(dry_run=True).cleanup(items, str(root))["manifest"] is None
+    assert len(list(root.rglob("*"))) == 12
+
+    results = CleanupManager(dry_run=False, trash_dir=None).cleanup(items)
+    assert len(results["deleted"]) == 4 and results["manifest"] is None
+    assert not (root / "Show" / ".actors").exists() and (root / "Show" / "poster.jpg").exists()
+    # Empty folders are only removed when asked to
+    assert (root / "Show" / "Empty" / "Nested").is_dir() and (root / "Show" / "Extras").is_dir()
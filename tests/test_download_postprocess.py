@@ -0,0 +1,75 @@
+import struct
+
+import pytest
+from aniplay.core.download_postprocess import PostProcessor, container_error, needs_faststart
+from aniplay.database.db import DatabaseManager
+from aniplay.database.models import Episode, MediaTrack, Series
+from aniplay.utils.file_identity import file_identity
+from aniplay.utils.media_analyzer import MediaMetadata, TrackInfo
+
+
+def box(kind, payload=b""):
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+def write(path, data):
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_container_checks(tmp_path):
+    mdat = box(b"mdat", b"\0" * 64)
+    moov = box(b"moov", box(b"mvhd", b"\0" * 100))
+    ts = b"".join(b"\x47" + bytes(187) for _ in range(4))
+
+    cases = {
+        "whole.mp4": (box(b"ftyp", b"isom") + moov + mdat, ""),
+        "cut.mp4": (box(b"ftyp", b"isom") + mdat[:40], "Incomplete MP4"),
+        "stream.mp4": (ts, ""),  # a transport stream kept under the target name
+        "cut.ts": (ts + b"\x47" + bytes(100), "mid-packet"),
+        "garbled.ts": (ts + bytes(188), "out of sync"),
+        "show.mkv": (b"\x1a\x45\xdf\xa3" + bytes(60), ""),
+        "error.mkv": (b"<html>404 Not Found</html>", "Not a video file"),
+        "empty.mp4": (b"", "Empty file"),
+    }
+    for name, (data, error) in cases.items():
+        path = write(tmp_path / name, data)
+        result = container_error(path, len(data))
+        assert (error in result) if error else result == "", name
+
+    assert needs_faststart(write(tmp_path / "end.mp4", box(b"ftyp", b"isom") + mdat + moov))
+    assert not needs_faststart(str(tmp_path / "whole.mp4"))
+    assert not needs_faststart(str(tmp_path / "stream.mp4"))
+
+
+@pytest.mark.asyncio
+async def test_duration_and_probe_cache(tmp_path):
+    data = b"\x1a\x45\xdf\xa3" + bytes(4096)
+    path = write(tmp_path / "Show - 01.mkv", data)
+    probes = []
+
+    def probe(p):
+        probes.append(p)
+        return MediaMetadata(1380.0, [TrackInfo(0, "video", "hevc", "und", ""), TrackInfo(1, "audio", "aac", "jpn", "")])
+
+    processor = PostProcessor(probe=probe)
+    check = await processor.process(path, expected_duration=1420.0)
+    assert not check.ok and check.error == "Truncated: 1380s of 1420s"
+
+    check = await processor.process(path, expected_duration=1385.0)  # within the segment rounding
+    assert check.ok and check.duration == 1380.0 and len(check.tracks) == 2
+    assert check.content_hash == file_identity(path) and not check.probe_cached
+    processor.shutdown()
+
+    # The same file already probed in the library is not probed again
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    await db.initialize()
+    series_id = await db.add_series(Series(name="Show", path=str(tmp_path / "lib")))
+    ep_id = await db.add_episode(Episode(series_id=series_id, filename="Show - 01.mkv", path=str(tmp_path / "lib" / "Show - 01.mkv"),
+                                         duration=1420.0))
+    await db.update_episode_hashes([(check.content_hash, ep_id)])
+    await db.add_media_track(MediaTrack(ep_id, 1, "audio", "flac", "jpn", "Japanese"))
+    probes.clear()
+    check = await PostProcessor(db, probe=probe).process(path, expected_duration=1420.0)
+    assert check.ok and check.probe_cached and probes == []
+    assert check.tracks == [{"type": "audio", "codec": "flac", "language": "jpn"}]
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+from aniplay.core.download_progress import ProgressAggregator
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_samples_are_coalesced_per_tick():
+    clock, batches = Clock(), []
+    progress = ProgressAggregator(batches.append, clock=clock)
+    for n in range(1, 101):  # a burst of reports between two ticks
+        progress.update("a.mp4", n / 10, bytes_done=n * 1000, bytes_total=100_000)
+    progress.update("b.mp4", 50.0, speed="1.5x")
+    progress.tick()
+    assert len(batches) == 1 and set(batches[0]) == {"a.mp4", "b.mp4"}
+    assert batches[0]["a.mp4"]["progress"] == 10.0 and batches[0]["b.mp4"]["speed"] == "1.5x"
+
+    # Speed and ETA come from the samples: a.mp4 moves 100 KB/s, b.mp4 1 %/s
+    for second in range(1, 6):
+        clock.now = second
+        progress.update("a.mp4", 10 + second, bytes_done=10_000 + second * 1000, bytes_total=100_000)
+        progress.update("b.mp4", 50.0 + second, speed="1.5x")
+        progress.tick()
+    a, b = batches[-1]["a.mp4"], batches[-1]["b.mp4"]
+    assert a["speed"] == "1000.0 B/s" and a["eta"] == "01:25" and a["elapsed"] == "00:05"
+    assert b["eta"] == "00:45"
+
+    # Unchanged tasks are left out, nothing at all is published without changes
+    progress.update("b.mp4", 56.0, speed="1.5x")
+    assert set(progress.tick()) == {"b.mp4"}
+    assert progress.tick() == {} and len(batches) == 7
+    assert progress.remove("b.mp4")["progress"] == 56.0
+
+
+@pytest.mark.asyncio
+async def test_ticker_publishes_and_saves_in_batches():
+    batches, saves = [], []
+
+    async def persist(states):
+        saves.append(states)
+
+    progress = ProgressAggregator(batches.append, persist, interval=0.01, save_interval=0.05)
+    for n in range(20):
+        progress.update("a.mp4", n, bytes_done=n)
+        progress.update("b.mp4", n, bytes_done=n)
+        await asyncio.sleep(0.005)
+    await asyncio.sleep(0.1)
+    assert len(batches) < 20 and batches[-1]["a.mp4"]["progress"] == 19
+    assert saves and set(saves[-1]) == {"a.mp4", "b.mp4"}  # one call for all running tasks
+
+    progress.remove("a.mp4")
+    progress.remove("b.mp4")
+    await asyncio.sleep(0.03)
+    assert progress._ticker.done()  # stops with nothing to track
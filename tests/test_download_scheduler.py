@@ -0,0 +1,101 @@
+import time
+from datetime import datetime
+
+import pytest
+from aniplay.core.download_scheduler import (BandwidthSchedule, DownloadQueue, QueuedDownload, SlotLimits,
+                                             TokenBucket, episode_priority, provider_of)
+from aniplay.database.models import OnlineProgress
+
+
+def _item(name, priority=0, host="cdn.test", show_id="abc"):
+    return QueuedDownload(f"https://{host}/{name}.mp4", name, metadata={"show_id": show_id}, priority=priority)
+
+
+def _drain(queue, allowed=lambda item: True):
+    names = []
+    while (item := queue.pop_next(allowed)) is not None:
+        names.append(item.filename)
+    return names
+
+
+def _progress(*eps, started=(), downloaded=()):
+    rows = [OnlineProgress("abc", "Show", ep, completed=True) for ep in eps]
+    rows += [OnlineProgress("abc", "Show", ep, local_path=f"/dl/Show - Ep {ep}.mp4") for ep in downloaded]
+    return rows + [OnlineProgress("abc", "Show", ep, timestamp=300.0) for ep in started]
+
+
+@pytest.mark.parametrize("progress, expected", [
+    ([], {"1": 2, "2": 1, "3": 1}),
+    (_progress(1, 2), {"1": 0, "2": 0, "3": 2, "4": 1}),
+    (_progress(1, 2, started=[3]), {"2": 0, "3": 2, "4": 1}),
+    (_progress(1, started=[5]), {"2": 0, "5": 2, "6": 1}),
+    (_progress(1), {"2.0": 2, "": 0, None: 0}),
+    (_progress(1, downloaded=[5, 6]), {"2": 2, "3": 1, "5": 1, "7": 1}),  # downloaded, never played
+])
+def test_episode_priority(progress, expected):
+    assert {ep: episode_priority(ep, progress) for ep in expected} == expected
+
+
+def test_queue_order():
+    queue = DownloadQueue()
+    for item in [_item("a"), _item("b"), _item("c", priority=5), _item("d")]:
+        queue.push(item)
+    assert "b" in queue and len(queue) == 4
+
+    queue.set_priority("d", 10)
+    queue.set_paused("a", True)
+    queue.remove("b")
+    assert [i.filename for i in queue.ordered()] == ["d", "c", "a"]
+    assert _drain(queue) == ["d", "c"]
+
+    # Paused items stay queued but are only popped once resumed, in their old place
+    assert len(queue) == 1
+    queue.push(_item("e"))
+    queue.set_paused("a", False)
+    assert _drain(queue) == ["a", "e"]
+
+
+def test_limits_skip_blocked_hosts_and_providers():
+    queue = DownloadQueue()
+    for item in [_item("a1", host="a.test"), _item("a2", host="a.test"), _item("b1", host="b.test"),
+                 QueuedDownload("magnet:?xt=urn:btih:" + "0" * 40, "t1"), QueuedDownload("magnet:?xt=x", "t2")]:
+        queue.push(item)
+    limits = SlotLimits(total=10, per_host=1, per_provider={"torrent": 1})
+
+    started = []
+    while (item := queue.pop_next(limits.allows)) is not None:
+        limits.acquire(item)
+        started.append(item)
+    assert [i.filename for i in started] == ["a1", "b1", "t1"]
+    assert [i.filename for i in queue.ordered()] == ["a2", "t2"]
+
+    limits.release(started[0])  # a1 done: a2 may go, the second torrent still may not
+    assert queue.pop_next(limits.allows).filename == "a2"
+    assert queue.pop_next(limits.allows) is None
+
+    assert SlotLimits(total=1).full is False
+    assert provider_of("https://x.test/1.mp4", {"show_id": "nyaa-123"}) == "nyaa"
+
+
+def test_bandwidth_schedule():
+    schedule = BandwidthSchedule.parse("08:00-18:00=512, 23:00-06:00=0", default=2048)
+    assert schedule.limit_at(datetime(2026, 1, 1, 9, 30)) == 512 * 1024
+    assert schedule.limit_at(datetime(2026, 1, 1, 20, 0)) == 2048 * 1024
+    assert schedule.limit_at(datetime(2026, 1, 1, 2, 0)) == 0  # wraps past midnight, unlimited
+    with pytest.raises(ValueError):
+        BandwidthSchedule.parse("8-18=512")
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_rate():
+    bucket = TokenBucket(rate=4 * 1024 * 1024)
+    start = time.monotonic()
+    for _ in range(32):
+        await bucket.consume(64 * 1024)
+    elapsed = time.monotonic() - start
+    assert 0.4 < elapsed < 1.0  # 2 MiB at 4 MiB/s
+
+    bucket.set_rate(0)
+    start = time.monotonic()
+    await bucket.consume(100 * 1024 * 1024)
+    assert time.monotonic() - start < 0.05
@@ -0,0 +1,152 @@
+import asyncio
+import json
+
+import pytest
+import pytest_asyncio
+from aniplay.cli.download import format_status, serve_status
+from aniplay.core import download_backends, download_service
+from aniplay.core.download_service import DownloadService, Event
+from aniplay.database.db import DatabaseManager
+from aniplay.database.models import DownloadTaskState
+from tests.http_standin import HttpStandIn
+
+TS = (b"\x47" + bytes(187)) * 2000  # a whole (if empty) transport stream
+
+
+@pytest_asyncio.fixture
+async def setup(tmp_path, monkeypatch):
+    """A DB, a downloads folder and a stand-in CDN behind the shared HTTP client."""
+    monkeypatch.setattr(download_service, "DOWNLOADS_PATH", tmp_path / "downloads")
+    (tmp_path / "downloads").mkdir()
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    await db.initialize()
+    server = HttpStandIn({f"/ep{e}.mp4": TS for e in range(1, 4)})
+    return db, server, tmp_path / "downloads"
+
+
+def _service(db, server, monkeypatch):
+    # DownloadService.shutdown() closes the shared client, so each service gets a fresh one
+    monkeypatch.setitem(download_backends._clients, asyncio.get_running_loop(), server.client())
+    service = DownloadService(db)
+    service.postprocessor._probe = lambda path: None  # no ffprobe here
+    return service
+
+
+async def _queue(db, n, status="Queued"):
+    await db.update_download_task(DownloadTaskState(filename=f"Show - Ep {n}.ts", url=f"http://cdn.test/ep{n}.mp4",
+                                                    status=status))
+
+
+async def _until(condition, timeout=5):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("timed out")
+
+
+def test_event():
+    calls = []
+    event = Event()
+    event.connect(calls.append)
+    event.connect(lambda x: calls.append(x * 2))
+    event.emit(2)
+    event.disconnect(calls.append)
+    event.emit(3)
+    assert calls == [2, 4, 6]
+
+
+@pytest.mark.asyncio
+async def test_runs_the_db_queue_headless(setup, monkeypatch):
+    db, server, downloads = setup
+    await _queue(db, 1)
+    service = _service(db, server, monkeypatch)
+    finished = []
+    service.task_finished.connect(lambda filename, success, message, metadata: finished.append((filename, success)))
+    await service.loaded
+    assert not service.idle and service.status()["active"][0]["filename"] == "Show - Ep 1.ts"
+
+    # Queued by another process while it runs: picked up by reload()
+    await _queue(db, 2)
+    await service.reload()
+    await service.reload()  # nothing new, nothing doubled
+    await _until(lambda: service.idle)
+
+    assert sorted(finished) == [("Show - Ep 1.ts", True), ("Show - Ep 2.ts", True)]
+    assert (downloads / "Show - Ep 2.ts").read_bytes() == TS
+    status = service.status()
+    assert (status["finished"], status["failed"], status["queued"]) == (2, 0, [])
+    assert format_status(status).startswith("0 downloading, 0 checking, 0 queued, 2 finished")
+    await service.shutdown()
+    assert {t.status for t in await db.get_all_download_tasks()} == {"Finished"}
+
+    await service.reload()  # finished rows are not queued again
+    assert service.idle and len(service.history) == 2
+
+
+@pytest.mark.asyncio
+async def test_shutdown_keeps_the_download_for_the_next_run(setup, monkeypatch):
+    db, server, downloads = setup
+    server.delay = 0.05
+    await _queue(db, 3)
+    service = _service(db, server, monkeypatch)
+    await service.loaded
+    await service.shutdown()
+    assert service.active_tasks  # stopped, not finished
+    [task] = await db.get_all_download_tasks()
+    assert task.status == "Downloading"
+
+    service = _service(db, server, monkeypatch)
+    await service.loaded
+    await _until(lambda: service.idle)
+    await service.shutdown()
+    assert (downloads / "Show - Ep 3.ts").read_bytes() == TS
+
+
+@pytest.mark.asyncio
+async def test_local_paths_skip_unfinished_and_failed(setup, monkeypatch):
+    db, server, downloads = setup
+    folder = downloads / "nyaa-0123456789ab"
+    folder.mkdir()
+    for n in (1, 2, 3):
+        (folder / f"Show - Ep {n}.mp4").write_bytes(TS)
+    service = _service(db, server, monkeypatch)
+    await service.loaded
+    await asyncio.to_thread(service.index.build)
+    assert list(service.get_local_paths("nyaa-0123456789ab", ["1", "2", "3"])) == ["1", "2", "3"]
+
+    # Still being checked after the transfer: not playable yet
+    service.task_states["Show - Ep 2.mp4"] = {"metadata": {"show_id": "nyaa-0123456789ab", "ep_no": "2"}}
+    service._processing["Show - Ep 2.mp4"] = asyncio.get_running_loop().create_future()
+    assert list(service.get_local_paths("nyaa-0123456789ab", ["1", "2", "3"])) == ["1", "3"]
+    service._processing.pop("Show - Ep 2.mp4").cancel()
+
+    # A failed check recorded on the task keeps the file out, through watcher refreshes too
+    failed = str(folder / "Show - Ep 3.mp4")
+    await db.update_download_task(DownloadTaskState(filename="Show - Ep 3.mp4", url="", status="Failed",
+                                                    check_json=json.dumps({"path": failed, "error": "truncated"})))
+    await service.reload()
+    service.index.refresh([failed])
+    assert list(service.get_local_paths("nyaa-0123456789ab", ["1", "2", "3"])) == ["1", "2"]
+    await service.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_status_server(setup, monkeypatch):
+    db, server, downloads = setup
+    service = _service(db, server, monkeypatch)
+    await service.loaded
+    service.start_download("http://cdn.test/ep1.mp4", "Show - Ep 1.ts")
+    service.pause_download("Show - Ep 1.ts")
+    status_server = await serve_status(service, 0)
+    port = status_server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    head, body = (await reader.read()).split(b"\r\n\r\n", 1)
+    writer.close()
+    status_server.close()
+    await status_server.wait_closed()
+    await service.shutdown()
+
+    assert head.startswith(b"HTTP/1.1 200 OK")
+    assert json.loads(body) == service.status()
@@ -0,0 +1,47 @@
+import json
+
+import pytest
+from aniplay.database.db import DatabaseManager
+from aniplay.database.models import DownloadTaskState
+
+
+@pytest.mark.asyncio
+async def test_resume_state_round_trip(tmp_path):
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    await db.initialize()
+    await db.update_download_task(DownloadTaskState(filename="Show - Ep 1.mp4", url="http://cdn.test/1.mp4",
+                                                    status="Downloading", priority=3))
+    resume = {"backend": "http", "size": 100, "ranges": [[40, 99]]}
+    await db.update_download_task(DownloadTaskState(filename="Show - Ep 2.mp4", url="http://cdn.test/2.mp4",
+                                                    status="Downloading"))
+    await db.save_download_progress([("Show - Ep 1.mp4", 40.0, "2 MB/s", "00:30", "00:20", json.dumps(resume)),
+                                     ("Show - Ep 2.mp4", 10.0, "1 MB/s", "01:30", "00:10", "{}")])
+
+    task, _ = sorted(await db.get_all_download_tasks(), key=lambda t: t.filename)
+    assert json.loads(task.resume_json) == resume and task.progress == 40.0 and task.priority == 3
+    assert task.speed == "2 MB/s" and task.eta == "00:30"
+    await db.remove_download_task("Show - Ep 2.mp4")
+
+    # Finishing (or queueing it again) starts over
+    await db.update_download_task(DownloadTaskState(filename="Show - Ep 1.mp4", url="", status="Finished", progress=100.0))
+    [task] = await db.get_all_download_tasks()
+    assert task.resume_json == "{}"
+
+
+@pytest.mark.asyncio
+async def test_requeue_after_failure_takes_the_new_url(tmp_path):
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    await db.initialize()
+    name = "Show - Ep 1.mp4"
+    await db.update_download_task(DownloadTaskState(filename=name, url="http://old/expired", status="Downloading",
+                                                    referrer="http://old/", metadata_json='{"ep_no": "1"}'))
+    await db.update_download_task(DownloadTaskState(filename=name, url="", status="Failed",
+                                                    metadata_json='{"ep_no": "1"}'))
+    [task] = await db.get_all_download_tasks()
+    assert (task.url, task.referrer, task.status) == ("http://old/expired", "http://old/", "Failed")
+
+    await db.update_download_task(DownloadTaskState(filename=name, url="http://new/fresh", status="Queued",
+                                                    metadata_json='{"ep_no": "1", "show_id": "abc"}'))
+    [task] = await db.get_all_download_tasks()
+    assert (task.url, task.referrer, task.status) == ("http://new/fresh", None, "Queued")
+    assert json.loads(task.metadata_json) == {"ep_no": "1", "show_id": "abc"}
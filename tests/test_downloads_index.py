@@ -0,0 +1,90 @@
+import os
+
+import pytest
+from aniplay.core.downloads_index import DownloadsIndex
+from aniplay.core.online_library_manager import OnlineLibraryManager
+from aniplay.database.db import DatabaseManager
+from aniplay.database.models import OnlineProgress
+
+
+def make(path, size=1):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    return str(path)
+
+
+def test_lookups(tmp_path, monkeypatch):
+    root = tmp_path / "downloads"
+    batch = root / "nyaa-0123456789ab" / "[Group] Show (Batch)"
+    small = make(batch / "[Group] Show - 01 [720p].mkv", 10)
+    big = make(batch / "[Group] Show - 01 [1080p].mkv", 20)
+    second = make(batch / "[Group] Show - 02 [1080p].mkv", 20)
+    special = make(batch / "[Group] Show - 02.5 [1080p].mkv", 30)  # larger, but not episode 2
+    numbered = make(root / "nyaa-aaaaaaaaaaaa" / "04. Title.mkv")
+    make(batch / "[Group] Show - 03 [1080p].mkv.part.ts", 50)  # still downloading
+    old = make(root / "Other Show [nyaa-ba9876543210]" / "Other - 07.mkv")
+    allanime = make(root / OnlineLibraryManager("", None).get_allanime_folder_name("xyz") / "Anime - Ep 12.5.mp4")
+    loose = make(root / "Loose - Ep 1.mp4")
+
+    index = DownloadsIndex(str(root))
+    calls = []
+    real_scandir = os.scandir
+    monkeypatch.setattr(os, "scandir", lambda p: calls.append(p) or real_scandir(p))
+    index.build()
+    scans = len(calls)
+
+    assert index.lookup_many("nyaa-0123456789ab", ["1", "2", "3"]) == {"1": big, "2": second}  # largest copy wins
+    assert index.lookup("nyaa-ba9876543210", 7) == old
+    assert index.lookup("nyaa-0123456789ab", "2.5") == special
+    assert index.lookup("nyaa-aaaaaaaaaaaa", 4) == numbered
+    assert index.lookup("xyz", "12.5") == allanime
+    assert index.lookup(None, filename="Loose - Ep 1.mp4") == loose
+    assert index.lookup("nyaa-0123456789ab", 9) is None and index.lookup("nyaa-ffffffffffff", 1) is None
+    assert len(calls) == scans  # lookups never touch the disk
+    assert small != big
+
+    # A finished download and a watcher event
+    third = make(batch / "[Group] Show - 03 [1080p].mkv", 20)
+    index.add(third)
+    assert index.lookup("nyaa-0123456789ab", 3) == third
+    os.remove(big)
+    index.refresh([big])
+    assert index.lookup("nyaa-0123456789ab", 1) == small
+
+    # Folders deleted or moved by the library manager
+    os.rename(batch.parent, root / "nyaa-cccccccccccc")
+    index.refresh([str(batch.parent), str(root / "nyaa-cccccccccccc")])
+    assert index.lookup_many("nyaa-0123456789ab", ["1", "2"]) == {}
+    assert index.lookup("nyaa-cccccccccccc", 2).startswith(str(root / "nyaa-cccccccccccc"))
+    assert sorted(index.folder_names())[0] == "Other Show [nyaa-ba9876543210]"
+
+
+def test_excluded_files(tmp_path):
+    root = tmp_path / "downloads"
+    small = make(root / "nyaa-0123456789ab" / "Show - 01 [720p].mkv", 10)
+    broken = make(root / "nyaa-0123456789ab" / "Show - 01 [1080p].mkv", 20)
+    index = DownloadsIndex(str(root))
+    index.exclude([broken])  # before the first build, e.g. from the stored tasks
+    index.build()
+    assert index.lookup("nyaa-0123456789ab", 1) == small
+    index.refresh([broken])
+    assert index.lookup("nyaa-0123456789ab", 1) == small
+
+    index.refresh([str(tmp_path / "elsewhere" / "x.mkv")])  # outside the downloads folder: no rebuild
+    assert index.lookup("nyaa-0123456789ab", 1) == small
+
+    index.add(broken)  # downloaded again and checked out this time
+    assert index.lookup("nyaa-0123456789ab", 1) == broken
+    index.exclude([broken])
+    assert index.lookup("nyaa-0123456789ab", 1) == small
+
+
+@pytest.mark.asyncio
+async def test_downloaded_online_shows(tmp_path):
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    await db.initialize()
+    for show_id in ("nyaa-0123456789ab", "nyaa-ba9876543210", "allanime-gone"):
+        await db.update_online_progress(OnlineProgress(show_id=show_id, show_name=show_id, episode_number=1))
+    shows = await db.get_downloaded_online_shows(["nyaa-0123456789ab", "Other Show [nyaa-ba9876543210]"])
+    assert [s["show_id"] for s in shows] == ["nyaa-0123456789ab", "nyaa-ba9876543210"]
@@ -0,0 +1,116 @@
+import argparse
+import json
+import os
+
+import pytest
+import pytest_asyncio
+from aniplay.cli import duplicates
+from aniplay.core.library_manager import LibraryManager
+from aniplay.database.db import DatabaseManager
+from aniplay.database.models import WatchProgress
+from aniplay.utils.duplicate_finder import DuplicateFinder, find_duplicates
+from aniplay.utils.file_identity import CHUNK_SIZE
+from aniplay.utils.media_analyzer import MediaMetadata
+
+
+class _StubAnalyzer:
+    def probe_file(self, path):
+        return MediaMetadata(duration=1420.0, tracks=[])
+
+
+def _write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return str(path)
+
+
+def _large(path, middle: bytes):
+    # Same head and tail, so only the full hash can tell these apart
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        f.truncate(3 * CHUNK_SIZE)
+        f.seek(CHUNK_SIZE + 10)
+        f.write(middle)
+    return (str(path), 3 * CHUNK_SIZE)
+
+
+def test_partial_hash_is_confirmed_by_full_hash(tmp_path):
+    files = [_large(tmp_path / "a.mkv", b"one"), _large(tmp_path / "b.mkv", b"two"), _large(tmp_path / "c.mkv", b"one")]
+    groups = find_duplicates(files, min_size=0)
+    assert [g.paths for g in groups] == [[files[0][0], files[2][0]]]
+    assert groups[0].reclaimable == 3 * CHUNK_SIZE
+    assert len(find_duplicates(files, min_size=0, verify=False)[0].paths) == 3
+
+
+@pytest_asyncio.fixture
+async def library(tmp_path):
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    await db.initialize()
+    root = tmp_path / "library"
+    episode = os.urandom(4096)
+    paths = {
+        "grp_a": _write(root / "Show [GrpA]" / "Show - 01.mkv", episode),
+        "grp_b": _write(root / "Show [GrpB]" / "Show - 01.mkv", episode),
+        "other": _write(root / "Show [GrpB]" / "Show - 02.mkv", os.urandom(4096)),
+        "download": _write(tmp_path / "downloads" / "Show - 01.mkv", episode),
+    }
+    manager = LibraryManager(db)
+    manager._analyzer = _StubAnalyzer()
+    await manager.scan_library(str(root))
+    episodes = {e.path: e for e in await db.get_all_episodes()}
+    # Progress is on the second group's copy, so that one is kept
+    await db.update_progress(WatchProgress(episode_id=episodes[paths["grp_b"]].id, timestamp=300))
+    folders = [str(root), str(tmp_path / "downloads")]
+    return db, folders, paths, episodes
+
+
+@pytest.mark.asyncio
+async def test_keeps_copy_with_progress_and_deletes_others(library):
+    db, folders, paths, episodes = library
+    finder = DuplicateFinder(db)
+    groups = await finder.find(folders, min_size=0)
+    assert len(groups) == 1
+    group = groups[0]
+    assert sorted(group.paths) == sorted([paths["grp_a"], paths["grp_b"], paths["download"]])
+    assert group.keep == paths["grp_b"] and group.reclaimable == 2 * 4096
+
+    dry = await finder.resolve(group, "delete", dry_run=True)
+    assert len(dry["done"]) == 2 and os.path.exists(paths["grp_a"])
+
+    results = await finder.resolve(group, "delete", dry_run=False)
+    assert results["reclaimed"] == 2 * 4096 and not results["failed"]
+    assert not os.path.exists(paths["grp_a"]) and not os.path.exists(paths["download"])
+    remaining = {e.path for e in await db.get_all_episodes()}
+    assert paths["grp_a"] not in remaining and paths["grp_b"] in remaining
+    assert (await db.get_progress(episodes[paths["grp_b"]].id)).timestamp == 300
+
+
+@pytest.mark.asyncio
+async def test_hardlinked_copies_are_not_reported_again(library):
+    db, folders, paths, episodes = library
+    finder = DuplicateFinder(db)
+    group = (await finder.find(folders, min_size=0))[0]
+    results = await finder.resolve(group, "hardlink", dry_run=False)
+    assert len(results["done"]) == 2
+    assert os.stat(paths["grp_a"]).st_ino == os.stat(paths["grp_b"]).st_ino == os.stat(paths["download"]).st_ino
+    # Every path still exists and is still a library episode
+    assert {e.path for e in await db.get_all_episodes()} == set(episodes)
+    assert await finder.find(folders, min_size=0) == []
+
+
+@pytest.mark.asyncio
+async def test_cli_json_to_stdout_stays_valid(library, monkeypatch, capsys):
+    db, folders, paths, episodes = library
+    monkeypatch.setattr(duplicates, "DatabaseManager", lambda: db)
+
+    def args(apply):
+        return argparse.Namespace(folders=folders, min_size=0, no_verify=False, workers=2, json="-",
+                                  hardlink=False, delete=True, apply=apply)
+
+    await duplicates.run(args(apply=False))
+    out, err = capsys.readouterr()
+    assert len(json.loads(out)["groups"]) == 1 and "[DRY RUN]" in err
+
+    await duplicates.run(args(apply=True))
+    out, err = capsys.readouterr()
+    assert json.loads(out)["reclaimable"] == 2 * 4096 and "Deleted 2 files" in err
@@ -0,0 +1,119 @@
+import asyncio
+import os
+
+import pytest
+from aniplay.core.download_backends import DownloadError
+from aniplay.core.hls_downloader import HlsDownloader, HlsUnsupported, parse_master, parse_media, pick_variant
+from tests.http_standin import HttpStandIn
+
+MASTER = """#EXTM3U
+#EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=854x480
+480/index.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=2500000,RESOLUTION=1920x1080,CODECS="avc1.640028,mp4a.40.2"
+1080/index.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=1400000,RESOLUTION=1280x720
+720/index.m3u8
+"""
+
+
+def _media(count, prefix="seg", key=None):
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:6", "#EXT-X-MEDIA-SEQUENCE:7"]
+    if key:
+        lines.append(key)
+    for i in range(count):
+        lines += [f"#EXTINF:{4.0 + i % 3:.3f},", f"{prefix}{i}.ts"]
+    lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines)
+
+
+def _stream(count=12):
+    segments = {f"/show/1080/seg{i}.ts": os.urandom(1000 + 37 * i) for i in range(count)}
+    files = {"/show/master.m3u8": MASTER.encode(), "/show/1080/index.m3u8": _media(count).encode(), **segments}
+    return files, b"".join(segments[f"/show/1080/seg{i}.ts"] for i in range(count))
+
+
+def test_parse_playlists():
+    variants = parse_master(MASTER, "https://cdn.test/show/master.m3u8")
+    assert [v.height for v in variants] == [480, 1080, 720]
+    assert pick_variant(variants).uri == "https://cdn.test/show/1080/index.m3u8"
+    assert pick_variant(variants, max_height=720).height == 720
+
+    playlist = parse_media(_media(3) + "\n", "https://cdn.test/show/1080/index.m3u8")
+    assert [s.sequence for s in playlist.segments] == [7, 8, 9]
+    assert playlist.segments[1].uri == "https://cdn.test/show/1080/seg1.ts"
+    assert playlist.duration == 15.0
+
+    ranged = parse_media("#EXTM3U\n#EXT-X-MAP:URI=\"init.mp4\"\n#EXTINF:4,\n#EXT-X-BYTERANGE:100@0\nall.m4s\n"
+                         "#EXTINF:4,\n#EXT-X-BYTERANGE:50\nall.m4s\n", "https://cdn.test/a/index.m3u8")
+    assert ranged.init.uri == "https://cdn.test/a/init.mp4"
+    assert [s.byterange for s in ranged.segments] == [(0, 100), (100, 50)]
+
+
+@pytest.mark.asyncio
+async def test_parallel_segments_written_in_order(tmp_path):
+    files, expected = _stream()
+    server = HttpStandIn(files, delay=0.01)
+    server.fail_once.add("/show/1080/seg3.ts")
+    updates = []
+    async with server.client() as client:
+        downloader = HlsDownloader("http://cdn.test/show/master.m3u8", {"Referer": "https://ref.test"},
+                                   client=client, workers=4, progress_callback=updates.append)
+        written = await downloader.download(str(tmp_path / "out.ts"))
+
+    assert written == len(expected)
+    assert (tmp_path / "out.ts").read_bytes() == expected
+    assert server.max_in_flight >= 3
+    assert server.requests["/show/1080/seg3.ts"] == 2  # retried once
+    assert "/show/480/index.m3u8" not in server.requests
+    final = updates[-1]
+    assert final.bytes_done == final.bytes_total == len(expected) and final.parts_done == 12
+
+
+@pytest.mark.asyncio
+async def test_encrypted_stream(tmp_path):
+    crypto = pytest.importorskip("cryptography.hazmat.primitives.ciphers")
+    from cryptography.hazmat.primitives import padding
+    key, segments = os.urandom(16), [os.urandom(500 + i) for i in range(3)]
+    files = {"/k.key": key, "/index.m3u8": _media(3, key='#EXT-X-KEY:METHOD=AES-128,URI="/k.key"').encode()}
+    for i, plain in enumerate(segments):
+        padder = padding.PKCS7(128).padder()
+        iv = (7 + i).to_bytes(16, "big")  # no IV attribute: the media sequence number is the IV
+        encryptor = crypto.Cipher(crypto.algorithms.AES(key), crypto.modes.CBC(iv)).encryptor()
+        files[f"/seg{i}.ts"] = encryptor.update(padder.update(plain) + padder.finalize()) + encryptor.finalize()
+
+    async with HttpStandIn(files).client() as client:
+        await HlsDownloader("http://cdn.test/index.m3u8", client=client).download(str(tmp_path / "out.ts"))
+    assert (tmp_path / "out.ts").read_bytes() == b"".join(segments)
+
+
+@pytest.mark.asyncio
+async def test_unsupported_and_missing(tmp_path):
+    files = {"/index.m3u8": _media(2, key="#EXT-X-KEY:METHOD=SAMPLE-AES,URI=\"k\"").encode()}
+    async with HttpStandIn(files).client() as client:
+        with pytest.raises(HlsUnsupported):
+            await HlsDownloader("http://cdn.test/index.m3u8", client=client).download(str(tmp_path / "out.ts"))
+        with pytest.raises(DownloadError):
+            await HlsDownloader("http://cdn.test/missing.m3u8", client=client).download(str(tmp_path / "out.ts"))
+    assert not (tmp_path / "out.ts").exists()
+
+
+@pytest.mark.asyncio
+async def test_resume_continues_after_written_segments(tmp_path):
+    files, expected = _stream(20)
+    server = HttpStandIn(files, delay=0.01)
+    path = str(tmp_path / "out.part.ts")
+    async with server.client() as client:
+        first = HlsDownloader("http://cdn.test/show/master.m3u8", client=client, workers=2)
+        task = asyncio.ensure_future(first.download(path))
+        while first.resume_state() is None or first.resume_state()["segments"] < 5:
+            await asyncio.sleep(0.005)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        state = first.resume_state()
+        assert state["playlist"] == "http://cdn.test/show/1080/index.m3u8"
+
+        server.requests.clear()
+        await HlsDownloader("http://cdn.test/show/master.m3u8", client=client, resume=state).download(path)
+    assert open(path, "rb").read() == expected
+    assert "/show/master.m3u8" not in server.requests  # the variant is kept
+    assert sum(n for p, n in server.requests.items() if p.endswith(".ts")) == 20 - state["segments"]
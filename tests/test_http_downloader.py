@@ -0,0 +1,102 @@
+import asyncio
+import json
+import os
+
+import pytest
+from aniplay.core.download_backends import DownloadError
+from aniplay.core.http_downloader import HttpDownloader, probe, split
+from tests.http_standin import HttpStandIn
+
+CHUNK = 256 * 1024
+
+
+def test_split():
+    assert list(split(10, 4)) == [(0, 3), (4, 7), (8, 9)]
+    assert list(split(8, 4)) == [(0, 3), (4, 7)]
+
+
+@pytest.mark.asyncio
+async def test_probe():
+    server = HttpStandIn({"/ep1.mp4": b"x" * 1000})
+    async with server.client() as client:
+        remote = await probe("http://cdn.test/ep1.mp4", client=client)
+        assert (remote.size, remote.accepts_ranges, remote.is_media) == (1000, True, True)
+
+        server.head = False  # HEAD refused: a one-byte ranged GET is used instead
+        remote = await probe("http://cdn.test/ep1.mp4", client=client)
+        assert (remote.size, remote.accepts_ranges) == (1000, True)
+
+        server.ranges = False
+        remote = await probe("http://cdn.test/ep1.mp4", client=client)
+        assert (remote.size, remote.accepts_ranges) == (1000, False)
+
+
+@pytest.mark.asyncio
+async def test_parallel_chunks(tmp_path):
+    body = os.urandom(CHUNK * 10 + 123)
+    server = HttpStandIn({"/ep1.mp4": body}, delay=0.01)
+    server.short_once.add("/ep1.mp4")  # one chunk is cut off halfway and continued
+    updates = []
+    async with server.client() as client:
+        downloader = HttpDownloader("http://cdn.test/ep1.mp4", client=client, connections=4, chunk_size=CHUNK,
+                                    progress_callback=updates.append)
+        written = await downloader.download(str(tmp_path / "ep1.mp4"))
+
+    assert written == len(body)
+    assert (tmp_path / "ep1.mp4").read_bytes() == body
+    assert server.max_in_flight >= 3
+    assert server.requests["/ep1.mp4"] == 1 + 11 + 1  # HEAD, 11 chunks and the rest of the cut-off one
+    final = updates[-1]
+    assert final.bytes_done == final.bytes_total == len(body) and final.parts_done == final.parts_total == 11
+
+
+@pytest.mark.asyncio
+async def test_without_ranges(tmp_path):
+    body = os.urandom(CHUNK * 3)
+    server = HttpStandIn({"/ep1.mp4": body}, ranges=False)
+    server.fail_once.add("/ep1.mp4")
+    async with server.client() as client:
+        written = await HttpDownloader("http://cdn.test/ep1.mp4", client=client, chunk_size=CHUNK).download(
+            str(tmp_path / "ep1.mp4"))
+        assert written == len(body) and (tmp_path / "ep1.mp4").read_bytes() == body
+
+        with pytest.raises(DownloadError):
+            await HttpDownloader("http://cdn.test/missing.mp4", client=client).download(str(tmp_path / "x.mp4"))
+
+
+async def _interrupt(downloader, path, after_bytes):
+    """Run a download until `after_bytes` have arrived, then cancel it like an app shutdown would."""
+    task = asyncio.ensure_future(downloader.download(path))
+    while downloader._progress.bytes_done < after_bytes:
+        await asyncio.sleep(0.005)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    return downloader.resume_state()
+
+
+@pytest.mark.asyncio
+async def test_resume_after_interruption(tmp_path):
+    body = os.urandom(CHUNK * 12)
+    server = HttpStandIn({"/ep1.mp4": body}, delay=0.01)
+    path = str(tmp_path / "ep1.mp4.part")
+    async with server.client() as client:
+        first = HttpDownloader("http://cdn.test/ep1.mp4", client=client, connections=2, chunk_size=CHUNK)
+        state = await _interrupt(first, path, CHUNK * 4)
+        assert state["size"] == len(body) and state["ranges"]
+        missing = sum(end - start + 1 for start, end in state["ranges"])
+        assert 0 < missing < len(body)
+
+        server.bytes_sent = 0
+        resumed = HttpDownloader("http://cdn.test/ep1.mp4", client=client, connections=2, chunk_size=CHUNK,
+                                 resume=json.loads(json.dumps(state)))
+        assert await resumed.download(path) == len(body)
+    assert open(path, "rb").read() == body
+    assert server.bytes_sent == missing
+
+    # A different file behind the same url is fetched again from the start
+    server.files["/ep1.mp4"] = body[::-1]
+    server.bytes_sent = 0
+    async with server.client() as client:
+        await HttpDownloader("http://cdn.test/ep1.mp4", client=client, chunk_size=CHUNK,
+                             resume={**state, "validator": '"old"'}).download(path)
+    assert open(path, "rb").read() == body[::-1] and server.bytes_sent == len(body)
@@ -0,0 +1,223 @@
+import shutil
+import pytest
+import pytest_asyncio
+from aniplay.core.library_manager import LibraryManager
+from aniplay.core.scan_pipeline import CancelToken, ScanCancelled
+from aniplay.database.db import DatabaseManager
+from aniplay.utils.media_analyzer import MediaMetadata, TrackInfo
+
+
+class _StubAnalyzer:
+    def __init__(self):
+        self.probed = []
+
+    def probe_file(self, path):
+        self.probed.append(path)
+        return MediaMetadata(duration=1420.0, tracks=[
+            TrackInfo(index=0, type="video", codec="h264", language="und", title="Video 0"),
+            TrackInfo(index=1, type="audio", codec="aac", language="jpn", title="Audio 1"),
+        ])
+
+
+def _make_library(root, series_count=3, episodes=4):
+    for s in range(series_count):
+        season = root / f"Show {s}" / "Season 1"
+        season.mkdir(parents=True)
+        for e in range(1, episodes + 1):
+            (season / f"Show {s} - S01E{e:02d}.mkv").write_bytes(b"\0" * (e * 10))
+
+
+@pytest_asyncio.fixture
+async def library(tmp_path):
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    await db.initialize()
+    lib_root = tmp_path / "library"
+    _make_library(lib_root)
+    manager = LibraryManager(db)
+    manager._analyzer = _StubAnalyzer()
+    return db, manager, lib_root
+
+
+@pytest.mark.asyncio
+async def test_parallel_scan_syncs_all_series(library):
+    db, manager, lib_root = library
+    messages = []
+    await manager.scan_library(str(lib_root), progress_callback=messages.append, scan_workers=3, probe_workers=2)
+
+    series = await db.get_all_series()
+    assert [s.name for s in series] == ["Show 0", "Show 1", "Show 2"]
+    assert all(s.size_bytes == 100 for s in series)
+
+    episodes = await db.get_all_episodes()
+    assert len(episodes) == 12
+    assert all(e.duration == 1420.0 and e.season_number == 1 for e in episodes)
+    assert len(await db.get_tracks_for_episode(episodes[0].id)) == 2
+
+    # Progress stays ordered even though folders are walked concurrently
+    scanning = [str(m) for m in messages if m.phase == "scan"]
+    assert scanning == [f"Scanning Show {i}... ({i + 1}/3)" for i in range(3)]
+    assert str(messages[-1]) == "Scan complete!"
+    assert messages[-1].files_seen == 12 and messages[-1].bytes_seen == 300
+    assert messages[-1].probes_done == messages[-1].probes_total == 12
+
+
+@pytest.mark.asyncio
+async def test_rescan_does_not_reprobe(library):
+    db, manager, lib_root = library
+    await manager.scan_library(str(lib_root))
+    assert len(manager._analyzer.probed) == 12
+    await manager.scan_library(str(lib_root))
+    assert len(manager._analyzer.probed) == 12
+
+
+@pytest.mark.asyncio
+async def test_scan_paths_only_touches_affected_series(library):
+    db, manager, lib_root = library
+    await manager.scan_library(str(lib_root))
+    new_file = lib_root / "Show 1" / "Season 1" / "Show 1 - S01E05.mkv"
+    new_file.write_bytes(b"\0" * 50)
+    messages = []
+
+    scanned = await manager.scan_paths([str(new_file), "/somewhere/else.mkv"], str(lib_root), messages.append)
+
+    assert scanned == [str(lib_root / "Show 1")]
+    assert [str(m) for m in messages if m.phase == "scan"] == ["Scanning Show 1... (1/1)"]
+    assert len(await db.get_all_episodes()) == 13
+    assert manager._analyzer.probed[-1] == str(new_file)
+
+
+@pytest.mark.asyncio
+async def test_replaced_file_is_reprobed(library):
+    db, manager, lib_root = library
+    await manager.scan_library(str(lib_root))
+    replaced = lib_root / "Show 2" / "Season 1" / "Show 2 - S01E01.mkv"
+    replaced.write_bytes(b"\0" * 99)
+    await manager.scan_library(str(lib_root))
+    assert manager._analyzer.probed[12:] == [str(replaced)]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_full_scan_resumes_from_checkpoint(library):
+    db, manager, lib_root = library
+    # Probe everything first so the full scan checkpoints each series as soon as it is written
+    await manager.scan_library(str(lib_root))
+    token = CancelToken()
+    messages = []
+
+    def on_progress(event):
+        messages.append(event)
+        # Stop once the second series starts; the first one is already checkpointed
+        if event.phase == "scan" and event.series_done == 1:
+            token.cancel()
+
+    with pytest.raises(ScanCancelled):
+        await manager.scan_library(str(lib_root), on_progress, full_scan=True, cancel_token=token)
+    assert messages[-1].phase == "cancelled"
+    checkpoint = await db.get_scan_checkpoint(str(lib_root))
+    assert checkpoint["completed"] == {str(lib_root / "Show 0")}
+
+    messages.clear()
+    await manager.scan_library(str(lib_root), messages.append, full_scan=True)
+    assert [str(m) for m in messages if m.phase == "scan"] == ["Scanning Show 1... (2/3)", "Scanning Show 2... (3/3)"]
+    assert await db.get_scan_checkpoint(str(lib_root)) is None
+    assert len(await db.get_all_episodes()) == 12
+
+
+@pytest.mark.asyncio
+async def test_deleted_files_and_series_are_pruned(library):
+    db, manager, lib_root = library
+    await manager.scan_library(str(lib_root))
+    (lib_root / "Show 0" / "Season 1" / "Show 0 - S01E02.mkv").unlink()
+    shutil.rmtree(lib_root / "Show 2")
+    messages = []
+
+    await manager.scan_library(str(lib_root), progress_callback=messages.append, prune_grace_days=0)
+
+    assert [s.name for s in await db.get_all_series(include_missing=True)] == ["Show 0", "Show 1"]
+    paths = [e.path for e in await db.get_all_episodes(include_missing=True)]
+    assert len(paths) == 7
+    assert not any(p.endswith("S01E02.mkv") and "Show 0" in p for p in paths)
+    assert [str(m) for m in messages if m.phase == "prune"] == ["Removed 5 missing episodes, 1 series"]
+    assert str(messages[-1]) == "Scan complete!"
+
+
+@pytest.mark.asyncio
+async def test_empty_root_is_not_pruned(library):
+    db, manager, lib_root = library
+    await manager.scan_library(str(lib_root))
+    for s in range(3):
+        shutil.rmtree(lib_root / f"Show {s}")
+
+    await manager.scan_library(str(lib_root))
+    assert len(await db.get_all_series()) == 3
+
+
+@pytest.mark.asyncio
+async def test_grace_period_marks_missing_and_restores(library):
+    db, manager, lib_root = library
+    await manager.scan_library(str(lib_root))
+    episode = lib_root / "Show 1" / "Season 1" / "Show 1 - S01E03.mkv"
+    hidden = lib_root.parent / "hidden.mkv"
+    episode.rename(hidden)
+
+    await manager.scan_library(str(lib_root), prune_grace_days=30)
+    assert len(await db.get_all_episodes()) == 11
+    assert len(await db.get_all_episodes(include_missing=True)) == 12
+
+    hidden.rename(episode)
+    await manager.scan_library(str(lib_root), prune_grace_days=30)
+    assert len(await db.get_all_episodes()) == 12
+    assert len(manager._analyzer.probed) == 12
+
+
+@pytest.mark.asyncio
+async def test_scan_paths_prunes_removed_series_folder(library):
+    db, manager, lib_root = library
+    await manager.scan_library(str(lib_root))
+    shutil.rmtree(lib_root / "Show 1")
+
+    scanned = await manager.scan_paths([str(lib_root / "Show 1")], str(lib_root))
+
+    assert scanned == [str(lib_root / "Show 1")]
+    # Hidden for the grace period, not deleted
+    assert [s.name for s in await db.get_all_series()] == ["Show 0", "Show 2"]
+    assert len(await db.get_all_series(include_missing=True)) == 3
+
+
+@pytest.mark.asyncio
+async def test_scan_report_is_recorded(library):
+    db, manager, lib_root = library
+    first = await manager.scan_library(str(lib_root))
+    c = first["counters"]
+    assert c["series"] == 3 and c["files_walked"] == 12 and c["stats"] == 12
+    assert c["dirs_listed"] == 6  # each series folder plus its season folder
+    assert c["probes_run"] == 12 and c["episodes_written"] == 12
+    assert c["bytes_hashed"] == 300
+    assert c["db_statements"] > 0
+    assert {"discover", "diff", "persist", "store"} <= set(first["phases"])
+    assert {"walk", "probe", "hash"} <= set(first["worker_time"])
+
+    # Nothing changed: everything is served from the DB
+    second = await manager.scan_library(str(lib_root))
+    assert second["counters"]["probes_cached"] == 12
+    assert "probes_run" not in second["counters"] and "episodes_written" not in second["counters"]
+
+    runs = await db.get_scan_runs(str(lib_root))
+    assert [r["status"] for r in runs] == ["ok", "ok"]
+    assert runs[0]["counters"] == second["counters"]
+    assert (await db.get_scan_run(runs[1]["id"]))["counters"] == first["counters"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_scan_report_is_recorded(library):
+    db, manager, lib_root = library
+    token = CancelToken()
+
+    def on_progress(event):
+        if event.phase == "scan":
+            token.cancel()
+
+    with pytest.raises(ScanCancelled):
+        await manager.scan_library(str(lib_root), on_progress, cancel_token=token)
+    runs = await db.get_scan_runs()
+    assert len(runs) == 1 and runs[0]["status"] == "cancelled"
@@ -0,0 +1,106 @@
+import os
+import struct
+import sys
+import threading
+import time
+
+import pytest
+from aniplay.core.library_watcher import (IN_CLOSE_WRITE, IN_CREATE, IN_IGNORED, IN_ISDIR, IN_MOVED_TO, IN_Q_OVERFLOW,
+                                          LibraryWatcher, _Coalescer, _InotifyBackend)
+
+
+class _Batches:
+    def __init__(self):
+        self.batches = []
+        self.times = []
+        self.event = threading.Event()
+
+    def __call__(self, batch):
+        self.batches.append(batch)
+        self.times.append(time.monotonic())
+        self.event.set()
+
+
+def test_coalescer_debounces_a_burst():
+    batches = _Batches()
+    coalescer = _Coalescer(batches, debounce=0.1, max_delay=5)
+    coalescer.start()
+    try:
+        coalescer.add(["/lib/a.mkv"])
+        time.sleep(0.03)
+        coalescer.add(["/lib/b.mkv", "/lib/a.mkv"])
+        assert batches.event.wait(2)
+        time.sleep(0.2)  # nothing else is flushed
+        assert batches.batches == [{"/lib/a.mkv", "/lib/b.mkv"}]
+    finally:
+        coalescer.stop()
+
+
+def test_coalescer_flushes_after_max_delay_under_a_stream():
+    batches = _Batches()
+    coalescer = _Coalescer(batches, debounce=0.2, max_delay=0.3)
+    coalescer.start()
+    try:
+        start = time.monotonic()
+        for n in range(20):  # a new path every 50 ms never lets the debounce expire
+            coalescer.add([f"/lib/{n}.mkv"])
+            time.sleep(0.05)
+        assert batches.event.wait(2)
+        assert batches.times[0] - start < 0.8
+        time.sleep(0.4)
+        assert set().union(*batches.batches) == {f"/lib/{n}.mkv" for n in range(20)}
+    finally:
+        coalescer.stop()
+
+
+def _event(wd, mask, name=b""):
+    padded = name + b"\0" * (-len(name) % 16 or 16) if name else b""
+    return struct.pack("iIII", wd, mask, 0, len(padded)) + padded
+
+
+@pytest.fixture
+def inotify(tmp_path):
+    if not sys.platform.startswith("linux"):
+        pytest.skip("inotify is Linux only")
+    root = tmp_path / "library"
+    root.mkdir()
+    backend = _InotifyBackend([str(root)], lambda paths: None)
+    backend._add_tree(str(root))  # the watches start() would add, without the reader thread
+    yield backend, root, next(wd for wd, path in backend._watches.items() if path == str(root))
+    for fd in (backend._fd, backend._wake_r, backend._wake_w):
+        os.close(fd)
+
+
+def test_inotify_overflow_rescans_the_roots(inotify):
+    backend, root, _ = inotify
+    assert backend._parse(_event(-1, IN_Q_OVERFLOW)) == [str(root)]
+
+
+def test_inotify_new_directory_gets_a_watch(inotify):
+    backend, root, wd = inotify
+    (root / "Show" / "Season 1").mkdir(parents=True)
+    assert backend._parse(_event(wd, IN_CREATE | IN_ISDIR, b"Show")) == [str(root / "Show")]
+    assert {str(root / "Show"), str(root / "Show" / "Season 1")} <= set(backend._watches.values())
+
+
+def test_inotify_files_are_reported_once_written(inotify):
+    backend, root, wd = inotify
+    data = _event(wd, IN_CREATE, b"Show - 01.mkv") + _event(wd, IN_CLOSE_WRITE, b"notes.txt")
+    assert backend._parse(data) == []  # half-written video, not a video
+    data = _event(wd, IN_CLOSE_WRITE, b"Show - 01.mkv") + _event(wd, IN_MOVED_TO, b"Show - 02.mp4")
+    assert backend._parse(data) == [str(root / "Show - 01.mkv"), str(root / "Show - 02.mp4")]
+
+    assert backend._parse(_event(wd, IN_IGNORED)) == []
+    assert backend._parse(_event(wd, IN_CLOSE_WRITE, b"Show - 03.mkv")) == []  # watch gone
+    assert wd not in backend._watches
+
+
+def test_root_for(tmp_path):
+    for name in ("lib", "lib2"):
+        (tmp_path / name).mkdir()
+    watcher = LibraryWatcher([tmp_path / "lib", tmp_path / "lib2", tmp_path / "missing"], lambda batch: None)
+    assert watcher.roots == [str(tmp_path / "lib"), str(tmp_path / "lib2")]
+    assert watcher.root_for(str(tmp_path / "lib")) == str(tmp_path / "lib")
+    assert watcher.root_for(str(tmp_path / "lib2" / "Show" / "ep.mkv")) == str(tmp_path / "lib2")
+    assert watcher.root_for(str(tmp_path / "lib" / ".." / "lib2" / "x.mkv")) == str(tmp_path / "lib2")
+    assert watcher.root_for(str(tmp_path / "other" / "x.mkv")) is None
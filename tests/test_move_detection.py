@@ -0,0 +1,145 @@
+import os
+import pytest
+import pytest_asyncio
+from aniplay.core.library_manager import LibraryManager
+from aniplay.database.db import DatabaseManager
+from aniplay.database.models import WatchProgress
+from aniplay.utils.db_migrator import DatabaseMigrator
+from aniplay.utils.file_identity import file_identity
+from aniplay.utils.media_analyzer import MediaMetadata, TrackInfo
+
+
+class _StubAnalyzer:
+    def probe_file(self, path):
+        return MediaMetadata(duration=1420.0, tracks=[
+            TrackInfo(index=0, type="video", codec="h264", language="und", title="Video 0"),
+        ])
+
+
+@pytest_asyncio.fixture
+async def library(tmp_path):
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    await db.initialize()
+    root = tmp_path / "library"
+    for s in range(2):
+        season = root / f"Show {s}" / "Season 1"
+        season.mkdir(parents=True)
+        for e in range(1, 4):
+            (season / f"Show {s} - S01E{e:02d}.mkv").write_bytes(os.urandom(2048))
+    manager = LibraryManager(db)
+    manager._analyzer = _StubAnalyzer()
+    await manager.scan_library(str(root))
+    return db, manager, root
+
+
+def test_identity_ignores_name_but_not_content(tmp_path):
+    a = tmp_path / "a.mkv"
+    a.write_bytes(b"head" + b"\0" * 100 + b"tail")
+    b = tmp_path / "renamed.mkv"
+    b.write_bytes(a.read_bytes())
+    c = tmp_path / "c.mkv"
+    c.write_bytes(b"head" + b"\0" * 100 + b"TAIL")
+    # Small chunk so only head and tail are read
+    assert file_identity(str(a), chunk_size=16) == file_identity(str(b), chunk_size=16)
+    assert file_identity(str(a), chunk_size=16) != file_identity(str(c), chunk_size=16)
+    assert file_identity(str(tmp_path / "missing.mkv")) is None
+
+
+async def _watch_first_episode(db):
+    episode = next(e for e in await db.get_all_episodes() if e.path.endswith("Show 0 - S01E02.mkv"))
+    await db.update_progress(WatchProgress(episode_id=episode.id, timestamp=600.0))
+    return episode
+
+
+@pytest.mark.asyncio
+async def test_migrator_relinks_renamed_file_by_hash(library):
+    db, manager, root = library
+    episode = await _watch_first_episode(db)
+    new_path = root / "Show 1" / "Extras" / "totally different name.mkv"
+    new_path.parent.mkdir()
+    os.rename(episode.path, new_path)
+
+    stats = await DatabaseMigrator(db).migrate_paths(str(root), dry_run=False)
+
+    assert stats["relinked_by_hash"] == 1
+    moved = next(e for e in await db.get_all_episodes() if e.id == episode.id)
+    assert moved.path == str(new_path)
+    assert (await db.get_progress(episode.id)).timestamp == 600.0
+
+
+@pytest.mark.asyncio
+async def test_rescan_folds_renamed_file_into_old_row(library):
+    db, manager, root = library
+    episode = await _watch_first_episode(db)
+    new_path = root / "Show 0" / "Season 1" / "[Grp] Show 0 - 02 [1080p].mkv"
+    os.rename(episode.path, new_path)
+
+    await manager.scan_library(str(root))
+
+    episodes = await db.get_all_episodes()
+    assert len(episodes) == 6
+    moved = next(e for e in episodes if e.id == episode.id)
+    assert moved.path == str(new_path)
+    assert (await db.get_progress(episode.id)).timestamp == 600.0
+
+
+async def _forget_hashes(db):
+    # As in a library scanned before content hashes were stored
+    async with db._connect() as conn:
+        await conn.execute("UPDATE episodes SET content_hash = NULL")
+        await conn.commit()
+
+
+@pytest.mark.asyncio
+async def test_rescan_hashes_old_rows_once(library):
+    db, manager, root = library
+    await _forget_hashes(db)
+    episode = await _watch_first_episode(db)
+
+    report = await manager.scan_library(str(root))
+    assert report["counters"]["hashes_backfilled"] == 6
+    assert all(e.content_hash for e in await db.get_all_episodes())
+    report = await manager.scan_library(str(root))
+    assert "hashes_backfilled" not in report["counters"]
+
+    # Now a rename is relinked by content like any other
+    new_path = root / "Show 1" / "Season 1" / "renamed.mkv"
+    os.rename(episode.path, new_path)
+    await manager.scan_library(str(root))
+    assert (await db.get_episode_by_id(episode.id)).path == str(new_path)
+    assert (await db.get_progress(episode.id)).timestamp == 600.0
+
+
+@pytest.mark.asyncio
+async def test_unhashed_row_is_relinked_by_filename(library):
+    db, manager, root = library
+    await _forget_hashes(db)
+    episode = await _watch_first_episode(db)
+    new_path = root / "Show 1" / "Season 1" / episode.filename
+    os.rename(episode.path, new_path)
+
+    await manager.scan_library(str(root))
+
+    episodes = await db.get_all_episodes()
+    assert len(episodes) == 6
+    moved = next(e for e in episodes if e.id == episode.id)
+    assert moved.path == str(new_path) and moved.duration == 1420.0
+    assert len(await db.get_tracks_for_episode(episode.id)) == 1
+    assert (await db.get_progress(episode.id)).timestamp == 600.0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("grace_days", [0, 14])
+async def test_renamed_unhashed_row_keeps_progress(library, grace_days):
+    db, manager, root = library
+    await _forget_hashes(db)
+    episode = await _watch_first_episode(db)
+    new_path = root / "Show 0" / "Season 1" / "[Grp] Show 0 - 02 [1080p].mkv"
+    os.rename(episode.path, new_path)
+
+    await manager.scan_library(str(root), prune_grace_days=grace_days)
+
+    # Matched by season and episode, before anything is pruned
+    assert (await db.get_episode_by_id(episode.id)).path == str(new_path)
+    assert (await db.get_progress(episode.id)).timestamp == 600.0
+    assert len(await db.get_all_episodes(include_missing=True)) == 6
@@ -0,0 +1,85 @@
+import struct
+import subprocess
+from aniplay.utils.mp4_parser import Mp4Parser
+from aniplay.utils.media_analyzer import MediaAnalyzer
+
+
+def _box(box_type: bytes, payload: bytes = b"") -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def _full_box(box_type: bytes, body: bytes, version: int = 0) -> bytes:
+    return _box(box_type, bytes([version, 0, 0, 0]) + body)
+
+
+def _lang(code: str) -> int:
+    a, b, c = (ord(ch) - 0x60 for ch in code)
+    return (a << 10) | (b << 5) | c
+
+
+def _trak(handler: bytes, fourcc: bytes, lang: str, name: str = None) -> bytes:
+    mdhd = _full_box(b"mdhd", struct.pack(">IIIIHH", 0, 0, 1000, 1440000, _lang(lang), 0))
+    hdlr = _full_box(b"hdlr", struct.pack(">I4s", 0, handler) + b"\x00" * 12 + b"handler\x00")
+    entry = _box(fourcc, b"\x00" * 28)
+    stsd = _full_box(b"stsd", struct.pack(">I", 1) + entry)
+    minf = _box(b"minf", _box(b"stbl", stsd))
+    children = _box(b"mdia", mdhd + hdlr + minf)
+    if name:
+        children += _box(b"udta", _box(b"name", name.encode()))
+    return _box(b"trak", children)
+
+
+def _moov() -> bytes:
+    mvhd = _full_box(b"mvhd", struct.pack(">IIII", 0, 0, 1000, 1440000) + b"\x00" * 80)
+    return _box(b"moov", mvhd
+                + _trak(b"vide", b"avc1", "und")
+                + _trak(b"soun", b"mp4a", "jpn")
+                + _trak(b"tmcd", b"tmcd", "und")
+                + _trak(b"sbtl", b"tx3g", "eng", name="Dialogue"))
+
+
+def _write(tmp_path, moov_first: bool):
+    ftyp = _box(b"ftyp", b"isom\x00\x00\x02\x00isomiso2avc1mp41")
+    mdat = _box(b"mdat", b"\x00" * 4096)
+    data = ftyp + (_moov() + mdat if moov_first else mdat + _moov())
+    path = tmp_path / ("start.mp4" if moov_first else "end.mp4")
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_parse_moov_at_start_and_end(tmp_path):
+    for moov_first in (True, False):
+        meta = Mp4Parser.parse(_write(tmp_path, moov_first))
+        assert meta is not None
+        assert meta.duration == 1440.0
+        assert [t.type for t in meta.tracks] == ["video", "audio", "subtitle"]
+        assert [t.codec for t in meta.tracks] == ["h264", "aac", "mov_text"]
+        assert [t.language for t in meta.tracks] == ["und", "jpn", "eng"]
+        # Stream indices follow trak order, including the skipped timecode track
+        assert [t.index for t in meta.tracks] == [0, 1, 3]
+        sub = meta.tracks[2]
+        assert sub.title == "Dialogue"
+        assert sub.sub_index == 0
+        assert meta.tracks[0].title == "Video 0"
+
+
+def test_analyzer_uses_native_path_without_ffprobe(tmp_path, monkeypatch):
+    def boom(*args, **kwargs):
+        raise AssertionError("ffprobe should not be called")
+    monkeypatch.setattr(subprocess, "run", boom)
+    meta = MediaAnalyzer.probe_file(_write(tmp_path, moov_first=False))
+    assert meta is not None and len(meta.tracks) == 3
+
+
+def test_analyzer_falls_back_to_ffprobe(tmp_path, monkeypatch):
+    broken = tmp_path / "broken.mp4"
+    broken.write_bytes(_box(b"ftyp", b"isom") + _box(b"mdat", b"\x00" * 64))
+    calls = []
+
+    def fake_run(cmd, **kwargs):
+        calls.append(cmd)
+        return subprocess.CompletedProcess(cmd, 0, stdout='{"format": {"duration": "12.5"}, "streams": []}', stderr="")
+    monkeypatch.setattr(subprocess, "run", fake_run)
+    meta = MediaAnalyzer.probe_file(str(broken))
+    assert calls and calls[0][0] == "ffprobe"
+    assert meta.duration == 12.5
@@ -0,0 +1,72 @@
+import csv
+import io
+
+import pytest
+from aniplay.cli.org_check import run_check, write_csv
+from aniplay.core.library_manager import LibraryManager
+from aniplay.database.db import DatabaseManager
+from aniplay.utils.media_analyzer import MediaMetadata
+from aniplay.utils.org_analyzer import OrgAnalyzer
+
+
+class _StubAnalyzer:
+    def probe_file(self, path):
+        return MediaMetadata(duration=1420.0, tracks=[])
+
+
+def _touch(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"\0")
+
+
+@pytest.fixture
+def library(tmp_path):
+    root = tmp_path / "library"
+    for e in range(1, 3):
+        _touch(root / "Clean" / "Season 1" / f"Clean - S01E{e:02d}.mkv")
+        _touch(root / "Loose" / f"Loose - S01E{e:02d}.mkv")
+        _touch(root / "Mixed" / f"Mixed - S01E{e:02d}.mkv")
+        _touch(root / "Mixed" / "Extras" / "Bonus" / f"Mixed - S02E{e:02d}.mkv")
+        _touch(root / "Flat" / f"Flat - S0{e}E01.mkv")
+    (root / "Empty").mkdir()
+    return root
+
+
+def test_analyze_series(library):
+    analyzer = OrgAnalyzer()
+    assert analyzer.analyze_series(str(library / "Clean"))["status"] == "ok"
+    assert analyzer.analyze_series(str(library / "Empty")) == {"status": "empty", "issues": []}
+
+    loose = analyzer.analyze_series(str(library / "Loose"))
+    assert [i["type"] for i in loose["issues"]] == ["missing_season_folder"]
+
+    mixed = analyzer.analyze_series(str(library / "Mixed"))
+    assert [i["type"] for i in mixed["issues"]] == ["mixed_content", "non_standard_folder"]
+    assert mixed["issues"][0]["files"] == ["Mixed - S01E01.mkv", "Mixed - S01E02.mkv"]
+    assert mixed["media_folders"] == ["Extras"] and mixed["total_videos"] == 4
+
+    flat = analyzer.analyze_series(str(library / "Flat"))
+    assert [i["type"] for i in flat["issues"]] == ["missing_season_folders", "inconsistent_seasons"]
+    assert flat["issues"][1]["folder"] == "."
+
+
+@pytest.mark.asyncio
+async def test_run_check_from_disk_and_db(library, tmp_path):
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    await db.initialize()
+    manager = LibraryManager(db)
+    manager._analyzer = _StubAnalyzer()
+    await manager.scan_library(str(library))
+
+    disk = await run_check(str(library), workers=3)
+    cached = await run_check(str(library), workers=3, from_db=True, db=db)
+    assert disk["summary"] == {"series": 5, "ok": 1, "issues": 3, "empty": 1}
+    # The empty folder has no series row, everything else matches
+    strip = lambda r: [{k: v for k, v in s.items() if k != "elapsed"} for s in r["series"] if s["status"] != "empty"]
+    assert strip(cached) == strip(disk)
+
+    out = io.StringIO()
+    write_csv(disk, out)
+    rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+    assert len(rows) == 7  # five issues plus one row each for the clean and the empty series
+    assert {r["issue"] for r in rows if r["series"] == "Mixed"} == {"mixed_content", "non_standard_folder"}
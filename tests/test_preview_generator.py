@@ -0,0 +1,89 @@
+import json
+import os
+
+import pytest
+import pytest_asyncio
+from aniplay.core.library_manager import LibraryManager
+from aniplay.core.preview_generator import PreviewGenerator, SpriteManifest, load_previews, preview_dir
+from aniplay.core.scan_pipeline import CancelToken
+from aniplay.database.db import DatabaseManager
+from aniplay.utils.media_analyzer import MediaMetadata
+
+
+class _StubAnalyzer:
+    def probe_file(self, path):
+        return MediaMetadata(duration=1420.0, tracks=[])
+
+
+def _fake_generate(calls, fail=()):
+    def generate(path, duration, folder, interval):
+        calls.append(os.path.basename(path))
+        if os.path.basename(path) in fail:
+            return False
+        folder.mkdir(parents=True, exist_ok=True)
+        (folder / "thumb.jpg").write_bytes(b"jpg")
+        (folder / "sprite.jpg").write_bytes(b"jpg")
+        manifest = SpriteManifest(interval=interval, count=int(duration // interval) + 1, columns=10,
+                                  tile_width=160, tile_height=90)
+        (folder / "sprite.json").write_text(json.dumps(manifest.__dict__))
+        return True
+    return generate
+
+
+@pytest_asyncio.fixture
+async def library(tmp_path):
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    await db.initialize()
+    season = tmp_path / "library" / "Show" / "Season 1"
+    season.mkdir(parents=True)
+    for e in range(1, 4):
+        (season / f"Show - S01E{e:02d}.mkv").write_bytes(os.urandom(1024))
+    manager = LibraryManager(db)
+    manager._analyzer = _StubAnalyzer()
+    await manager.scan_library(str(tmp_path / "library"))
+    return db, tmp_path / "previews"
+
+
+def test_tile_for():
+    manifest = SpriteManifest(interval=10, count=25, columns=10, tile_width=160, tile_height=90)
+    assert manifest.tile_for(0) == (0, 0)
+    assert manifest.tile_for(125) == (320, 90)
+    assert manifest.tile_for(10_000) == (640, 180)  # clamped to the last tile
+
+
+@pytest.mark.asyncio
+async def test_previews_are_incremental(library):
+    db, cache = library
+    calls = []
+    stats = await PreviewGenerator(db, cache, generate=_fake_generate(calls, fail={"Show - S01E03.mkv"})).run()
+    assert stats == {"generated": 2, "failed": 1, "skipped": 0, "cancelled": False}
+
+    episodes = await db.get_all_episodes()
+    done = [e for e in episodes if load_previews(e.content_hash, cache)]
+    assert len(done) == 2
+    assert load_previews(done[0].content_hash, cache).manifest.interval == 10
+    assert (preview_dir(next(e for e in episodes if e not in done).content_hash, cache) / "failed").exists()
+
+    # Finished and failed episodes are not redone unless asked to
+    calls.clear()
+    stats = await PreviewGenerator(db, cache, generate=_fake_generate(calls)).run()
+    assert calls == [] and stats["skipped"] == 3
+    stats = await PreviewGenerator(db, cache, generate=_fake_generate(calls)).run(retry_failed=True)
+    assert calls == ["Show - S01E03.mkv"] and stats["generated"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_job_resumes(library):
+    db, cache = library
+    token = CancelToken()
+    calls = []
+
+    def generate(path, duration, folder, interval):
+        token.cancel()
+        return _fake_generate(calls)(path, duration, folder, interval)
+
+    stats = await PreviewGenerator(db, cache, cancel_token=token, generate=generate).run()
+    assert stats["cancelled"] and stats["generated"] == 1
+
+    stats = await PreviewGenerator(db, cache, generate=_fake_generate(calls)).run()
+    assert stats["generated"] == 2 and len(calls) == 3
@@ -0,0 +1,77 @@
+from dataclasses import asdict
+
+import pytest
+from aniplay.utils.release_parser import parse_release
+from aniplay.utils.file_scanner import FileScanner
+from aniplay.utils.title_extractor import TitleExtractor
+from aniplay.utils.nyaa_scraper import NyaaScraper
+from benchmarks.release_corpus import load
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("[SubsPlease] Sousou no Frieren - 05v2 (1080p) [A1B2C3D4].mkv",
+     dict(group="SubsPlease", title="Sousou no Frieren", episode=5, version=2, resolution="1080p", crc="A1B2C3D4")),
+    ("Show Name - S01E02 - The Title.mkv", dict(title="Show Name", season=1, episode=2, episode_title="The Title")),
+    ("S01E02-The Title.mkv", dict(season=1, episode=2, episode_title="The Title")),
+    ("Show.Name.S02E03.1080p.WEB-DL.DDP5.1.H.264-GRP.mkv",
+     dict(group="GRP", title="Show Name", season=2, episode=3, resolution="1080p", codec="h264")),
+    ("Mob Psycho 100 05.mkv", dict(title="Mob Psycho 100", episode=5)),
+    ("[Grp] 86 [05][720p].mkv", dict(group="Grp", title="86", episode=5, resolution="720p")),
+    ("Show 2nd Season - 07 [1920x1080 HEVC].mkv", dict(title="Show", season=2, episode=7, resolution="1080p", codec="hevc")),
+    ("[Grp] Show (01-12) [BD 1080p FLAC]", dict(group="Grp", title="Show", episode=1, episode_end=12, resolution="1080p")),
+    ("[Grp]_Dr._Stone_-_03_[ABCD1234].mkv", dict(group="Grp", title="Dr. Stone", episode=3, crc="ABCD1234")),
+    ("Show 1x05 Title.avi", dict(title="Show", season=1, episode=5, episode_title="Title")),
+    # Spaced batch ranges
+    ("[Group] Title - 01 ~ 12 [1080p]", dict(group="Group", title="Title", episode=1, episode_end=12, resolution="1080p")),
+    ("Title - 01 - 12 [Batch]", dict(title="Title", episode=1, episode_end=12)),
+    ("[Grp] Hyouka 01~22 [BD 720p]", dict(group="Grp", title="Hyouka", episode=1, episode_end=22, resolution="720p")),
+    ("Spy x Family - S01E01-E02.mkv", dict(title="Spy x Family", season=1, episode=1, episode_end=2)),
+    ("Show - 05 - 12 Days.mkv", dict(title="Show", episode=5, episode_title="12 Days")),
+    # Source tags that are also ordinary words
+    ("Show - 03 - The Complete Story.mkv", dict(title="Show", episode=3, episode_title="The Complete Story")),
+    ("Show - 07 - Web of Lies.mkv", dict(title="Show", episode=7, episode_title="Web of Lies")),
+    ("Show Name Complete [1080p]", dict(title="Show Name", resolution="1080p")),
+    ("Show.S01E01.1080p.WEB.x264-GRP.mkv",
+     dict(group="GRP", title="Show", season=1, episode=1, resolution="1080p", codec="h264")),
+    # Files inside a series folder, glued markers and specials
+    ("01. Title.mkv", dict(episode=1, episode_title="Title")),
+    ("01 - Title.mkv", dict(episode=1, episode_title="Title")),
+    ("[Judas] 05. Kitakubu.mkv", dict(group="Judas", episode=5, episode_title="Kitakubu")),
+    ("86 - 05.mkv", dict(title="86", episode=5)),
+    ("01 - 13 [Batch].mkv", dict(episode=1, episode_end=13)),
+    ("episode05.mkv", dict(episode=5)),
+    ("ep07.mp4", dict(episode=7)),
+    ("Show - #05.mkv", dict(title="Show", episode=5)),
+    ("Show - 05.5.mkv", dict(title="Show", episode=5, episode_decimal=5.5)),
+    ("Show Episode 12.5.mkv", dict(title="Show", episode=12, episode_decimal=12.5)),
+    ("Show - 05 [AAC 2.0].mkv", dict(title="Show", episode=5)),
+])
+def test_parse_release(name, expected):
+    info = asdict(parse_release(name))
+    assert {k: info[k] for k in expected} == expected
+    assert all(v is None for k, v in info.items() if k not in expected)
+
+
+def test_corpus_accuracy():
+    corpus = load()
+    assert len(corpus) >= 150
+    wrong = [item["name"] for item in corpus if asdict(parse_release(item["name"])) != item["expected"]]
+    # The corpus keeps names the parser still gets wrong; this only guards against regressions
+    assert len(wrong) / len(corpus) < 0.05, wrong[:10]
+
+
+def test_parse_is_memoized():
+    parse_release.cache_clear()
+    first = parse_release("[Grp] Show - 01 [1080p].mkv")
+    assert parse_release("[Grp] Show - 01 [1080p].mkv") is first
+    assert parse_release.cache_info().hits == 1
+
+
+def test_callers_agree():
+    name = "[Grp] Show Name - S01E04 - A Promise [1080p].mkv"
+    assert FileScanner.parse_episode_info(name) == {"season": 1, "episode": 4}
+    assert TitleExtractor.extract(name) == "A Promise"
+    scraper = NyaaScraper()
+    assert scraper._clean_name(name) == "Show Name"
+    assert scraper._extract_episode(name, "Show Name") == "4"
+    assert scraper._extract_episode("[Grp] Show Name [Batch]", "Show Name") == "1"
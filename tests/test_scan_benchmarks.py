@@ -0,0 +1,24 @@
+import pytest
+from benchmarks.bench_library_scan import run_benchmarks
+from benchmarks.synthetic_library import LibrarySpec, build_library, reorganize
+
+
+def test_build_library(tmp_path):
+    spec = LibrarySpec(series=4, episodes=3, seasons=2, specials=1, file_size=4096)
+    folders = build_library(tmp_path, spec)
+    files = [p for p in tmp_path.rglob("*.mkv")]
+    assert len(files) == spec.total_files == 28
+    assert sorted(p.name for p in (folders[0] / "Season 2").iterdir())[0] == "[Synth] Synthetic Show 0000 - S02E01 [1080p].mkv"
+    assert reorganize(folders, 0.5) == 2
+    assert (folders[0] / "S1").is_dir() and (folders[1] / "Season 1").is_dir()
+
+
+@pytest.mark.asyncio
+async def test_benchmarks_run(tmp_path):
+    spec = LibrarySpec(series=3, episodes=2, file_size=4096)
+    results = await run_benchmarks(spec, repeat=1, moved_fraction=0.5, parent=str(tmp_path))
+    assert set(results) == {"scan_series_folder", "scan_library_initial", "scan_library_quick",
+                            "scan_library_full", "migrate_paths", "analyze_series"}
+    assert results["scan_library_initial"]["counters"]["probes_run"] == 6
+    assert results["scan_library_quick"]["counters"]["probes_cached"] == 6
+    assert results["migrate_paths"]["updated"] == 4  # two series reorganized, two episodes each
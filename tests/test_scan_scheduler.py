@@ -0,0 +1,113 @@
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from aniplay.core.library_manager import LibraryManager
+from aniplay.core.scan_scheduler import ScanScheduler, is_root_online, throttle_current_thread
+from aniplay.database.db import DatabaseManager
+from aniplay.database.models import LibraryRoot
+from aniplay.utils.media_analyzer import MediaMetadata
+
+
+class _StubAnalyzer:
+    def probe_file(self, path):
+        return MediaMetadata(duration=1420.0, tracks=[])
+
+
+@pytest_asyncio.fixture
+async def roots(tmp_path):
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    await db.initialize()
+    for disk in ("ssd", "hdd"):
+        season = tmp_path / disk / f"Show on {disk}" / "Season 1"
+        season.mkdir(parents=True)
+        (season / "Show - S01E01.mkv").write_bytes(b"\0" * 10)
+        await db.add_library_root(LibraryRoot(path=str(tmp_path / disk), scan_interval=60, scan_workers=1,
+                                              probe_workers=1, nice=1, io_class="idle"))
+    await db.add_library_root(LibraryRoot(path=str(tmp_path / "nfs"), scan_interval=60, offline_timeout=1))
+    manager = LibraryManager(db)
+    manager._analyzer = _StubAnalyzer()
+    return db, manager, tmp_path
+
+
+@pytest.mark.asyncio
+async def test_due_roots_are_scanned_independently(roots):
+    db, manager, tmp_path = roots
+    finished = []
+    scheduler = ScanScheduler(manager, on_finished=lambda root, status: finished.append((root.path, status)))
+
+    await scheduler.run_due()
+    await scheduler.wait_idle()
+
+    assert sorted(finished) == sorted([(str(tmp_path / "ssd"), "ok"), (str(tmp_path / "hdd"), "ok"),
+                                       (str(tmp_path / "nfs"), "offline")])
+    assert sorted(s.name for s in await db.get_all_series()) == ["Show on hdd", "Show on ssd"]
+    stored = {r.path: r for r in await db.get_library_roots()}
+    assert stored[str(tmp_path / "nfs")].last_status == "offline"
+    assert all(r.last_scan_at for r in stored.values())
+
+    # Nothing is due again until the interval passed
+    finished.clear()
+    await scheduler.run_due()
+    await scheduler.wait_idle()
+    assert finished == []
+
+
+@pytest.mark.asyncio
+async def test_busy_defers_background_scans(roots):
+    db, manager, tmp_path = roots
+    scheduler = ScanScheduler(manager, busy=lambda: True)
+    await scheduler.run_due()
+    await scheduler.wait_idle()
+    assert await db.get_all_series() == []
+
+
+def test_due():
+    scheduler = ScanScheduler(library=None)
+    now = datetime.now()
+    assert not scheduler.due(LibraryRoot(path="/a", scan_interval=0), now)
+    assert scheduler.due(LibraryRoot(path="/a", scan_interval=30), now)
+    assert not scheduler.due(LibraryRoot(path="/a", scan_interval=30, last_scan_at=now - timedelta(minutes=10)), now)
+    assert scheduler.due(LibraryRoot(path="/a", scan_interval=30, last_scan_at=now - timedelta(minutes=31)), now)
+    assert not scheduler.due(LibraryRoot(path="/a", scan_interval=30, enabled=False), now)
+
+
+def test_root_for_path(tmp_path):
+    manager = LibraryManager(db_manager=None)
+    outer = LibraryRoot(path=str(tmp_path / "anime"), id=1)
+    inner = LibraryRoot(path=str(tmp_path / "anime" / "nas"), id=2)
+    assert manager.root_for_path([outer, inner], str(tmp_path / "anime" / "nas" / "Show" / "ep.mkv")) is inner
+    assert manager.root_for_path([outer, inner], str(tmp_path / "anime" / "Show")) is outer
+    assert manager.root_for_path([outer, inner], str(tmp_path / "anime2" / "Show")) is None
+
+
+def test_is_root_online(tmp_path):
+    assert is_root_online(str(tmp_path), timeout=1)
+    assert not is_root_online(str(tmp_path / "missing"), timeout=1)
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="per-thread niceness is Linux behaviour")
+def test_throttle_only_affects_calling_thread():
+    before = os.getpriority(os.PRIO_PROCESS, 0)
+    seen = []
+
+    def worker():
+        throttle_current_thread(nice=3, io_class="idle")
+        seen.append(os.getpriority(os.PRIO_PROCESS, 0))
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+    assert seen == [min(before + 3, 19)]
+    assert os.getpriority(os.PRIO_PROCESS, 0) == before
+
+
+def test_throttle_leaves_process_nice_alone_off_linux(monkeypatch):
+    calls = []
+    monkeypatch.setattr(sys, "platform", "darwin")
+    monkeypatch.setattr(os, "nice", calls.append, raising=False)
+    throttle_current_thread(nice=10, io_class="idle")
+    assert calls == []
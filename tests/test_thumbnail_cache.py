@@ -0,0 +1,27 @@
+import os
+
+from aniplay.utils.thumbnail_cache import stale_variants, thumbnail_path
+
+
+def test_variant_name_follows_source_mtime(tmp_path):
+    poster = tmp_path / "folder.jpg"
+    poster.write_bytes(b"jpeg")
+    cache = tmp_path / "cache"
+    cache.mkdir()
+
+    first = thumbnail_path(str(poster), 180, 260, 1.0, cache)
+    assert first == thumbnail_path(str(poster), 180, 260, 1.0, cache)
+    assert first != thumbnail_path(str(poster), 360, 520, 2.0, cache)
+    assert thumbnail_path(str(tmp_path / "missing.jpg"), 180, 260, 1.0, cache) is None
+
+    st = poster.stat()
+    os.utime(poster, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    second = thumbnail_path(str(poster), 180, 260, 1.0, cache)
+    assert second != first
+
+    first.write_bytes(b"old")
+    hidpi = thumbnail_path(str(poster), 360, 520, 2.0, cache)
+    hidpi.write_bytes(b"2x")
+    second.write_bytes(b"new")
+    # Only the outdated variant of the same size is stale
+    assert stale_variants(second) == [first]